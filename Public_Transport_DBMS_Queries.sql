@@ -109,19 +109,85 @@ CREATE TABLE IF NOT EXISTS ticket_log (
     trip_id INT,
     log_time DATETIME DEFAULT CURRENT_TIMESTAMP,
     action VARCHAR(50),
-    FOREIGN KEY (ticket_id) REFERENCES tickets(ticket_id)
+    INDEX idx_ticket_log_ticket (ticket_id),
+    INDEX idx_ticket_log_trip (trip_id)
+);
+
+-- Materialized reports, kept current by the app's report refresher
+-- (per service day; 0 stands for a missing route/bus/driver/stop)
+CREATE TABLE IF NOT EXISTS report_revenue_daily (
+    day DATE NOT NULL,
+    route_id INT NOT NULL,
+    bus_id INT NOT NULL,
+    driver_id INT NOT NULL,
+    tickets INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, route_id, bus_id, driver_id)
+);
+
+CREATE TABLE IF NOT EXISTS report_gender_daily (
+    day DATE NOT NULL,
+    route_id INT NOT NULL,
+    gender VARCHAR(10) NOT NULL,
+    tickets INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, route_id, gender)
+);
+
+CREATE TABLE IF NOT EXISTS report_stop_pairs_daily (
+    day DATE NOT NULL,
+    route_id INT NOT NULL,
+    boarding_stop_id INT NOT NULL,
+    dropping_stop_id INT NOT NULL,
+    tickets INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, route_id, boarding_stop_id, dropping_stop_id)
+);
+
+CREATE TABLE IF NOT EXISTS report_refresh_state (
+    id INT PRIMARY KEY,
+    ticket_high_water DATETIME,
+    ticket_id_high_water INT,
+    log_high_water INT,
+    pending_ids TEXT,
+    refreshed_at DATETIME,
+    last_duration_ms INT
 );
 
 -- =====================================================
--- 2. TRIGGER
+-- 2. TRIGGERS
+-- Sessions that set @ticket_log_async (the app in async log mode) queue
+-- these events themselves, so the triggers skip them.
 -- =====================================================
 DELIMITER //
 CREATE TRIGGER after_ticket_insert
 AFTER INSERT ON tickets
 FOR EACH ROW
 BEGIN
-    INSERT INTO ticket_log (ticket_id, trip_id, action)
-    VALUES (NEW.ticket_id, NEW.trip_id, 'Ticket Issued');
+    IF @ticket_log_async IS NULL THEN
+        INSERT INTO ticket_log (ticket_id, trip_id, action)
+        VALUES (NEW.ticket_id, NEW.trip_id, 'Ticket Issued');
+    END IF;
+END //
+
+CREATE TRIGGER after_ticket_update
+AFTER UPDATE ON tickets
+FOR EACH ROW
+BEGIN
+    IF @ticket_log_async IS NULL THEN
+        INSERT INTO ticket_log (ticket_id, trip_id, action)
+        VALUES (NEW.ticket_id, NEW.trip_id, 'Ticket Updated');
+    END IF;
+END //
+
+CREATE TRIGGER after_ticket_delete
+AFTER DELETE ON tickets
+FOR EACH ROW
+BEGIN
+    IF @ticket_log_async IS NULL THEN
+        INSERT INTO ticket_log (ticket_id, trip_id, action)
+        VALUES (OLD.ticket_id, OLD.trip_id, 'Ticket Deleted');
+    END IF;
 END //
 DELIMITER ;
 
@@ -6,695 +6,63 @@ Includes NEW public ticket booking feature and update/delete buttons
 """
 
 import streamlit as st
-import mysql.connector
-from mysql.connector import Error
-from contextlib import contextmanager
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from datetime import datetime, date, time, timedelta
-import hashlib
-import traceback
-import random
+import threading
+
+from transport import context, crud, demand_analytics, passenger_identity, queries, reporting, stop_geo, ticket_lookup
+from transport.db import (get_conn, fetch_all, memo, get_replica_set, session_memo,
+                          get_ticket_log_writer, ticket_log_async, start_rerun_stats)
+from transport.config import TICKET_PAGE_SIZE
+from transport.query_guard import Overloaded, QueryTimeout
+from transport.schema import ensure_database_initialized, reset_sample_data
+from transport.crud import (
+    authenticate, register_user, list_buses, list_drivers, list_routes, list_stops, list_trips,
+    list_tickets, lookup_tickets, list_available_trips, list_trips_for_day, list_path_for_trip,
+    list_major_stops, route_topology, nearest_stops, calculate_fare, seat_tags, live_seat_map,
+    get_available_seats, get_report_refresher, get_dashboard_refresher, report_refresh_state, revenue_report,
+    add_bus, update_bus, delete_bus, add_driver, update_driver, delete_driver,
+    add_route, update_route, delete_route, add_stop, update_stop, delete_stop,
+    add_trip, update_trip, delete_trip, trip_scheduler, find_trip_conflicts, TripConflictError,
+    plan_trip_assignments, apply_trip_assignments, add_passenger, add_ticket, book_ticket, BookingError,
+    update_ticket, delete_ticket, get_waitlist_worker, join_waitlist, leave_waitlist, waitlist_by_contact,
+    bulk_update_rows, bulk_delete_rows, cancel_route_trips,
+)
 
 # --------------------------- CONFIG ---------------------------
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "tp_user",
-    "password": "root", 
-    "database": "transport_db"
-}
+# Database and background-job settings live in transport/config.py
 
-DEMO_USERS = [
-    ("admin", "admin123", "admin"),
-    ("operator1", "oper123", "operator"),
-]
+# How often the live seat picker on "Book Tickets" refreshes itself
+SEAT_REFRESH_SECONDS = 3
 
-# --------------------------- DB HELPERS ---------------------------
-@contextmanager
-def get_conn():
-    conn = None
-    cur = None
-    try:
-        tmp = DB_CONFIG.copy()
-        db = tmp.pop("database", None)
-        conn0 = mysql.connector.connect(host=tmp["host"], user=tmp["user"], password=tmp["password"])
-        cur0 = conn0.cursor()
-        if db:
-            cur0.execute(f"CREATE DATABASE IF NOT EXISTS `{db}` DEFAULT CHARACTER SET 'utf8mb4'")
-        cur0.close()
-        conn0.close()
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cur = conn.cursor(dictionary=True)
-        yield conn, cur
-        conn.commit()
-    except Exception as e:
-        st.error(f"Database error: {e}")
-        traceback.print_exc()
-        raise
-    finally:
-        if cur: cur.close()
-        if conn: conn.close()
-
-def fetch_all(sql, params=None):
-    with get_conn() as (conn, cur):
-        cur.execute(sql, params or ())
-        return cur.fetchall() or []
-
-def run_sql(sql, params=None):
-    with get_conn() as (conn, cur):
-        cur.execute(sql, params or ())
-        return cur.lastrowid
-
-# --------------------------- SCHEMA & SEED ---------------------------
-def initialize_database_and_schema():
-    """Create all tables safely - only if they don't exist"""
-    with get_conn() as (conn, cur):
-        # Disable foreign key checks temporarily for safe table creation
-        cur.execute("SET FOREIGN_KEY_CHECKS = 0;")
-        
-        # Create tables only if they don't exist
-        # Users table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(100) UNIQUE,
-            password_hash VARCHAR(256),
-            role ENUM('admin','operator') NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB;
-        """)
-
-        # Drivers table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS drivers (
-            driver_id INT AUTO_INCREMENT PRIMARY KEY,
-            first_name VARCHAR(100),
-            last_name VARCHAR(100),
-            license_no VARCHAR(100) UNIQUE,
-            phone VARCHAR(20),
-            salary DECIMAL(10,2),
-            address TEXT,
-            is_active BOOLEAN DEFAULT TRUE
-        ) ENGINE=InnoDB;
-        """)
-
-        # Routes table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS routes (
-            route_id INT AUTO_INCREMENT PRIMARY KEY,
-            route_name VARCHAR(200),
-            source VARCHAR(200),
-            destination VARCHAR(200),
-            distance_km FLOAT
-        ) ENGINE=InnoDB;
-        """)
-
-        # Stops table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS stops (
-            stop_id INT AUTO_INCREMENT PRIMARY KEY,
-            stop_name VARCHAR(200),
-            location VARCHAR(255)
-        ) ENGINE=InnoDB;
-        """)
-
-        # Buses table - CORRECTED: Added 'type' column
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS buses (
-            bus_id INT AUTO_INCREMENT PRIMARY KEY,
-            bus_no VARCHAR(100) UNIQUE,
-            bus_name VARCHAR(200),
-            type VARCHAR(100),
-            capacity INT,
-            fare_id INT,
-            route_id INT,
-            ac BOOLEAN DEFAULT FALSE,
-            status ENUM('active','maintenance','inactive') DEFAULT 'active',
-            FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE SET NULL
-        ) ENGINE=InnoDB;
-        """)
-
-        # Route stops table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS route_stops (
-            route_id INT,
-            stop_order INT,
-            stop_id INT,
-            PRIMARY KEY (route_id, stop_order),
-            FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE CASCADE,
-            FOREIGN KEY (stop_id) REFERENCES stops(stop_id) ON DELETE CASCADE
-        ) ENGINE=InnoDB;
-        """)
-
-        # Trips table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS trips (
-            trip_id INT AUTO_INCREMENT PRIMARY KEY,
-            route_id INT,
-            bus_id INT,
-            driver_id INT,
-            start_time DATETIME,
-            end_time DATETIME,
-            frequency VARCHAR(100),
-            status ENUM('scheduled','ongoing','completed','cancelled') DEFAULT 'scheduled',
-            FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE SET NULL,
-            FOREIGN KEY (bus_id) REFERENCES buses(bus_id) ON DELETE SET NULL,
-            FOREIGN KEY (driver_id) REFERENCES drivers(driver_id) ON DELETE SET NULL
-        ) ENGINE=InnoDB;
-        """)
-
-        # Passengers table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS passengers (
-            passenger_id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(200),
-            address VARCHAR(300),
-            contact_no VARCHAR(20),
-            email_id VARCHAR(200)
-        ) ENGINE=InnoDB;
-        """)
-
-        # Tickets table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS tickets (
-            ticket_id INT AUTO_INCREMENT PRIMARY KEY,
-            trip_id INT,
-            passenger_id INT,
-            boarding_stop_id INT,
-            dropping_stop_id INT,
-            seat_no VARCHAR(10),
-            fare DECIMAL(10,2),
-            gender ENUM('male','female','other') DEFAULT 'other',
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (trip_id) REFERENCES trips(trip_id) ON DELETE SET NULL,
-            FOREIGN KEY (passenger_id) REFERENCES passengers(passenger_id) ON DELETE SET NULL,
-            FOREIGN KEY (boarding_stop_id) REFERENCES stops(stop_id) ON DELETE SET NULL,
-            FOREIGN KEY (dropping_stop_id) REFERENCES stops(stop_id) ON DELETE SET NULL
-        ) ENGINE=InnoDB;
-        """)
-
-        # Path table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS path (
-            path_id INT AUTO_INCREMENT PRIMARY KEY,
-            trip_id INT,
-            stop_id INT,
-            arrival_time DATETIME,
-            departure_time DATETIME,
-            people_in INT DEFAULT 0,
-            people_out INT DEFAULT 0,
-            money_collected DECIMAL(10,2) DEFAULT 0,
-            FOREIGN KEY (trip_id) REFERENCES trips(trip_id) ON DELETE CASCADE,
-            FOREIGN KEY (stop_id) REFERENCES stops(stop_id) ON DELETE CASCADE
-        ) ENGINE=InnoDB;
-        """)
-
-        # Major stops table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS major_stops (
-            major_stop_id INT AUTO_INCREMENT PRIMARY KEY,
-            route_id INT,
-            stop_id INT,
-            time_taken_minutes INT DEFAULT 0,
-            people_getting_in INT DEFAULT 0,
-            people_getting_down INT DEFAULT 0,
-            FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE CASCADE,
-            FOREIGN KEY (stop_id) REFERENCES stops(stop_id) ON DELETE CASCADE
-        ) ENGINE=InnoDB;
-        """)
-
-        # Ticket log table
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS ticket_log (
-            log_id INT AUTO_INCREMENT PRIMARY KEY,
-            ticket_id INT,
-            trip_id INT,
-            log_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-            action VARCHAR(50),
-            FOREIGN KEY (ticket_id) REFERENCES tickets(ticket_id)
-        ) ENGINE=InnoDB;
-        """)
-
-        # Re-enable foreign key checks
-        cur.execute("SET FOREIGN_KEY_CHECKS = 1;")
-
-        # Create trigger (safe version)
-        try:
-            cur.execute("DROP TRIGGER IF EXISTS after_ticket_insert;")
-            cur.execute("""
-            CREATE TRIGGER after_ticket_insert
-            AFTER INSERT ON tickets
-            FOR EACH ROW
-            INSERT INTO ticket_log (ticket_id, trip_id, action)
-            VALUES (NEW.ticket_id, NEW.trip_id, 'Ticket Issued');
-            """)
-        except Exception as e:
-            st.warning(f"Could not create trigger: {e}")
-
-        # Stored procedure (safe version)
-        try:
-            cur.execute("DROP PROCEDURE IF EXISTS GetTripRevenue;")
-            cur.execute("""
-            CREATE PROCEDURE GetTripRevenue(IN tripID INT)
-            BEGIN
-                SELECT t.trip_id, COALESCE(r.route_name,'-') AS route_name, 
-                       COALESCE(SUM(tk.fare), 0) AS total_revenue
-                FROM trips t
-                LEFT JOIN routes r ON t.route_id = r.route_id
-                LEFT JOIN tickets tk ON t.trip_id = tk.trip_id
-                WHERE t.trip_id = tripID
-                GROUP BY t.trip_id, r.route_name;
-            END;
-            """)
-        except Exception as e:
-            st.warning(f"Could not create stored procedure: {e}")
-
-    # Only seed data if tables are empty
-    seed_sample_data()
-def seed_sample_data():
-    """Populate with rich sample data only if tables are empty"""
-    with get_conn() as (conn, cur):
-        # Only seed if users table is empty (indicator that all tables are empty)
-        cur.execute("SELECT COUNT(*) as c FROM users")
-        user_count = cur.fetchone()["c"]
-        
-        if user_count > 0:
-            st.info("Database already has data. Skipping seeding.")
-            return    
-        st.info("Seeding database with sample data...")
-        
-        # Demo users
-        for uname, pwd, role in DEMO_USERS:
-            pwd_hash = hashlib.sha256(pwd.encode()).hexdigest()
-            cur.execute("INSERT INTO users (username,password_hash,role) VALUES (%s,%s,%s)", (uname, pwd_hash, role))
-        # Stops
-        stops = [
-            ("Central Station", "City Center"), 
-            ("North Square", "North Area"),
-            ("East Park", "East Side"), 
-            ("West End", "West District"),
-            ("South Gate", "South Zone"), 
-            ("University", "Campus Road"),
-            ("Airport", "Airport Terminal"), 
-            ("Mall", "Shopping District"),
-            ("Tech Park", "IT Hub")
-        ]
-        for s in stops:
-            cur.execute("INSERT INTO stops (stop_name, location) VALUES (%s,%s)", s)
-
-        # Routes
-        routes = [
-            ("R1 Central-Airport", "Central Station", "Airport", 15.0),
-            ("R2 Central-University", "Central Station", "University", 8.5),
-            ("R3 North-South Express", "North Square", "South Gate", 12.0),
-            ("R4 Tech Loop", "Tech Park", "Mall", 9.0)
-        ]
-        for r in routes:
-            cur.execute("INSERT INTO routes (route_name,source,destination,distance_km) VALUES (%s,%s,%s,%s)", r)
-
-        # Get stop IDs and route IDs for route_stops
-        cur.execute("SELECT stop_id, stop_name FROM stops")
-        srows = {row["stop_name"]: row["stop_id"] for row in cur.fetchall()}
-        
-        cur.execute("SELECT route_id, route_name FROM routes")
-        rmap = {rr["route_name"]: rr["route_id"] for rr in cur.fetchall()}
-        
-        # Route stops configuration
-        route_stops_config = {
-            "R1 Central-Airport": ["Central Station", "East Park", "West End", "Airport"],
-            "R2 Central-University": ["Central Station", "North Square", "University"],
-            "R3 North-South Express": ["North Square", "Central Station", "South Gate"]
-        }
-        
-        for route_name, stops_list in route_stops_config.items():
-            if route_name in rmap:
-                for idx, stop_name in enumerate(stops_list, 1):
-                    if stop_name in srows:
-                        cur.execute("INSERT INTO route_stops (route_id,stop_order,stop_id) VALUES (%s,%s,%s)", 
-                                   (rmap[route_name], idx, srows[stop_name]))
-
-        # Drivers
-        drivers = [
-            ("Raj", "Kumar", "LIC1001", "9999990001", 30000, "Central City", True),
-            ("Anita", "Sharma", "LIC1002", "9999990002", 32000, "North Block", True),
-            ("Vikram", "Singh", "LIC1003", "9999990003", 31000, "East Side", False),
-            ("Deepa", "Rao", "LIC1004", "9999990004", 29000, "South Area", True),
-            ("Kiran", "Mehta", "LIC1005", "9999990005", 28000, "Airport Zone", False)
-        ]
-        for d in drivers:
-            cur.execute("INSERT INTO drivers (first_name,last_name,license_no,phone,salary,address,is_active) VALUES (%s,%s,%s,%s,%s,%s,%s)", d)
-
-        # Buses - WITH TYPE COLUMN
-        buses = [
-            ("BUS100", "City Rapid", "AC", 50, None, 1, True, "active"),
-            ("BUS101", "Metro Shuttle", "Mini", 30, None, 2, False, "active"),
-            ("BUS102", "Airport Express", "AC", 60, None, 1, True, "maintenance"),
-            ("BUS103", "Downtown Loop", "Non-AC", 40, None, 3, False, "active"),
-            ("BUS104", "City Connect", "AC", 45, None, 4, True, "active")
-        ]
-        for bus in buses:
-            cur.execute("INSERT INTO buses (bus_no,bus_name,type,capacity,fare_id,route_id,ac,status) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)", bus)
-
-        # Get IDs for trips
-        route_ids = {}
-        cur.execute("SELECT route_id, route_name FROM routes")
-        for row in cur.fetchall():
-            route_ids[row['route_name']] = row['route_id']
-        
-        bus_ids = {}
-        cur.execute("SELECT bus_id, bus_no FROM buses")
-        for row in cur.fetchall():
-            bus_ids[row['bus_no']] = row['bus_id']
-        
-        driver_ids = {}
-        cur.execute("SELECT driver_id, license_no FROM drivers")
-        for row in cur.fetchall():
-            driver_ids[row['license_no']] = row['driver_id']
-
-        # Trips - create trips for today and tomorrow
-        now = datetime.now()
-        trips = [
-            # Today's trips
-            (route_ids["R1 Central-Airport"], bus_ids["BUS100"], driver_ids["LIC1001"], 
-             now.replace(hour=8, minute=0, second=0, microsecond=0), 
-             now.replace(hour=9, minute=0, second=0, microsecond=0), "daily", "scheduled"),
-            
-            (route_ids["R2 Central-University"], bus_ids["BUS101"], driver_ids["LIC1002"], 
-             now.replace(hour=10, minute=30, second=0, microsecond=0), 
-             now.replace(hour=11, minute=15, second=0, microsecond=0), "daily", "scheduled"),
-            
-            (route_ids["R3 North-South Express"], bus_ids["BUS103"], driver_ids["LIC1004"], 
-             now.replace(hour=14, minute=0, second=0, microsecond=0), 
-             now.replace(hour=14, minute=45, second=0, microsecond=0), "weekdays", "scheduled"),
-            
-            # Tomorrow's trips
-            (route_ids["R1 Central-Airport"], bus_ids["BUS100"], driver_ids["LIC1001"], 
-             (now + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0), 
-             (now + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0), "daily", "scheduled"),
-            
-            (route_ids["R4 Tech Loop"], bus_ids["BUS104"], driver_ids["LIC1003"], 
-             (now + timedelta(days=1)).replace(hour=11, minute=0, second=0, microsecond=0), 
-             (now + timedelta(days=1)).replace(hour=11, minute=40, second=0, microsecond=0), "daily", "scheduled")
-        ]
-        
-        for trip in trips:
-            cur.execute("INSERT INTO trips (route_id,bus_id,driver_id,start_time,end_time,frequency,status) VALUES (%s,%s,%s,%s,%s,%s,%s)", trip)
-
-        # Passengers
-        passengers = [
-            ("Sneha Verma", "College Road", "8888888888", "sneha@example.com"),
-            ("Aman Singh", "North Lane", "7777777777", "aman@example.com"),
-            ("Priya Patel", "South Street", "6666666666", "priya@example.com"),
-            ("Rahul Kumar", "East Avenue", "5555555555", "rahul@example.com"),
-            ("Anjali Sharma", "West Boulevard", "4444444444", "anjali@example.com")
-        ]
-        for p in passengers:
-            cur.execute("INSERT INTO passengers (name,address,contact_no,email_id) VALUES (%s,%s,%s,%s)", p)
-
-        # Sample tickets - book some seats to demonstrate availability
-        cur.execute("SELECT trip_id FROM trips WHERE start_time > %s ORDER BY start_time LIMIT 1", (now,))
-        trip = cur.fetchone()
-        
-        cur.execute("SELECT stop_id FROM stops LIMIT 4")
-        stops = cur.fetchall()
-        
-        cur.execute("SELECT passenger_id FROM passengers LIMIT 3")
-        passengers = cur.fetchall()
-        
-        if trip and len(stops) >= 2 and passengers:
-            # Book some sample tickets
-            sample_tickets = [
-                (trip["trip_id"], passengers[0]["passenger_id"], stops[0]["stop_id"], stops[2]["stop_id"], "A1", 45.00, "female"),
-                (trip["trip_id"], passengers[1]["passenger_id"], stops[1]["stop_id"], stops[3]["stop_id"], "A2", 35.00, "male"),
-                (trip["trip_id"], passengers[2]["passenger_id"], stops[0]["stop_id"], stops[1]["stop_id"], "B1", 25.00, "female")
-            ]
-            
-            for ticket in sample_tickets:
-                cur.execute("INSERT INTO tickets (trip_id,passenger_id,boarding_stop_id,dropping_stop_id,seat_no,fare,gender) VALUES (%s,%s,%s,%s,%s,%s,%s)", ticket)
-
-        # Path data for analytics
-        cur.execute("SELECT trip_id FROM trips LIMIT 1")
-        trip_for_path = cur.fetchone()
-        cur.execute("SELECT stop_id FROM stops LIMIT 3")
-        stops_for_path = cur.fetchall()
-        
-        if trip_for_path and stops_for_path:
-            path_time = now.replace(hour=8, minute=0, second=0, microsecond=0)
-            for idx, stop in enumerate(stops_for_path):
-                cur.execute("""
-                    INSERT INTO path (trip_id,stop_id,arrival_time,departure_time,people_in,people_out,money_collected) 
-                    VALUES (%s,%s,%s,%s,%s,%s,%s)
-                """, (
-                    trip_for_path["trip_id"], stop["stop_id"], 
-                    path_time + timedelta(minutes=idx*15),
-                    path_time + timedelta(minutes=idx*15 + 2),
-                    5 + idx, 2 + idx, 150.0 * (idx + 1)
-                ))
-
-        # Major stops data
-        cur.execute("SELECT route_id FROM routes LIMIT 2")
-        routes_for_major = cur.fetchall()
-        cur.execute("SELECT stop_id FROM stops LIMIT 2")
-        stops_for_major = cur.fetchall()
-        
-        if routes_for_major and stops_for_major:
-            for i, route in enumerate(routes_for_major):
-                for j, stop in enumerate(stops_for_major):
-                    if i < len(routes_for_major) and j < len(stops_for_major):
-                        cur.execute("""
-                            INSERT INTO major_stops (route_id,stop_id,time_taken_minutes,people_getting_in,people_getting_down) 
-                            VALUES (%s,%s,%s,%s,%s)
-                        """, (route["route_id"], stop["stop_id"], (i+1)*5, (j+1)*8, (j+1)*3))
-
-        st.success("✅ Database seeded successfully with sample data!")
-
-# --------------------------- AUTH HELPERS ---------------------------
-def hash_password(plain):
-    return hashlib.sha256(plain.encode()).hexdigest()
-
-def authenticate(username, password):
-    with get_conn() as (conn, cur):
-        cur.execute("SELECT * FROM users WHERE username=%s", (username,))
-        row = cur.fetchone()
-        if not row:
-            return None
-        if row.get("password_hash") == hash_password(password):
-            return {"user_id": row.get("user_id", 0), "username": row.get("username"), "role": row.get("role")}
-    return None
-
-def register_user(username, password, role="operator"):
-    with get_conn() as (conn, cur):
-        cur.execute("SELECT * FROM users WHERE username=%s", (username,))
-        if cur.fetchone() is not None:
-            return False, "Username already exists."
-        cur.execute("INSERT INTO users (username,password_hash,role) VALUES (%s,%s,%s)", 
-                   (username, hash_password(password), role))
-        return True, "User created."
-
-# --------------------------- CRUD HELPERS ---------------------------
-def list_buses(): 
-    return fetch_all("SELECT * FROM buses ORDER BY bus_id DESC")
-
-def list_drivers(): 
-    return fetch_all("SELECT * FROM drivers ORDER BY driver_id DESC")
-
-def list_routes(): 
-    return fetch_all("SELECT * FROM routes ORDER BY route_id DESC")
-
-def list_stops(): 
-    return fetch_all("SELECT * FROM stops ORDER BY stop_id DESC")
-
-def list_trips(): 
-    return fetch_all("""
-        SELECT t.*, r.route_name, b.bus_no, b.type, b.ac, CONCAT(d.first_name,' ',d.last_name) AS driver_name
-        FROM trips t
-        LEFT JOIN routes r ON t.route_id=r.route_id
-        LEFT JOIN buses b ON t.bus_id=b.bus_id
-        LEFT JOIN drivers d ON t.driver_id=d.driver_id
-        ORDER BY t.trip_id DESC
-    """)
-
-def list_tickets():
-    return fetch_all("""
-        SELECT tk.*, r.route_name, s1.stop_name AS boarding_stop, s2.stop_name AS dropping_stop,
-               p.name AS passenger_name, t.start_time, t.end_time
-        FROM tickets tk
-        JOIN trips t ON tk.trip_id = t.trip_id
-        JOIN routes r ON t.route_id = r.route_id
-        JOIN stops s1 ON tk.boarding_stop_id = s1.stop_id
-        JOIN stops s2 ON tk.dropping_stop_id = s2.stop_id
-        JOIN passengers p ON tk.passenger_id = p.passenger_id
-        ORDER BY tk.created_at DESC
-    """)
-
-def list_available_trips():
-    """Get trips that are scheduled for today or future"""
-    today = datetime.now().date()
-    return fetch_all("""
-        SELECT t.*, r.route_name, b.bus_no, b.type, b.ac, 
-               CONCAT(d.first_name,' ',d.last_name) AS driver_name
-        FROM trips t
-        LEFT JOIN routes r ON t.route_id=r.route_id
-        LEFT JOIN buses b ON t.bus_id=b.bus_id
-        LEFT JOIN drivers d ON t.driver_id=d.driver_id
-        WHERE t.status = 'scheduled' AND DATE(t.start_time) >= %s
-        ORDER BY t.start_time ASC
-    """, (today,))
-
-def get_route_stops(route_id):
-    """Get stops for a specific route in order"""
-    return fetch_all("""
-        SELECT rs.stop_order, s.stop_id, s.stop_name, s.location
-        FROM route_stops rs
-        JOIN stops s ON rs.stop_id = s.stop_id
-        WHERE rs.route_id = %s
-        ORDER BY rs.stop_order
-    """, (route_id,))
-
-def calculate_fare(boarding_stop_id, dropping_stop_id, bus_type, is_ac):
-    """Calculate fare based on stops and bus type"""
-    base_fare = 20.0
-    if bus_type.lower() == "ac" or is_ac:
-        base_fare += 10.0
-    return base_fare + random.randint(5, 15)
-
-def get_available_seats(trip_id):
-    """Get available seats for a trip"""
-    trip = fetch_all("SELECT * FROM trips WHERE trip_id = %s", (trip_id,))
-    if not trip:
-        return []
-    
-    bus_id = trip[0]['bus_id']
-    bus = fetch_all("SELECT * FROM buses WHERE bus_id = %s", (bus_id,))
-    if not bus:
-        return []
-    
-    capacity = bus[0]['capacity']
-    booked_seats = fetch_all("SELECT seat_no FROM tickets WHERE trip_id = %s", (trip_id,))
-    booked_seat_nos = [seat['seat_no'] for seat in booked_seats]
-    
-    all_seats = [f"A{i+1}" for i in range(capacity)]
-    available_seats = [seat for seat in all_seats if seat not in booked_seat_nos]
-    
-    return available_seats
+# --------------------------- DATA LAYER HOOKS ---------------------------
+def current_session():
+    """st.session_state while a page is running, None in background threads"""
+    return st.session_state if get_script_run_ctx() is not None else None
 
-# Add/Update/Delete functions
-def add_bus(bus_no, bus_name, type_, capacity, fare_id, route_id, ac, status):
-    with get_conn() as (conn, cur):
-        cur.execute("INSERT INTO buses (bus_no,bus_name,type,capacity,fare_id,route_id,ac,status) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                    (bus_no, bus_name, type_, capacity, fare_id, route_id, ac, status))
+def show_message(level, message):
+    {"info": st.info, "success": st.success, "warning": st.warning, "error": st.error}[level](message)
 
-def update_bus(bus_id, **kwargs):
-    cols = []; vals = []
-    for k,v in kwargs.items():
-        cols.append(f"{k}=%s"); vals.append(v)
-    vals.append(bus_id)
-    sql = f"UPDATE buses SET {', '.join(cols)} WHERE bus_id=%s"
-    with get_conn() as (conn, cur):
-        cur.execute(sql, tuple(vals))
+def bind_to_page(fn):
+    """Run fn on a worker thread with this page's context (st.cache_* / st.error need it)"""
+    ctx = get_script_run_ctx()
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn()
+    return run
 
-def delete_bus(bus_id):
-    with get_conn() as (conn, cur):
-        cur.execute("DELETE FROM buses WHERE bus_id=%s", (bus_id,))
+context.install(session=current_session, notify=show_message, bind_worker=bind_to_page)
 
-def add_driver(first, last, license_no, phone, salary, address, is_active=True):
-    with get_conn() as (conn, cur):
-        cur.execute("INSERT INTO drivers (first_name,last_name,license_no,phone,salary,address,is_active) VALUES (%s,%s,%s,%s,%s,%s,%s)",
-                    (first, last, license_no, phone, salary, address, is_active))
+demand_report = st.cache_data(ttl=300, show_spinner="Crunching path data...")(crud.demand_report)
 
-def update_driver(driver_id, **kwargs):
-    cols = []; vals = []
-    for k,v in kwargs.items():
-        cols.append(f"{k}=%s"); vals.append(v)
-    vals.append(driver_id)
-    sql = f"UPDATE drivers SET {', '.join(cols)} WHERE driver_id=%s"
-    with get_conn() as (conn, cur):
-        cur.execute(sql, tuple(vals))
-
-def delete_driver(driver_id):
-    with get_conn() as (conn, cur):
-        cur.execute("DELETE FROM drivers WHERE driver_id=%s", (driver_id,))
-
-def add_route(route_name, source, destination, distance_km=None):
-    with get_conn() as (conn, cur):
-        cur.execute("INSERT INTO routes (route_name,source,destination,distance_km) VALUES (%s,%s,%s,%s)", 
-                   (route_name, source, destination, distance_km))
-
-def update_route(route_id, **kwargs):
-    cols = []; vals = []
-    for k,v in kwargs.items():
-        cols.append(f"{k}=%s"); vals.append(v)
-    vals.append(route_id)
-    sql = f"UPDATE routes SET {', '.join(cols)} WHERE route_id=%s"
-    with get_conn() as (conn, cur):
-        cur.execute(sql, tuple(vals))
-
-def delete_route(route_id):
-    with get_conn() as (conn, cur):
-        cur.execute("DELETE FROM routes WHERE route_id=%s", (route_id,))
-
-def add_stop(stop_name, location):
-    with get_conn() as (conn, cur):
-        cur.execute("INSERT INTO stops (stop_name,location) VALUES (%s,%s)", (stop_name, location))
-
-def update_stop(stop_id, **kwargs):
-    cols=[]; vals=[]
-    for k,v in kwargs.items():
-        cols.append(f"{k}=%s"); vals.append(v)
-    vals.append(stop_id)
-    sql = f"UPDATE stops SET {', '.join(cols)} WHERE stop_id=%s"
-    with get_conn() as (conn, cur):
-        cur.execute(sql, tuple(vals))
-
-def delete_stop(stop_id):
-    with get_conn() as (conn, cur):
-        cur.execute("DELETE FROM stops WHERE stop_id=%s", (stop_id,))
-
-def add_trip(route_id, bus_id, driver_id, start_time, end_time, frequency, status='scheduled'):
-    with get_conn() as (conn, cur):
-        cur.execute("INSERT INTO trips (route_id,bus_id,driver_id,start_time,end_time,frequency,status) VALUES (%s,%s,%s,%s,%s,%s,%s)",
-                    (route_id, bus_id, driver_id, start_time, end_time, frequency, status))
-
-def update_trip(trip_id, **kwargs):
-    cols=[]; vals=[]
-    for k,v in kwargs.items():
-        cols.append(f"{k}=%s"); vals.append(v)
-    vals.append(trip_id)
-    sql = f"UPDATE trips SET {', '.join(cols)} WHERE trip_id=%s"
-    with get_conn() as (conn, cur):
-        cur.execute(sql, tuple(vals))
-
-def delete_trip(trip_id):
-    with get_conn() as (conn, cur):
-        cur.execute("DELETE FROM trips WHERE trip_id=%s", (trip_id,))
-
-def add_passenger(name, address, contact_no, email):
-    with get_conn() as (conn, cur):
-        cur.execute("INSERT INTO passengers (name,address,contact_no,email_id) VALUES (%s,%s,%s,%s)", 
-                   (name, address, contact_no, email))
-        return cur.lastrowid
-
-def add_ticket(trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, fare, gender):
-    with get_conn() as (conn, cur):
-        cur.execute("INSERT INTO tickets (trip_id,passenger_id,boarding_stop_id,dropping_stop_id,seat_no,fare,gender) VALUES (%s,%s,%s,%s,%s,%s,%s)",
-                    (trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, fare, gender))
-
-def update_ticket(ticket_id, **kwargs):
-    cols=[]; vals=[]
-    for k,v in kwargs.items():
-        cols.append(f"{k}=%s"); vals.append(v)
-    vals.append(ticket_id)
-    sql = f"UPDATE tickets SET {', '.join(cols)} WHERE ticket_id=%s"
-    with get_conn() as (conn, cur):
-        cur.execute(sql, tuple(vals))
-
-def delete_ticket(ticket_id):
-    with get_conn() as (conn, cur):
-        cur.execute("DELETE FROM tickets WHERE ticket_id=%s", (ticket_id,))
-
-def list_path_for_trip(trip_id):
-    return fetch_all("SELECT p.*, s.stop_name FROM path p JOIN stops s ON p.stop_id=s.stop_id WHERE p.trip_id=%s ORDER BY p.path_id", (trip_id,))
-
-def list_major_stops():
-    return fetch_all("SELECT m.*, r.route_name, s.stop_name FROM major_stops m LEFT JOIN routes r ON m.route_id=r.route_id LEFT JOIN stops s ON m.stop_id=s.stop_id ORDER BY m.major_stop_id DESC")
+def show_rerun_stats():
+    stats = session_memo()
+    st.sidebar.caption(f"🔎 {st.session_state.get('rerun_queries', 0)} database queries this rerun "
+               f"({stats.hits} results served from the session cache)")
+    replicas = get_replica_set()
+    if replicas:
+        st.sidebar.caption(f"🪞 Replica reads: {replicas.stats['replica_reads']} | "
+                           f"fell back to primary: {replicas.stats['fallback_reads']}")
 
 # --------------------------- UI HELPERS ---------------------------
 def header():
@@ -710,32 +78,68 @@ def driver_card(d):
 
 
 
+@st.fragment(run_every=SEAT_REFRESH_SECONDS)
+def seat_picker(trip_id):
+    """Seat selectbox that re-renders on its own every few seconds, applying
+    seat feed deltas to the session's seat map instead of rerunning the page"""
+    seat_map = live_seat_map(trip_id)
+    available = seat_map.available() if seat_map else []
+    key = f"seat_choice_{trip_id}"
+    taken = st.session_state.get(key)
+    if taken is not None and taken not in available:
+        # must happen before the widget is created in this run
+        del st.session_state[key]
+        st.warning(f"Seat {taken} was just booked by someone else.")
+    if not available:
+        st.error("😔 The last seat on this trip was just booked.")
+        return
+    st.selectbox("Available seats:", available, key=key)
+    st.caption(f"🟢 Live: {len(available)} of {len(seat_map.seats)} seats free")
+
+def dashboard_data(can_refresh=False):
+    """The background dashboard snapshot (no queries) with its age; admins get a refresh button"""
+    refresher = get_dashboard_refresher()
+    col1, col2 = st.columns([4, 1])
+    if can_refresh and col2.button("🔄 Refresh now", key="dashboard_refresh"):
+        refresher.request_refresh(wait=5)
+    snap = refresher.snapshot
+    if snap is None:
+        st.error(f"Dashboard unavailable: {refresher.last_error}")
+        return None
+    note = f" · last refresh failed: {refresher.last_error}" if refresher.last_error else ""
+    col1.caption(f"🕒 Updated {refresher.age_seconds():.0f}s ago (computed in {snap.duration_ms} ms, "
+                 f"refreshed every {refresher.interval:g}s){note}")
+    return snap
+
 # --------------------------- INTERFACES ---------------------------
 def admin_interface():
     st.sidebar.title("Admin Panel")
     page = st.sidebar.selectbox("Navigation", [
         "Dashboard", "Buses", "Drivers", "Routes & Stops", "Trips", 
         "Tickets", "Path", "Major Stops", "Users", "Trigger Logs", 
-        "Stored Procedure: Revenue", "Seed Data (re-run)"
+        "Reports", "Stored Procedure: Revenue", "Auto-assign Trips", "Bulk Actions", "Seed Data (re-run)"
     ])
     st.header("🏢 Admin Management Interface")
     
     if page == "Dashboard":
+        snap = dashboard_data(can_refresh=True)
+        if snap is None:
+            return
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Buses", len(list_buses()))
+            st.metric("Total Buses", snap.buses)
         with col2:
-            st.metric("Active Drivers", len([d for d in list_drivers() if d['is_active']]))
+            st.metric("Active Drivers", snap.active_drivers)
         with col3:
-            st.metric("Routes", len(list_routes()))
+            st.metric("Routes", snap.routes)
         with col4:
-            st.metric("Upcoming Trips", len(list_available_trips()))
+            st.metric("Upcoming Trips", snap.upcoming_trips)
         
         st.subheader("📊 Recent Activity")
         col1, col2 = st.columns(2)
         with col1:
             st.write("**Recent Tickets**")
-            tickets = list_tickets()[:5]
+            tickets = snap.recent_tickets[:5]
             if tickets:
                 for ticket in tickets:
                     st.write(f"🎫 {ticket['passenger_name']} - {ticket['route_name']} - ₹{ticket['fare']}")
@@ -744,11 +148,9 @@ def admin_interface():
         
         with col2:
             st.write("**System Status**")
-            buses = list_buses()
-            active_buses = len([b for b in buses if b['status'] == 'active'])
-            st.write(f"🟢 Active Buses: {active_buses}/{len(buses)}")
-            st.write(f"🔧 Maintenance: {len([b for b in buses if b['status'] == 'maintenance'])}")
-            st.write(f"🚫 Inactive: {len([b for b in buses if b['status'] == 'inactive'])}")
+            st.write(f"🟢 Active Buses: {snap.bus_status['active']}/{snap.buses}")
+            st.write(f"🔧 Maintenance: {snap.bus_status['maintenance']}")
+            st.write(f"🚫 Inactive: {snap.bus_status['inactive']}")
 
     elif page == "Buses":
         st.subheader("🚌 Bus Management")
@@ -1025,10 +427,13 @@ def admin_interface():
                 st.write("**Add New Stop**")
                 stop_name = st.text_input("Stop Name *", placeholder="City Center")
                 location = st.text_input("Location *", placeholder="Main Street")
+                lat_col, lon_col = st.columns(2)
+                latitude = lat_col.number_input("Latitude", value=None, min_value=-90.0, max_value=90.0, format="%.6f")
+                longitude = lon_col.number_input("Longitude", value=None, min_value=-180.0, max_value=180.0, format="%.6f")
                 
                 if st.form_submit_button("Add Stop"):
                     if stop_name and location:
-                        add_stop(stop_name, location)
+                        add_stop(stop_name, location, latitude, longitude)
                         st.success("Stop added successfully!")
                         st.rerun()
                     else:
@@ -1043,6 +448,8 @@ def admin_interface():
                     with col1:
                         st.write(f"**{stop['stop_name']}**")
                         st.write(f"Location: {stop['location']}")
+                        if stop['latitude'] is not None and stop['longitude'] is not None:
+                            st.caption(f"📍 {stop['latitude']:.5f}, {stop['longitude']:.5f}")
                     
                     with col2:
                         if st.button("✏️", key=f"edit_stop_{stop['stop_id']}"):
@@ -1058,8 +465,13 @@ def admin_interface():
                         with st.form(f"update_stop_{stop['stop_id']}"):
                             new_name = st.text_input("Stop Name", value=stop['stop_name'])
                             new_loc = st.text_input("Location", value=stop['location'])
+                            new_lat = st.number_input("Latitude", value=stop['latitude'], min_value=-90.0,
+                                                      max_value=90.0, format="%.6f")
+                            new_lon = st.number_input("Longitude", value=stop['longitude'], min_value=-180.0,
+                                                      max_value=180.0, format="%.6f")
                             if st.form_submit_button("Save"):
-                                update_stop(stop['stop_id'], stop_name=new_name, location=new_loc)
+                                update_stop(stop['stop_id'], stop_name=new_name, location=new_loc,
+                                            latitude=new_lat, longitude=new_lon)
                                 st.session_state[f"editing_stop_{stop['stop_id']}"] = False
                                 st.success("Stop updated!")
                                 st.rerun()
@@ -1100,14 +512,18 @@ def admin_interface():
                         et_time = st.time_input("End Time *", value=(datetime.now() + timedelta(hours=2)).time())
                     
                     frequency = st.selectbox("Frequency", ["daily", "weekdays", "weekends", "once"])
+                    allow_conflict = st.checkbox("Schedule even if the bus or driver is already booked (trip is flagged)")
                     
                     submitted = st.form_submit_button("Schedule Trip", type="primary")
                     if submitted:
                         start_time = datetime.combine(st_date, st_time)
                         end_time = datetime.combine(et_date, et_time)
+                        conflicts = find_trip_conflicts(bmap[bus_sel], dmap[driver_sel], start_time, end_time)
                         
                         if end_time <= start_time:
                             st.error("End time must be after start time")
+                        elif conflicts and not allow_conflict:
+                            st.error("Double booking: " + ", ".join(f"{kind} already on trip {tid}" for kind, tid in conflicts))
                         else:
                             add_trip(rmap[route_sel], bmap[bus_sel], dmap[driver_sel], start_time, end_time, frequency, "scheduled")
                             st.success("Trip scheduled successfully!")
@@ -1118,6 +534,7 @@ def admin_interface():
         # Trip List with Update/Delete
         st.subheader("📋 Scheduled Trips")
         trips = list_trips()
+        clashes = trip_scheduler().all_conflicts()
         if trips:
             for trip in trips:
                 with st.container():
@@ -1128,6 +545,9 @@ def admin_interface():
                         st.write(f"Bus: {trip['bus_no']} | Driver: {trip['driver_name']}")
                         st.write(f"Start: {trip['start_time'].strftime('%Y-%m-%d %H:%M')}")
                         st.write(f"End: {trip['end_time'].strftime('%Y-%m-%d %H:%M')} | Status: {trip['status']}")
+                        if trip['trip_id'] in clashes:
+                            st.warning("⚠️ Double-booked: " + ", ".join(
+                                f"{kind} also on trip {tid}" for kind, tid in clashes[trip['trip_id']]))
                     
                     with col2:
                         if st.button("✏️ Edit", key=f"edit_trip_{trip['trip_id']}"):
@@ -1143,10 +563,14 @@ def admin_interface():
                             new_status = st.selectbox("Status", ["scheduled", "ongoing", "completed", "cancelled"],
                                                     index=["scheduled", "ongoing", "completed", "cancelled"].index(trip['status']))
                             if st.form_submit_button("Save"):
-                                update_trip(trip['trip_id'], status=new_status)
-                                st.session_state[f"editing_trip_{trip['trip_id']}"] = False
-                                st.success("Trip updated!")
-                                st.rerun()
+                                try:
+                                    update_trip(trip['trip_id'], status=new_status)
+                                except TripConflictError as e:
+                                    st.error(str(e))
+                                else:
+                                    st.session_state[f"editing_trip_{trip['trip_id']}"] = False
+                                    st.success("Trip updated!")
+                                    st.rerun()
                     
                     # Delete Confirmation
                     if st.session_state.get(f"deleting_trip_{trip['trip_id']}"):
@@ -1168,7 +592,7 @@ def admin_interface():
         with st.expander("🎟️ Issue Ticket Manually", expanded=False):
             trips = list_available_trips()
             stops = list_stops()
-            passengers = fetch_all("SELECT * FROM passengers")
+            passengers = fetch_all(queries.PASSENGERS_SQL)
             
             if trips and stops:
                 with st.form("manual_ticket_form"):
@@ -1260,11 +684,64 @@ def admin_interface():
         else:
             st.info("No tickets issued yet")
 
-    # ... (Other admin pages like Path, Major Stops, Users, etc. would continue here)
+    elif page == "Path":
+        st.subheader("📍 Trip Path & Occupancy")
+        trips = list_trips()
+        if trips:
+            tmap = {f"{t['trip_id']}: {t['route_name']}": t['trip_id'] for t in trips}
+            trip_sel = st.selectbox("Select Trip", list(tmap.keys()))
+            rows = list_path_for_trip(tmap[trip_sel])
+            if rows:
+                occ = demand_analytics.running_occupancy(demand_analytics.path_frame(rows))
+                names = {r['stop_id']: r['stop_name'] for r in rows}
+                occ["stop_name"] = occ["stop_id"].map(names)
+                st.dataframe(occ[["stop_name", "arrival_time", "departure_time", "people_in", "people_out", "occupancy"]],
+                             use_container_width=True)
+                st.line_chart(occ.set_index("stop_name")["occupancy"])
+            else:
+                st.info("No path data recorded for this trip")
+        
+        st.subheader("📈 Network Demand")
+        method = st.radio("Forecast baseline", ["seasonal", "moving_average"], horizontal=True)
+        report = demand_report(method)
+        stop_names = {s['stop_id']: s['stop_name'] for s in list_stops()}
+        route_names = {r['route_id']: r['route_name'] for r in list_routes()}
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Busiest Stops (peak on-board load)**")
+            st.dataframe(report["stop_peaks"].assign(stop=report["stop_peaks"]["stop_id"].map(stop_names)).head(10),
+                         use_container_width=True)
+        with col2:
+            st.write("**Most Crowded Trips**")
+            st.dataframe(report["trip_peaks"].sort_values("peak_occupancy", ascending=False).head(10),
+                         use_container_width=True)
+        st.write("**Forecast vs. Scheduled Seats (by route, weekday, hour)**")
+        recs = report["recommendations"]
+        recs = recs.assign(route=recs["route_id"].map(route_names))
+        actionable = recs[recs["action"] != "keep"]
+        st.dataframe(actionable if not actionable.empty else recs, use_container_width=True)
+
+    elif page == "Major Stops":
+        st.subheader("🚏 Major Stops")
+        rows = list_major_stops()
+        if rows:
+            st.table(rows)
+            load = demand_analytics.major_stops_load(rows)
+            names = {r['stop_id']: r['stop_name'] for r in rows}
+            routes = {r['route_id']: r['route_name'] for r in rows}
+            load = load.assign(route=load["route_id"].map(routes), stop=load["stop_id"].map(names))
+            st.write("**Cumulative load along each route**")
+            st.dataframe(load[["route", "stop", "time_taken_minutes", "people_getting_in", "people_getting_down", "load"]],
+                         use_container_width=True)
+            peaks = load.loc[load.groupby("route_id")["load"].idxmax(), ["route", "stop", "load"]]
+            st.write("**Peak-load stop per route**")
+            st.dataframe(peaks, use_container_width=True)
+        else:
+            st.info("No major stops recorded")
 
     elif page == "Users":
         st.subheader("👥 User Management")
-        users = fetch_all("SELECT user_id, username, role, created_at FROM users ORDER BY user_id DESC")
+        users = fetch_all(queries.USERS_SQL)
         st.table(users)
         
         with st.expander("Add New User"):
@@ -1283,12 +760,52 @@ def admin_interface():
 
     elif page == "Trigger Logs":
         st.subheader("📝 Ticket Logs (Trigger Demo)")
-        logs = fetch_all("SELECT * FROM ticket_log ORDER BY log_time DESC LIMIT 50")
+        if ticket_log_async():
+            stats = get_ticket_log_writer().stats
+            st.caption(f"Async log mode — queued: {stats['enqueued']} | written: {stats['written']} "
+                       f"in {stats['batches']} batches | spooled: {stats['spooled']}")
+        logs = fetch_all(queries.RECENT_TICKET_LOG_SQL)
         if logs:
             st.table(logs)
         else:
             st.info("No ticket logs yet")
 
+    elif page == "Reports":
+        st.subheader("📈 Revenue & Ridership Reports")
+        refresher = get_report_refresher()
+        state = report_refresh_state()
+        if state and state["refreshed_at"]:
+            st.caption(f"Report tables refreshed {state['refreshed_at']} "
+                       f"(tickets up to {state['ticket_high_water']}, took {state['last_duration_ms']} ms)")
+        else:
+            st.info("Report tables are being built — check back in a moment.")
+        c1, c2 = st.columns(2)
+        if c1.button("Refresh now"):
+            refresher.request_refresh()
+            st.toast("Refresh requested")
+        if c2.button("Full rebuild"):
+            refresher.request_refresh(full=True)
+            st.toast("Full rebuild requested")
+
+        today = datetime.now().date()
+        picked = st.date_input("Service days", value=(today - timedelta(days=30), today + timedelta(days=30)))
+        start, end = picked if len(picked) == 2 else (picked[0], picked[0])
+        dimension = st.radio("Group by", ["route", "bus", "driver", "day"], horizontal=True)
+        rows = revenue_report(dimension, start, end)
+        if rows:
+            st.metric("Total Revenue", f"₹{sum(r['revenue'] or 0 for r in rows):,.2f}")
+            st.dataframe(rows, use_container_width=True)
+        else:
+            st.info("No ticket sales in this range")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Tickets by gender**")
+            st.dataframe(fetch_all(reporting.GENDER_REPORT_SQL, (start, end), read_only=True), use_container_width=True)
+        with col2:
+            st.write("**Busiest stop pairs**")
+            st.dataframe(fetch_all(reporting.STOP_PAIR_REPORT_SQL, (start, end), read_only=True), use_container_width=True)
+
     elif page == "Stored Procedure: Revenue":
         st.subheader("💰 Trip Revenue Analysis")
         trips = list_trips()
@@ -1310,11 +827,88 @@ def admin_interface():
                     except Exception as e:
                         st.error(f"Error: {e}")
 
+    elif page == "Bulk Actions":
+        st.subheader("🗂️ Bulk Actions")
+        st.write("Apply one change to many rows in a single transaction.")
+        table = st.selectbox("Table", ["buses", "drivers", "trips", "tickets"])
+        if table == "buses":
+            rows = list_buses()
+            labels = {f"{r['bus_id']}: {r['bus_no']} ({r['status']})": r['bus_id'] for r in rows}
+            field, choices = "status", ["active", "maintenance", "inactive"]
+        elif table == "drivers":
+            rows = list_drivers()
+            labels = {f"{r['driver_id']}: {r['first_name']} {r['last_name']}"
+                      f" ({'active' if r['is_active'] else 'inactive'})": r['driver_id'] for r in rows}
+            field, choices = "is_active", [True, False]
+        elif table == "trips":
+            rows = list_trips()
+            labels = {f"{r['trip_id']}: {r['route_name']} @ {r['start_time']} ({r['status']})": r['trip_id'] for r in rows}
+            field, choices = "status", ["scheduled", "ongoing", "completed", "cancelled"]
+        else:
+            rows = list_tickets()
+            labels = {f"{r['ticket_id']}: {r['passenger_name']} seat {r['seat_no']} (trip {r['trip_id']})": r['ticket_id']
+                      for r in rows}
+            field, choices = None, []
+
+        selected = st.multiselect(f"Select {table}", list(labels.keys()))
+        ids = [labels[l] for l in selected]
+        col1, col2 = st.columns(2)
+        with col1:
+            if field:
+                value = st.selectbox(f"Set {field} to", choices)
+                if st.button(f"Update {len(ids)} row(s)", disabled=not ids):
+                    result = bulk_update_rows(table, ids, **{field: value})
+                    st.success(f"Updated {result.affected} {table} in {result.elapsed_ms} ms")
+        with col2:
+            confirm = st.checkbox("I understand deletes cannot be undone")
+            if st.button(f"Delete {len(ids)} row(s)", disabled=not (ids and confirm)):
+                try:
+                    result = bulk_delete_rows(table, ids)
+                    st.success(f"Deleted {result.affected} {table} in {result.elapsed_ms} ms")
+                except Exception as e:
+                    st.error(f"Delete failed, nothing was removed: {e}")
+
+        if table == "trips":
+            st.divider()
+            st.write("**Cancel a route's scheduled trips for a day**")
+            routes = list_routes()
+            if routes:
+                rmap = {r['route_name']: r['route_id'] for r in routes}
+                route_name = st.selectbox("Route", list(rmap.keys()))
+                day = st.date_input("Day", value=datetime.now().date(), key="bulk_cancel_day")
+                if st.button("Cancel trips"):
+                    result = cancel_route_trips(rmap[route_name], day)
+                    st.success(f"Cancelled {result.affected} trip(s) in {result.elapsed_ms} ms")
+
+    elif page == "Auto-assign Trips":
+        st.subheader("🧩 Auto-assign Buses & Drivers")
+        st.write("Assigns active buses and active drivers to a day's scheduled trips without double booking.")
+        day = st.date_input("Service day", value=datetime.now().date())
+        keep_existing = st.checkbox("Keep buses/drivers already assigned", value=True)
+        day_start = datetime.combine(day, time.min)
+        assignments, unassigned = plan_trip_assignments(day_start, keep_existing)
+        
+        if assignments:
+            buses = {b['bus_id']: b['bus_no'] for b in list_buses()}
+            drivers = {d['driver_id']: f"{d['first_name']} {d['last_name']}" for d in list_drivers()}
+            trips = {t['trip_id']: t for t in list_trips_for_day(day_start)}
+            st.table([{"Trip": tid, "Start": trips[tid]['start_time'].strftime('%H:%M'),
+                       "Bus": buses.get(bus_id, bus_id), "Driver": drivers.get(driver_id, driver_id)}
+                      for tid, (bus_id, driver_id) in assignments.items()])
+            if st.button("✅ Apply Assignments", type="primary"):
+                apply_trip_assignments(assignments)
+                st.success(f"Assigned {len(assignments)} trip(s)")
+                st.rerun()
+        else:
+            st.info("No scheduled trips for this day")
+        if unassigned:
+            st.warning(f"No free bus or driver for trip(s): {', '.join(map(str, unassigned))}")
+
     elif page == "Seed Data (re-run)":
         st.subheader("🔄 Database Reset")
-        st.warning("This will reset all data and recreate sample data!")
+        st.warning("This will reset all data and recreate sample data! User accounts are kept.")
         if st.button("Reset Database", type="primary"):
-            initialize_database_and_schema()
+            reset_sample_data()
             st.success("Database reset complete!")
             st.rerun()
 
@@ -1324,17 +918,19 @@ def operator_interface():
     
     if page == "Overview":
         st.subheader("📊 Operator Dashboard")
+        snap = dashboard_data()
+        if snap is None:
+            return
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Today's Trips", len(list_available_trips()))
+            st.metric("Today's Trips", snap.upcoming_trips)
         with col2:
-            st.metric("Total Tickets", len(list_tickets()))
+            st.metric("Total Tickets", snap.tickets)
         with col3:
-            active_drivers = len([d for d in list_drivers() if d['is_active']])
-            st.metric("Active Drivers", active_drivers)
+            st.metric("Active Drivers", snap.active_drivers)
         
         st.subheader("Recent Tickets")
-        tickets = list_tickets()[:10]
+        tickets = snap.recent_tickets[:10]
         if tickets:
             for ticket in tickets:
                 st.write(f"🎫 {ticket['passenger_name']} - {ticket['route_name']} - ₹{ticket['fare']}")
@@ -1476,18 +1072,21 @@ def public_interface():
             """)
         
         st.subheader("📈 System Overview")
+        snap = dashboard_data()
+        if snap is None:
+            return
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Available Routes", len(list_routes()))
+            st.metric("Available Routes", snap.routes)
         with col2:
-            st.metric("Active Buses", len([b for b in list_buses() if b['status'] == 'active']))
+            st.metric("Active Buses", snap.bus_status['active'])
         with col3:
-            st.metric("Today's Trips", len(list_available_trips()))
+            st.metric("Today's Trips", snap.upcoming_trips)
         with col4:
-            st.metric("Total Stops", len(list_stops()))
+            st.metric("Total Stops", snap.stops)
         
         st.subheader("🕒 Upcoming Trips")
-        trips = list_available_trips()[:5]
+        trips = snap.next_trips
         if trips:
             for trip in trips:
                 col1, col2, col3 = st.columns([2, 1, 1])
@@ -1510,7 +1109,8 @@ def public_interface():
         
         # Step 1: Route Selection
         st.write("### Step 1: Select Your Route")
-        routes = list_routes()
+        # memoized per session: changing a widget below does not refetch these
+        routes = memo(("routes",), list_routes)
         if not routes:
             st.error("No routes available. Please try again later.")
             return
@@ -1521,8 +1121,7 @@ def public_interface():
         
         # Step 2: Trip Selection
         st.write("### Step 2: Select Trip Timing")
-        trips = list_available_trips()
-        route_trips = [t for t in trips if t['route_id'] == route_id]
+        route_trips = list_available_trips(route_id)
         
         if not route_trips:
             st.warning("No available trips for this route today.")
@@ -1537,40 +1136,58 @@ def public_interface():
         trip_id = trip_options[selected_trip]
         current_trip = next((t for t in route_trips if t['trip_id'] == trip_id), None)
         
-        # Step 3: Stop Selection
+        # Step 3: Stop Selection (served from the in-memory route topology)
         st.write("### Step 3: Select Stops")
-        route_stops = get_route_stops(route_id)
+        topology = route_topology()
+        route_stops = topology.stops_for_route(route_id)
         
         if len(route_stops) < 2:
             st.error("Route information incomplete. Please try another route.")
             return
         
-        boarding_options = {f"{stop['stop_order']}. {stop['stop_name']} - {stop['location']}": stop['stop_id'] for stop in route_stops}
-        dropping_options = {f"{stop['stop_order']}. {stop['stop_name']} - {stop['location']}": stop['stop_id'] for stop in route_stops}
+        stop_options = {f"{stop['stop_order']}. {stop['stop_name']} - {stop['location']}": stop for stop in route_stops}
         
-        boarding_stop = st.selectbox("Boarding Stop:", list(boarding_options.keys()))
-        dropping_stop = st.selectbox("Dropping Stop:", list(dropping_options.keys()))
+        boarding_stop = stop_options[st.selectbox("Boarding Stop:", list(stop_options.keys()))]
+        dropping_stop = stop_options[st.selectbox("Dropping Stop:", list(stop_options.keys()))]
         
-        boarding_stop_id = boarding_options[boarding_stop]
-        dropping_stop_id = dropping_options[dropping_stop]
+        boarding_stop_id = boarding_stop['stop_id']
+        dropping_stop_id = dropping_stop['stop_id']
         
         # Validate stop order
-        boarding_order = int(boarding_stop.split('.')[0])
-        dropping_order = int(dropping_stop.split('.')[0])
-        
-        if dropping_order <= boarding_order:
+        if not topology.is_forward(route_id, boarding_stop_id, dropping_stop_id):
             st.error("❌ Dropping stop must come after boarding stop!")
             return
+        journey_km = stop_geo.route_km(topology.segment(route_id, boarding_stop_id, dropping_stop_id))
+        if journey_km is not None:
+            st.caption(f"📏 About {journey_km:.1f} km along the route")
         
-        # Step 4: Seat Selection
+        # Step 4: Seat Selection (live: refreshes on its own, see seat_picker)
         st.write("### Step 4: Choose Your Seat")
-        available_seats = get_available_seats(trip_id)
+        seat_map = live_seat_map(trip_id)
         
-        if not available_seats:
-            st.error("😔 No seats available for this trip. Please choose another trip.")
+        if not seat_map or not seat_map.available():
+            st.error("😔 No seats available for this trip. Choose another trip, or join the waitlist below.")
+            st.write("### ⏳ Join the Waitlist")
+            st.caption("If a seat is cancelled, it is booked for the first rider on the waitlist automatically. "
+                       "Check \"My Tickets\" with your contact number.")
+            col1, col2 = st.columns(2)
+            with col1:
+                wl_name = st.text_input("Full Name *", key="wl_name")
+                wl_contact = st.text_input("Contact Number *", key="wl_contact")
+            with col2:
+                wl_email = st.text_input("Email Address", key="wl_email")
+                wl_gender = st.selectbox("Gender", ["male", "female", "other"], key="wl_gender")
+            if st.button("⏳ Join Waitlist", type="primary"):
+                try:
+                    entry = join_waitlist(trip_id, boarding_stop_id, dropping_stop_id,
+                                          wl_name, wl_contact, wl_email or "", wl_gender)
+                    st.success(f"You are #{entry['position']} on the waitlist for this trip.")
+                except BookingError as e:
+                    st.error(f"Could not join the waitlist: {e}")
             return
         
-        selected_seat = st.selectbox("Available seats:", available_seats)
+        seat_picker(trip_id)
+        selected_seat = st.session_state.get(f"seat_choice_{trip_id}")
         
         # Step 5: Passenger Details
         st.write("### Step 5: Passenger Information")
@@ -1582,8 +1199,12 @@ def public_interface():
             email = st.text_input("Email Address", placeholder="your.email@example.com")
             gender = st.selectbox("Gender", ["male", "female", "other"])
         
-        # Calculate fare
-        fare = calculate_fare(boarding_stop_id, dropping_stop_id, current_trip['type'], current_trip['ac'])
+        # Calculate fare once per trip and stops: the quote shown is the fare booked
+        fare_key = f"fare_quote_{trip_id}_{boarding_stop_id}_{dropping_stop_id}"
+        if fare_key not in st.session_state:
+            st.session_state[fare_key] = calculate_fare(boarding_stop_id, dropping_stop_id,
+                                                        current_trip['type'], current_trip['ac'])
+        fare = st.session_state[fare_key]
         
         # Booking Summary
         st.write("### 📋 Booking Summary")
@@ -1599,8 +1220,8 @@ def public_interface():
         with col2:
             st.info(f"""
             **Your Selection:**
-            - Boarding: {boarding_stop.split('.')[1].split(' - ')[0].strip()}
-            - Dropping: {dropping_stop.split('.')[1].split(' - ')[0].strip()}
+            - Boarding: {boarding_stop['stop_name']}
+            - Dropping: {dropping_stop['stop_name']}
             - Seat: {selected_seat}
             - Fare: ₹{fare:.2f}
             """)
@@ -1611,11 +1232,13 @@ def public_interface():
                 st.error("Please fill in all required fields (Name and Contact Number)")
             elif len(contact_no) < 10:
                 st.error("Please enter a valid 10-digit contact number")
+            elif selected_seat not in live_seat_map(trip_id).available():
+                st.error(f"Seat {selected_seat} was just booked by someone else. Please pick another seat.")
             else:
                 try:
-                    # Create passenger and ticket
-                    passenger_id = add_passenger(passenger_name, "", contact_no, email or "")
-                    add_ticket(trip_id, passenger_id, boarding_stop_id, dropping_stop_id, selected_seat, fare, gender)
+                    # Create passenger and ticket (seat re-checked at write time, see seat_inventory)
+                    ticket = book_ticket(trip_id, boarding_stop_id, dropping_stop_id, selected_seat,
+                                         passenger_name, contact_no, email or "", gender, fare=fare)
                     
                     st.success("🎉 Ticket Booked Successfully!")
                     st.balloons()
@@ -1626,7 +1249,7 @@ def public_interface():
                     - Ticket for: {passenger_name}
                     - Contact: {contact_no}
                     - Seat: {selected_seat}
-                    - Total Fare: ₹{fare:.2f}
+                    - Total Fare: ₹{ticket['fare']:.2f}
                     - Please arrive at the stop 10 minutes before departure
                     """)
                     
@@ -1634,32 +1257,39 @@ def public_interface():
                     if st.button("Book Another Ticket"):
                         st.rerun()
                         
+                except BookingError as e:
+                    st.error(f"Booking failed: {e}. Please pick another seat or trip.")
                 except Exception as e:
                     st.error(f"Booking failed: {str(e)}")
 
     elif page == "My Tickets":
         st.subheader("📋 My Tickets")
         
-        # Search by contact number (since we don't have user login in public interface)
-        contact_search = st.text_input("🔍 Enter your contact number to view tickets")
+        # Search by contact number (since we don't have user login in public interface);
+        # looked up on submit, not on every rerun of the page
+        with st.form("my_tickets_form"):
+            contact_entry = st.text_input("🔍 Enter your contact number to view tickets")
+            if st.form_submit_button("Find Tickets"):
+                st.session_state["my_tickets_contact"] = contact_entry
+                st.session_state["my_tickets_pages"] = [None]
+        contact_search = st.session_state.get("my_tickets_contact")
+        contact_key = passenger_identity.normalize_contact(contact_search)
         
-        if contact_search:
-            tickets = fetch_all("""
-                SELECT tk.*, r.route_name, s1.stop_name AS boarding_stop, s2.stop_name AS dropping_stop,
-                       p.name AS passenger_name, t.start_time, t.end_time, b.bus_no
-                FROM tickets tk
-                JOIN trips t ON tk.trip_id = t.trip_id
-                JOIN routes r ON t.route_id = r.route_id
-                JOIN stops s1 ON tk.boarding_stop_id = s1.stop_id
-                JOIN stops s2 ON tk.dropping_stop_id = s2.stop_id
-                JOIN passengers p ON tk.passenger_id = p.passenger_id
-                JOIN buses b ON t.bus_id = b.bus_id
-                WHERE p.contact_no = %s
-                ORDER BY tk.created_at DESC
-            """, (contact_search,))
+        if contact_search and (contact_key is None or len(contact_key) < 10):
+            st.warning("Please enter your full 10-digit contact number")
+        elif contact_search:
+            pages = st.session_state.setdefault("my_tickets_pages", [None])
+            try:
+                # memoized per session until a booking or cancellation touches this contact
+                page_result = memo(ticket_lookup.lookup_tags(contact_key), lookup_tickets, contact_search, pages[-1])
+            except ticket_lookup.RateLimited as e:
+                st.warning(f"Too many lookups, please wait {e.retry_after:.0f}s and try again")
+                page_result = None
+            tickets = page_result.tickets if page_result else []
             
             if tickets:
-                st.success(f"Found {len(tickets)} ticket(s) for contact number: {contact_search}")
+                first = (len(pages) - 1) * TICKET_PAGE_SIZE + 1
+                st.success(f"Tickets {first}-{first + len(tickets) - 1} for contact number: {contact_search}")
                 
                 for ticket in tickets:
                     with st.expander(f"Ticket #{ticket['ticket_id']} - {ticket['route_name']} - {ticket['created_at'].strftime('%Y-%m-%d')}", expanded=True):
@@ -1686,14 +1316,32 @@ def public_interface():
                             delete_ticket(ticket['ticket_id'])
                             st.success("Ticket cancelled successfully!")
                             st.rerun()
-            else:
+                
+                prev_col, next_col = st.columns(2)
+                if len(pages) > 1 and prev_col.button("⬅️ Newer tickets"):
+                    pages.pop()
+                    st.rerun()
+                if page_result.next_cursor and next_col.button("Older tickets ➡️"):
+                    pages.append(page_result.next_cursor)
+                    st.rerun()
+            elif page_result is not None and len(pages) == 1:
                 st.warning("No tickets found for this contact number")
+
+            for entry in waitlist_by_contact(contact_search):
+                start = entry['start_time'].strftime('%Y-%m-%d %H:%M') if entry['start_time'] else "-"
+                with st.expander(f"⏳ Waitlisted #{entry['position']} - {entry['route_name']} - {start}"):
+                    st.write(f"🚏 {entry['boarding_stop']} → 🎯 {entry['dropping_stop']}")
+                    st.write("A seat is booked for you automatically if one is cancelled before departure.")
+                    if st.button("Leave Waitlist", key=f"leave_wl_{entry['waitlist_id']}"):
+                        leave_waitlist(entry['waitlist_id'])
+                        st.rerun()
         else:
             st.info("Please enter your contact number to view your tickets")
 
     elif page == "Routes":
         st.subheader("🛣️ Available Routes")
         routes = list_routes()
+        topology = route_topology()
         
         if routes:
             for route in routes:
@@ -1701,17 +1349,17 @@ def public_interface():
                     st.write(f"**Distance:** {route['distance_km']} km")
                     
                     # Show route stops
-                    route_stops = get_route_stops(route['route_id'])
+                    route_stops = topology.stops_for_route(route['route_id'])
                     if route_stops:
                         st.write("**Route Stops:**")
                         for stop in route_stops:
                             st.write(f"{stop['stop_order']}. {stop['stop_name']} - {stop['location']}")
                     
                     # Show available trips for this route
-                    trips = [t for t in list_available_trips() if t['route_id'] == route['route_id']]
+                    trips = list_available_trips(route['route_id'], limit=3)
                     if trips:
                         st.write("**Available Trips:**")
-                        for trip in trips[:3]:  # Show first 3 trips
+                        for trip in trips:  # Show first 3 trips
                             st.write(f"- {trip['start_time'].strftime('%H:%M')} - Bus {trip['bus_no']} ({trip['type']})")
                     
                     if st.button("Book this Route", key=f"book_route_{route['route_id']}"):
@@ -1735,7 +1383,7 @@ def public_interface():
                         st.write(f"Time: {trip['start_time'].strftime('%Y-%m-%d %H:%M')} to {trip['end_time'].strftime('%H:%M')}")
                     
                     with col2:
-                        available_seats = len(get_available_seats(trip['trip_id']))
+                        available_seats = len(memo(seat_tags(trip['trip_id']), get_available_seats, trip['trip_id']))
                         st.write(f"Seats: {available_seats}")
                     
                     with col3:
@@ -1749,6 +1397,19 @@ def public_interface():
 
     elif page == "Stops":
         st.subheader("🚏 All Stops")
+        with st.expander("📍 Find the nearest stop"):
+            lat_col, lon_col, k_col = st.columns([2, 2, 1])
+            latitude = lat_col.number_input("Your latitude", value=None, min_value=-90.0, max_value=90.0, format="%.6f")
+            longitude = lon_col.number_input("Your longitude", value=None, min_value=-180.0, max_value=180.0,
+                                             format="%.6f")
+            k = k_col.number_input("Show", min_value=1, max_value=20, value=5)
+            if latitude is not None and longitude is not None:
+                nearby = nearest_stops(latitude, longitude, int(k))
+                if nearby:
+                    st.table([{"Stop": s["stop_name"], "Location": s["location"], "Distance (km)": s["distance_km"]}
+                              for s in nearby])
+                else:
+                    st.info("No stops have coordinates yet")
         stops = list_stops()
         if stops:
             for stop in stops:
@@ -1775,16 +1436,13 @@ def public_interface():
         
         if search_query:
             # Search routes
-            routes = fetch_all("SELECT * FROM routes WHERE route_name LIKE %s OR source LIKE %s OR destination LIKE %s", 
-                             (f"%{search_query}%", f"%{search_query}%", f"%{search_query}%"))
+            routes = fetch_all(queries.SEARCH_ROUTES_SQL, queries.search_params(search_query, 3), read_only=True)
             
             # Search stops
-            stops = fetch_all("SELECT * FROM stops WHERE stop_name LIKE %s OR location LIKE %s", 
-                            (f"%{search_query}%", f"%{search_query}%"))
+            stops = fetch_all(queries.SEARCH_STOPS_SQL, queries.search_params(search_query, 2), read_only=True)
             
             # Search buses
-            buses = fetch_all("SELECT * FROM buses WHERE bus_no LIKE %s OR bus_name LIKE %s", 
-                            (f"%{search_query}%", f"%{search_query}%"))
+            buses = fetch_all(queries.SEARCH_BUSES_SQL, queries.search_params(search_query, 2), read_only=True)
             
             if routes or stops or buses:
                 if routes:
@@ -1819,11 +1477,14 @@ def main():
     if 'public_page' not in st.session_state:
         st.session_state.public_page = "Overview"
     
+    start_rerun_stats()
     header()
     
     # Initialize database
     try:
-        initialize_database_and_schema()
+        ensure_database_initialized()
+        get_report_refresher()
+        get_waitlist_worker()
     except Exception as e:
         st.error(f"Database initialization failed: {e}")
         st.stop()
@@ -1873,18 +1534,25 @@ def main():
         st.session_state.user = None
         st.rerun()
 
-    # Route to appropriate interface
+    # Route to appropriate interface; signed-out visitors' queries are shed first under load
     user = st.session_state.get('user')
-    if user:
-        role = user.get('role')
-        if role == 'admin':
-            admin_interface()
-        elif role == 'operator':
-            operator_interface()
+    st.session_state.query_class = "staff" if user else "public"
+    try:
+        if user:
+            role = user.get('role')
+            if role == 'admin':
+                admin_interface()
+            elif role == 'operator':
+                operator_interface()
+            else:
+                st.error("Unknown user role")
         else:
-            st.error("Unknown user role")
-    else:
-        public_interface()
+            public_interface()
+    except (Overloaded, QueryTimeout):
+        # get_conn has already shown the message; the rest of the page is skipped
+        st.caption("Please try again in a moment.")
+
+    show_rerun_stats()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Load test for the HTTP JSON API: requests per second and latency.
+
+    transport-admin serve &
+    python benchmarks/bench_api.py [--url http://127.0.0.1:8080] [-c 32] [-d 10]
+                                   [--path /health --path "/trips?route_id=1" ...] [--compare]
+
+Each of `-c` clients keeps one connection open (HTTP/1.1 keep-alive) and
+sends its next request as soon as the previous response is complete,
+cycling through the given paths. --compare repeats the run opening a new
+connection per request, to show what keep-alive saves. Only a running API
+is needed; the paths decide whether the database is involved (/health is not).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    size = 0
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            length = int((await reader.readuntil(b"\r\n")).strip(), 16)
+            await reader.readexactly(length + 2)
+            size += length
+            if not length:
+                break
+    elif "content-length" in headers:
+        size = len(await reader.readexactly(int(headers["content-length"])))
+    else:
+        size = len(await reader.read())
+    return status, size, headers.get("connection") != "close"
+
+
+async def client(host, port, paths, deadline, keep_alive, stats, offset):
+    reader = writer = None
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            connection = "keep-alive" if keep_alive else "close"
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: {connection}\r\n\r\n".encode())
+            await writer.drain()
+            status, size, server_keeps = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            stats["errors"][type(e).__name__] = stats["errors"].get(type(e).__name__, 0) + 1
+            writer = None
+            continue
+        stats["latency"].append((time.perf_counter() - t0) * 1000)
+        stats["bytes"] += size
+        if status >= 400:
+            stats["errors"][status] = stats["errors"].get(status, 0) + 1
+        if not (keep_alive and server_keeps):
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(host, port, paths, concurrency, seconds, keep_alive):
+    stats = {"latency": [], "bytes": 0, "errors": {}}
+    started = time.perf_counter()
+    deadline = started + seconds
+    await asyncio.gather(*(client(host, port, paths, deadline, keep_alive, stats, n) for n in range(concurrency)))
+    return stats, time.perf_counter() - started
+
+
+def report(label, stats, elapsed):
+    latency = sorted(stats["latency"])
+    if not latency:
+        print(f"{label:>12}: no successful requests, errors={stats['errors']}")
+        return
+    p99 = latency[min(len(latency) - 1, int(len(latency) * 0.99))]
+    print(f"{label:>12}: {len(latency) / elapsed:8.0f} req/s  p50={statistics.median(latency):.2f}ms "
+          f"p99={p99:.2f}ms  {stats['bytes'] / elapsed / 1024:.0f} KiB/s  errors={stats['errors'] or 0}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--path", action="append", help="request path (repeatable; default /health)")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--compare", action="store_true", help="also run with a new connection per request")
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    paths = args.path or ["/health"]
+    print(f"{url.hostname}:{url.port or 80}  paths={paths}  clients={args.concurrency}  {args.duration:g}s per run")
+    modes = [("keep-alive", True)] + ([("per-request", False)] if args.compare else [])
+    for label, keep_alive in modes:
+        stats, elapsed = asyncio.run(run(url.hostname, url.port or 80, paths, args.concurrency,
+                                         args.duration, keep_alive))
+        report(label, stats, elapsed)
+
+
+if __name__ == "__main__":
+    main()
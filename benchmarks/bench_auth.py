@@ -0,0 +1,49 @@
+"""
+Login throughput at different scrypt cost factors, plus the credential cache.
+
+    python benchmarks/bench_auth.py [seconds-per-case]
+
+Pure CPU benchmark: no database needed.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import auth
+
+
+def rate(fn, seconds):
+    n = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        fn()
+        n += 1
+    elapsed = time.perf_counter() - t0
+    return n / elapsed, elapsed / n * 1000
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    print(f"{'scheme':<28}{'verifies/s':>12}{'ms/verify':>12}")
+
+    legacy = auth.legacy_sha256("secret")
+    per_sec, ms = rate(lambda: auth.verify_password("secret", legacy), seconds)
+    print(f"{'sha256 (legacy)':<28}{per_sec:>12.0f}{ms:>12.3f}")
+
+    for log_n in (12, 13, 14, 15):
+        stored = auth.hash_password("secret", n=2 ** log_n)
+        per_sec, ms = rate(lambda: auth.verify_password("secret", stored), seconds)
+        marker = "  <- default" if 2 ** log_n == auth.SCRYPT_N else ""
+        print(f"{f'scrypt n=2^{log_n} r=8 p=1':<28}{per_sec:>12.0f}{ms:>12.3f}{marker}")
+
+    cache = auth.CredentialCache()
+    cache.put("admin", "secret", {"user_id": 1, "username": "admin", "role": "admin"})
+    per_sec, ms = rate(lambda: cache.get("admin", "secret"), seconds)
+    print(f"{'credential cache hit':<28}{per_sec:>12.0f}{ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup and per-operation cost of the database backends.
+
+    python benchmarks/bench_backends.py [--backend sqlite|mysql] [-n 200]
+
+sqlite (default) runs in-process against a throwaway file: no server
+needed. mysql uses DB_CONFIG and writes real bookings into that database,
+so point it at a scratch schema. Reported: first connection, schema
+bootstrap, sample-data seeding, then the mean of `n` trip listings, seat
+map loads and bookings, and one full report rebuild.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import config
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - t0) * 1000, result
+
+
+def per_call(fn, n):
+    samples = []
+    for i in range(n):
+        ms, _ = timed(fn, i)
+        samples.append(ms)
+    return statistics.mean(samples), sorted(samples)[min(n - 1, int(n * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("-n", type=int, default=200, help="iterations per operation")
+    args = parser.parse_args()
+
+    config.DB_BACKEND = args.backend
+    if args.backend == "sqlite":
+        config.SQLITE_PATH = os.path.join(tempfile.mkdtemp(prefix="transport-bench-"), "bench.sqlite3")
+    from transport import backends, crud, reporting, schema
+    from transport.db import connect_db, get_conn
+
+    print(f"backend: {args.backend}" + (f" ({config.SQLITE_PATH})" if args.backend == "sqlite" else ""))
+    ms, conn = timed(connect_db)
+    conn.close()
+    print(f"{'first connection':<22}{ms:>10.1f} ms")
+    with get_conn() as (conn, cur):
+        ms, _ = timed(backends.get().create_schema, conn, cur, schema.TABLES_DDL + reporting.REPORT_TABLES_DDL)
+    print(f"{'schema bootstrap':<22}{ms:>10.1f} ms")
+    ms, _ = timed(schema.seed_sample_data)
+    print(f"{'seed sample data':<22}{ms:>10.1f} ms   (mostly password hashing)")
+
+    trips = crud.list_available_trips()
+    trip = trips[0]
+    stops = crud.get_route_stops(trip["route_id"])
+    seats = crud.get_available_seats(trip["trip_id"])
+    n = min(args.n, len(seats))
+
+    def book(i):
+        crud.book_ticket(trip["trip_id"], stops[0]["stop_id"], stops[-1]["stop_id"], seats[i],
+                         "Bench Passenger", f"90000{i:05d}")
+
+    print(f"{'operation':<22}{'mean ms':>10}{'p99 ms':>10}")
+    for label, fn, count in (("list trips", lambda i: crud.list_available_trips(), args.n),
+                             ("seat map", lambda i: crud.load_seat_map(trip["trip_id"]), args.n),
+                             ("book ticket", book, n)):
+        mean, p99 = per_call(fn, count)
+        print(f"{label:<22}{mean:>10.2f}{p99:>10.2f}")
+    conn = connect_db()
+    ms, _ = timed(reporting.refresh_reports, conn, True)
+    conn.close()
+    print(f"{'full report rebuild':<22}{ms:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
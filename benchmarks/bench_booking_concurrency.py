@@ -0,0 +1,171 @@
+"""
+Booking rush: hundreds of clients booking the same few trips at once.
+
+    python benchmarks/bench_booking_concurrency.py [--clients 400] [--trips 4] [--capacity 40] [--processes 1]
+                                                   [--mode both|optimistic|locked] [--backend sqlite|mysql]
+
+Each client is a thread that waits at a barrier, then books one seat with
+book_ticket(..., seat_no=None) (any free seat) on a random one of --trips
+fresh trips of --capacity seats, so more clients than seats arrive at
+once. With --processes N the clients are split over N processes (app
+servers sharing one database): "locked" only excludes bookings within a
+process, so there its races surface as errors from the unique seat index.
+Per BOOKING_MODE it reports:
+
+* booked, refused as sold out, gave up (busy after BOOKING_RETRIES) and
+  errors; "success" is booked over the seats there were to sell;
+* p50/p99 latency of a booking call;
+* double-booked seats and oversold trips, counted from the tickets table
+  afterwards (both must be 0).
+
+sqlite (default) runs against a throwaway file. mysql writes buses, trips
+and tickets into DB_CONFIG's database, so point it at a scratch schema.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import config
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def make_trips(run_sql, crud, route_id, count, capacity, label):
+    """A fresh bus of `capacity` seats and `count` scheduled trips tomorrow"""
+    bus_id = run_sql(
+        "INSERT INTO buses (bus_no,bus_name,type,capacity,route_id,ac,status) VALUES (%s,%s,'Regular',%s,%s,0,'active')",
+        (f"RUSH-{label}", f"Rush {label}", capacity, route_id))
+    start = datetime.now().replace(hour=6, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    trips = []
+    for i in range(count):
+        depart = start + timedelta(minutes=15 * i)
+        trips.append(run_sql(
+            "INSERT INTO trips (route_id,bus_id,start_time,end_time,frequency,status) VALUES (%s,%s,%s,%s,'once','scheduled')",
+            (route_id, bus_id, depart, depart + timedelta(hours=1))))
+    crud.invalidate_queries("buses", "trips")
+    return trips
+
+
+def rush(crud, trips, stops, clients, rng, first=0, start=None):
+    barrier = threading.Barrier(clients, action=start.wait if start else None)
+    outcomes, latencies = [], []
+    lock = threading.Lock()
+
+    def client(i, trip_id):
+        barrier.wait()
+        t0 = time.perf_counter()
+        try:
+            crud.book_ticket(trip_id, stops[0], stops[-1], None, f"Rider {i}", f"8{first + i:09d}")
+            outcome = "booked"
+        except crud.BookingError as e:
+            outcome = "sold out" if "sold out" in str(e) else "gave up"
+        except Exception:
+            outcome = "error"
+        with lock:
+            outcomes.append(outcome)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=client, args=(i, rng.choice(trips))) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outcomes, latencies, time.perf_counter() - t0
+
+
+def worker(backend, path, mode, trips, stops, clients, first, start, results):
+    """One app process's share of the clients (spawned: its own pool and locks)"""
+    config.DB_BACKEND, config.SQLITE_PATH, config.BOOKING_MODE = backend, path, mode
+    from transport import crud
+    results.put(rush(crud, trips, stops, clients, random.Random(first), first, start)[:2])
+
+
+def rush_processes(args, mode, trips, stops):
+    ctx = multiprocessing.get_context("spawn")
+    start, results = ctx.Barrier(args.processes), ctx.Queue()
+    share = args.clients // args.processes
+    procs = [ctx.Process(target=worker, args=(args.backend, config.SQLITE_PATH, mode, trips, stops,
+                                              share, p * share, start, results))
+             for p in range(args.processes)]
+    t0 = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    outcomes, latencies = [], []
+    for _ in procs:
+        o, l = results.get()
+        outcomes += o
+        latencies += l
+    for proc in procs:
+        proc.join()
+    return outcomes, latencies, time.perf_counter() - t0
+
+
+def check(crud, trips, capacity):
+    marks = ",".join(["%s"] * len(trips))
+    doubles = crud.fetch_all(f"""
+        SELECT trip_id, seat_no FROM tickets WHERE trip_id IN ({marks})
+        GROUP BY trip_id, seat_no HAVING COUNT(*) > 1
+    """, trips)
+    oversold = crud.fetch_all(f"""
+        SELECT trip_id FROM tickets WHERE trip_id IN ({marks})
+        GROUP BY trip_id HAVING COUNT(*) > %s
+    """, list(trips) + [capacity])
+    return len(doubles), len(oversold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=400)
+    parser.add_argument("--trips", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=40)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--mode", choices=("both", "optimistic", "locked"), default="both")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    args = parser.parse_args()
+
+    config.DB_BACKEND = args.backend
+    if args.backend == "sqlite":
+        config.SQLITE_PATH = os.path.join(tempfile.mkdtemp(prefix="transport-bench-"), "bench.sqlite3")
+    from transport import crud
+    from transport.db import run_sql
+    from transport.schema import initialize_database_and_schema
+
+    initialize_database_and_schema()
+    route = next(r for r in crud.list_routes() if len(crud.get_route_stops(r["route_id"])) >= 2)
+    stops = [s["stop_id"] for s in crud.get_route_stops(route["route_id"])]
+    seats = args.trips * args.capacity
+    print(f"backend: {args.backend}; {args.clients} clients in {args.processes} process(es), "
+          f"{args.trips} trips x {args.capacity} seats = {seats} seats; retries {config.BOOKING_RETRIES}")
+    print(f"{'mode':<12}{'booked':>8}{'success':>9}{'sold out':>10}{'gave up':>9}{'errors':>8}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'wall s':>8}{'double':>8}{'oversold':>10}")
+    rng = random.Random(3)
+    for mode in (("optimistic", "locked") if args.mode == "both" else (args.mode,)):
+        config.BOOKING_MODE = mode
+        trips = make_trips(run_sql, crud, route["route_id"], args.trips, args.capacity, f"{mode}-{rng.randrange(10**6)}")
+        if args.processes > 1:
+            outcomes, latencies, wall = rush_processes(args, mode, trips, stops)
+        else:
+            outcomes, latencies, wall = rush(crud, trips, stops, args.clients, rng)
+        booked = outcomes.count("booked")
+        doubles, oversold = check(crud, trips, args.capacity)
+        print(f"{mode:<12}{booked:>8}{booked / min(seats, args.clients):>9.0%}{outcomes.count('sold out'):>10}"
+              f"{outcomes.count('gave up'):>9}{outcomes.count('error'):>8}"
+              f"{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.99):>9.1f}{wall:>8.2f}"
+              f"{doubles:>8}{oversold:>10}")
+
+
+if __name__ == "__main__":
+    main()
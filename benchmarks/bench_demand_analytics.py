@@ -0,0 +1,71 @@
+"""
+Demand analytics over a synthetic `path` table.
+
+    python benchmarks/bench_demand_analytics.py [path-rows]
+
+Generates trips of 10-30 stops over 8 weeks on 50 routes (default
+2,000,000 path rows) and times each stage of demand_analytics.
+No database needed.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import demand_analytics as da
+
+
+def synthetic_path(n_rows, routes=50, seed=7):
+    rng = np.random.default_rng(seed)
+    stops_per_trip = rng.integers(10, 31, size=n_rows // 10)
+    stops_per_trip = stops_per_trip[np.cumsum(stops_per_trip) <= n_rows]
+    n_trips = len(stops_per_trip)
+    n = int(stops_per_trip.sum())
+    trip_id = np.repeat(np.arange(1, n_trips + 1), stops_per_trip)
+    seq = np.arange(n) - np.repeat(np.cumsum(stops_per_trip) - stops_per_trip, stops_per_trip)
+    start = pd.Timestamp("2026-01-05 05:00") + pd.to_timedelta(rng.integers(0, 56 * 18, size=n_trips) * 60, unit="min")
+    arrival = np.repeat(start.values, stops_per_trip) + pd.to_timedelta(seq * 4, unit="min").values
+    return pd.DataFrame({
+        "path_id": np.arange(1, n + 1),
+        "trip_id": trip_id,
+        "route_id": np.repeat(rng.integers(1, routes + 1, size=n_trips), stops_per_trip),
+        "stop_id": rng.integers(1, 2000, size=n),
+        "arrival_time": arrival,
+        "departure_time": arrival + np.timedelta64(1, "m"),
+        "people_in": rng.poisson(4, size=n).astype("int32"),
+        "people_out": rng.poisson(4, size=n).astype("int32"),
+        "capacity": np.repeat(rng.choice([30, 40, 50, 60], size=n_trips), stops_per_trip).astype(float),
+    })
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    print(f"{label:<28}{time.perf_counter() - t0:>8.2f}s")
+    return out
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    df = timed("generate", lambda: synthetic_path(n_rows))
+    print(f"{len(df):,} path rows, {df['trip_id'].nunique():,} trips")
+    occ = timed("running_occupancy", lambda: da.running_occupancy(df))
+    timed("trip_peaks", lambda: da.trip_peaks(occ))
+    timed("peak_load_per_stop", lambda: da.peak_load_per_stop(occ))
+    hourly = timed("hourly_demand", lambda: da.hourly_demand(occ))
+    fc = timed("forecast_demand (seasonal)", lambda: da.forecast_demand(hourly))
+    timed("forecast_demand (moving)", lambda: da.forecast_demand(hourly, method="moving_average"))
+    trips = occ.groupby("trip_id").agg(route_id=("route_id", "first"), start_time=("arrival_time", "min"),
+                                       capacity=("capacity", "first")).reset_index(drop=True)
+    supply = da.supply_frame(trips.to_dict("records"))
+    recs = timed("recommend_trip_changes", lambda: da.recommend_trip_changes(fc, supply))
+    print(recs["action"].value_counts().to_string())
+
+
+if __name__ == "__main__":
+    main()
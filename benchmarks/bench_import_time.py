@@ -0,0 +1,56 @@
+"""
+Startup cost of the data layer and the transport-admin CLI.
+
+    python benchmarks/bench_import_time.py [runs]
+
+Each case runs in a fresh interpreter with `python -X importtime`; the
+cumulative time of the measured module is reported (best of `runs`), with
+a check that nothing heavy (Streamlit, pandas) came along with it.
+No database needed.
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ("transport.cli", "import transport.cli; transport.cli.build_parser()"),
+    ("transport.crud", "import transport.crud"),
+    ("transport.schema", "import transport.schema"),
+    ("app", "import app"),
+]
+HEAVY = ("streamlit", "pandas", "numpy")
+
+
+def import_time_ms(module, code):
+    check = f"; import sys; print('HEAVY=' + ','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code + check], cwd=ROOT,
+                         capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    cumulative = 0
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1])
+    heavy = [line[6:] for line in out.stdout.splitlines() if line.startswith("HEAVY=")]
+    return cumulative / 1000, heavy[0] if heavy else ""
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'module':<20}{'import ms':>10}  heavy modules loaded")
+    for module, code in CASES:
+        try:
+            results = [import_time_ms(module, code) for _ in range(runs)]
+        except RuntimeError as e:
+            print(f"{module:<20}{'-':>10}  ({e})")
+            continue
+        best = min(ms for ms, _ in results)
+        print(f"{module:<20}{best:>10.1f}  {results[0][1] or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Nearest-stop lookups: k-d tree (StopIndex) vs. a haversine scan of every stop.
+
+    python benchmarks/bench_nearest_stops.py [--stops 100000] [--queries 2000] [-k 5] [--radius 1.5]
+
+No database: scatters synthetic stops over a few city-sized clusters (as a
+national network geocodes) plus a sprinkle over the whole globe, builds a
+StopIndex from rows shaped like COORDS_SQL's result and reports:
+
+* build time and memory held (tracemalloc), total and per stop;
+* k nearest stops per query: scan + heap vs. nearest(k);
+* every stop within a radius per query: scan vs. within(radius_km);
+* that both give the same stops (distance ties aside) for every query checked.
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport.stop_geo import StopIndex, haversine_km
+
+CITIES = [(12.97, 77.59), (19.08, 72.88), (28.61, 77.21), (13.08, 80.27), (22.57, 88.36),
+          (51.51, -0.13), (40.71, -74.01), (-33.87, 151.21), (64.15, -21.94), (-0.18, 179.9)]
+
+
+def make_rows(n, rng):
+    rows = []
+    for stop_id in range(1, n + 1):
+        if rng.random() < 0.05:
+            lat, lon = rng.uniform(-89.9, 89.9), rng.uniform(-180, 180)
+        else:
+            lat, lon = rng.choice(CITIES)
+            lat, lon = lat + rng.gauss(0, 0.15), (lon + rng.gauss(0, 0.15) + 180) % 360 - 180
+        rows.append({"stop_id": stop_id, "stop_name": f"Stop {stop_id}", "location": f"Zone {stop_id % 97}",
+                     "latitude": lat, "longitude": lon})
+    return rows
+
+
+def scan_nearest(rows, lat, lon, k):
+    return heapq.nsmallest(k, ((haversine_km(lat, lon, r["latitude"], r["longitude"]), r["stop_id"]) for r in rows))
+
+
+def scan_within(rows, lat, lon, radius_km):
+    return sorted(hit for hit in ((haversine_km(lat, lon, r["latitude"], r["longitude"]), r["stop_id"])
+                                  for r in rows) if hit[0] <= radius_km)
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return obj, used
+
+
+def per_query_us(fn, points):
+    t0 = time.perf_counter()
+    for lat, lon in points:
+        fn(lat, lon)
+    return (time.perf_counter() - t0) / len(points) * 1e6
+
+
+def same_stops(expected, found):
+    """Same distances (to the metre) for the same number of stops: ties may pick different ids"""
+    return [round(d, 3) for d, _ in expected] == [s["distance_km"] for s in found]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stops", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--radius", type=float, default=1.5, help="km, for the radius query")
+    args = parser.parse_args()
+    rng = random.Random(48)
+
+    rows = make_rows(args.stops, rng)
+    index, index_bytes = measure(lambda: StopIndex(rows))
+    t0 = time.perf_counter()
+    StopIndex(rows)
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"{args.stops} stops; index built in {build_ms:.0f} ms, "
+          f"{index_bytes / 1e6:.1f} MB held ({index_bytes / args.stops:.0f} bytes per stop)")
+
+    # most queries near a city, a few anywhere (open sea, poles)
+    points = [(lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.2)) if rng.random() < 0.9
+              else (rng.uniform(-90, 90), rng.uniform(-180, 180))
+              for lat, lon in (rng.choice(CITIES) for _ in range(args.queries))]
+    points = [(max(-90.0, min(90.0, lat)), (lon + 180) % 360 - 180) for lat, lon in points]
+    scanned = points[:max(1, args.queries // 50)]
+
+    print(f"{'':<28}{'scan':>14}{'k-d tree':>14}")
+    scan = per_query_us(lambda lat, lon: scan_nearest(rows, lat, lon, args.k), scanned)
+    tree = per_query_us(lambda lat, lon: index.nearest(lat, lon, args.k), points)
+    print(f"{f'{args.k} nearest us':<28}{scan:>14.0f}{tree:>14.1f}")
+    scan = per_query_us(lambda lat, lon: scan_within(rows, lat, lon, args.radius), scanned)
+    tree = per_query_us(lambda lat, lon: index.within(lat, lon, args.radius), points)
+    print(f"{f'within {args.radius} km us':<28}{scan:>14.0f}{tree:>14.1f}")
+
+    wrong = sum(not same_stops(scan_nearest(rows, lat, lon, args.k), index.nearest(lat, lon, args.k))
+                or not same_stops(scan_within(rows, lat, lon, args.radius), index.within(lat, lon, args.radius))
+                for lat, lon in scanned)
+    print(f"checked {len(scanned)} queries against the scan: {wrong} mismatched")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Passenger dedup: table size and "My Tickets" lookup before and after.
+
+    python benchmarks/bench_passenger_identity.py [--tickets 50000] [--contacts 2000] [--chunk 500]
+
+Builds a throwaway SQLite database shaped like one from before passenger
+identity: one passengers row per ticket, no contact_key, contact numbers
+written in mixed formats ("98765 43210", "+91-9876543210", ...). It then
+times the old lookup (raw contact_no equality), runs the migration the
+schema bootstrap runs (add contact_key, merge_duplicates in --chunk
+sized transactions, unique index) and times the new lookup by normalized
+contact.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import config
+
+FORMATS = ("{}", "+91 {}", "0{}", "{} ", "+91-{}")
+
+
+def lookup_ms(cur, sql, params_list):
+    samples = []
+    for params in params_list:
+        t0 = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.mean(samples), sorted(samples)[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=50000)
+    parser.add_argument("--contacts", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    config.DB_BACKEND = "sqlite"
+    config.SQLITE_PATH = os.path.join(tempfile.mkdtemp(prefix="transport-bench-"), "bench.sqlite3")
+    from transport import backends, crud, passenger_identity
+    from transport.db import connect_db
+    from transport.schema import initialize_database_and_schema
+
+    initialize_database_and_schema()
+    conn = connect_db()
+    cur = conn.cursor(dictionary=True)
+    # back to the pre-dedup shape: no key column, no unique index
+    cur.execute(f"DROP INDEX {passenger_identity.UNIQUE_INDEX}")
+    cur.execute("ALTER TABLE passengers DROP COLUMN contact_key")
+    cur.execute("SELECT trip_id FROM trips")
+    trips = [r["trip_id"] for r in cur.fetchall()]
+    rng = random.Random(7)
+    numbers = [f"9{rng.randrange(10**9):09d}" for _ in range(args.contacts)]
+    t0 = time.perf_counter()
+    for i in range(args.tickets):
+        number = rng.choice(numbers)
+        cur.execute("INSERT INTO passengers (name, address, contact_no, email_id) VALUES (%s, '', %s, '')",
+                    (f"Rider {number[-4:]}", rng.choice(FORMATS).format(number)))
+        cur.execute("INSERT INTO tickets (trip_id, passenger_id, seat_no, fare, gender) VALUES (%s, %s, %s, 10, 'other')",
+                    (rng.choice(trips), cur.lastrowid, f"S{i}"))
+    conn.commit()
+    print(f"legacy data: {args.tickets} tickets/passengers, {args.contacts} riders "
+          f"({(time.perf_counter() - t0):.1f}s to build)")
+
+    sample = [rng.choice(numbers) for _ in range(args.lookups)]
+    old_sql = crud.TICKETS_BY_CONTACT_SQL.replace("p.contact_key", "p.contact_no")
+    old_mean, old_p95 = lookup_ms(cur, old_sql, [(n,) for n in sample])
+    # the bootstrap's migration steps, with the chosen chunk size
+    passenger_identity.ensure_schema(cur, backends.get().live_columns(conn))
+    conn.commit()
+    report = crud.dedupe_passengers(args.chunk)
+    print(f"merge: {report.rows_merged} duplicates of {report.contacts_merged} riders, "
+          f"{report.tickets_repointed} tickets repointed, {report.chunks} chunks in {report.elapsed_ms:.0f} ms")
+    new_mean, new_p95 = lookup_ms(cur, crud.TICKETS_BY_CONTACT_SQL,
+                                  [crud.tickets_by_contact_query(n)[1] for n in sample])
+    cur.close()
+    conn.close()
+
+    print(f"{'':<22}{'before':>12}{'after':>12}")
+    print(f"{'passengers rows':<22}{report.passengers_before:>12}{report.passengers_after:>12}")
+    print(f"{'lookup mean ms':<22}{old_mean:>12.2f}{new_mean:>12.2f}")
+    print(f"{'lookup p95 ms':<22}{old_p95:>12.2f}{new_p95:>12.2f}")
+    print("(the old lookup also missed tickets booked with the number in another format)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Seeding cost: rows one statement at a time vs. bulk_loader batches.
+
+    python benchmarks/bench_seed.py [--backend sqlite|mysql] [--scale 200]
+
+Loads a generated network `scale` times the size of the sample data
+(stops, routes, route_stops, drivers, buses, trips, passengers, tickets)
+twice into emptied tables: once with chunk_size=1, which is the old
+seeding's shape (one INSERT per row), and once with the default chunks.
+Both resolve natural keys the same way, so the difference is round trips:
+next to nothing on the in-process SQLite backend, one network round trip
+per statement on MySQL.
+
+Then times schema.reset_sample_data() (delete everything, reseed), the
+admin "Seed Data (re-run)" action. mysql uses DB_CONFIG: point it at a
+scratch schema, the tables are emptied.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import config
+
+
+def network(scale, now):
+    from transport.bulk_loader import batch, col
+
+    stops = [(f"Stop {i}", f"Zone {i % 40}") for i in range(9 * scale)]
+    routes = [(f"R{i}", f"Stop {i}", f"Stop {i + 1}", 10.0) for i in range(4 * scale)]
+    drivers = [(f"First{i}", f"Last{i}", f"LIC{i}", f"9{i:09d}") for i in range(5 * scale)]
+    buses = [(f"BUS{i}", 40, f"R{i % len(routes)}") for i in range(5 * scale)]
+    trips = [(f"R{i % len(routes)}", f"BUS{i % len(buses)}", f"LIC{i % len(drivers)}",
+              now + timedelta(minutes=30 * (i // len(buses)))) for i in range(25 * scale)]
+    passengers = [(f"Rider {i}", f"8{i:09d}", f"8{i:09d}") for i in range(5 * scale)]
+    return [
+        batch("stops", [col("stop_name"), col("location")], stops, key="stop_name"),
+        batch("routes", [col("route_name"), col("source"), col("destination"), col("distance_km", float)],
+              routes, key="route_name"),
+        batch("route_stops", [col("route_id", ref="routes"), col("stop_order", int), col("stop_id", ref="stops")],
+              [(f"R{r}", k + 1, f"Stop {(r + k) % len(stops)}") for r in range(len(routes)) for k in range(3)]),
+        batch("drivers", [col("first_name"), col("last_name"), col("license_no"), col("phone")], drivers,
+              key="license_no"),
+        batch("buses", [col("bus_no"), col("capacity", int), col("route_id", ref="routes")], buses, key="bus_no"),
+        batch("trips", [col("route_id", ref="routes"), col("bus_id", ref="buses"), col("driver_id", ref="drivers"),
+                        col("start_time", datetime)], trips, key=("bus_id", "start_time")),
+        batch("passengers", [col("name"), col("contact_no"), col("contact_key")], passengers, key="contact_key"),
+        batch("tickets", [col("trip_id", ref="trips"), col("passenger_id", ref="passengers"),
+                          col("boarding_stop_id", ref="stops"), col("dropping_stop_id", ref="stops"),
+                          col("seat_no"), col("fare", float)],
+              [((t[1], t[3]), passengers[i % len(passengers)][2], "Stop 0", "Stop 1", f"S{i % 40 + 1}", 25.0)
+               for i, t in enumerate(trips)]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--scale", type=int, default=200, help="times the sample data's size")
+    args = parser.parse_args()
+
+    config.DB_BACKEND = args.backend
+    if args.backend == "sqlite":
+        config.SQLITE_PATH = os.path.join(tempfile.mkdtemp(prefix="transport-bench-"), "bench.sqlite3")
+    from transport import bulk_loader, schema
+    from transport.db import connect_db
+
+    schema.initialize_database_and_schema()
+    conn = connect_db()
+    cur = conn.cursor()
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    batches = network(args.scale, now)
+    print(f"backend: {args.backend}, {sum(len(b.rows) for b in batches)} rows in {len(batches)} tables")
+    print(f"{'':<22}{'statements':>12}{'ms':>10}")
+    for label, chunk in (("row at a time", 1), ("bulk_loader", bulk_loader.CHUNK_SIZE)):
+        for table in schema.SAMPLE_TABLES_RESET_ORDER:
+            cur.execute(f"DELETE FROM {table}")
+        conn.commit()
+        report = bulk_loader.load(conn, batches, chunk_size=chunk)
+        print(f"{label:<22}{report.statements:>12}{report.elapsed_ms:>10.1f}")
+    cur.close()
+    conn.close()
+
+    t0 = time.perf_counter()
+    report = schema.reset_sample_data()
+    print(f"{'reset + reseed':<22}{report.statements:>12}{(time.perf_counter() - t0) * 1000:>10.1f}"
+          f"   (sample data; includes password hashing and the report rebuild)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Booking latency with synchronous trigger logging vs. the async ticket_log writer.
+
+    python benchmarks/bench_ticket_log.py [bookings]
+
+Uses the connection from db_config.py against a database initialised by app.py
+or `transport-admin init`.
+Inserted tickets and their log rows are removed afterwards.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_config import get_connection
+from transport.ticket_log_writer import TicketLogWriter, ACTION_ISSUED
+
+INSERT_TICKET = ("INSERT INTO tickets (trip_id,passenger_id,boarding_stop_id,dropping_stop_id,seat_no,fare,gender) "
+                 "VALUES (%s,%s,%s,%s,%s,%s,%s)")
+
+
+def pick_fixture(cur):
+    cur.execute("SELECT trip_id FROM trips ORDER BY trip_id LIMIT 1")
+    trip = cur.fetchone()
+    cur.execute("SELECT passenger_id FROM passengers ORDER BY passenger_id LIMIT 1")
+    passenger = cur.fetchone()
+    cur.execute("SELECT stop_id FROM stops ORDER BY stop_id LIMIT 2")
+    stops = cur.fetchall()
+    if not trip or not passenger or len(stops) < 2:
+        sys.exit("Run `transport-admin init` (or app.py) once to create and seed the schema first.")
+    return trip[0], passenger[0], stops[0][0], stops[1][0]
+
+
+def book(conn, cur, fixture, i):
+    trip_id, passenger_id, boarding, dropping = fixture
+    cur.execute(INSERT_TICKET, (trip_id, passenger_id, boarding, dropping, f"Z{i}", 30.0, "other"))
+    conn.commit()
+    return cur.lastrowid
+
+
+def run(mode, n, fixture):
+    conn = get_connection()
+    cur = conn.cursor()
+    writer = None
+    if mode == "async":
+        cur.execute("SET @ticket_log_async = 1")
+        writer = TicketLogWriter(get_connection, spool_path="bench_ticket_log.spool").start()
+
+    latencies, ids = [], []
+    for i in range(n):
+        t0 = time.perf_counter()
+        ticket_id = book(conn, cur, fixture, i)
+        if writer:
+            writer.log(ticket_id, fixture[0], ACTION_ISSUED)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        ids.append(ticket_id)
+
+    drain_ms = 0.0
+    if writer:
+        t0 = time.perf_counter()
+        writer.stop()
+        drain_ms = (time.perf_counter() - t0) * 1000
+    cur.close()
+    conn.close()
+    return latencies, ids, drain_ms
+
+
+def cleanup(ids):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SET @ticket_log_async = 1")
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        marks = ",".join(["%s"] * len(chunk))
+        cur.execute(f"DELETE FROM tickets WHERE ticket_id IN ({marks})", chunk)
+        cur.execute(f"DELETE FROM ticket_log WHERE ticket_id IN ({marks})", chunk)
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def report(mode, latencies, drain_ms):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    line = (f"{mode:>8}: n={len(latencies)} mean={statistics.mean(latencies):.2f}ms "
+            f"p50={statistics.median(latencies):.2f}ms p99={p99:.2f}ms")
+    if mode == "async":
+        line += f" (final drain {drain_ms:.1f}ms)"
+    print(line)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    conn = get_connection()
+    cur = conn.cursor()
+    fixture = pick_fixture(cur)
+    cur.close()
+    conn.close()
+
+    for mode in ("trigger", "async"):
+        latencies, ids, drain_ms = run(mode, n, fixture)
+        report(mode, latencies, drain_ms)
+        cleanup(ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+"My Tickets" lookup latency: the unpaged contact query vs. one page, uncached and cached.
+
+    python benchmarks/bench_ticket_lookup.py [--tickets 1000000] [--contacts 200000] [--lookups 500]
+    python benchmarks/bench_ticket_lookup.py --tickets 10000000 --contacts 2000000    # the 10M-ticket target
+
+Fills a throwaway SQLite database through the schema bootstrap (so with
+idx_tickets_passenger_created and the unique contact_key index). Most riders
+get a few tickets; one in a thousand is a "commuter" with a long history,
+where the page LIMIT pays off. It then times, for random riders and for
+commuters:
+
+* TICKETS_BY_CONTACT_SQL: every ticket of the contact, as "My Tickets" read it before;
+* the first page and a page deep in the history (keyset cursor), straight from the database;
+* crud.lookup_tickets() served from the shared page cache.
+
+Reports p50/p95/p99 in ms; the target is p95 under 20 ms at 10M tickets.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import config
+
+BATCH = 50000
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    at = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return statistics.median(samples), at(0.95), at(0.99)
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return percentiles(samples)
+
+
+def fill(conn, cur, tickets, contacts, rng):
+    cur.execute("SELECT trip_id FROM trips")
+    trips = [r["trip_id"] for r in cur.fetchall()]
+    cur.execute("SELECT stop_id FROM stops")
+    stops = [r["stop_id"] for r in cur.fetchall()]
+    cur.execute("SELECT COALESCE(MAX(passenger_id), 0) AS n FROM passengers")
+    first = cur.fetchone()["n"] + 1
+    for lo in range(0, contacts, BATCH):
+        cur.executemany("INSERT INTO passengers (name, address, contact_no, email_id, contact_key) "
+                        "VALUES (%s, '', %s, '', %s)",
+                        [(f"Rider {i}", f"8{i:09d}", f"8{i:09d}") for i in range(lo, min(contacts, lo + BATCH))])
+    conn.commit()
+    commuters = contacts // 1000 or 1
+    base = datetime.now() - timedelta(days=365)
+    for lo in range(0, tickets, BATCH):
+        rows = []
+        for i in range(lo, min(tickets, lo + BATCH)):
+            # a third of the tickets go to the commuters
+            rider = rng.randrange(commuters) if i % 3 == 0 else rng.randrange(contacts)
+            rows.append((rng.choice(trips), first + rider, rng.choice(stops), rng.choice(stops), f"B{i}", 25,
+                         "other", base + timedelta(seconds=rng.randrange(365 * 86400))))
+        cur.executemany("INSERT INTO tickets (trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, "
+                        "fare, gender, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", rows)
+        conn.commit()
+    cur.execute("ANALYZE")
+    return commuters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=1000000)
+    parser.add_argument("--contacts", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--page", type=int, default=20)
+    args = parser.parse_args()
+
+    config.DB_BACKEND = "sqlite"
+    config.SQLITE_PATH = os.path.join(tempfile.mkdtemp(prefix="transport-bench-"), "bench.sqlite3")
+    from transport import crud, ticket_lookup
+    from transport.db import connect_db
+    from transport.schema import initialize_database_and_schema
+
+    initialize_database_and_schema()
+    conn = connect_db()
+    cur = conn.cursor(dictionary=True)
+    rng = random.Random(49)
+    t0 = time.perf_counter()
+    commuters = fill(conn, cur, args.tickets, args.contacts, rng)
+    print(f"{args.tickets} tickets, {args.contacts} riders ({commuters} commuters with "
+          f"~{args.tickets // 3 // commuters} tickets each); built in {time.perf_counter() - t0:.0f}s")
+
+    def unpaged(key):
+        cur.execute(crud.TICKETS_BY_CONTACT_SQL, (key,))
+        cur.fetchall()
+
+    def page(key, cursor):
+        cur.execute(*ticket_lookup.page_query(key, cursor, args.page))
+        return ticket_lookup.to_page(cur.fetchall(), args.page)
+
+    def deep_cursor(key):
+        """cursor of a page about halfway down the rider's history"""
+        cur.execute("SELECT tk.created_at, tk.ticket_id FROM tickets tk JOIN passengers p "
+                    "ON tk.passenger_id = p.passenger_id WHERE p.contact_key = %s "
+                    "ORDER BY tk.created_at DESC, tk.ticket_id DESC", (key,))
+        rows = cur.fetchall()
+        return ticket_lookup.encode_cursor(rows[len(rows) // 2]) if rows else None
+
+    print(f"{'ms (p50 / p95 / p99)':<30}{'random riders':>24}{'commuters':>24}")
+    riders = [(f"8{rng.randrange(args.contacts):09d}",) for _ in range(args.lookups)]
+    heavy = [(f"8{rng.randrange(commuters):09d}",) for _ in range(args.lookups)]
+    rows = [
+        ("unpaged (before)", unpaged, riders, heavy),
+        ("first page", lambda k: page(k, None), riders, heavy),
+        ("deep page (cursor)", page, [(k, deep_cursor(k)) for k, in riders[:100]],
+         [(k, deep_cursor(k)) for k, in heavy[:100]]),
+    ]
+    # the page cache: warm every key once, then time hits
+    crud.get_ticket_lookup_cache().max_entries = 2 * args.lookups
+    for key, in riders + heavy:
+        crud.lookup_tickets(key, None, args.page)
+    rows.append(("cached page", lambda k: crud.lookup_tickets(k, None, args.page), riders, heavy))
+    for label, fn, light_args, heavy_args in rows:
+        light, commuter = timed(fn, light_args), timed(fn, heavy_args)
+        print(f"{label:<30}{' / '.join(f'{v:.2f}' for v in light):>24}{' / '.join(f'{v:.2f}' for v in commuter):>24}")
+    cache = crud.get_ticket_lookup_cache().stats()
+    print(f"page cache: {cache['entries']} entries, {cache['hits']} hits, {cache['misses']} misses")
+    cur.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
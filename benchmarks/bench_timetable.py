@@ -0,0 +1,98 @@
+"""
+Memory and lookup cost of the compact timetable vs. a list of row dicts.
+
+    python benchmarks/bench_timetable.py [--trips 100000] [--routes 200] [--lookups 2000]
+
+No database: builds synthetic rows shaped like TIMETABLE_SQL's result (a
+fresh string object per row, as a DB driver returns them), then compares
+the list of dicts list_available_trips() used to return with a Timetable
+built from the same rows:
+
+* memory held (tracemalloc), total and per trip;
+* one route's trips: list comprehension over all rows vs. trips(route_id);
+* one route's trips in a 3-hour window: scan vs. two binary searches.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport.timetable import Timetable
+
+
+def make_rows(n, routes, rng):
+    base = datetime.now().replace(hour=5, minute=0, second=0, microsecond=0)
+    rows = []
+    for trip_id in range(1, n + 1):
+        route_id = rng.randrange(1, routes + 1)
+        bus_id, driver_id = rng.randrange(1, routes * 3), rng.randrange(1, routes * 4)
+        start = base + timedelta(minutes=rng.randrange(0, 60 * 24 * 30))
+        rows.append({
+            "trip_id": trip_id, "route_id": route_id, "bus_id": bus_id, "driver_id": driver_id,
+            "start_time": start, "end_time": start + timedelta(minutes=45),
+            "frequency": "".join(["daily"]), "status": "".join(["scheduled"]),
+            "route_name": f"R{route_id} Route {route_id}", "bus_no": f"BUS{bus_id}", "type": "".join(["AC"]),
+            "ac": 1, "driver_name": f"Driver {driver_id}",
+        })
+    return rows
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return obj, used
+
+
+def per_lookup_us(fn, args_list):
+    t0 = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - t0) / len(args_list) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trips", type=int, default=100000)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    rows, rows_bytes = measure(lambda: make_rows(args.trips, args.routes, rng))
+    timetable, tt_bytes = measure(lambda: Timetable.from_rows(rows))
+    t0 = time.perf_counter()
+    Timetable.from_rows(rows)
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"{args.trips} trips on {args.routes} routes; timetable built in {build_ms:.0f} ms "
+          f"(nbytes() reports {timetable.nbytes() / 1e6:.1f} MB)")
+    print(f"{'':<28}{'row dicts':>14}{'timetable':>14}")
+    print(f"{'memory MB':<28}{rows_bytes / 1e6:>14.1f}{tt_bytes / 1e6:>14.1f}")
+    print(f"{'bytes per trip':<28}{rows_bytes / args.trips:>14.0f}{tt_bytes / args.trips:>14.0f}")
+
+    routes = [(rng.randrange(1, args.routes + 1),) for _ in range(args.lookups // 10)]
+    scan = per_lookup_us(lambda r: [t for t in rows if t["route_id"] == r], routes)
+    indexed = per_lookup_us(lambda r: timetable.trips(r), routes)
+    print(f"{'route lookup us':<28}{scan:>14.0f}{indexed:>14.0f}")
+
+    day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    windows = []
+    for _ in range(args.lookups):
+        start = day + timedelta(days=rng.randrange(30), hours=rng.randrange(5, 21))
+        windows.append((rng.randrange(1, args.routes + 1), start, start + timedelta(hours=3)))
+    scan = per_lookup_us(lambda r, s, e: [t for t in rows if t["route_id"] == r and s <= t["start_time"] < e],
+                         windows[:args.lookups // 10])
+    indexed = per_lookup_us(lambda r, s, e: timetable.trips(r, s, e), windows)
+    print(f"{'route + 3h window us':<28}{scan:>14.0f}{indexed:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
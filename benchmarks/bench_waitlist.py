@@ -0,0 +1,103 @@
+"""
+Waitlist: join cost, and how fast cancelled seats reach waitlisted riders.
+
+    python benchmarks/bench_waitlist.py [--capacity 100] [--waitlist 300] [--cancel 100] [--threads 8]
+
+Runs against a throwaway SQLite file. One trip of --capacity seats is sold
+out, --waitlist riders join its waitlist, then --cancel tickets are
+cancelled from --threads threads at once while the backfill worker runs.
+Reported:
+
+* join_waitlist() mean/p95 and joins per second;
+* backfill: seats assigned, assignments per second from the first
+  cancellation to the last assignment, and the worker's own
+  release-to-assignment p50/p95;
+* checks: assigned entries are exactly the oldest --cancel ones (FIFO), no
+  seat is booked twice, and waitlist_log has one row per lifecycle step.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--waitlist", type=int, default=300)
+    parser.add_argument("--cancel", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    args.cancel = min(args.cancel, args.capacity, args.waitlist)
+
+    config.DB_BACKEND = "sqlite"
+    config.SQLITE_PATH = os.path.join(tempfile.mkdtemp(prefix="transport-bench-"), "bench.sqlite3")
+    from transport import crud
+    from transport.db import fetch_all, run_sql
+    from transport.schema import initialize_database_and_schema
+
+    initialize_database_and_schema()
+    route = next(r for r in crud.list_routes() if len(crud.get_route_stops(r["route_id"])) >= 2)
+    stops = [s["stop_id"] for s in crud.get_route_stops(route["route_id"])]
+    bus_id = run_sql("INSERT INTO buses (bus_no,bus_name,type,capacity,route_id,ac,status) "
+                     "VALUES ('WL-1','Waitlist bench','Regular',%s,%s,0,'active')", (args.capacity, route["route_id"]))
+    start = time.strftime("%Y-%m-%d 23:00:00", time.localtime(time.time() + 86400))
+    trip_id = run_sql("INSERT INTO trips (route_id,bus_id,start_time,end_time,frequency,status) "
+                      "VALUES (%s,%s,%s,%s,'once','scheduled')", (route["route_id"], bus_id, start, start))
+    tickets = [crud.book_ticket(trip_id, stops[0], stops[-1], None, f"Rider {i}", f"7{i:09d}")["ticket_id"]
+               for i in range(args.capacity)]
+
+    samples = []
+    t0 = time.perf_counter()
+    entries = []
+    for i in range(args.waitlist):
+        t = time.perf_counter()
+        entries.append(crud.join_waitlist(trip_id, stops[0], stops[-1], f"Waiting {i}", f"6{i:09d}")["waitlist_id"])
+        samples.append((time.perf_counter() - t) * 1000)
+    join_s = time.perf_counter() - t0
+    print(f"trip {trip_id}: {args.capacity} seats sold out, {args.waitlist} waitlisted, "
+          f"cancelling {args.cancel} from {args.threads} threads")
+    print(f"{'join mean ms':<28}{statistics.mean(samples):>10.2f}")
+    print(f"{'join p95 ms':<28}{sorted(samples)[int(len(samples) * 0.95)]:>10.2f}")
+    print(f"{'joins per second':<28}{args.waitlist / join_s:>10.0f}")
+
+    worker = crud.get_waitlist_worker()
+    cancel = tickets[:args.cancel]
+    chunks = [cancel[i::args.threads] for i in range(args.threads)]
+    threads = [threading.Thread(target=lambda ids: [crud.delete_ticket(t) for t in ids], args=(c,)) for c in chunks]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    deadline = time.monotonic() + args.timeout
+    while worker.stats()["assigned"] < args.cancel and time.monotonic() < deadline:
+        time.sleep(0.005)
+    wall = time.perf_counter() - t0
+    stats = worker.stats()
+    print(f"{'seats assigned':<28}{stats['assigned']:>10}")
+    print(f"{'assignments per second':<28}{stats['assigned'] / wall:>10.0f}")
+    print(f"{'release->assign p50 ms':<28}{stats['release_to_assign_ms']['p50']:>10}")
+    print(f"{'release->assign p95 ms':<28}{stats['release_to_assign_ms']['p95']:>10}")
+    print(f"{'backfill runs':<28}{stats['runs']:>10}")
+
+    assigned = [r["waitlist_id"] for r in fetch_all(
+        "SELECT waitlist_id FROM waitlist WHERE trip_id = %s AND status = 'assigned' ORDER BY waitlist_id", (trip_id,))]
+    doubles = fetch_all("SELECT seat_no FROM tickets WHERE trip_id = %s GROUP BY seat_no HAVING COUNT(*) > 1", (trip_id,))
+    log = {r["action"]: r["n"] for r in fetch_all(
+        "SELECT action, COUNT(*) AS n FROM waitlist_log WHERE trip_id = %s GROUP BY action", (trip_id,))}
+    print(f"FIFO: {'ok' if assigned == entries[:args.cancel] else 'VIOLATED'}; double-booked seats: {len(doubles)}; "
+          f"waitlist_log: {log}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,10 @@
-import mysql.connector
+from transport import config
+from transport.db import connect_db
 
+# checks the backend configured in transport/config.py (DB_BACKEND)
 try:
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="tp_user",
-        password="tp_password",
-        database="transport_db"
-    )
-    print("✅ Connection successful!")
+    conn = connect_db()
+    print(f"✅ Connection successful! ({config.DB_BACKEND})")
     conn.close()
-except mysql.connector.Error as err:
+except Exception as err:
     print("❌ Error:", err)
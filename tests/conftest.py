@@ -0,0 +1,162 @@
+"""
+Shared fixtures: a database loaded with a generated dataset.
+
+    pytest tests                                  # SQLite, throwaway file
+    pytest tests --plan-backend mysql             # DB_CONFIG's server, in a scratch schema
+    pytest tests --update-plan-baselines          # re-record tests/plan_baselines/<backend>.json
+"""
+
+import itertools
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transport import config
+
+# generated rows per table, on top of the seeded sample data
+DATASET = {"stops": 400, "routes": 60, "stops_per_route": 10, "buses": 150, "drivers": 180,
+           "trips": 6000, "passengers": 5000, "tickets": 30000, "path_trips": 400, "waitlist": 600}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--plan-backend", choices=("sqlite", "mysql"), default="sqlite",
+                     help="database for the query plan tests (mysql: a scratch schema on DB_CONFIG's server, "
+                          "dropped afterwards)")
+    parser.addoption("--update-plan-baselines", action="store_true",
+                     help="record the captured plans as the new baselines instead of comparing")
+
+
+def generate_dataset(cur, rng, sizes=DATASET):
+    """Bulk rows shaped like production: many trips over a +-3 week window,
+    tickets spread over them (one per seat), path rows for a slice of trips"""
+    n = sizes
+    cur.executemany("INSERT INTO stops (stop_name, location) VALUES (%s, %s)",
+                    [(f"Stop {i}", f"Zone {i % 40}") for i in range(n["stops"])])
+    cur.execute("SELECT stop_id FROM stops")
+    stops = [r["stop_id"] for r in cur.fetchall()]
+    cur.executemany("INSERT INTO routes (route_name, source, destination, distance_km) VALUES (%s, %s, %s, %s)",
+                    [(f"G{i} Generated", f"Stop {i}", f"Stop {i + 1}", rng.uniform(5, 40)) for i in range(n["routes"])])
+    cur.execute("SELECT route_id FROM routes WHERE route_name LIKE 'G%'")
+    routes = [r["route_id"] for r in cur.fetchall()]
+    cur.executemany("INSERT INTO route_stops (route_id, stop_order, stop_id) VALUES (%s, %s, %s)",
+                    [(r, i + 1, s) for r in routes for i, s in enumerate(rng.sample(stops, n["stops_per_route"]))])
+    cur.executemany("INSERT INTO buses (bus_no, bus_name, type, capacity, route_id, ac, status) "
+                    "VALUES (%s, %s, %s, 40, %s, %s, %s)",
+                    [(f"GEN{i}", f"Generated {i}", rng.choice(("AC", "Regular", "Mini")), rng.choice(routes),
+                      i % 2, rng.choice(("active", "active", "maintenance"))) for i in range(n["buses"])])
+    cur.executemany("INSERT INTO drivers (first_name, last_name, license_no, phone, salary, is_active) "
+                    "VALUES (%s, %s, %s, %s, 30000, %s)",
+                    [(f"First{i}", f"Last{i}", f"GLIC{i}", f"8{i:09d}", i % 10 != 0) for i in range(n["drivers"])])
+    cur.execute("SELECT bus_id, route_id FROM buses WHERE bus_no LIKE 'GEN%'")
+    buses = [(r["bus_id"], r["route_id"]) for r in cur.fetchall()]
+    cur.execute("SELECT driver_id FROM drivers")
+    drivers = [r["driver_id"] for r in cur.fetchall()]
+    base = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=7)
+    trips = []
+    for _ in range(n["trips"]):
+        bus_id, route_id = rng.choice(buses)
+        start = base + timedelta(minutes=15 * rng.randrange(4 * 24 * 21))
+        trips.append((route_id, bus_id, rng.choice(drivers), start, start + timedelta(minutes=50),
+                      "once", "completed" if start < base + timedelta(days=7) else "scheduled"))
+    cur.executemany("INSERT INTO trips (route_id, bus_id, driver_id, start_time, end_time, frequency, status) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s)", trips)
+    cur.execute("SELECT trip_id, route_id FROM trips")
+    trip_routes = {r["trip_id"]: r["route_id"] for r in cur.fetchall()}
+    cur.executemany("INSERT INTO passengers (name, address, contact_no, email_id, contact_key) VALUES (%s, '', %s, '', %s)",
+                    [(f"Rider {i}", f"9{i:09d}", f"9{i:09d}") for i in range(1, n["passengers"] + 1)])
+    cur.execute("SELECT passenger_id FROM passengers")
+    passengers = [r["passenger_id"] for r in cur.fetchall()]
+    seats, tickets = {}, []
+    trip_ids = list(trip_routes)
+    for _ in range(n["tickets"]):
+        trip_id = rng.choice(trip_ids)
+        seats[trip_id] = seats.get(trip_id, 0) + 1
+        board, drop = rng.sample(stops, 2)
+        tickets.append((trip_id, rng.choice(passengers), board, drop, f"S{seats[trip_id]}",
+                        rng.randrange(20, 60), rng.choice(("male", "female", "other")),
+                        base + timedelta(minutes=rng.randrange(60 * 24 * 21))))
+    cur.executemany("INSERT INTO tickets (trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, fare, "
+                    "gender, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", tickets)
+    path = []
+    for trip_id in trip_ids[:n["path_trips"]]:
+        for order, stop_id in enumerate(rng.sample(stops, 8)):
+            at = base + timedelta(minutes=5 * order)
+            path.append((trip_id, stop_id, at, at + timedelta(minutes=1), rng.randrange(10), rng.randrange(10)))
+    cur.executemany("INSERT INTO path (trip_id, stop_id, arrival_time, departure_time, people_in, people_out) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)", path)
+    cur.executemany("INSERT INTO major_stops (route_id, stop_id, time_taken_minutes) VALUES (%s, %s, 10)",
+                    [(r, rng.choice(stops)) for r in routes])
+    cur.executemany("INSERT INTO waitlist (trip_id, passenger_id, boarding_stop_id, dropping_stop_id, fare, status) "
+                    "VALUES (%s, %s, %s, %s, 30, %s)",
+                    [(rng.choice(trip_ids), rng.choice(passengers), stops[0], stops[1],
+                      rng.choice(("waiting", "assigned", "expired"))) for _ in range(n["waitlist"])])
+
+
+@pytest.fixture(scope="session")
+def plan_backend(request):
+    return request.config.getoption("--plan-backend")
+
+
+@pytest.fixture(scope="session")
+def dataset_db(plan_backend, tmp_path_factory):
+    """(conn, cursor) on a bootstrapped database holding the generated dataset,
+    with optimizer statistics refreshed. On MySQL that is a schema of its own,
+    created next to DB_CONFIG's database and dropped at the end, never the
+    live one."""
+    config.DB_BACKEND = plan_backend
+    live_database = config.DB_CONFIG.get("database")
+    if plan_backend == "sqlite":
+        config.SQLITE_PATH = str(tmp_path_factory.mktemp("plans") / "plans.sqlite3")
+    else:
+        # the backend reads this same dict, so every connection below lands in the scratch schema
+        config.DB_CONFIG["database"] = f"transport_plans_{os.getpid()}"
+    from transport import reporting
+    from transport.db import connect_db
+    from transport.schema import initialize_database_and_schema
+
+    initialize_database_and_schema()
+    conn = connect_db()
+    cur = conn.cursor(dictionary=True)
+    generate_dataset(cur, random.Random(47))
+    conn.commit()
+    reporting.refresh_reports(conn, full=True)
+    if plan_backend == "sqlite":
+        cur.execute("ANALYZE")
+    else:
+        cur.execute("ANALYZE TABLE tickets, trips, passengers, routes, stops, buses, drivers, path, waitlist, ticket_log")
+        cur.fetchall()
+    conn.commit()
+    yield conn, cur
+    if plan_backend == "mysql":
+        cur.execute(f"DROP DATABASE IF EXISTS `{config.DB_CONFIG['database']}`")
+        config.DB_CONFIG["database"] = live_database
+    cur.close()
+    conn.close()
+
+
+_test_buses = itertools.count(1)
+
+
+@pytest.fixture
+def open_trip(dataset_db):
+    """(trip_id, boarding_stop_id, dropping_stop_id) of a new trip tomorrow on a
+    3-seat bus (seats A1-A3), open for booking on the dataset database"""
+    conn, cur = dataset_db
+    cur.execute("SELECT route_id, stop_id FROM route_stops "
+                "WHERE route_id = (SELECT MIN(route_id) FROM route_stops) ORDER BY stop_order")
+    stops = cur.fetchall()
+    cur.execute("INSERT INTO buses (bus_no, bus_name, type, capacity, route_id, ac, status) "
+                "VALUES (%s, 'Test', 'Regular', 3, %s, 0, 'active')", (f"TEST{next(_test_buses)}", stops[0]["route_id"]))
+    bus_id = cur.lastrowid
+    start = datetime.now().replace(microsecond=0) + timedelta(days=1)
+    cur.execute("INSERT INTO trips (route_id, bus_id, start_time, end_time, frequency, status) "
+                "VALUES (%s, %s, %s, %s, 'once', 'scheduled')",
+                (stops[0]["route_id"], bus_id, start, start + timedelta(minutes=50)))
+    trip_id = cur.lastrowid
+    conn.commit()
+    return trip_id, stops[0]["stop_id"], stops[-1]["stop_id"]
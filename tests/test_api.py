@@ -0,0 +1,36 @@
+"""
+API argument handling: an explicit 0 is validated, not replaced by the default.
+"""
+
+import asyncio
+
+import pytest
+
+from transport import api
+
+
+class FakeServer:
+    async def run(self, fn, *args):
+        return args
+
+
+def _call(handler, target):
+    return asyncio.run(handler(FakeServer(), api.Request("GET", target, "HTTP/1.1", {}, b"")))
+
+
+@pytest.mark.parametrize("handler, target", [
+    (api.tickets_by_contact, "/tickets?contact_no=9876543210&limit=0"),
+    (api.nearest_stops, "/stops/nearest?lat=12.97&lon=77.59&k=0"),
+    (api.stops_within, "/stops/within?lat=12.97&lon=77.59&radius_km=1&limit=0"),
+    (api.stops_within, "/stops/within?lat=12.97&lon=77.59&radius_km=1&limit=-3"),
+])
+def test_zero_is_rejected(handler, target):
+    with pytest.raises(api.HTTPError) as exc:
+        _call(handler, target)
+    assert exc.value.status == 400
+
+
+def test_defaults_and_upper_clamp():
+    assert _call(api.nearest_stops, "/stops/nearest?lat=12.97&lon=77.59") == (200, (12.97, 77.59, 5))
+    _, args = _call(api.stops_within, "/stops/within?lat=12.97&lon=77.59&radius_km=1&limit=9999")
+    assert args[-1] == api.MAX_WITHIN
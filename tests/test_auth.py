@@ -0,0 +1,35 @@
+"""
+Credential cache: a cached login outlives a password change until it is
+forgotten or expires. Registration: a taken username is reported, not raised.
+"""
+
+import time
+
+from transport.auth import CredentialCache
+
+USER = {"user_id": 1, "username": "admin", "role": "admin"}
+
+
+def test_old_password_hits_until_forgotten():
+    cache = CredentialCache()
+    cache.put("admin", "old", USER)
+    # the password changed in the database: the cache does not know
+    assert cache.get("admin", "old") == USER and cache.get("admin", "new") is None
+    cache.forget_user("admin")
+    assert cache.get("admin", "old") is None
+
+
+def test_entries_expire():
+    cache = CredentialCache(ttl=0.01)
+    cache.put("admin", "old", USER)
+    time.sleep(0.02)
+    assert cache.get("admin", "old") is None
+
+
+def test_register_user_on_sqlite(dataset_db):
+    from transport import crud
+
+    assert crud.register_user("newclerk", "s3cret-pass") == (True, "User created.")
+    assert crud.register_user("newclerk", "other-pass") == (False, "Username already exists.")
+    assert crud.authenticate("newclerk", "s3cret-pass")["role"] == "operator"
+    assert crud.authenticate("newclerk", "other-pass") is None
@@ -0,0 +1,75 @@
+"""
+Booking: the ticket keeps the fare the rider was quoted; optimistic booking
+moves past a seat taken meanwhile, refuses a sold-out trip and recounts a
+counter that drifted from the tickets.
+"""
+
+import pytest
+
+from transport import crud, seat_inventory
+
+
+def _book(open_trip, seat_no, contact_no="9111111111", **kwargs):
+    trip_id, boarding, dropping = open_trip
+    return crud.book_ticket(trip_id, boarding, dropping, seat_no, "Rider", contact_no, **kwargs)
+
+
+def _stored_fare(dataset_db, ticket_id):
+    conn, cur = dataset_db
+    cur.execute("SELECT fare FROM tickets WHERE ticket_id = %s", (ticket_id,))
+    return float(cur.fetchone()["fare"])
+
+
+def test_quoted_fare_is_the_fare_booked(dataset_db, open_trip):
+    ticket = _book(open_trip, "A1", fare=27.0)
+    assert ticket["fare"] == 27.0 and _stored_fare(dataset_db, ticket["ticket_id"]) == 27.0
+
+
+def test_fare_is_calculated_without_a_quote(dataset_db, open_trip):
+    ticket = _book(open_trip, "A2")
+    assert 25 <= ticket["fare"] <= 45 and _stored_fare(dataset_db, ticket["ticket_id"]) == ticket["fare"]
+
+
+def _remaining(dataset_db, trip_id):
+    conn, cur = dataset_db
+    cur.execute("SELECT remaining FROM trip_inventory WHERE trip_id = %s", (trip_id,))
+    return cur.fetchone()["remaining"]
+
+
+def _stale_seat_map(monkeypatch, open_trip):
+    """Book from the seat map as it is now, whatever is booked later"""
+    stale = crud.load_seat_map(open_trip[0])
+    monkeypatch.setattr(crud, "load_seat_map", lambda trip_id: stale)
+    monkeypatch.setattr(seat_inventory, "candidates", lambda free: list(free))
+
+
+def test_seat_taken_meanwhile_moves_to_the_next_candidate(dataset_db, open_trip, monkeypatch):
+    _stale_seat_map(monkeypatch, open_trip)
+    assert _book(open_trip, "A1", contact_no="9111111121")["seat_no"] == "A1"
+    # A1 still looks free: the unique seat index turns the rider to A2
+    ticket = _book(open_trip, None, contact_no="9111111122")
+    assert ticket["seat_no"] == "A2" and _remaining(dataset_db, open_trip[0]) == 1
+
+
+def test_sold_out_trip_is_refused(dataset_db, open_trip, monkeypatch):
+    empty = crud.load_seat_map(open_trip[0])
+    for i, seat in enumerate(("A1", "A2", "A3")):
+        _book(open_trip, seat, contact_no=f"911111113{i}")
+    with pytest.raises(crud.BookingError, match="sold out"):
+        _book(open_trip, None, contact_no="9111111135")
+    # a stale seat map still shows free seats: the counter refuses, and so does its recount
+    monkeypatch.setattr(crud, "load_seat_map", lambda trip_id: empty)
+    with pytest.raises(crud.BookingError, match="sold out"):
+        _book(open_trip, None, contact_no="9111111136")
+    assert _remaining(dataset_db, open_trip[0]) == 0
+
+
+def test_drifted_counter_is_recounted(dataset_db, open_trip):
+    conn, cur = dataset_db
+    trip_id = open_trip[0]
+    _book(open_trip, "A1", contact_no="9111111141")
+    cur.execute("UPDATE trip_inventory SET remaining = 0 WHERE trip_id = %s", (trip_id,))
+    conn.commit()
+    # two seats are free, the counter says none: the booking recounts and goes through
+    assert _book(open_trip, None, contact_no="9111111142")["seat_no"] in ("A2", "A3")
+    assert _remaining(dataset_db, trip_id) == 1
@@ -0,0 +1,111 @@
+"""
+Bulk loader: the sample data in a handful of statements, natural-key
+resolution (composite keys, rows loaded earlier) and all-or-nothing errors.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from transport import backends, bulk_loader, config, reporting, seat_inventory
+from transport.bulk_loader import LoadError, batch, col
+from transport.schema import TABLES_DDL, sample_batches
+
+
+@pytest.fixture
+def empty_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_BACKEND", "sqlite")
+    backend = backends.get()
+    conn = backend.connect(overrides={"path": str(tmp_path / "load.sqlite3")})
+    cur = conn.cursor(dictionary=True)
+    backend.create_schema(conn, cur, TABLES_DDL + reporting.REPORT_TABLES_DDL)
+    seat_inventory.ensure_unique_index(cur, backend.live_indexes(conn))
+    conn.commit()
+    yield conn, cur
+    cur.close()
+    conn.close()
+
+
+def _count(cur, table):
+    cur.execute(f"SELECT COUNT(*) AS n FROM {table}")
+    return cur.fetchone()["n"]
+
+
+def test_sample_data_round_trips(empty_db):
+    conn, cur = empty_db
+    now = datetime(2026, 10, 19, 12, 0)
+    batches = sample_batches(now)
+    report = bulk_loader.load(conn, batches)
+    assert report.tables == {b.table: len(b.rows) for b in batches}
+    # one INSERT per batch plus one id SELECT per referenced table
+    referenced = {c.ref for b in batches for c in b.columns if c.ref}
+    assert report.statements == len(batches) + len(referenced)
+    assert all(_count(cur, b.table) == len(b.rows) for b in batches)
+    # the sample tickets sit on the next trip to leave (R3 at 14:00)
+    cur.execute("SELECT DISTINCT b.bus_no, t.start_time FROM tickets tk JOIN trips t ON tk.trip_id = t.trip_id "
+                "JOIN buses b ON t.bus_id = b.bus_id")
+    assert cur.fetchall() == [{"bus_no": "BUS103", "start_time": datetime(2026, 10, 19, 14, 0)}]
+    cur.execute("SELECT s.stop_name FROM route_stops rs JOIN routes r ON rs.route_id = r.route_id "
+                "JOIN stops s ON rs.stop_id = s.stop_id WHERE r.route_name = %s ORDER BY rs.stop_order",
+                ("R2 Central-University",))
+    assert [r["stop_name"] for r in cur.fetchall()] == ["Central Station", "North Square", "University"]
+
+
+def test_composite_key_and_earlier_rows(empty_db):
+    conn, cur = empty_db
+    cur.executemany("INSERT INTO stops (stop_name, location) VALUES (%s, %s)", [("A", ""), ("B", "")])
+    loader = bulk_loader.BulkLoader(cur, chunk_size=2, keys={"stops": "stop_name"})
+    loader.load(batch("routes", [col("route_name"), col("distance_km", float)], [("R", "4.5")], key="route_name"))
+    loader.load(batch("buses", [col("bus_no"), col("route_id", ref="routes"), col("capacity", int)],
+                      [("X1", "R", "40"), ("X2", None, 30)], key="bus_no"))
+    start = datetime(2026, 10, 20, 9, 0)
+    loader.load(batch("trips", [col("route_id", ref="routes"), col("bus_id", ref="buses"),
+                                col("start_time", datetime)],
+                      [("R", "X1", start), ("R", "X2", start), ("R", "X1", start.replace(hour=10))],
+                      key=("bus_id", "start_time")))
+    loader.load(batch("route_stops", [col("route_id", ref="routes"), col("stop_order", int),
+                                      col("stop_id", ref="stops")], [("R", 1, "A"), ("R", 2, "B"), ("R", 3, "A")]))
+    conn.commit()
+    trip_id = loader.id("trips", ("X2", start))
+    cur.execute("SELECT trip_id FROM trips t JOIN buses b ON t.bus_id = b.bus_id WHERE b.bus_no = 'X2'")
+    assert cur.fetchone()["trip_id"] == trip_id
+    cur.execute("SELECT capacity, route_id FROM buses WHERE bus_no = 'X2'")
+    assert cur.fetchone() == {"capacity": 30, "route_id": None}
+    # INSERTs in chunks of two (1 + 1 + 2 + 2), one id SELECT each for routes, buses, stops and trips
+    assert loader.report().tables["trips"] == 3 and loader.statements == 6 + 4
+
+
+def test_unique_indexes_still_enforced(empty_db):
+    conn, cur = empty_db
+    batches = sample_batches(datetime(2026, 10, 19, 12, 0))
+    tickets = next(b for b in batches if b.table == "tickets")
+    # a second ticket for a seat already sold: no key= on tickets, so only uq_tickets_trip_seat catches it
+    double = tickets._replace(rows=tickets.rows + [tickets.rows[0][:1] + ("7777777777",) + tickets.rows[0][2:]])
+    with pytest.raises(Exception) as exc:
+        bulk_loader.load(conn, [b if b is not tickets else double for b in batches], relax_checks=True)
+    assert backends.get().is_duplicate(exc.value)
+    assert _count(cur, "tickets") == 0 and _count(cur, "stops") == 0
+
+
+def test_errors_write_nothing(empty_db):
+    conn, cur = empty_db
+    good = batch("routes", [col("route_name")], [("R",)], key="route_name")
+    bad = [
+        batch("buses", [col("bus_no"), col("route_id", ref="routes")], [("X1", "No Such Route")]),
+        batch("buses", [col("bus_no"), col("capacity", int)], [("X1", "forty")]),
+        batch("buses", [col("bus_no")], [("X1",), ("X1",)], key="bus_no"),
+        batch("buses", [col("bus_no"), col("route_id", ref="drivers")], [("X1", "LIC1")]),
+        batch("buses", [col("bus_no"), col("capacity", int)], [("X1",)]),
+    ]
+    for b in bad:
+        with pytest.raises(LoadError):
+            bulk_loader.load(conn, [good, b])
+        assert _count(cur, "routes") == 0 and _count(cur, "buses") == 0
+
+
+def test_reset_keeps_existing_users():
+    from transport.config import DEMO_USERS
+
+    kept = DEMO_USERS[0][0]
+    users = next(b for b in sample_batches(datetime(2026, 10, 19, 12, 0), {kept}) if b.table == "users")
+    assert [u[0] for u in users.rows] == [u[0] for u in DEMO_USERS[1:]]
@@ -0,0 +1,16 @@
+"""
+transport-admin argument checks: a bulk update-where without a filter is
+refused by the parser, before anything touches the database.
+"""
+
+import pytest
+
+from transport import cli
+
+
+def test_update_where_needs_a_filter(capsys, monkeypatch):
+    monkeypatch.setattr(cli, "cmd_bulk", lambda args: pytest.fail("ran without a filter"))
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["bulk", "update-where", "trips", "status=cancelled"])
+    assert exc.value.code == 2
+    assert "needs --where and/or --day" in capsys.readouterr().err
@@ -0,0 +1,55 @@
+"""
+Connection pool: connections are pinged only after sitting idle, and dropped
+when an error leaves them unusable.
+"""
+
+import pytest
+
+from transport.db_pool import ConnectionPool
+
+
+class FakeConn:
+    def __init__(self):
+        self.pings = 0
+        self.alive = True
+        self.closed = False
+
+    def is_connected(self):
+        self.pings += 1
+        return self.alive
+
+    def rollback(self):
+        if not self.alive:
+            raise ConnectionError("server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+def test_recently_used_connection_is_not_pinged():
+    pool = ConnectionPool(FakeConn, size=1, ping_after=60)
+    for _ in range(3):
+        with pool.connection() as conn:
+            pass
+    assert conn.pings == 0
+
+
+def test_idle_connection_is_pinged_and_replaced_when_dead():
+    pool = ConnectionPool(FakeConn, size=1, ping_after=0)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as conn:
+        assert conn is first and first.pings == 1
+    first.alive = False
+    with pool.connection() as conn:
+        assert conn is not first and first.closed
+
+
+def test_connection_broken_by_an_error_is_discarded():
+    pool = ConnectionPool(FakeConn, size=1, ping_after=60)
+    with pytest.raises(ConnectionError):
+        with pool.connection() as first:
+            first.alive = False
+            raise ConnectionError("lost connection during query")
+    with pool.connection() as conn:
+        assert conn is not first and first.closed
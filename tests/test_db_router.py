@@ -0,0 +1,50 @@
+"""
+Replica routing: a busy replica is passed over for one read, a broken one
+is taken out of rotation.
+"""
+
+from contextlib import contextmanager
+
+from transport.db_pool import PoolTimeout
+from transport.db_router import ReplicaSet
+
+
+class FakePool:
+    def __init__(self, name, error=None):
+        self.name = name
+        self.error = error
+
+    def acquire(self, timeout=None):
+        if self.error:
+            raise self.error
+        return self.name
+
+    def release(self, conn, discard=False):
+        pass
+
+    @contextmanager
+    def connection(self):
+        yield self.name
+
+
+def _read(replicas):
+    with replicas.connection(FakePool("primary")) as conn:
+        return conn
+
+
+def test_busy_replica_stays_in_rotation():
+    busy = FakePool("replica", PoolTimeout("busy"))
+    replicas = ReplicaSet([busy])
+    assert _read(replicas) == "primary"
+    busy.error = None
+    assert _read(replicas) == "replica"
+    assert replicas.stats["busy"] == 1 and replicas.stats["failovers"] == 0
+
+
+def test_broken_replica_cools_down():
+    broken = FakePool("replica", ConnectionError("refused"))
+    replicas = ReplicaSet([broken], cooldown=60)
+    assert _read(replicas) == "primary"
+    broken.error = None
+    assert _read(replicas) == "primary"       # still cooling down
+    assert replicas.stats["failovers"] == 1
@@ -0,0 +1,26 @@
+"""
+Running occupancy with incomplete counts: a stop where more people get off
+than were counted on does not drag the later stops below their real load.
+"""
+
+from datetime import datetime, timedelta
+
+from transport import demand_analytics
+
+
+def _rows(trip_id, counts):
+    start = datetime(2026, 10, 19, 8, 0)
+    return [{"path_id": trip_id * 100 + i, "trip_id": trip_id, "route_id": 1, "stop_id": i,
+             "arrival_time": start + timedelta(minutes=5 * i), "departure_time": None,
+             "people_in": people_in, "people_out": people_out, "capacity": 40}
+            for i, (people_in, people_out) in enumerate(counts)]
+
+
+def test_occupancy_floored_at_each_stop():
+    # trip 1: 2 on, 5 off (3 were never counted), then 10 on, 4 off
+    rows = _rows(1, [(2, 0), (0, 5), (10, 0), (0, 4)]) + _rows(2, [(5, 0), (3, 1), (0, 7)])
+    occ = demand_analytics.running_occupancy(demand_analytics.path_frame(rows))
+    assert occ[occ["trip_id"] == 1]["occupancy"].tolist() == [2, 0, 10, 6]
+    assert occ[occ["trip_id"] == 2]["occupancy"].tolist() == [5, 7, 0]
+    peaks = demand_analytics.trip_peaks(occ).set_index("trip_id")
+    assert peaks.loc[1, "peak_occupancy"] == 10 and peaks.loc[1, "peak_load_factor"] == 0.25
@@ -0,0 +1,151 @@
+"""
+Passenger identity: contact normalization, upsert (including losing the
+insert race) and the duplicate merge job across chunk boundaries.
+"""
+
+import pytest
+
+from transport import backends, config, passenger_identity
+from transport.passenger_identity import merge_duplicates, normalize_contact, upsert
+from transport.schema import TABLES_DDL
+
+
+@pytest.fixture
+def empty_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_BACKEND", "sqlite")
+    backend = backends.get()
+    conn = backend.connect(overrides={"path": str(tmp_path / "identity.sqlite3")})
+    cur = conn.cursor(dictionary=True)
+    backend.create_schema(conn, cur, TABLES_DDL)
+    conn.commit()
+    yield conn, cur
+    cur.close()
+    conn.close()
+
+
+def _passenger(cur, contact_no, email="", address=""):
+    cur.execute("INSERT INTO passengers (name, address, contact_no, email_id) VALUES (%s, %s, %s, %s)",
+                ("Rider", address, contact_no, email))
+    return cur.lastrowid
+
+
+def _ticket(cur, passenger_id, seat_no):
+    cur.execute("INSERT INTO tickets (passenger_id, seat_no, fare) VALUES (%s, %s, 20)", (passenger_id, seat_no))
+
+
+def _rows(cur):
+    cur.execute("SELECT passenger_id, contact_key, email_id, address FROM passengers ORDER BY passenger_id")
+    return cur.fetchall()
+
+
+def _indexes(conn):
+    return backends.get().live_indexes(conn)
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("9876543210", "9876543210"),
+    ("+91 98765-43210", "9876543210"),
+    ("09876543210", "9876543210"),
+    ("0091 9876543210", "9876543210"),
+    ("091-9876543210", "9876543210"),
+    ("44 9876543210", "449876543210"),    # not a national prefix: kept
+    ("98765", "98765"),                   # short numbers are left as they are
+    ("n/a", None),
+    (None, None),
+])
+def test_normalize_contact(raw, key):
+    assert normalize_contact(raw) == key
+
+
+@pytest.fixture
+def duplicates(empty_db):
+    """Three riders spread over two chunks of three rows, plus one with no number"""
+    conn, cur = empty_db
+    a1 = _passenger(cur, "9000000001")
+    b1 = _passenger(cur, "9000000002", email="b@example.com")
+    _passenger(cur, "unknown")
+    a2 = _passenger(cur, "+91 90000 00001", email="a@example.com", address="Main St")   # second chunk
+    b2 = _passenger(cur, "09000000002", address="Park Rd")
+    a3 = _passenger(cur, "09000000001", email="other@example.com")
+    c1 = _passenger(cur, "9000000003")
+    for i, pid in enumerate((a1, a2, a3, a3, b2)):
+        _ticket(cur, pid, f"S{i}")
+    conn.commit()
+    return conn, cur, {"a": a1, "b": b1, "c": c1}
+
+
+def test_dry_run_counts_without_writing(duplicates):
+    conn, cur, _ = duplicates
+    before = _rows(cur)
+    report = merge_duplicates(conn, _indexes(conn), chunk_size=3, dry_run=True)
+    assert (report.passengers_before, report.passengers_after) == (7, 4)
+    assert (report.contacts_merged, report.rows_merged, report.tickets_repointed) == (2, 3, 4)
+    assert report.keys_backfilled == 3 and report.chunks == 3 and not report.index_created
+    assert _rows(cur) == before
+
+
+def test_merge_across_chunks_backfills_and_is_idempotent(duplicates):
+    conn, cur, ids = duplicates
+    report = merge_duplicates(conn, _indexes(conn), chunk_size=3)
+    assert (report.passengers_after, report.rows_merged, report.tickets_repointed) == (4, 3, 4)
+    assert report.index_created
+    survivors = {r["contact_key"]: r for r in _rows(cur)}
+    assert set(survivors) == {"9000000001", "9000000002", "9000000003", None}
+    a, b = survivors["9000000001"], survivors["9000000002"]
+    assert a["passenger_id"] == ids["a"] and b["passenger_id"] == ids["b"]
+    # blanks taken from the first duplicate that has them; a set email is kept
+    assert (a["email_id"], a["address"]) == ("a@example.com", "Main St")
+    assert (b["email_id"], b["address"]) == ("b@example.com", "Park Rd")
+    cur.execute("SELECT passenger_id, COUNT(*) AS n FROM tickets GROUP BY passenger_id")
+    assert {r["passenger_id"]: r["n"] for r in cur.fetchall()} == {ids["a"]: 4, ids["b"]: 1}
+    assert passenger_identity.has_unique_index(_indexes(conn))
+
+    again = merge_duplicates(conn, _indexes(conn), chunk_size=3)
+    assert (again.rows_merged, again.tickets_repointed, again.keys_backfilled) == (0, 0, 0)
+    assert again.passengers_after == 4 and not again.index_created
+
+
+def test_upsert_reuses_contact_and_fills_email(empty_db):
+    conn, cur = empty_db
+    merge_duplicates(conn, _indexes(conn))     # creates the unique index
+    first = upsert(cur, "Rider", "", "9876543210", "")
+    assert upsert(cur, "Rider", "", "+91 98765 43210", "r@example.com") == first
+    assert upsert(cur, "Rider", "", "0 98765 43210", "new@example.com") == first
+    assert [(r["contact_key"], r["email_id"]) for r in _rows(cur)] == [("9876543210", "r@example.com")]
+    # no digits: always a new row
+    assert upsert(cur, "Walk-in", "", "", "") != upsert(cur, "Walk-in", "", "", "")
+
+
+class LateCursor:
+    """Cursor whose first lookup misses a passenger another booking inserts right after it."""
+
+    def __init__(self, cur, insert_rival):
+        self.cur = cur
+        self.insert_rival = insert_rival
+        self.missing = False
+
+    def execute(self, sql, params=()):
+        self.cur.execute(sql, params)
+        if sql == passenger_identity.FIND_SQL and self.insert_rival:
+            self.insert_rival()
+            self.insert_rival, self.missing = None, True
+
+    def fetchone(self):
+        if self.missing:
+            self.missing = False
+            return None
+        return self.cur.fetchone()
+
+    def __getattr__(self, name):
+        return getattr(self.cur, name)
+
+
+def test_upsert_race_returns_the_winner(empty_db):
+    conn, cur = empty_db
+    merge_duplicates(conn, _indexes(conn))
+    rival = []
+    rival_cur = conn.cursor(dictionary=True)
+    late = LateCursor(cur, lambda: rival.append(upsert(rival_cur, "Rival", "", "9123456789", "")))
+    winner = upsert(late, "Rider", "", "+91 91234 56789", "late@example.com")
+    assert rival and winner == rival[0]
+    assert [(r["contact_key"], r["email_id"]) for r in _rows(cur)] == [("9123456789", "late@example.com")]
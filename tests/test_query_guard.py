@@ -0,0 +1,54 @@
+"""
+Query classes: which class a call runs under, deadlines armed per statement
+(not per checkout), and checkouts without a deadline.
+"""
+
+import time
+
+from transport import api, config, db
+from transport.query_guard import current_class, workload
+
+
+def test_api_calls_default_to_public():
+    assert api._public(current_class) == "public"
+    # writes set their own class inside, whatever the caller's
+    assert api._public(workload("booking")(current_class)) == "booking"
+
+
+def test_maintenance_checkout_has_no_deadline(dataset_db):
+    from transport.db import get_conn, get_watchdog
+
+    watchdog = get_watchdog()
+    with get_conn(query_class="staff") as (conn, cur):
+        cur.execute("SELECT 1 AS n")
+        armed = len(watchdog._heap)
+    assert armed >= 1
+    with get_conn(query_class="maintenance") as (conn, cur):
+        assert len(watchdog._heap) <= armed          # nothing new armed
+        cur.execute("SELECT COUNT(*) AS n FROM tickets")
+        assert cur.fetchone()["n"] > 0
+
+
+def test_deadline_covers_statements_not_the_checkout(dataset_db, monkeypatch):
+    monkeypatch.setitem(config.QUERY_CLASSES, "staff", (0.05, 6, 5))
+    monkeypatch.setattr(db, "CANCEL_GRACE_SECONDS", 0)
+    cancelled = db.get_watchdog().cancelled
+    with db.get_conn(query_class="staff") as (conn, cur):
+        cur.execute("SELECT COUNT(*) AS n FROM tickets")
+        time.sleep(0.2)                             # e.g. writing an export: not the database's time
+        cur.execute("SELECT COUNT(*) AS n FROM stops")
+        other = conn.cursor(dictionary=True)        # cursors handed to bulk helpers are guarded too
+        other.execute("SELECT COUNT(*) AS n FROM routes")
+        assert other.fetchone()["n"] > 0 and cur.fetchone()["n"] > 0
+        other.close()
+    assert db.get_watchdog().cancelled == cancelled
+
+
+def test_concurrent_fetch_is_admitted_under_the_callers_class(dataset_db):
+    admission = db.get_admission()
+    before = admission.stats()["report"]["admitted"]
+    with workload("report"):
+        rows = db.fetch_all_concurrent({"stops": ("SELECT COUNT(*) AS n FROM stops", None),
+                                        "routes": ("SELECT COUNT(*) AS n FROM routes", None)})
+    assert rows["stops"][0]["n"] > 0 and rows["routes"][0]["n"] > 0
+    assert admission.stats()["report"]["admitted"] == before + 2
@@ -0,0 +1,91 @@
+"""
+Plan regression suite: every registered query (transport.queries) is run
+and EXPLAINed on the generated dataset, and its plan compared with
+tests/plan_baselines/<backend>.json. A failure lists what got worse (a
+table dropping to a full scan, a new filesort, ...). When a change is
+intended, re-record with `pytest tests --update-plan-baselines` and commit
+the baseline diff along with it.
+"""
+
+import os
+import re
+
+import pytest
+
+from transport import queries, query_plans
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plan_baselines")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a SELECT written inline at a fetch_all() or cur.execute() call instead of registered
+INLINE_SELECT = re.compile(r"(fetch_all|\.execute)\(\s*f?(\"\"\"|\"|')\s*SELECT", re.I)
+
+
+def test_query_names_are_unique():
+    names = [q.name for q in queries.all_queries()]
+    assert len(names) == len(set(names))
+
+
+def test_script_queries_are_registered():
+    names = {q.name for q in queries.script_queries()}
+    assert {"script_get_trip_revenue", "script_nested_query", "script_join_query",
+            "script_aggregate_query"} <= names
+
+
+def _inline_selects(source):
+    return [source.count("\n", 0, m.start()) + 1 for m in INLINE_SELECT.finditer(source)]
+
+
+def test_page_sql_is_registered():
+    with open(os.path.join(ROOT, "app.py"), encoding="utf-8") as f:
+        inline = _inline_selects(f.read())
+    assert not inline, f"app.py: move the SELECT at line(s) {inline} into transport/queries.py"
+
+
+@pytest.mark.parametrize("module", ["crud", "waitlist"])
+def test_module_sql_is_registered(module):
+    with open(os.path.join(ROOT, "transport", f"{module}.py"), encoding="utf-8") as f:
+        inline = _inline_selects(f.read())
+    assert not inline, f"{module}.py: move the SELECT at line(s) {inline} into a registered constant"
+
+
+def test_every_query_runs(dataset_db):
+    conn, cur = dataset_db
+    for q in queries.all_queries():
+        cur.execute(q.sql, q.params)
+        cur.fetchall()
+
+
+def test_plans_match_baselines(dataset_db, plan_backend, request):
+    conn, cur = dataset_db
+    current = query_plans.capture(cur, queries.all_queries())
+    path = query_plans.baseline_path(BASELINES, plan_backend)
+    if request.config.getoption("--update-plan-baselines"):
+        query_plans.save_baselines(path, current)
+        pytest.skip(f"recorded {len(current)} plans in {path}")
+    baseline = query_plans.load_baselines(path)
+    assert baseline, f"no baselines in {path}: run pytest with --update-plan-baselines"
+    problems = query_plans.compare(baseline, current)
+    moved = sorted({p.split(":")[0] for p in problems} & current.keys())
+    assert not problems, "query plans regressed:\n  " + "\n  ".join(
+        problems + [f"{name} now: {query_plans.describe(current[name])}" for name in moved])
+
+
+def _plan(*tables, filesort=False, temporary=False, rows=None):
+    return {"tables": [{"table": t, "access": a, "key": k, "rows": rows} for t, a, k in tables],
+            "filesort": filesort, "temporary": temporary}
+
+
+def test_compare_flags_regressions():
+    base = {"q": _plan(("t", "ref", "idx_t"), ("p", "eq_ref", "PRIMARY"), rows=50)}
+    assert query_plans.compare(base, base) == []
+    assert query_plans.compare(base, {"q": _plan(("t", "ref", "idx_t"), ("p", "const", "PRIMARY"), rows=50)}) == []
+    scan = query_plans.compare(base, {"q": _plan(("t", "ALL", None), ("p", "eq_ref", "PRIMARY"), rows=50)})
+    assert scan == ["q: t access ref (idx_t) -> ALL (None)"]
+    sort = query_plans.compare(base, {"q": _plan(("t", "ref", "idx_t"), ("p", "eq_ref", "PRIMARY"),
+                                                 rows=50, filesort=True)})
+    assert sort == ["q: now uses a filesort"]
+    grown = query_plans.compare(base, {"q": _plan(("t", "ref", "idx_t"), ("p", "eq_ref", "PRIMARY"), rows=5000)})
+    assert len(grown) == 2 and all("row estimate" in p for p in grown)
+    assert query_plans.compare(base, {}) == ["q: in the baseline but no longer registered"]
+    assert query_plans.compare({}, base) == ["q: no baseline plan (record one)"]
@@ -0,0 +1,78 @@
+"""
+Report refresh: tickets are followed by ticket_id, and one committed late
+below the high-water mark is counted exactly once.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from transport import backends, config, reporting
+from transport.schema import TABLES_DDL
+
+START = datetime(2026, 10, 20, 9, 0)
+
+
+@pytest.fixture
+def report_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_BACKEND", "sqlite")
+    backend = backends.get()
+    conn = backend.connect(overrides={"path": str(tmp_path / "reports.sqlite3")})
+    cur = conn.cursor(dictionary=True)
+    backend.create_schema(conn, cur, TABLES_DDL + reporting.REPORT_TABLES_DDL)
+    cur.execute("INSERT INTO routes (route_id, route_name) VALUES (1, 'R1')")
+    cur.execute("INSERT INTO trips (trip_id, route_id, start_time, end_time, status) VALUES (1, 1, %s, %s, 'scheduled')",
+                (START, START.replace(hour=10)))
+    conn.commit()
+    yield conn, cur
+    cur.close()
+    conn.close()
+
+
+def _sell(conn, cur, *ticket_ids):
+    cur.executemany("INSERT INTO tickets (ticket_id, trip_id, seat_no, fare) VALUES (%s, 1, %s, 10)",
+                    [(i, f"S{i}") for i in ticket_ids])
+    conn.commit()
+
+
+def _reported(cur):
+    cur.execute("SELECT COALESCE(SUM(tickets), 0) AS n, COALESCE(SUM(revenue), 0) AS revenue FROM report_revenue_daily")
+    row = cur.fetchone()
+    return row["n"], float(row["revenue"])
+
+
+def test_late_commit_below_the_mark_is_counted_once(report_db):
+    conn, cur = report_db
+    _sell(conn, cur, 1, 2, 4)                  # ticket 3 is still being booked
+    assert reporting.refresh_reports(conn)["pending"] == 1
+    assert _reported(cur) == (3, 30.0)
+    _sell(conn, cur, 3, 5)                     # 3 commits after the refresh read past it
+    stats = reporting.refresh_reports(conn)
+    assert stats["mode"] == "incremental" and stats["pending"] == 0
+    assert _reported(cur) == (5, 50.0)
+    reporting.refresh_reports(conn)
+    assert _reported(cur) == (5, 50.0)
+    reporting.refresh_reports(conn, full=True)
+    assert _reported(cur) == (5, 50.0)
+
+
+def test_deleted_ticket_recomputes_its_day(report_db):
+    conn, cur = report_db
+    _sell(conn, cur, 1, 2, 3)
+    reporting.refresh_reports(conn)
+    cur.execute("DELETE FROM tickets WHERE ticket_id = 2")
+    conn.commit()
+    _sell(conn, cur, 4)
+    stats = reporting.refresh_reports(conn)
+    assert stats["dirty_days"] == 1 and _reported(cur) == (3, 30.0)
+
+
+def test_old_state_table_gets_the_new_columns(report_db):
+    conn, cur = report_db
+    live = {"report_refresh_state": {"id", "ticket_high_water", "log_high_water", "refreshed_at"}}
+    cur.execute("DROP TABLE report_refresh_state")
+    cur.execute("CREATE TABLE report_refresh_state (id INT PRIMARY KEY, ticket_high_water DATETIME, "
+                "log_high_water INT, refreshed_at DATETIME, last_duration_ms INT)")
+    assert reporting.ensure_schema(cur, live)
+    _sell(conn, cur, 1)
+    assert reporting.refresh_reports(conn)["mode"] == "full" and _reported(cur) == (1, 10.0)
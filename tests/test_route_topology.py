@@ -0,0 +1,29 @@
+"""
+Route topology cache: loaded once, reloaded after invalidate() or once it
+is older than max_age (writes made by another process).
+"""
+
+import time
+
+from transport.route_topology import RouteTopologyCache
+
+ROWS = [{"route_id": 1, "stop_order": i, "stop_id": 10 + i, "stop_name": f"S{i}", "location": None,
+         "latitude": None, "longitude": None} for i in range(1, 4)]
+
+
+def test_reloaded_after_invalidate_or_max_age():
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return ROWS
+
+    cache = RouteTopologyCache(max_age=0.05)
+    first = cache.get(fetch)
+    assert cache.get(fetch) is first and cache.loads == 1
+    assert first.is_forward(1, 11, 13) and not first.is_forward(1, 13, 11)
+    cache.invalidate()
+    assert cache.get(fetch) is not first and cache.loads == 2
+    time.sleep(0.06)
+    cache.get(fetch)
+    assert cache.loads == len(fetches) == 3
@@ -0,0 +1,72 @@
+"""
+Seat feed: the ticket_log poller skips exactly the rows this process
+published and resyncs trips for everything else.
+"""
+
+from transport.seat_feed import BOOKED, RELEASED, RESYNC, SeatFeed, TicketLogPoller
+
+
+class FakeLog:
+    """A connection whose ticket_log holds `rows` of (log_id, ticket_id, trip_id, action)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._result = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        if "MAX(log_id)" in sql:
+            self._result = [(0,)]
+        else:
+            self._result = [r for r in self.rows if r[0] > params[0]][:params[1]]
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+
+def _resynced(feed):
+    trips = []
+    feed.subscribe(lambda trip_id, kind, seat_no: kind == RESYNC and trips.append(trip_id))
+    return trips
+
+
+def test_poller_skips_only_rows_published_here():
+    feed = SeatFeed()
+    feed.publish(1, BOOKED, "A1", ticket_id=10, action="Ticket Issued")
+    feed.publish(2, RELEASED, "A2", ticket_id=11, action="Ticket Deleted")
+    resynced = _resynced(feed)
+    conn = FakeLog([(1, 10, 1, "Ticket Issued"),      # ours
+                    (2, 11, 2, "Ticket Deleted"),     # ours
+                    (3, 10, 1, "Ticket Updated"),     # the same ticket, changed elsewhere
+                    (4, 12, 3, "Ticket Issued")])     # someone else's booking
+    poller = TicketLogPoller(lambda: conn, feed)
+    poller.poll_once(conn)                            # first poll only takes the high-water mark
+    assert poller.poll_once(conn) == 4
+    assert sorted(resynced) == [1, 3]
+
+
+def test_each_publish_answers_for_one_row():
+    feed = SeatFeed()
+    feed.publish(1, BOOKED, "A1", ticket_id=10, action="Ticket Updated")
+    assert feed.published_here(10, "Ticket Updated")
+    assert not feed.published_here(10, "Ticket Updated")   # a second update came from elsewhere
+
+
+def test_local_events_are_bounded():
+    feed = SeatFeed()
+    feed.local_limit = 3
+    for ticket_id in range(5):
+        feed.publish(1, BOOKED, "A1", ticket_id=ticket_id, action="Ticket Issued")
+    assert not feed.published_here(0, "Ticket Issued")
+    assert all(feed.published_here(t, "Ticket Issued") for t in (2, 3, 4))
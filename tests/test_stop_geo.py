@@ -0,0 +1,96 @@
+"""
+Nearest-stop index against a brute-force haversine scan, and the CSV import.
+"""
+
+import random
+
+import pytest
+
+from transport import stop_geo
+from transport.stop_geo import StopIndex, haversine_km
+
+
+def _rows(n, rng):
+    # clustered like a city network, plus points near the poles and the antimeridian
+    rows = [{"stop_id": i, "stop_name": f"Stop {i}", "location": "", "latitude": 12.97 + rng.gauss(0, 0.05),
+             "longitude": 77.59 + rng.gauss(0, 0.05)} for i in range(n)]
+    for i, (lat, lon) in enumerate([(89.99, 0.0), (89.99, 180.0), (-0.1, 179.99), (0.1, -179.99)], start=n):
+        rows.append({"stop_id": i, "stop_name": f"Edge {i}", "location": "", "latitude": lat, "longitude": lon})
+    rows.append({"stop_id": -1, "stop_name": "Not geocoded", "location": "", "latitude": None, "longitude": None})
+    return rows
+
+
+def _scan(rows, lat, lon):
+    return sorted((round(haversine_km(lat, lon, r["latitude"], r["longitude"]), 3), r["stop_id"])
+                  for r in rows if r["latitude"] is not None)
+
+
+@pytest.fixture(scope="module")
+def stops():
+    rows = _rows(3000, random.Random(48))
+    return rows, StopIndex(rows)
+
+
+def test_nearest_matches_scan(stops):
+    rows, index = stops
+    assert len(index) == len(rows) - 1
+    rng = random.Random(1)
+    for _ in range(200):
+        lat, lon = 12.97 + rng.gauss(0, 0.08), 77.59 + rng.gauss(0, 0.08)
+        found = index.nearest(lat, lon, k=7)
+        assert [s["distance_km"] for s in found] == [d for d, _ in _scan(rows, lat, lon)[:7]]
+        assert [s["distance_km"] for s in found] == sorted(s["distance_km"] for s in found)
+
+
+def test_within_matches_scan(stops):
+    rows, index = stops
+    rng = random.Random(2)
+    for _ in range(100):
+        lat, lon, radius = 12.97 + rng.gauss(0, 0.08), 77.59 + rng.gauss(0, 0.08), rng.uniform(0.2, 3)
+        expected = [d for d, _ in _scan(rows, lat, lon) if d < radius]
+        found = [s["distance_km"] for s in index.within(lat, lon, radius)]
+        # a stop right on the circle may round either side of it
+        assert found[:len(expected) - 1] == expected[:-1] and abs(len(found) - len(expected)) <= 1
+    assert len(index.within(12.97, 77.59, 5, limit=10)) == 10
+    assert index.nearest(12.97, 77.59, k=3, max_km=0.0001) == []
+
+
+def test_poles_and_antimeridian(stops):
+    rows, index = stops
+    assert {s["stop_name"] for s in index.nearest(0.0, 180.0, k=2)} == {"Edge 3002", "Edge 3003"}
+    assert {s["stop_name"] for s in index.within(90.0, 90.0, 5)} == {"Edge 3000", "Edge 3001"}
+
+
+def test_empty_index():
+    index = StopIndex([])
+    assert index.nearest(0, 0) == [] and index.within(0, 0, 10) == []
+
+
+def test_route_km():
+    a = {"latitude": 12.9716, "longitude": 77.5946}
+    b = {"latitude": 12.9784, "longitude": 77.6408}
+    assert stop_geo.route_km([a, b, a]) == pytest.approx(2 * haversine_km(12.9716, 77.5946, 12.9784, 77.6408))
+    assert stop_geo.route_km([a, {"latitude": None, "longitude": None}]) is None
+
+
+def test_read_csv_aliases():
+    rows = list(stop_geo.read_csv(["Name,Lat,Lng", "Central Station,12.97,77.59", "Market,,"]))
+    assert rows == [{"stop_id": None, "stop_name": "Central Station", "latitude": "12.97", "longitude": "77.59"},
+                    {"stop_id": None, "stop_name": "Market", "latitude": None, "longitude": None}]
+    with pytest.raises(stop_geo.CoordinateError):
+        list(stop_geo.read_csv(["stop_name,location", "A,B"]))
+
+
+def test_import_coordinates_dry_run(dataset_db):
+    conn, cur = dataset_db
+    cur.execute("SELECT stop_id, stop_name FROM stops ORDER BY stop_id")
+    first, second = cur.fetchall()[:2]
+    lines = ["stop_id,stop_name,latitude,longitude",
+             f"{first['stop_id']},,1.5,2.5",
+             f",{second['stop_name']},3.5,4.5",
+             ",No Such Stop,1,1",
+             f"{first['stop_id']},,95,0"]
+    report = stop_geo.import_coordinates(conn, stop_geo.read_csv(lines), chunk_size=1, dry_run=True)
+    assert (report.rows, report.updated, report.unmatched, report.invalid) == (4, 2, 1, 1)
+    cur.execute("SELECT latitude FROM stops WHERE stop_id = %s", (first["stop_id"],))
+    assert cur.fetchone()["latitude"] != 1.5
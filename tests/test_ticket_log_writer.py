@@ -0,0 +1,73 @@
+"""
+Async ticket_log writer: the spool survives crashed replays and torn lines,
+and is retried once the database is back.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+from transport.ticket_log_writer import ACTION_ISSUED, TicketLogWriter
+
+
+class FakeDB:
+    """Connections whose executemany fails while `down` is set."""
+
+    def __init__(self):
+        self.rows = []
+        self.down = False
+
+    def connect(self):
+        return self
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, rows):
+        if self.down:
+            raise ConnectionError("database down")
+        self.rows.extend(rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _line(ticket_id):
+    return json.dumps([ticket_id, 1, "2026-10-19 08:00:00", ACTION_ISSUED]) + "\n"
+
+
+def test_replay_keeps_leftover_and_skips_torn_lines(tmp_path):
+    spool = str(tmp_path / "ticket_log.spool")
+    with open(spool + ".replay", "w") as f:          # a replay that crashed
+        f.write(_line(1) + _line(2))
+    with open(spool, "w") as f:                      # rows spooled since, the last one torn
+        f.write(_line(3) + _line(4)[:12])
+    db = FakeDB()
+    writer = TicketLogWriter(db.connect, spool_path=spool, flush_interval=0.01).start()
+    writer.stop()
+    assert [r[0] for r in db.rows] == [1, 2, 3]
+    assert writer.stats["bad_lines"] == 1 and open(spool + ".bad").read() == _line(4)[:12] + "\n"
+    assert not os.path.exists(spool) and not os.path.exists(spool + ".replay")
+
+
+def test_spool_retried_after_recovery(tmp_path):
+    db = FakeDB()
+    writer = TicketLogWriter(db.connect, spool_path=str(tmp_path / "s.spool"), flush_interval=0.01).start()
+    try:
+        db.down = True
+        writer.log(1, 1, ACTION_ISSUED)
+        deadline = time.monotonic() + 5
+        while writer.stats["spooled"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        db.down = False
+        writer.log(2, 1, ACTION_ISSUED)
+        while len(db.rows) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        writer.stop()
+    assert sorted(r[0] for r in db.rows) == [1, 2] and writer.stats["replayed"] == 1
+    assert isinstance(db.rows[0][2], datetime)
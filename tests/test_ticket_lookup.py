@@ -0,0 +1,103 @@
+"""
+"My Tickets" pages: keyset pagination, the shared page cache and its
+invalidation on booking, and the per-client rate limit.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from transport import ticket_lookup
+from transport.query_memo import TagVersions
+
+
+def _busiest_contact(cur):
+    cur.execute("SELECT p.passenger_id, p.contact_key, COUNT(*) AS n FROM tickets tk "
+                "JOIN passengers p ON tk.passenger_id = p.passenger_id "
+                "GROUP BY p.passenger_id, p.contact_key ORDER BY n DESC LIMIT 1")
+    return cur.fetchone()
+
+
+def _walk(cur, contact_key, limit):
+    pages, cursor = [], None
+    while True:
+        cur.execute(*ticket_lookup.page_query(contact_key, cursor, limit))
+        page = ticket_lookup.to_page(cur.fetchall(), limit)
+        pages.append(page.tickets)
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_ticket_once(dataset_db):
+    conn, cur = dataset_db
+    rider = _busiest_contact(cur)
+    pages = _walk(cur, rider["contact_key"], 2)
+    assert all(len(p) == 2 for p in pages[:-1]) and 1 <= len(pages[-1]) <= 2
+    walked = [(t["created_at"], t["ticket_id"]) for page in pages for t in page]
+    assert walked == sorted(walked, reverse=True)
+    cur.execute("SELECT ticket_id FROM tickets WHERE passenger_id = %s", (rider["passenger_id"],))
+    assert sorted(t for _, t in walked) == sorted(r["ticket_id"] for r in cur.fetchall())
+
+
+def test_cursor_round_trip():
+    ticket = {"created_at": datetime(2026, 10, 19, 7, 5, 9), "ticket_id": 42}
+    assert ticket_lookup.decode_cursor(ticket_lookup.encode_cursor(ticket)) == (ticket["created_at"], 42)
+    for bad in ("", "20261019", "x.1", None):
+        with pytest.raises(ticket_lookup.BadCursor):
+            ticket_lookup.decode_cursor(bad)
+
+
+def test_cache_invalidated_by_contact_tag_only():
+    versions = TagVersions()
+    cache = ticket_lookup.LookupCache(versions, max_entries=2)
+    loads = []
+    load = lambda: loads.append(1) or len(loads)
+    assert cache.get(("a", None, 20), ticket_lookup.lookup_tags("a"), load) == 1
+    assert cache.get(("a", None, 20), ticket_lookup.lookup_tags("a"), load) == 1
+    versions.bump(ticket_lookup.contact_tag("b"), "tickets")       # someone else's booking
+    assert cache.get(("a", None, 20), ticket_lookup.lookup_tags("a"), load) == 1
+    versions.bump(ticket_lookup.contact_tag("a"))
+    assert cache.get(("a", None, 20), ticket_lookup.lookup_tags("a"), load) == 2
+    versions.bump("routes")                                         # a renamed route shows on the page
+    assert cache.get(("a", None, 20), ticket_lookup.lookup_tags("a"), load) == 3
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 3}
+
+
+def test_booking_invalidates_shared_page(dataset_db):
+    from transport import crud
+
+    conn, cur = dataset_db
+    rider = _busiest_contact(cur)
+    cur.execute("SELECT trip_id, boarding_stop_id, dropping_stop_id FROM tickets WHERE passenger_id = %s LIMIT 1",
+                (rider["passenger_id"],))
+    ticket = cur.fetchone()
+    cache = crud.get_ticket_lookup_cache()
+    first = crud.lookup_tickets(rider["contact_key"], limit=100)
+    hits = cache.hits
+    assert crud.lookup_tickets("+91 " + rider["contact_key"], limit=100) is first     # any format, same entry
+    assert cache.hits == hits + 1
+    ticket_id = crud.add_ticket(ticket["trip_id"], rider["passenger_id"], ticket["boarding_stop_id"],
+                                ticket["dropping_stop_id"], "LOOKUP-1", 10, "other")
+    try:
+        again = crud.lookup_tickets(rider["contact_key"], limit=100)
+        assert ticket_id in {t["ticket_id"] for t in again.tickets}
+    finally:
+        crud.delete_ticket(ticket_id)
+    assert ticket_id not in {t["ticket_id"] for t in crud.lookup_tickets(rider["contact_key"], limit=100).tickets}
+
+
+def test_token_bucket_and_limiter():
+    now = [0.0]
+    bucket = ticket_lookup.TokenBucket(rate=2, burst=3, clock=lambda: now[0])
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == pytest.approx(0.5)
+    now[0] += 0.5
+    assert bucket.take() == 0
+
+    limiter = ticket_lookup.RateLimiter(rate=1, burst=1, max_clients=2, clock=lambda: now[0])
+    limiter.check("10.0.0.1")
+    with pytest.raises(ticket_lookup.RateLimited):
+        limiter.check("10.0.0.1")
+    limiter.check("10.0.0.2")                  # clients have their own buckets
+    assert limiter.limited == 1
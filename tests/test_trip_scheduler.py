@@ -0,0 +1,61 @@
+"""
+Trip scheduling: auto-assignment keeps only valid existing assignments, and
+trip updates are checked for double booking.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from transport.trip_scheduler import TripScheduler
+
+NINE = datetime(2026, 10, 19, 9, 0)
+
+
+def _trip(trip_id, hour, bus_id=None, driver_id=None):
+    start = NINE.replace(hour=hour)
+    return {"trip_id": trip_id, "route_id": 1, "start_time": start, "end_time": start + timedelta(hours=1),
+            "bus_id": bus_id, "driver_id": driver_id}
+
+
+def _scheduler(trips):
+    return TripScheduler.from_rows([t for t in trips if t["bus_id"] or t["driver_id"]])
+
+
+def test_auto_assign_keeps_valid_assignments():
+    trips = [_trip(1, 9, bus_id=10, driver_id=20), _trip(2, 11)]
+    assignments, unassigned = _scheduler(trips).auto_assign(trips, [10, 11], [20, 21])
+    assert assignments[1] == (10, 20) and assignments[2] in {(10, 20), (10, 21), (11, 20), (11, 21)}
+    assert unassigned == []
+
+
+def test_auto_assign_replaces_inactive_and_double_booked():
+    # bus 99 is no longer active; trips 1 and 2 share bus 10 and driver 20 at the same time
+    trips = [_trip(1, 9, bus_id=10, driver_id=20), _trip(2, 9, bus_id=10, driver_id=20),
+             _trip(3, 12, bus_id=99, driver_id=21)]
+    assignments, unassigned = _scheduler(trips).auto_assign(trips, [10, 11], [20, 21])
+    assert assignments[1] == (10, 20)
+    assert assignments[2] == (11, 21)
+    assert assignments[3][0] in {10, 11} and assignments[3][1] == 21
+    assert unassigned == []
+
+
+def test_auto_assign_leaves_conflicts_unassigned_when_nothing_is_free():
+    trips = [_trip(1, 9, bus_id=10, driver_id=20), _trip(2, 9, bus_id=10, driver_id=20)]
+    assignments, unassigned = _scheduler(trips).auto_assign(trips, [10], [20])
+    assert assignments == {1: (10, 20)} and unassigned == [2]
+
+
+def test_update_trip_rejects_double_booking(dataset_db):
+    from transport import crud
+
+    conn, cur = dataset_db
+    cur.execute("SELECT trip_id, bus_id, driver_id, start_time, end_time FROM trips "
+                "WHERE status = 'scheduled' ORDER BY trip_id LIMIT 2")
+    first, second = cur.fetchall()
+    moved = {"bus_id": first["bus_id"], "start_time": first["start_time"], "end_time": first["end_time"]}
+    with pytest.raises(crud.TripConflictError) as exc:
+        crud.update_trip(second["trip_id"], **moved)
+    assert ("bus", first["trip_id"]) in exc.value.conflicts
+    cur.execute("SELECT bus_id, start_time FROM trips WHERE trip_id = %s", (second["trip_id"],))
+    assert cur.fetchone() == {"bus_id": second["bus_id"], "start_time": second["start_time"]}
@@ -0,0 +1,87 @@
+"""
+Waitlist backfill: a freed seat goes to the head of the queue exactly once,
+concurrent backfills do not hand it out twice, and entries that left the
+queue or expired are passed over.
+"""
+
+import threading
+
+from transport import crud, waitlist
+
+
+def _fill(open_trip, prefix):
+    """Book all three seats; {seat_no: ticket_id}"""
+    trip_id, boarding, dropping = open_trip
+    return {seat: crud.book_ticket(trip_id, boarding, dropping, seat, "Rider", f"{prefix}{i}")["ticket_id"]
+            for i, seat in enumerate(("A1", "A2", "A3"))}
+
+
+def _join(open_trip, contact_no):
+    trip_id, boarding, dropping = open_trip
+    return crud.join_waitlist(trip_id, boarding, dropping, "Waiting", contact_no)["waitlist_id"]
+
+
+def _entry(waitlist_id):
+    return crud.get_waitlist_entry(waitlist_id)
+
+
+def _trip_seats(dataset_db, trip_id):
+    conn, cur = dataset_db
+    cur.execute("SELECT seat_no FROM tickets WHERE trip_id = %s ORDER BY seat_no", (trip_id,))
+    return [row["seat_no"] for row in cur.fetchall()]
+
+
+def test_cancel_then_backfill_assigns_the_head_once(dataset_db, open_trip):
+    trip_id = open_trip[0]
+    tickets = _fill(open_trip, "931000000")
+    first, second = _join(open_trip, "9310000010"), _join(open_trip, "9310000011")
+    assert crud.backfill_waitlist(trip_id) == []            # full: nobody moves
+    crud.delete_ticket(tickets["A2"])
+    [assignment] = crud.backfill_waitlist(trip_id)
+    assert (assignment.waitlist_id, assignment.seat_no) == (first, "A2")
+    assert crud.backfill_waitlist(trip_id) == []
+    entry = _entry(first)
+    assert entry["status"] == waitlist.ASSIGNED and entry["ticket_id"] == assignment.ticket_id
+    assert _entry(second)["position"] == 1
+    assert _trip_seats(dataset_db, trip_id) == ["A1", "A2", "A3"]
+
+
+def test_concurrent_backfills_do_not_double_assign(dataset_db, open_trip):
+    trip_id = open_trip[0]
+    tickets = _fill(open_trip, "932000000")
+    entries = [_join(open_trip, f"932000001{i}") for i in range(3)]
+    crud.delete_ticket(tickets["A3"])
+    start = threading.Barrier(4)
+    results, errors = [], []
+
+    def backfill():
+        start.wait()
+        try:
+            results.extend(crud.backfill_waitlist(trip_id))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=backfill) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert [(a.waitlist_id, a.seat_no) for a in results] == [(entries[0], "A3")]
+    assert [_entry(w)["status"] for w in entries] == [waitlist.ASSIGNED, waitlist.WAITING, waitlist.WAITING]
+    assert _trip_seats(dataset_db, trip_id) == ["A1", "A2", "A3"]
+
+
+def test_cancelled_and_expired_entries_are_skipped(dataset_db, open_trip):
+    conn, cur = dataset_db
+    trip_id = open_trip[0]
+    tickets = _fill(open_trip, "933000000")
+    left, expired, waiting = (_join(open_trip, f"933000001{i}") for i in range(3))
+    assert crud.leave_waitlist(left)
+    cur.execute("UPDATE waitlist SET status = 'expired' WHERE waitlist_id = %s", (expired,))
+    conn.commit()
+    crud.delete_ticket(tickets["A1"])
+    [assignment] = crud.backfill_waitlist(trip_id)
+    assert assignment.waitlist_id == waiting
+    assert [_entry(w)["status"] for w in (left, expired)] == [waitlist.CANCELLED, waitlist.EXPIRED]
+    assert not crud.leave_waitlist(left)
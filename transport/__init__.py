@@ -0,0 +1,11 @@
+"""
+Public transport data layer: connections, schema, CRUD helpers and
+background jobs, with no Streamlit dependency.
+
+    from transport import crud
+    crud.list_available_trips()
+
+app.py is the Streamlit UI on top of it; `transport-admin` (transport.cli)
+runs the same helpers from the command line. Submodules are imported on
+demand, so importing the package itself costs next to nothing.
+"""
@@ -0,0 +1,477 @@
+"""
+HTTP JSON API for kiosks and mobile clients, next to the Streamlit UI.
+
+    GET  /health
+    GET  /trips?route_id=3&date=2026-10-20     scheduled trips (streamed)
+    GET  /trips/<trip_id>/seats                 capacity and free seats
+    POST /bookings                              {"trip_id", "boarding_stop_id", "dropping_stop_id",
+                                                 "seat_no", "name", "contact_no", "email", "gender"}
+                                                (seat_no, email and gender optional)
+    POST /waitlist                              same body without seat_no: queue for a full trip
+    GET  /waitlist/<waitlist_id>                status, place in the queue, ticket once assigned
+    DELETE /waitlist/<waitlist_id>              leave the queue
+    GET  /tickets?contact_no=9876543210[&limit=20][&cursor=...]
+                                                a page of a contact's tickets, newest first:
+                                                {"tickets", "next_cursor"}; rate limited per client (429)
+    GET  /stops/nearest?lat=12.97&lon=77.59&k=5 nearest geocoded stops with distance_km
+    GET  /stops/within?lat=12.97&lon=77.59&radius_km=1.5[&limit=50]
+                                                stops within a radius, nearest first
+
+Reads are "public" queries (query_guard): under overload they are refused
+with 503 before bookings are, which run as "booking" (book_ticket and the
+waitlist writes set that themselves); a query that overruns its deadline is
+cancelled and answered with 504.
+
+One asyncio loop owns the sockets and keeps HTTP/1.1 connections alive
+between requests. The data layer is blocking, so queries run on API_WORKERS
+threads that take connections from the shared pool. List endpoints stream a
+JSON array in chunks straight off the cursor: the first rows go out while
+the rest are still being read, and a long list is never held as one
+document. Errors before the first chunk get a normal JSON error response;
+an error mid-stream closes the connection, so the client sees a truncated
+body rather than a valid-looking short list. A client that stops reading
+for STREAM_STALL_SECONDS is cut off the same way: its query slot and pooled
+connection are not held hostage to a slow socket.
+
+Run with `transport-admin serve`; stdlib only.
+"""
+
+import asyncio
+import functools
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from . import context, crud, stop_geo, ticket_lookup
+from .config import API_HOST, API_PORT, API_WORKERS, API_KEEPALIVE_SECONDS, TICKET_PAGE_MAX, TICKET_PAGE_SIZE
+from .db import get_admission, get_conn, json_default
+from .db_pool import PoolTimeout
+from .query_guard import Overloaded, QueryTimeout, workload
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+STREAM_BATCH = 500   # rows per chunk
+STREAM_QUEUE = 4     # chunks buffered between the cursor thread and the socket
+STREAM_STALL_SECONDS = 10   # a client that takes no chunk for this long is cut off
+MAX_NEAREST = 50     # k for /stops/nearest
+MAX_RADIUS_KM = 50   # radius_km for /stops/within
+MAX_WITHIN = 500     # stops returned by /stops/within
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method, target, version, headers, body, client=None):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = parse_qs(url.query)
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.client = client    # peer address, the key of per-client limits
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def arg(self, name, cast=str, required=False, default=None):
+        values = self.query.get(name)
+        if not values:
+            if required:
+                raise HTTPError(400, f"missing query parameter {name!r}")
+            return default
+        try:
+            return cast(values[0])
+        except ValueError:
+            raise HTTPError(400, f"bad value for {name!r}: {values[0]!r}")
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b"null")
+        except ValueError:
+            raise HTTPError(400, "request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "expected a JSON object")
+        return data
+
+
+class Stream:
+    """A response body read from a query and sent as a chunked JSON array."""
+
+    def __init__(self, sql, params=()):
+        self.sql = sql
+        self.params = params
+
+
+# --------------------------- routes ---------------------------
+ROUTES = []
+
+
+def route(method, pattern):
+    def register(handler):
+        ROUTES.append((method, re.compile(pattern + "$"), handler))
+        return handler
+    return register
+
+
+def _day(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+@route("GET", r"/health")
+async def health(server, request):
+    body = {"status": "ok", "requests": server.requests, "connections": server.connections,
+            "uptime_s": round(time.monotonic() - server.started, 1), "queries": get_admission().stats()}
+    if crud.get_waitlist_worker.exists():
+        body["waitlist"] = crud.get_waitlist_worker().stats()
+    if crud.get_ticket_lookup_cache.exists():
+        body["ticket_lookup"] = dict(crud.get_ticket_lookup_cache().stats(),
+                                     rate_limited=crud.get_ticket_rate_limiter().limited)
+    return 200, body
+
+
+@route("GET", r"/trips")
+async def search_trips(server, request):
+    return Stream(*crud.available_trips_query(request.arg("route_id", int), request.arg("date", _day)))
+
+
+@route("GET", r"/trips/(\d+)/seats")
+async def trip_seats(server, request, trip_id):
+    seat_map = await server.run(crud.load_seat_map, int(trip_id))
+    if seat_map is None:
+        raise HTTPError(404, f"trip {trip_id} not found")
+    available = seat_map.available()
+    return 200, {"trip_id": seat_map.trip_id, "capacity": len(seat_map.seats),
+                 "booked": len(seat_map.seats) - len(available), "available": available}
+
+
+BOOKING_FIELDS = ("trip_id", "boarding_stop_id", "dropping_stop_id", "name", "contact_no")
+
+
+def _booking_request(request):
+    data = request.json()
+    missing = [f for f in BOOKING_FIELDS if data.get(f) in (None, "")]
+    if missing:
+        raise HTTPError(400, f"missing field(s): {', '.join(missing)}")
+    try:
+        return data, [int(data[f]) for f in BOOKING_FIELDS[:3]]
+    except (TypeError, ValueError):
+        raise HTTPError(400, "trip_id and stop ids must be integers")
+
+
+@route("POST", r"/bookings")
+async def create_booking(server, request):
+    data, (trip_id, boarding, dropping) = _booking_request(request)
+    try:
+        # no seat_no: any free seat is assigned
+        seat_no = None if data.get("seat_no") in (None, "") else str(data["seat_no"])
+        ticket = await server.run(crud.book_ticket, trip_id, boarding, dropping, seat_no,
+                                  str(data["name"]), str(data["contact_no"]), str(data.get("email") or ""),
+                                  data.get("gender") or "other")
+    except crud.BookingError as e:
+        raise HTTPError(409, str(e))
+    return 201, ticket
+
+
+@route("POST", r"/waitlist")
+async def join_waitlist(server, request):
+    data, (trip_id, boarding, dropping) = _booking_request(request)
+    try:
+        entry = await server.run(crud.join_waitlist, trip_id, boarding, dropping, str(data["name"]),
+                                 str(data["contact_no"]), str(data.get("email") or ""), data.get("gender") or "other")
+    except crud.BookingError as e:
+        raise HTTPError(409, str(e))
+    return 201, entry
+
+
+@route("GET", r"/waitlist/(\d+)")
+async def waitlist_entry(server, request, waitlist_id):
+    entry = await server.run(crud.get_waitlist_entry, int(waitlist_id))
+    if entry is None:
+        raise HTTPError(404, f"waitlist entry {waitlist_id} not found")
+    return 200, entry
+
+
+@route("DELETE", r"/waitlist/(\d+)")
+async def leave_waitlist(server, request, waitlist_id):
+    if not await server.run(crud.leave_waitlist, int(waitlist_id)):
+        raise HTTPError(409, f"waitlist entry {waitlist_id} is not waiting")
+    return 200, {"waitlist_id": int(waitlist_id), "status": "cancelled"}
+
+
+@route("GET", r"/tickets")
+async def tickets_by_contact(server, request):
+    contact_no = request.arg("contact_no", required=True)
+    limit = request.arg("limit", int, default=TICKET_PAGE_SIZE)
+    if not 1 <= limit <= TICKET_PAGE_MAX:
+        raise HTTPError(400, f"limit must be between 1 and {TICKET_PAGE_MAX}")
+    try:
+        page = await server.run(crud.lookup_tickets, contact_no, request.arg("cursor"), limit,
+                                request.client or "unknown")
+    except ticket_lookup.BadCursor as e:
+        raise HTTPError(400, str(e))
+    return 200, {"tickets": page.tickets, "next_cursor": page.next_cursor}
+
+
+def _point(request):
+    try:
+        return stop_geo.check_coordinates(request.arg("lat", float, required=True),
+                                          request.arg("lon", float, required=True))
+    except stop_geo.CoordinateError as e:
+        raise HTTPError(400, str(e))
+
+
+@route("GET", r"/stops/nearest")
+async def nearest_stops(server, request):
+    lat, lon = _point(request)
+    k = request.arg("k", int, default=5)
+    if not 1 <= k <= MAX_NEAREST:
+        raise HTTPError(400, f"k must be between 1 and {MAX_NEAREST}")
+    return 200, await server.run(crud.nearest_stops, lat, lon, k)
+
+
+@route("GET", r"/stops/within")
+async def stops_within(server, request):
+    lat, lon = _point(request)
+    radius_km = request.arg("radius_km", float, required=True)
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise HTTPError(400, f"radius_km must be above 0 and at most {MAX_RADIUS_KM}")
+    limit = request.arg("limit", int, default=MAX_WITHIN)
+    if limit < 1:
+        raise HTTPError(400, "limit must be at least 1")
+    limit = min(limit, MAX_WITHIN)
+    return 200, await server.run(crud.stops_within, lat, lon, radius_km, limit)
+
+
+# --------------------------- server ---------------------------
+def _public(fn, *args):
+    with workload("public"):
+        return fn(*args)
+
+
+def _head(status, headers):
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+class ApiServer:
+    def __init__(self, host=API_HOST, port=API_PORT, workers=API_WORKERS):
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.requests = 0
+        self.connections = 0
+        self.started = time.monotonic()
+
+    async def run(self, fn, *args):
+        """Run a blocking data-layer call on a worker thread, as a "public" query
+        unless the call sets its own class"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(_public, fn, *args))
+
+    async def serve(self, ready=None):
+        server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = server.sockets[0].getsockname()[1]
+        context.logger.info("API listening on http://%s:%s", self.host, self.port)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        peer = writer.get_extra_info("peername")
+        client = peer[0] if isinstance(peer, tuple) else peer
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader, client), API_KEEPALIVE_SECONDS)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                self.requests += 1
+                if not await self._respond(request, writer) or not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_request(self, reader, client=None):
+        """Next request on the connection; None when the client closed it between requests"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "request headers too large")
+        lines = head.decode("latin-1").lstrip("\r\n").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(501, "chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "bad Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"request body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, target, version, headers, body, client)
+
+    async def _dispatch(self, request):
+        allowed = False
+        for method, pattern, handler in ROUTES:
+            match = pattern.match(request.path)
+            if match:
+                if method == request.method:
+                    return await handler(self, request, *match.groups())
+                allowed = True
+        raise HTTPError(405 if allowed else 404, f"no route for {request.method} {request.path}")
+
+    async def _respond(self, request, writer):
+        """Handle one request; False if the connection must be closed afterwards"""
+        try:
+            result = await self._dispatch(request)
+            if isinstance(result, Stream):
+                return await self._send_stream(writer, request, result)
+            status, body = result
+        except HTTPError as e:
+            status, body = e.status, {"error": str(e)}
+        except ConnectionError:
+            raise
+        except (PoolTimeout, Overloaded) as e:
+            status, body = 503, {"error": str(e)}
+        except QueryTimeout as e:
+            status, body = 504, {"error": str(e)}
+        except ticket_lookup.RateLimited as e:
+            status, body = 429, {"error": str(e), "retry_after": round(e.retry_after, 1)}
+        except Exception as e:
+            context.logger.exception("%s %s failed", request.method, request.path)
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+        await self._send_json(writer, status, body, request.keep_alive)
+        return True
+
+    async def _send_json(self, writer, status, body, keep_alive):
+        data = json.dumps(body, default=json_default).encode()
+        writer.write(_head(status, {"Content-Type": "application/json", "Content-Length": len(data),
+                                    "Connection": "keep-alive" if keep_alive else "close"}) + data)
+        await writer.drain()
+
+    async def _send_stream(self, writer, request, stream):
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(STREAM_QUEUE)
+        stop = threading.Event()
+
+        def abort():
+            while not chunks.empty():
+                chunks.get_nowait()
+            chunks.put_nowait(TimeoutError(f"client read nothing for {STREAM_STALL_SECONDS}s"))
+
+        def put(item):
+            if stop.is_set():
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    asyncio.wait_for(chunks.put(item), STREAM_STALL_SECONDS), loop).result()
+            except asyncio.TimeoutError:
+                # stop sending; the rest is read unsent and the slot is released
+                stop.set()
+                loop.call_soon_threadsafe(abort)
+
+        def produce():
+            try:
+                with get_conn(read_only=True, query_class="public") as (conn, cur):
+                    cur.execute(stream.sql, stream.params)
+                    while True:
+                        rows = cur.fetchmany(STREAM_BATCH)
+                        if not rows:
+                            break
+                        # once the client is gone, keep reading (unsent) so the
+                        # connection goes back to the pool with no unread result
+                        put(json.dumps(rows, default=json_default)[1:-1].encode())
+            except Exception as e:
+                put(e)
+            else:
+                put(None)
+
+        producer = loop.run_in_executor(self.executor, produce)
+        try:
+            item = await chunks.get()
+            if isinstance(item, Exception):
+                raise item
+            # HTTP/1.0 has no chunked encoding: the end of the body is the end of the connection
+            chunked = request.version != "HTTP/1.0"
+            headers = {"Content-Type": "application/json"}
+            headers.update({"Transfer-Encoding": "chunked"} if chunked else {"Connection": "close"})
+            writer.write(_head(200, headers))
+            first = True
+            data = b"["
+            while True:
+                if item is not None:
+                    data += item if first else b"," + item
+                    first = False
+                else:
+                    data += b"]"
+                if chunked:
+                    data = b"%x\r\n%s\r\n" % (len(data), data)
+                writer.write(data)
+                try:
+                    await asyncio.wait_for(writer.drain(), STREAM_STALL_SECONDS)
+                except asyncio.TimeoutError:
+                    context.logger.warning("%s %s: client stopped reading, closing", request.method, request.path)
+                    return False
+                if item is None:
+                    break
+                data = b""
+                item = await chunks.get()
+                if isinstance(item, Exception):
+                    context.logger.error("%s %s failed mid-stream: %s", request.method, request.path, item)
+                    return False
+            if chunked:
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            return chunked
+        finally:
+            stop.set()
+            while not chunks.empty():
+                chunks.get_nowait()
+            await producer
+
+
+def serve(host=API_HOST, port=API_PORT, workers=API_WORKERS):
+    """Run the API in the foreground until interrupted"""
+    server = ApiServer(host, port, workers)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown(wait=False)
@@ -0,0 +1,124 @@
+"""
+Password hashing and verified-credential cache.
+
+Hashes are stored as  scrypt$<n>$<r>$<p>$<salt b64>$<key b64>  using the
+stdlib hashlib.scrypt. Rows still holding the original unsalted SHA-256 hex
+digest verify once and are reported as needing a rehash, so they are
+upgraded transparently on the next successful login. All comparisons are
+constant-time.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# ~16 MiB and a few tens of ms per hash on a typical server core; raise
+# SCRYPT_N to make brute force more expensive (see benchmarks/bench_auth.py).
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _derive(plain, salt, n, r, p):
+    return hashlib.scrypt(plain.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=KEY_BYTES)
+
+
+def hash_password(plain, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = os.urandom(SALT_BYTES)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(_derive(plain, salt, n, r, p))}"
+
+
+def legacy_sha256(plain):
+    """The original unsalted scheme, kept only to verify old rows."""
+    return hashlib.sha256(plain.encode()).hexdigest()
+
+
+def verify_password(plain, stored):
+    """Return (ok, needs_rehash) for a plaintext against a stored hash."""
+    if not stored:
+        return False, False
+    if stored.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, key = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            expected = base64.b64decode(key)
+            actual = _derive(plain, base64.b64decode(salt), n, r, p)
+        except (ValueError, TypeError):
+            return False, False
+        ok = hmac.compare_digest(actual, expected)
+        return ok, ok and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    ok = hmac.compare_digest(legacy_sha256(plain).encode(), stored.encode())
+    return ok, ok
+
+
+_dummy_hash = None
+
+def verify_unknown_user(plain):
+    """Spend a real KDF round for a username that does not exist, so unknown
+    users take as long to reject as wrong passwords. Always returns False."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(os.urandom(16).hex())
+    verify_password(plain, _dummy_hash)
+    return False
+
+
+class CredentialCache:
+    """Bounded, TTL'd cache of recently verified logins.
+
+    Keys are an HMAC of username+password under a per-process random key, so
+    plaintext passwords are never held. The cache never looks at the users
+    table again: after a password change, role change or delete, the old
+    entry keeps logging in for up to `ttl` seconds unless forget_user() is
+    called. Code in this process that changes a user must call it; a change
+    made elsewhere (SQL console, another app process) only takes effect when
+    the entry expires.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, username, password):
+        return hmac.new(self._secret, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+
+    def get(self, username, password):
+        key = self._key(username, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(user)
+
+    def put(self, username, password, user):
+        key = self._key(username, password)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def forget_user(self, username):
+        """Drop every cached login for a user (password or role changed)."""
+        with self._lock:
+            for key in [k for k, (_, u) in self._entries.items() if u.get("username") == username]:
+                del self._entries[key]
@@ -0,0 +1,50 @@
+"""
+Database backends: MySQL (the default, via mysql.connector) and an embedded
+SQLite file for single-node depots, demos and in-process tests/benchmarks.
+
+The data layer is written against the mysql.connector API (cursor(
+dictionary=True), %s placeholders, MySQL SQL). A backend module provides:
+
+    connect(async_log=False, overrides=None, read_only=False)
+        a connection with that API; async_log tells the ticket triggers the
+        app logs ticket events itself (TICKET_LOG_MODE = "async")
+    create_database()
+        make sure the database exists before the pool opens
+    create_schema(conn, cur, tables)
+        `tables` (MySQL CREATE TABLE statements) plus indexes, the ticket_log
+        triggers and the GetTripRevenue procedure
+    live_columns(conn) / live_indexes(conn)
+        {table: {column, ...}} / {table: {index name, ...}} of the live
+        schema, for table_registry checks and migrations
+    set_statement_timeout(conn, seconds) / cancel(conn) / is_timeout(exc)
+        per-query deadlines for transport.query_guard: a server-side limit
+        where the database has one, aborting a running statement from
+        another thread, and recognising the error either one raises
+    is_duplicate(exc) / is_retryable(exc)
+        a unique-key violation / a deadlock or lock wait worth retrying the
+        transaction for (optimistic booking, transport.seat_inventory)
+    relaxed_checks(cur)
+        context manager for wipe-and-reload (schema.reset_sample_data):
+        MySQL turns the session's foreign_key_checks off and restores it on
+        exit (unique checks stay on); SQLite defers foreign keys to commit
+    explain(cur, sql, params)
+        the plan of a SELECT as {"tables": [{"table", "access", "key",
+        "rows"}], "filesort", "temporary"}, access in MySQL's terms (const,
+        eq_ref, ref, range, index, ALL), for transport.query_plans
+
+config.DB_BACKEND picks one; it is read on every call, so a script can
+switch with `config.DB_BACKEND = "sqlite"` before its first query.
+"""
+
+import importlib
+
+from .. import config
+
+BACKENDS = ("mysql", "sqlite")
+
+
+def get(name=None):
+    name = name or config.DB_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"unknown database backend {name!r} (expected one of {', '.join(BACKENDS)})")
+    return importlib.import_module(f".{name}", __name__)
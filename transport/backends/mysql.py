@@ -0,0 +1,228 @@
+"""
+MySQL backend (mysql.connector), the default.
+"""
+
+import json
+from contextlib import contextmanager
+
+from .. import context
+from ..config import DB_CONFIG
+
+# statement stopped by KILL QUERY / by MAX_EXECUTION_TIME
+_TIMEOUT_ERRNOS = (1317, 3024)
+# ER_DUP_ENTRY; deadlock / lock wait timeout (the transaction can be retried)
+_DUPLICATE_ERRNOS = (1062,)
+_RETRYABLE_ERRNOS = (1213, 1205)
+
+
+def _mysql():
+    # imported on first connection, not at module import: keeps CLI startup fast
+    import mysql.connector
+    return mysql.connector
+
+
+def connect(async_log=False, overrides=None, read_only=False):
+    cfg = {**DB_CONFIG, **(overrides or {})}
+    conn = _mysql().connect(**cfg)
+    # cancel() opens its KILL QUERY session on the same server with the same account
+    conn._transport_config = cfg
+    cur = conn.cursor()
+    if async_log:
+        # tells the after_ticket_* triggers that the app logs this session itself
+        cur.execute("SET @ticket_log_async = 1")
+    if read_only:
+        # a write routed to a replica by mistake fails loudly instead of diverging it
+        cur.execute("SET SESSION TRANSACTION READ ONLY")
+    cur.close()
+    return conn
+
+
+def set_statement_timeout(conn, seconds):
+    """Server-side limit for this session's SELECTs (writes rely on cancel())"""
+    ms = int(seconds * 1000)
+    if getattr(conn, "_max_execution_ms", None) != ms:
+        cur = conn.cursor()
+        cur.execute(f"SET SESSION MAX_EXECUTION_TIME = {ms}")
+        cur.close()
+        conn._max_execution_ms = ms
+
+
+def cancel(conn):
+    """Stop the statement running on `conn` (called from another thread)"""
+    killer = _mysql().connect(**conn._transport_config)
+    try:
+        cur = killer.cursor()
+        cur.execute(f"KILL QUERY {int(conn.connection_id)}")
+        cur.close()
+    finally:
+        killer.close()
+
+
+def is_timeout(exc):
+    return getattr(exc, "errno", None) in _TIMEOUT_ERRNOS
+
+
+def is_duplicate(exc):
+    return getattr(exc, "errno", None) in _DUPLICATE_ERRNOS
+
+
+def is_retryable(exc):
+    return getattr(exc, "errno", None) in _RETRYABLE_ERRNOS
+
+
+@contextmanager
+def relaxed_checks(cur):
+    """Session foreign-key checks off for a bulk load, restored afterwards. unique_checks
+    stays on: nothing else would stop duplicates in the unique secondary indexes."""
+    cur.execute("SELECT @@SESSION.foreign_key_checks AS fk")
+    row = cur.fetchone()
+    fk = row["fk"] if isinstance(row, dict) else row[0]
+    cur.execute("SET SESSION foreign_key_checks = 0")
+    try:
+        yield
+    finally:
+        # session variables are not transactional: restore even if the load rolled back
+        cur.execute("SET SESSION foreign_key_checks = %s", (fk,))
+
+
+def _plan_nodes(node, plan):
+    """Walk an EXPLAIN FORMAT=JSON document into explain()'s summary"""
+    if isinstance(node, dict):
+        if "table_name" in node and "access_type" in node:
+            plan["tables"].append({"table": node["table_name"], "access": node["access_type"],
+                                   "key": node.get("key"), "rows": node.get("rows_examined_per_scan")})
+        plan["filesort"] |= node.get("using_filesort") is True
+        plan["temporary"] |= node.get("using_temporary_table") is True
+        for value in node.values():
+            _plan_nodes(value, plan)
+    elif isinstance(node, list):
+        for value in node:
+            _plan_nodes(value, plan)
+    return plan
+
+
+def explain(cur, sql, params=()):
+    """EXPLAIN FORMAT=JSON of a SELECT as {"tables": [{table, access, key, rows}], "filesort", "temporary"}"""
+    cur.execute("EXPLAIN FORMAT=JSON " + sql, params or ())
+    row = cur.fetchone()
+    doc = json.loads(next(iter(row.values())) if isinstance(row, dict) else row[0])
+    return _plan_nodes(doc, {"tables": [], "filesort": False, "temporary": False})
+
+
+def create_database():
+    cfg = DB_CONFIG.copy()
+    db = cfg.pop("database", None)
+    conn = _mysql().connect(host=cfg["host"], user=cfg["user"], password=cfg["password"])
+    cur = conn.cursor()
+    if db:
+        cur.execute(f"CREATE DATABASE IF NOT EXISTS `{db}` DEFAULT CHARACTER SET 'utf8mb4'")
+    cur.close()
+    conn.close()
+
+
+def create_schema(conn, cur, tables):
+    # Disable foreign key checks temporarily for safe table creation
+    cur.execute("SET FOREIGN_KEY_CHECKS = 0;")
+    for ddl in tables:
+        cur.execute(ddl)
+
+    # Older databases were created with ticket_log.ticket_id -> tickets FK,
+    # which blocks deleting any ticket that has a log row
+    cur.execute("""
+        SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'ticket_log'
+    """)
+    for fk in cur.fetchall():
+        cur.execute(f"ALTER TABLE ticket_log DROP FOREIGN KEY `{fk['CONSTRAINT_NAME']}`")
+
+    # Re-enable foreign key checks
+    cur.execute("SET FOREIGN_KEY_CHECKS = 1;")
+
+    # Create triggers (safe version). They skip sessions that set
+    # @ticket_log_async, i.e. the app in async log mode, which queues the
+    # same events itself; every other writer is still logged here.
+    try:
+        cur.execute("DROP TRIGGER IF EXISTS after_ticket_insert;")
+        cur.execute("""
+        CREATE TRIGGER after_ticket_insert
+        AFTER INSERT ON tickets
+        FOR EACH ROW
+        BEGIN
+            IF @ticket_log_async IS NULL THEN
+                INSERT INTO ticket_log (ticket_id, trip_id, action)
+                VALUES (NEW.ticket_id, NEW.trip_id, 'Ticket Issued');
+            END IF;
+        END;
+        """)
+        cur.execute("DROP TRIGGER IF EXISTS after_ticket_update;")
+        cur.execute("""
+        CREATE TRIGGER after_ticket_update
+        AFTER UPDATE ON tickets
+        FOR EACH ROW
+        BEGIN
+            IF @ticket_log_async IS NULL THEN
+                INSERT INTO ticket_log (ticket_id, trip_id, action)
+                VALUES (NEW.ticket_id, NEW.trip_id, 'Ticket Updated');
+            END IF;
+        END;
+        """)
+        cur.execute("DROP TRIGGER IF EXISTS after_ticket_delete;")
+        cur.execute("""
+        CREATE TRIGGER after_ticket_delete
+        AFTER DELETE ON tickets
+        FOR EACH ROW
+        BEGIN
+            IF @ticket_log_async IS NULL THEN
+                INSERT INTO ticket_log (ticket_id, trip_id, action)
+                VALUES (OLD.ticket_id, OLD.trip_id, 'Ticket Deleted');
+            END IF;
+        END;
+        """)
+    except Exception as e:
+        context.notify("warning", f"Could not create trigger: {e}")
+
+    # Stored procedure (safe version)
+    try:
+        cur.execute("DROP PROCEDURE IF EXISTS GetTripRevenue;")
+        cur.execute("""
+        CREATE PROCEDURE GetTripRevenue(IN tripID INT)
+        BEGIN
+            SELECT t.trip_id, COALESCE(r.route_name,'-') AS route_name, 
+                   COALESCE(SUM(tk.fare), 0) AS total_revenue
+            FROM trips t
+            LEFT JOIN routes r ON t.route_id = r.route_id
+            LEFT JOIN tickets tk ON t.trip_id = tk.trip_id
+            WHERE t.trip_id = tripID
+            GROUP BY t.trip_id, r.route_name;
+        END;
+        """)
+    except Exception as e:
+        context.notify("warning", f"Could not create stored procedure: {e}")
+
+
+def live_columns(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT table_name, column_name FROM information_schema.columns WHERE table_schema = %s",
+                    (DB_CONFIG["database"],))
+        live = {}
+        for row in cur.fetchall():
+            tbl, col = row.values() if isinstance(row, dict) else row
+            live.setdefault(tbl, set()).add(col)
+    finally:
+        cur.close()
+    return live
+
+
+def live_indexes(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT DISTINCT table_name, index_name FROM information_schema.statistics WHERE table_schema = %s",
+                    (DB_CONFIG["database"],))
+        live = {}
+        for row in cur.fetchall():
+            tbl, name = row.values() if isinstance(row, dict) else row
+            live.setdefault(tbl, set()).add(name)
+    finally:
+        cur.close()
+    return live
@@ -0,0 +1,468 @@
+"""
+Embedded SQLite backend: one database file (config.SQLITE_PATH), no server.
+
+For depots running single-node, demos, and tests/benchmarks that want a
+real database in-process. The data layer's MySQL statements are
+translated once per distinct text (cached):
+
+    %s                                     -> ?
+    NOW() - INTERVAL n SECOND              -> datetime(NOW(), '-n seconds')
+    TIMESTAMPDIFF(MINUTE, a, b)            -> whole minutes from a to b
+    ON DUPLICATE KEY UPDATE c = VALUES(c)  -> ON CONFLICT DO UPDATE SET c = excluded.c
+    SELECT ... FOR UPDATE                  -> BEGIN IMMEDIATE, then the SELECT
+    DATE(x) AS a, TIME(x) AS b             -> returned as date / timedelta, like MySQL
+
+and NOW(), CONCAT(), GET_LOCK() and RELEASE_LOCK() are registered as SQL
+functions. CREATE TABLE statements are translated as well (AUTO_INCREMENT,
+ENUM -> CHECK, inline INDEX -> CREATE INDEX); the ticket_log triggers and
+GetTripRevenue (via callproc) have SQLite versions below.
+
+Connections run in WAL mode, so readers never wait for the writer, with
+synchronous=NORMAL (a power cut can lose the last commits but never
+corrupts the file), a 64 MB page cache, in-memory temp tables, mmap I/O
+and foreign keys on. Every write transaction starts with BEGIN IMMEDIATE:
+it takes the single write lock up front and queues for it (busy timeout)
+instead of failing with SQLITE_BUSY when a read turns into a write.
+Ticket events are always logged by the triggers here (TICKET_LOG_MODE
+"async" only applies to MySQL, where it saves a round trip).
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+from .. import config
+
+try:
+    import fcntl
+except ImportError:     # Windows: GET_LOCK only excludes threads of this process
+    fcntl = None
+
+BUSY_TIMEOUT = 10.0
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+# --------------------------- types ---------------------------
+def _parse(parse, text):
+    try:
+        return parse(text)
+    except ValueError:
+        return text
+
+
+def _timedelta(text):
+    h, m, s = (float(part) for part in text.split(":"))
+    return timedelta(hours=h, minutes=m, seconds=s)
+
+
+# DATETIME stored as 'YYYY-MM-DD HH:MM:SS' (local time, like MySQL), so
+# comparisons with parameters are plain string comparisons
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" ", "seconds"))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATETIME", lambda b: _parse(datetime.fromisoformat, b.decode()))
+sqlite3.register_converter("DATE", lambda b: _parse(date.fromisoformat, b.decode()[:10]))
+sqlite3.register_converter("TIME", lambda b: _parse(_timedelta, b.decode()))
+sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()))
+
+
+# --------------------------- SQL translation ---------------------------
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.I)
+_INTERVAL = re.compile(r"(NOW\(\)|[\w.]+)\s*([-+])\s*INTERVAL\s+(\?|\d+)\s+(SECOND|MINUTE|HOUR|DAY)\b", re.I)
+_TIMESTAMPDIFF = re.compile(r"TIMESTAMPDIFF\(\s*(SECOND|MINUTE|HOUR|DAY)\s*,\s*([^,()]+?)\s*,\s*([^,()]+?)\s*\)", re.I)
+_UNIT_SECONDS = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400}
+_TYPED_ALIAS = re.compile(r"\b(DATE|TIME)\(([^()]*)\)\s+AS\s+(\w+)", re.I)
+_VALUES_FN = re.compile(r"\bVALUES\((\w+)\)", re.I)
+_UPSERT = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+
+
+def _interval(m):
+    base, sign, amount, unit = m.groups()
+    return f"datetime({base}, '{sign}' || {amount} || ' {unit.lower()}s')"
+
+
+def _timestampdiff(m):
+    unit, start, end = m.groups()
+    return f"((strftime('%s', {end}) - strftime('%s', {start})) / {_UNIT_SECONDS[unit.upper()]})"
+
+
+@lru_cache(maxsize=2048)
+def translate(sql):
+    """MySQL statement -> (SQLite statement, take the write lock first)"""
+    for_update = bool(_FOR_UPDATE.search(sql))
+    sql = _FOR_UPDATE.sub("", sql).replace("%s", "?")
+    sql = _INTERVAL.sub(_interval, sql)
+    sql = _TIMESTAMPDIFF.sub(_timestampdiff, sql)
+    # "name [TYPE]" column names pick the converter (PARSE_COLNAMES)
+    sql = _TYPED_ALIAS.sub(lambda m: f'{m[1]}({m[2]}) AS "{m[3]} [{m[1].upper()}]"', sql)
+    parts = _UPSERT.split(sql, maxsplit=1)
+    if len(parts) == 2:
+        sql = parts[0] + "ON CONFLICT DO UPDATE SET" + _VALUES_FN.sub(r"excluded.\1", parts[1])
+    return sql, for_update
+
+
+_ENGINE = re.compile(r"\)\s*ENGINE\s*=\s*\w+\s*;?\s*$", re.I)
+_INLINE_INDEX = re.compile(r"(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\((.*)\)$", re.I | re.S)
+_AUTO_PK = re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.I)
+_ENUM = re.compile(r"^(\w+)\s+ENUM\(([^)]*)\)", re.I)
+_ON_UPDATE_NOW = re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.I)
+_DEFAULT_NOW = re.compile(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", re.I)
+
+
+def _split_top_level(body):
+    items, depth, start = [], 0, 0
+    for i, ch in enumerate(body):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            items.append(body[start:i].strip())
+            start = i + 1
+    items.append(body[start:].strip())
+    return [item for item in items if item]
+
+
+def translate_ddl(ddl):
+    """MySQL CREATE TABLE -> [CREATE TABLE, CREATE INDEX, ...] for SQLite"""
+    ddl = _ENGINE.sub(")", ddl.strip())
+    head, _, rest = ddl.partition("(")
+    table = head.split()[-1]
+    columns, indexes = [], []
+    for item in _split_top_level(rest[:rest.rindex(")")]):
+        m = _INLINE_INDEX.match(item)
+        if m:
+            unique, name, cols = m.groups()
+            indexes.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+            continue
+        item = _AUTO_PK.sub("INTEGER PRIMARY KEY AUTOINCREMENT", item)
+        item = _ENUM.sub(lambda m: f"{m[1]} TEXT CHECK ({m[1]} IN ({m[2]}))", item)
+        item = _ON_UPDATE_NOW.sub("", item)
+        # CURRENT_TIMESTAMP is UTC in SQLite; MySQL (and NOW() here) use local time
+        item = _DEFAULT_NOW.sub("DEFAULT (datetime('now', 'localtime'))", item)
+        columns.append(item)
+    return [f"{head.strip()} (\n    " + ",\n    ".join(columns) + "\n)"] + indexes
+
+
+# --------------------------- functions ---------------------------
+def _now():
+    return datetime.now().isoformat(" ", "seconds")
+
+
+def _concat(*args):
+    # NULL if any argument is NULL, like MySQL
+    return None if any(a is None for a in args) else "".join(str(a) for a in args)
+
+
+class _NamedLocks:
+    """GET_LOCK/RELEASE_LOCK for one connection: an flock on a file next to the
+    database, so other processes using the same file are excluded too."""
+
+    _thread_locks = {}
+
+    def __init__(self, path):
+        self.path = path
+        self.held = {}
+
+    def get(self, name, timeout):
+        if name in self.held:
+            return 1
+        deadline = time.monotonic() + max(timeout or 0, 0)
+        if fcntl is None:
+            lock = self._thread_locks.setdefault((self.path, name), threading.Lock())
+            if not lock.acquire(timeout=max(timeout or 0, 0)):
+                return 0
+            self.held[name] = lock
+            return 1
+        fd = os.open(f"{self.path}-{name}.lock", os.O_CREAT | os.O_RDWR, 0o644)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.held[name] = fd
+                return 1
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    return 0
+                time.sleep(0.05)
+
+    def release(self, name):
+        held = self.held.pop(name, None)
+        if held is None:
+            return None
+        if fcntl is None:
+            held.release()
+        else:
+            os.close(held)      # closing the descriptor drops the flock
+        return 1
+
+    def release_all(self):
+        for name in list(self.held):
+            self.release(name)
+
+
+# --------------------------- connection ---------------------------
+def _dict_row(cursor, row):
+    return {d[0]: value for d, value in zip(cursor.description, row)}
+
+
+class Cursor:
+    """mysql.connector-style cursor over a sqlite3 cursor."""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._dictionary = dictionary
+        self._cur = conn._raw.cursor()
+        if dictionary:
+            self._cur.row_factory = _dict_row
+        self._results = []
+
+    def execute(self, operation, params=None):
+        sql, for_update = translate(operation)
+        if for_update and not self._conn._raw.in_transaction:
+            self._cur.execute("BEGIN IMMEDIATE")
+        self._cur.execute(sql, params or ())
+
+    def executemany(self, operation, seq_params):
+        self._cur.executemany(translate(operation)[0], seq_params)
+
+    def callproc(self, name, args=()):
+        result = Cursor(self._conn, self._dictionary)
+        result.execute(PROCEDURES[name], args)
+        self._results = [result]
+        return args
+
+    def stored_results(self):
+        return iter(self._results)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cur.fetchmany(size)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class Connection:
+    """sqlite3 connection with the part of the mysql.connector API the data layer uses."""
+
+    def __init__(self, raw, path):
+        self._raw = raw
+        self._locks = _NamedLocks(path)
+        self._closed = False
+        raw.create_function("NOW", 0, _now)
+        raw.create_function("CONCAT", -1, _concat)
+        raw.create_function("GET_LOCK", 2, self._locks.get)
+        raw.create_function("RELEASE_LOCK", 1, self._locks.release)
+
+    def cursor(self, dictionary=False, prepared=False):
+        # prepared=True is accepted for table_registry.execute_prepared();
+        # sqlite3 already caches compiled statements per connection
+        return Cursor(self, dictionary)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def is_connected(self):
+        return not self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._locks.release_all()
+            self._raw.close()
+
+
+def connect(async_log=False, overrides=None, read_only=False):
+    path = (overrides or {}).get("path", config.SQLITE_PATH)
+    raw = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level="IMMEDIATE", check_same_thread=False,
+                          detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    for pragma in PRAGMAS:
+        raw.execute(pragma)
+    if read_only:
+        raw.execute("PRAGMA query_only = ON")
+    return Connection(raw, path)
+
+
+def set_statement_timeout(conn, seconds):
+    # no server-side limit: the query watchdog's cancel() enforces the deadline
+    pass
+
+
+def cancel(conn):
+    """Abort the statement running on `conn` (called from another thread)"""
+    conn._raw.interrupt()
+
+
+def is_timeout(exc):
+    return isinstance(exc, sqlite3.OperationalError) and "interrupted" in str(exc)
+
+
+def is_duplicate(exc):
+    return isinstance(exc, sqlite3.IntegrityError) and "UNIQUE constraint failed" in str(exc)
+
+
+def is_retryable(exc):
+    # the write lock was not free within BUSY_TIMEOUT
+    return isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc)
+
+
+@contextmanager
+def relaxed_checks(cur):
+    """Foreign keys checked once at commit instead of per row (SQLite resets this at commit)"""
+    cur.execute("PRAGMA defer_foreign_keys = ON")
+    yield
+
+
+_PLAN_STEP = re.compile(r"^(SCAN|SEARCH)(?: TABLE)? (\w+)(?: AS (\w+))?(.*)$")
+_PLAN_KEY = re.compile(r"USING (?:COVERING |AUTOMATIC (?:PARTIAL )?COVERING |AUTOMATIC )?INDEX (\w+)?")
+
+
+def _plan_step(detail):
+    """One EXPLAIN QUERY PLAN line -> {table, access, key, rows}, MySQL access types:
+    SCAN -> ALL (index when it walks an index), SEARCH by rowid -> eq_ref,
+    SEARCH by index -> ref or range; an automatic index is built per query
+    from a full scan, so it counts as ALL."""
+    m = _PLAN_STEP.match(detail)
+    if not m or detail == "SCAN CONSTANT ROW":
+        return None
+    op, table, alias, rest = m.groups()
+    key = _PLAN_KEY.search(rest)
+    key = key.group(1) if key else None
+    if "AUTOMATIC" in rest:
+        access, key = "ALL", None
+    elif op == "SCAN":
+        access = "index" if "INDEX" in rest else "ALL"
+    elif "PRIMARY KEY" in rest:
+        access, key = ("range" if re.search(r"rowid[<>]", rest) else "eq_ref"), "PRIMARY"
+    else:
+        access = "range" if re.search(r"[<>]|\bIN\b", rest) else "ref"
+    return {"table": alias or table, "access": access, "key": key, "rows": None}
+
+
+def explain(cur, sql, params=()):
+    """EXPLAIN QUERY PLAN in the shape of the MySQL backend's explain(); SQLite
+    gives no row estimates (rows is None), and its temp B-trees stand in for
+    filesort (ORDER BY) and temporary tables (GROUP BY / DISTINCT)."""
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    plan = {"tables": [], "filesort": False, "temporary": False}
+    for row in cur.fetchall():
+        detail = row["detail"] if isinstance(row, dict) else row[3]
+        if detail.startswith("USE TEMP B-TREE"):
+            plan["filesort" if "ORDER BY" in detail else "temporary"] = True
+        step = _plan_step(detail)
+        if step:
+            plan["tables"].append(step)
+    return plan
+
+
+def create_database():
+    folder = os.path.dirname(os.path.abspath(config.SQLITE_PATH))
+    os.makedirs(folder, exist_ok=True)
+
+
+# --------------------------- schema ---------------------------
+TRIGGERS = [
+    """
+    CREATE TRIGGER after_ticket_insert AFTER INSERT ON tickets
+    BEGIN
+        INSERT INTO ticket_log (ticket_id, trip_id, action) VALUES (NEW.ticket_id, NEW.trip_id, 'Ticket Issued');
+    END
+    """,
+    """
+    CREATE TRIGGER after_ticket_update AFTER UPDATE ON tickets
+    BEGIN
+        INSERT INTO ticket_log (ticket_id, trip_id, action) VALUES (NEW.ticket_id, NEW.trip_id, 'Ticket Updated');
+    END
+    """,
+    """
+    CREATE TRIGGER after_ticket_delete AFTER DELETE ON tickets
+    BEGIN
+        INSERT INTO ticket_log (ticket_id, trip_id, action) VALUES (OLD.ticket_id, OLD.trip_id, 'Ticket Deleted');
+    END
+    """,
+]
+
+# stored procedures, run by Cursor.callproc()
+PROCEDURES = {
+    "GetTripRevenue": """
+        SELECT t.trip_id, COALESCE(r.route_name,'-') AS route_name,
+               COALESCE(SUM(tk.fare), 0) AS "total_revenue [DECIMAL]"
+        FROM trips t
+        LEFT JOIN routes r ON t.route_id = r.route_id
+        LEFT JOIN tickets tk ON t.trip_id = tk.trip_id
+        WHERE t.trip_id = %s
+        GROUP BY t.trip_id, r.route_name
+    """,
+}
+
+
+def create_schema(conn, cur, tables):
+    for ddl in tables:
+        for statement in translate_ddl(ddl):
+            cur.execute(statement)
+    for trigger in TRIGGERS:
+        name = trigger.split()[2]
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cur.execute(trigger)
+
+
+def live_columns(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        live = {}
+        for (table,) in cur.fetchall():
+            cur.execute(f"PRAGMA table_info({table})")
+            live[table] = {row[1] for row in cur.fetchall()}
+    finally:
+        cur.close()
+    return live
+
+
+def live_indexes(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT tbl_name, name FROM sqlite_master WHERE type = 'index'")
+        live = {}
+        for table, name in cur.fetchall():
+            live.setdefault(table, set()).add(name)
+    finally:
+        cur.close()
+    return live
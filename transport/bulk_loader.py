@@ -0,0 +1,182 @@
+"""
+Bulk loader: typed row batches inserted with multi-row executemany, foreign
+keys given as natural keys and resolved to ids in memory.
+
+    loader = BulkLoader(cur)
+    loader.load(batch("routes", [col("route_name"), col("distance_km", float)],
+                      [("R1 Central-Airport", 15.0)], key="route_name"))
+    loader.load(batch("buses", [col("bus_no"), col("route_id", ref="routes")],
+                      [("BUS100", "R1 Central-Airport")], key="bus_no"))
+
+* A Batch names its table, its columns (Column: name, Python type the values
+  are coerced to, and for a foreign key the table it refers to) and its
+  rows. A ref column holds the referenced row's natural key: the `key` that
+  table was loaded with, one value or a tuple for a composite key (trips
+  are keyed by (bus_id, start_time), so a ticket refers to its trip as
+  ("BUS100", datetime(...))).
+* Ids are not re-queried row by row: the first time a table is referred to,
+  one SELECT of its primary key and key columns fills a {natural key: id}
+  map, and every later reference is a dict lookup. Key columns that are
+  themselves refs are mapped back to natural values, so composite keys
+  compare like the rows were written.
+* Rows go in with executemany in chunks of `chunk_size`; mysql.connector
+  rewrites each chunk into one multi-row INSERT, so a batch of n rows costs
+  about n / chunk_size round trips.
+* A row whose ref does not resolve, a value its column type rejects or a
+  natural key given twice within the batch raises LoadError before
+  anything of the batch is written. That is all the loader checks: keys
+  already in the table, other unique indexes (uq_tickets_trip_seat) and
+  foreign-key columns given as raw ids rather than ref= are left to the
+  database.
+
+load() wraps a list of batches in one transaction, the way bulk_ops runs
+its updates. relax_checks=True runs it under backends.relaxed_checks()
+(foreign keys unchecked on MySQL, deferred to commit on SQLite); only do
+that when every foreign key is a ref= column, as in
+schema.reset_sample_data(), which wipes the tables and reloads them.
+schema.seed_sample_data() and reset_sample_data() use BulkLoader inside
+their own get_conn() unit.
+"""
+
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+
+from . import backends, table_registry
+
+CHUNK_SIZE = 1000
+
+Column = namedtuple("Column", "name type ref")
+Batch = namedtuple("Batch", "table columns rows key")
+LoadReport = namedtuple("LoadReport", "tables rows statements elapsed_ms")
+
+
+class LoadError(ValueError):
+    pass
+
+
+def col(name, type=str, ref=None):
+    return Column(name, type, ref)
+
+
+def batch(table, columns, rows, key=None):
+    """Batch of `rows` (tuples in `columns` order); `key` is the column or tuple of columns
+    other batches refer to this table's rows by"""
+    return Batch(table, tuple(columns), rows, key)
+
+
+def _key_columns(key):
+    return (key,) if isinstance(key, str) else tuple(key)
+
+
+def _natural(values):
+    return values[0] if len(values) == 1 else tuple(values)
+
+
+def _coerce(column, value):
+    if value is None or isinstance(value, column.type):
+        return value
+    return column.type(value)
+
+
+class BulkLoader:
+    """Loads batches through one (dictionary) cursor; remembers natural keys across batches."""
+
+    def __init__(self, cur, chunk_size=CHUNK_SIZE, keys=None):
+        self.cur = cur
+        self.chunk_size = chunk_size
+        # table -> (key columns, {column: referenced table}) of tables refs may point at
+        self._keys = {table: (_key_columns(key), {}) for table, key in (keys or {}).items()}
+        self._ids = {}
+        self.tables = {}
+        self.statements = 0
+        self._started = time.perf_counter()
+
+    def load(self, batch):
+        """Insert the batch's rows; returns how many"""
+        names = [c.name for c in batch.columns]
+        rows = [self._row(batch, i, row) for i, row in enumerate(batch.rows)]
+        if batch.key is not None:
+            self._check_keys(batch, names)
+            self._keys[batch.table] = (_key_columns(batch.key),
+                                       {c.name: c.ref for c in batch.columns if c.ref})
+        sql = f"INSERT INTO {batch.table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))})"
+        for lo in range(0, len(rows), self.chunk_size):
+            self.cur.executemany(sql, rows[lo:lo + self.chunk_size])
+            self.statements += 1
+        # new rows: the table's id map is fetched again on next use
+        self._ids.pop(batch.table, None)
+        self.tables[batch.table] = self.tables.get(batch.table, 0) + len(rows)
+        return len(rows)
+
+    def id(self, table, key):
+        """Primary key of the `table` row with natural key `key`"""
+        try:
+            return self._ids_of(table)[key]
+        except (KeyError, TypeError):
+            raise LoadError(f"{table}: no row with key {key!r}") from None
+
+    def report(self):
+        return LoadReport(dict(self.tables), sum(self.tables.values()), self.statements,
+                          round((time.perf_counter() - self._started) * 1000, 1))
+
+    def _row(self, batch, index, row):
+        if len(row) != len(batch.columns):
+            raise LoadError(f"{batch.table} row {index}: {len(row)} values for {len(batch.columns)} columns")
+        values = []
+        for column, value in zip(batch.columns, row):
+            if column.ref and value is not None:
+                values.append(self.id(column.ref, value))
+                continue
+            try:
+                values.append(_coerce(column, value))
+            except (TypeError, ValueError) as e:
+                raise LoadError(f"{batch.table} row {index}: {column.name}={value!r}: {e}") from None
+        return tuple(values)
+
+    def _check_keys(self, batch, names):
+        positions = [names.index(c) for c in _key_columns(batch.key)]
+        seen = set()
+        for row in batch.rows:
+            key = _natural([row[i] for i in positions])
+            if key in seen:
+                raise LoadError(f"{batch.table}: key {key!r} given twice")
+            seen.add(key)
+
+    def _fetch(self, table):
+        """{natural key: id} of every row of the table, in one SELECT"""
+        if table not in self._keys:
+            raise LoadError(f"{table}: no natural key known (load it with key=... or pass keys=)")
+        columns, refs = self._keys[table]
+        # ids of referenced tables back to their natural keys (fetched first: same cursor)
+        back = {c: {v: k for k, v in self._ids_of(refs[c]).items()} for c in columns if c in refs}
+        pk = table_registry.table(table).pk
+        self.cur.execute(f"SELECT {pk} AS id, {', '.join(columns)} FROM {table}")
+        self.statements += 1
+        ids = {}
+        for row in self.cur.fetchall():
+            values = [back[c].get(row[c]) if c in back else row[c] for c in columns]
+            ids[_natural(values)] = row["id"]
+        return ids
+
+    def _ids_of(self, table):
+        if table not in self._ids:
+            self._ids[table] = self._fetch(table)
+        return self._ids[table]
+
+
+def load(conn, batches, chunk_size=CHUNK_SIZE, relax_checks=False):
+    """Load the batches in order in one transaction (rolled back on any error); a LoadReport"""
+    cur = conn.cursor(dictionary=True)
+    try:
+        loader = BulkLoader(cur, chunk_size)
+        with backends.get().relaxed_checks(cur) if relax_checks else nullcontext():
+            for b in batches:
+                loader.load(b)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return loader.report()
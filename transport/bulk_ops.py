@@ -0,0 +1,168 @@
+"""
+Bulk admin operations: many rows per statement, one transaction per call.
+
+    bulk_update(conn, "buses", [3, 4, 9], {"status": "maintenance"})
+    bulk_update_where(conn, "trips", {"status": "cancelled"},
+                      {"route_id": 2, "start_time": (day_start, day_end), "status": "scheduled"})
+    bulk_delete(conn, "tickets", ticket_ids)
+
+Every call returns a BulkResult (affected rows, elapsed ms, and for
+tickets the (ticket_id, trip_id, seat_no) rows touched, so callers can log
+and publish seat changes). dry_run=True rolls back instead of committing,
+still reporting what would have changed. Id lists are sent in chunks of
+CHUNK_SIZE placeholders, still inside the one transaction.
+
+The `transport-admin bulk ...` commands (transport.cli) wrap these.
+"""
+
+import time
+from collections import namedtuple
+
+from . import table_registry
+
+CHUNK_SIZE = 1000
+
+# table -> columns bulk operations may set or filter on (a subset of the
+# table_registry columns; primary keys come from the registry)
+BULK_TABLES = {
+    "buses": ("status", "route_id", "fare_id", "ac", "type"),
+    "drivers": ("is_active", "salary"),
+    "trips": ("status", "route_id", "bus_id", "driver_id", "start_time", "end_time", "frequency"),
+    "tickets": ("trip_id", "fare", "gender"),
+}
+
+BulkResult = namedtuple("BulkResult", "table action affected elapsed_ms tickets")
+
+
+class BulkError(ValueError):
+    pass
+
+
+def _table(table, columns=()):
+    if table not in BULK_TABLES:
+        raise BulkError(f"bulk operations are not supported on {table!r}")
+    pk, allowed = table_registry.table(table).pk, BULK_TABLES[table]
+    bad = [c for c in columns if c not in allowed and c != pk]
+    if bad:
+        raise BulkError(f"{table}: column(s) not allowed in bulk operations: {', '.join(bad)}")
+    return pk
+
+
+def _chunks(ids):
+    ids = list(dict.fromkeys(ids))
+    for i in range(0, len(ids), CHUNK_SIZE):
+        yield ids[i:i + CHUNK_SIZE]
+
+
+def _where(filters):
+    """{col: value | [values] | (lo, hi)} -> ("a=%s AND b IN (%s,%s) AND c >= %s AND c < %s", params).
+    Tuples are half-open ranges; a None bound is left open."""
+    clauses, params = [], []
+    for col, value in filters.items():
+        if isinstance(value, tuple):
+            lo, hi = value
+            if lo is not None:
+                clauses.append(f"{col} >= %s"); params.append(lo)
+            if hi is not None:
+                clauses.append(f"{col} < %s"); params.append(hi)
+        elif isinstance(value, list):
+            if not value:
+                clauses.append("FALSE")
+                continue
+            clauses.append(f"{col} IN ({','.join(['%s'] * len(value))})"); params.extend(value)
+        elif value is None:
+            clauses.append(f"{col} IS NULL")
+        else:
+            clauses.append(f"{col} = %s"); params.append(value)
+    return " AND ".join(clauses), params
+
+
+def _run(conn, table, action, work, dry_run):
+    started = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        affected, tickets = work(cur)
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return BulkResult(table, action, affected, round((time.perf_counter() - started) * 1000, 1), tickets)
+
+
+def _ticket_rows(cur, where, params):
+    cur.execute(f"SELECT ticket_id, trip_id, seat_no FROM tickets WHERE {where} FOR UPDATE", params)
+    return [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cur.fetchall()]
+
+
+def bulk_update(conn, table, ids, changes, dry_run=False):
+    """UPDATE table SET changes WHERE pk IN (ids)."""
+    if not changes:
+        raise BulkError("nothing to update")
+    pk = _table(table, changes)
+    assignments = ", ".join(f"{col}=%s" for col in changes)
+
+    def work(cur):
+        affected, tickets = 0, [] if table == "tickets" else None
+        for chunk in _chunks(ids):
+            marks = ",".join(["%s"] * len(chunk))
+            if tickets is not None:
+                tickets.extend(_ticket_rows(cur, f"ticket_id IN ({marks})", chunk))
+            cur.execute(f"UPDATE {table} SET {assignments} WHERE {pk} IN ({marks})",
+                        list(changes.values()) + chunk)
+            affected += cur.rowcount
+        return affected, tickets
+
+    return _run(conn, table, "update", work, dry_run)
+
+
+def bulk_update_where(conn, table, changes, filters, dry_run=False):
+    """Set-based UPDATE by predicate (see _where for the filter forms); filters are required."""
+    if not changes or not filters:
+        raise BulkError("bulk_update_where needs both changes and filters")
+    _table(table, list(changes) + list(filters))
+    assignments = ", ".join(f"{col}=%s" for col in changes)
+    where, params = _where(filters)
+
+    def work(cur):
+        tickets = _ticket_rows(cur, where, params) if table == "tickets" else None
+        cur.execute(f"UPDATE {table} SET {assignments} WHERE {where}", list(changes.values()) + params)
+        return cur.rowcount, tickets
+
+    return _run(conn, table, "update", work, dry_run)
+
+
+def bulk_delete(conn, table, ids, dry_run=False):
+    """DELETE FROM table WHERE pk IN (ids)."""
+    pk = _table(table)
+
+    def work(cur):
+        affected, tickets = 0, [] if table == "tickets" else None
+        for chunk in _chunks(ids):
+            marks = ",".join(["%s"] * len(chunk))
+            if tickets is not None:
+                tickets.extend(_ticket_rows(cur, f"ticket_id IN ({marks})", chunk))
+            cur.execute(f"DELETE FROM {table} WHERE {pk} IN ({marks})", chunk)
+            affected += cur.rowcount
+        return affected, tickets
+
+    return _run(conn, table, "delete", work, dry_run)
+
+
+def bulk_delete_where(conn, table, filters, dry_run=False):
+    """Set-based DELETE by predicate; filters are required."""
+    if not filters:
+        raise BulkError("bulk_delete_where needs filters")
+    _table(table, filters)
+    where, params = _where(filters)
+
+    def work(cur):
+        tickets = _ticket_rows(cur, where, params) if table == "tickets" else None
+        cur.execute(f"DELETE FROM {table} WHERE {where}", params)
+        return cur.rowcount, tickets
+
+    return _run(conn, table, "delete", work, dry_run)
@@ -0,0 +1,307 @@
+"""
+transport-admin: batch jobs over the transport data layer.
+
+    transport-admin init                          create tables/triggers, seed if empty
+    transport-admin seed                          seed sample data (only into empty tables)
+    transport-admin seed --reset                  delete all rows but users and load the sample data again
+    transport-admin expand-trips 2026-11-01 2026-11-30 [--dry-run]
+    transport-admin export tickets --format csv -o tickets.csv
+    transport-admin report revenue --by route --from 2026-10-01 --to 2026-10-31
+    transport-admin report refresh [--full]
+    transport-admin bulk update buses 3,4,9 status=maintenance [--dry-run]
+    transport-admin bulk update-where trips status=cancelled --where route_id=2 --day 2026-10-20
+    transport-admin bulk delete tickets 101,102
+    transport-admin passengers dedupe [--chunk 500] [--dry-run]
+    transport-admin stops import-coords stops.csv [--dry-run]
+    transport-admin stops nearest 12.9716 77.5946 [-k 5] [--within 1.5]
+    transport-admin serve --port 8080             HTTP JSON API (see transport.api)
+
+`--sqlite FILE` runs any command against an embedded SQLite database
+instead of the MySQL server (transport-admin --sqlite depot.db init).
+
+Also runnable as `python -m transport`. Command modules are imported only
+when their command runs, so cron jobs do not pay for the whole data layer
+(or pandas) just to parse arguments.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+EXPORT_TABLES = ("buses", "drivers", "routes", "stops", "route_stops", "trips", "passengers",
+                 "tickets", "path", "major_stops", "ticket_log", "waitlist", "waitlist_log")
+
+
+def _day(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def _value(text):
+    if text.lower() == "null":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _pairs(items):
+    out = {}
+    for item in items or ():
+        col, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"expected column=value, got {item!r}")
+        out[col] = [_value(v) for v in value.split("|")] if "|" in value else _value(value)
+    return out
+
+
+def _ids(text):
+    return [int(i) for i in text.split(",") if i.strip()]
+
+
+# --------------------------- commands ---------------------------
+def cmd_init(args):
+    from .schema import initialize_database_and_schema
+    initialize_database_and_schema()
+    print("schema ready")
+
+
+def cmd_seed(args):
+    from .schema import reset_sample_data, seed_sample_data
+    report = reset_sample_data() if args.reset else seed_sample_data()
+    if report is not None:
+        print(f"loaded {report.rows} rows in {report.statements} statements ({report.elapsed_ms} ms): "
+              + ", ".join(f"{table} {n}" for table, n in report.tables.items()))
+
+
+def cmd_expand_trips(args):
+    from .crud import expand_recurring_trips
+    created, skipped = expand_recurring_trips(args.first_day, args.last_day, dry_run=args.dry_run)
+    for route_id, start, note in skipped:
+        print(f"skipped route {route_id} @ {start:%Y-%m-%d %H:%M}: {note}", file=sys.stderr)
+    verb = "would create" if args.dry_run else "created"
+    print(f"{verb} {len(created)} trip(s), skipped {len(skipped)}")
+
+
+def cmd_export(args):
+    from .db import get_conn, json_default
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    count = 0
+    try:
+        # a "report" query: a whole-table read may take a while, and each fetch
+        # (not the writing in between) is what runs under the deadline
+        with get_conn(read_only=True, query_class="report") as (conn, cur):
+            cur.execute(f"SELECT * FROM {args.table}")
+            columns = [d[0] for d in cur.description]
+            writer = csv.DictWriter(out, fieldnames=columns) if args.format == "csv" else None
+            if writer:
+                writer.writeheader()
+            # stream in batches instead of loading the whole table
+            while True:
+                rows = cur.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    if writer:
+                        writer.writerow(row)
+                    else:
+                        out.write(json.dumps(row, default=json_default) + "\n")
+                count += len(rows)
+    finally:
+        if args.output:
+            out.close()
+    print(f"exported {count} {args.table} row(s)", file=sys.stderr)
+
+
+def cmd_report_revenue(args):
+    from .crud import revenue_report
+    rows = revenue_report(args.by, args.first_day, args.last_day)
+    writer = csv.writer(sys.stdout)
+    writer.writerow([args.by, "name", "tickets", "revenue"])
+    for r in rows:
+        writer.writerow([r["id"], r["name"], r["tickets"], r["revenue"]])
+
+
+def cmd_report_refresh(args):
+    from .db import connect_db
+    from .reporting import refresh_reports
+    conn = connect_db()
+    try:
+        stats = refresh_reports(conn, full=args.full)
+    finally:
+        conn.close()
+    if stats is None:
+        print("another process is refreshing the reports; nothing done")
+    else:
+        print(f"{stats['mode']} refresh: {stats['dirty_days']} day(s) recomputed in {stats['duration_ms']} ms")
+
+
+def cmd_bulk(args):
+    from . import bulk_ops
+    from .crud import run_bulk
+    if args.command == "update":
+        changes = _pairs(args.set)
+        result = run_bulk(bulk_ops.bulk_update, args.table, _ids(args.ids), changes,
+                          new_trip_id=changes.get("trip_id"), dry_run=args.dry_run)
+    elif args.command == "delete":
+        result = run_bulk(bulk_ops.bulk_delete, args.table, _ids(args.ids), dry_run=args.dry_run)
+    else:
+        filters = _pairs(args.where)
+        if args.day:
+            day = datetime.combine(args.day, datetime.min.time())
+            filters["start_time"] = (day, day + timedelta(days=1))
+        result = run_bulk(bulk_ops.bulk_update_where, args.table, _pairs(args.set), filters, dry_run=args.dry_run)
+    note = " (dry run, rolled back)" if args.dry_run else ""
+    print(f"{result.action} {result.table}: {result.affected} row(s) in {result.elapsed_ms} ms{note}")
+
+
+def cmd_passengers_dedupe(args):
+    from .crud import dedupe_passengers
+    r = dedupe_passengers(args.chunk, args.dry_run)
+    note = " (dry run, nothing written)" if args.dry_run else ""
+    shrink = 100 * (r.passengers_before - r.passengers_after) / r.passengers_before if r.passengers_before else 0
+    print(f"passengers: {r.passengers_before} -> {r.passengers_after} row(s) (-{shrink:.1f}%){note}")
+    print(f"merged {r.rows_merged} duplicate(s) of {r.contacts_merged} contact(s), "
+          f"repointed {r.tickets_repointed} ticket(s), backfilled {r.keys_backfilled} key(s)")
+    print(f"{r.chunks} chunk(s) in {r.elapsed_ms} ms" + ("; unique contact index created" if r.index_created else ""))
+
+
+def cmd_stops_import(args):
+    from .crud import import_stop_coordinates
+    with open(args.file, newline="", encoding="utf-8") as f:
+        r = import_stop_coordinates(f, args.dry_run)
+    note = " (dry run, rolled back)" if args.dry_run else ""
+    print(f"{r.rows} row(s): {r.updated} stop(s) geocoded in {r.elapsed_ms} ms{note}")
+    if r.unmatched or r.ambiguous or r.invalid:
+        print(f"skipped: {r.unmatched} unmatched, {r.ambiguous} ambiguous name(s), {r.invalid} invalid coordinate(s)")
+
+
+def cmd_stops_nearest(args):
+    from .crud import nearest_stops, stops_within
+    if args.within is not None:
+        stops = stops_within(args.latitude, args.longitude, args.within, args.k)
+    else:
+        stops = nearest_stops(args.latitude, args.longitude, args.k or 5)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["stop_id", "stop_name", "location", "distance_km"])
+    for s in stops:
+        writer.writerow([s["stop_id"], s["stop_name"], s["location"], s["distance_km"]])
+
+
+def cmd_serve(args):
+    from . import api
+    from .crud import get_waitlist_worker
+    from .schema import ensure_database_initialized
+    ensure_database_initialized()
+    get_waitlist_worker()
+    api.serve(args.host, args.port, args.workers)
+
+
+# --------------------------- parser ---------------------------
+def build_parser():
+    parser = argparse.ArgumentParser(prog="transport-admin", description="Batch jobs for the transport database.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only log warnings and errors")
+    parser.add_argument("--timing", action="store_true", help="print how long the command took")
+    parser.add_argument("--sqlite", metavar="FILE", help="use an embedded SQLite database instead of MySQL")
+    sub = parser.add_subparsers(dest="group", required=True)
+
+    sub.add_parser("init", help="create tables, triggers and report tables; seed if empty").set_defaults(func=cmd_init)
+    p = sub.add_parser("seed", help="insert sample data into empty tables")
+    p.add_argument("--reset", action="store_true", help="delete every row first (all tables but users)")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("expand-trips", help="materialize daily/weekday/weekend trips over a date range")
+    p.add_argument("first_day", type=_day)
+    p.add_argument("last_day", type=_day)
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(func=cmd_expand_trips)
+
+    p = sub.add_parser("export", help="stream a table as CSV or JSON lines")
+    p.add_argument("table", choices=EXPORT_TABLES)
+    p.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    p.add_argument("-o", "--output", help="file to write (default: stdout)")
+    p.set_defaults(func=cmd_export)
+
+    report = sub.add_parser("report", help="materialized revenue/ridership reports").add_subparsers(
+        dest="command", required=True)
+    p = report.add_parser("revenue", help="revenue and tickets per route/bus/driver/day (CSV)")
+    p.add_argument("--by", choices=("route", "bus", "driver", "day"), default="route")
+    p.add_argument("--from", dest="first_day", type=_day, default=date.today() - timedelta(days=30))
+    p.add_argument("--to", dest="last_day", type=_day, default=date.today())
+    p.set_defaults(func=cmd_report_revenue)
+    p = report.add_parser("refresh", help="bring the report tables up to date now")
+    p.add_argument("--full", action="store_true", help="rebuild from scratch")
+    p.set_defaults(func=cmd_report_refresh)
+
+    tables = ("buses", "drivers", "trips", "tickets")
+    bulk = sub.add_parser("bulk", help="multi-row update/delete in one transaction").add_subparsers(
+        dest="command", required=True)
+    p = bulk.add_parser("update", help="update rows by id")
+    p.add_argument("table", choices=tables)
+    p.add_argument("ids", help="comma-separated ids")
+    p.add_argument("set", nargs="+", metavar="column=value")
+    p = bulk.add_parser("update-where", help="update rows matching a predicate")
+    p.add_argument("table", choices=tables)
+    p.add_argument("set", nargs="+", metavar="column=value")
+    p.add_argument("--where", action="append", metavar="column=value[|value...]")
+    p.add_argument("--day", type=_day, help="only trips starting on this day")
+    p = bulk.add_parser("delete", help="delete rows by id")
+    p.add_argument("table", choices=tables)
+    p.add_argument("ids", help="comma-separated ids")
+    for p in bulk.choices.values():
+        p.add_argument("--dry-run", action="store_true", help="roll back instead of committing")
+        p.set_defaults(func=cmd_bulk)
+
+    passengers = sub.add_parser("passengers", help="passenger identity maintenance").add_subparsers(
+        dest="command", required=True)
+    p = passengers.add_parser("dedupe", help="merge passengers sharing a contact number, repointing their tickets")
+    p.add_argument("--chunk", type=int, default=500, help="passengers per transaction")
+    p.add_argument("--dry-run", action="store_true", help="report what would be merged")
+    p.set_defaults(func=cmd_passengers_dedupe)
+
+    stops = sub.add_parser("stops", help="stop coordinates and nearest-stop lookup").add_subparsers(
+        dest="command", required=True)
+    p = stops.add_parser("import-coords", help="set stop coordinates from a CSV "
+                                               "(stop_id or stop_name, latitude, longitude)")
+    p.add_argument("file")
+    p.add_argument("--dry-run", action="store_true", help="report what would be updated")
+    p.set_defaults(func=cmd_stops_import)
+    p = stops.add_parser("nearest", help="nearest geocoded stops to a point (CSV)")
+    p.add_argument("latitude", type=float)
+    p.add_argument("longitude", type=float)
+    p.add_argument("-k", type=int, help="how many stops (default 5; with --within: at most, default all)")
+    p.add_argument("--within", type=float, metavar="KM", help="every stop within this radius instead")
+    p.set_defaults(func=cmd_stops_nearest)
+
+    from .config import API_HOST, API_PORT, API_WORKERS
+    p = sub.add_parser("serve", help="run the HTTP JSON API (trip search, seats, booking, ticket lookup)")
+    p.add_argument("--host", default=API_HOST)
+    p.add_argument("--port", type=int, default=API_PORT)
+    p.add_argument("--workers", type=int, default=API_WORKERS, help="threads running queries")
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.group == "bulk" and args.command == "update-where" and not (args.where or args.day):
+        parser.error("bulk update-where needs --where and/or --day (it never updates a whole table)")
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
+    if args.sqlite:
+        from . import config
+        config.DB_BACKEND, config.SQLITE_PATH = "sqlite", args.sqlite
+    started = time.perf_counter()
+    args.func(args)
+    if args.timing:
+        print(f"done in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
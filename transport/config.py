@@ -0,0 +1,117 @@
+"""
+Database and background-job settings shared by the Streamlit app and the
+transport-admin CLI.
+"""
+
+import os
+
+# the project directory (holding app.py): relative data files live here, not
+# in whatever directory the process was started from
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "mysql":  the server in DB_CONFIG (default)
+# "sqlite": embedded database file at SQLITE_PATH, no server needed; for
+#           single-node depots, demos and in-process tests/benchmarks
+DB_BACKEND = "mysql"
+SQLITE_PATH = "transport.sqlite3"
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "tp_user",
+    "password": "root", 
+    "database": "transport_db"
+}
+
+# "trigger": ticket_log rows are written by the after_ticket_* triggers inside the
+#            booking transaction (original behaviour).
+# "async":   the app queues lifecycle events and a background thread batch-writes
+#            them; the triggers stay in place as a fallback for writes made outside
+#            the app (SQL console, scripts). MySQL only: on SQLite the
+#            triggers always log (they run in-process, nothing to save).
+TICKET_LOG_MODE = "trigger"
+# Rows the async writer cannot write are spooled here and replayed at next
+# start, so a run from another working directory still finds them
+TICKET_LOG_SPOOL_PATH = os.path.join(PROJECT_DIR, "ticket_log.spool")
+
+# Connections kept open per process; also the number of queries a page can
+# run concurrently through fetch_all_concurrent()/gather_queries().
+DB_POOL_SIZE = 8
+
+# A pooled connection idle for longer than this is pinged before reuse; one
+# used more recently is handed out as is (a dead one fails its query and is
+# discarded then)
+DB_POOL_PING_AFTER_SECONDS = 30
+
+# Query classes (see transport/query_guard.py):
+#   class: (statement timeout s, max concurrent statements, max wait for a slot s)
+# A limit of None is never queued or shed. The limited classes together use at
+# most DB_POOL_SIZE - BOOKING_RESERVE connections, so bookings always find one;
+# public reads wait the least and are shed first under overload. A timeout of
+# None arms no deadline: "maintenance" is the schema bootstrap and its
+# migrations, whose index builds on a large table take as long as they take.
+QUERY_CLASSES = {
+    "booking": (10, None, None),
+    "staff": (30, 6, 5),
+    "report": (120, 2, 30),
+    "public": (5, 4, 0.5),
+    "maintenance": (None, None, None),
+}
+BOOKING_RESERVE = 2
+
+# How book_ticket() keeps two bookings off one seat (transport/seat_inventory.py):
+# "optimistic": a per-trip remaining-seat counter taken with a conditional
+#               UPDATE plus a unique (trip_id, seat_no) index; nothing is held
+#               between bookings and it is safe across processes.
+# "locked":     re-check the seat map and insert under a per-trip lock (one
+#               process only; bookings for a trip wait for each other).
+BOOKING_MODE = "optimistic"
+# optimistic attempts (each a short transaction) before "busy, please retry"
+BOOKING_RETRIES = 8
+
+# The waitlist backfill worker reacts to freed seats at once; every this many
+# seconds it also expires entries of departed trips and retries every trip
+# with waiting entries (seats freed where no event reached this process)
+WAITLIST_SWEEP_SECONDS = 30
+
+# "My Tickets" (transport/ticket_lookup.py): tickets per page (the API accepts
+# up to TICKET_PAGE_MAX), pages cached per process and for how long at most
+# (bookings made here invalidate them at once; the age bounds writes made by
+# other processes), and lookups one session or API client may make:
+# TICKET_LOOKUP_RATE per second on average, TICKET_LOOKUP_BURST at once
+TICKET_PAGE_SIZE = 20
+TICKET_PAGE_MAX = 100
+TICKET_LOOKUP_CACHE_SIZE = 4096
+TICKET_LOOKUP_CACHE_SECONDS = 30
+TICKET_LOOKUP_RATE = 1.0
+TICKET_LOOKUP_BURST = 10
+
+# Read replicas for read-only helpers (list_*, search, reports).
+# Each entry overrides DB_CONFIG keys, e.g. {"host": "replica1.local"}; empty
+# means every query goes to the primary. Writes and seat checks always do.
+DB_REPLICAS = []
+
+# After a write, the session keeps reading from the primary for this long so
+# it sees its own booking even if the replicas lag behind (read-your-writes)
+READ_YOUR_WRITES_SECONDS = 15
+
+# Materialized report tables: incremental refresh interval (a full rebuild
+# runs every REPORT_FULL_EVERY refreshes, or on demand from "Reports")
+REPORT_REFRESH_SECONDS = 60
+REPORT_FULL_EVERY = 60
+
+# Dashboard/overview pages show a snapshot recomputed in the background this
+# often, so their numbers are at most this (plus one refresh) seconds old
+DASHBOARD_REFRESH_SECONDS = 15
+
+# HTTP JSON API (`transport-admin serve`). Requests run on API_WORKERS threads,
+# so at most that many hold a pooled connection at once; idle keep-alive
+# connections are closed after API_KEEPALIVE_SECONDS.
+API_HOST = "127.0.0.1"
+API_PORT = 8080
+API_WORKERS = DB_POOL_SIZE
+API_KEEPALIVE_SECONDS = 15
+
+DEMO_USERS = [
+    ("admin", "admin123", "admin"),
+    ("operator1", "oper123", "operator"),
+]
@@ -0,0 +1,71 @@
+"""
+Process singletons and the hooks a UI plugs into the data layer.
+
+transport never imports Streamlit. app.py installs its hooks at startup:
+
+    context.install(session=..., notify=..., bind_worker=...)
+
+* session()          -> the current user's state mapping, or None outside a
+                        page (CLI, cron jobs, background threads); per-session
+                        features (query memo, read-your-writes, seat maps)
+                        switch off when it is None
+* notify(level, msg) -> user-facing messages ("info", "success", "warning",
+                        "error"); logged to the `transport` logger by default
+* bind_worker(fn)    -> wrap fn to run on a pool worker thread (the UI binds
+                        its page context there)
+
+@resource replaces st.cache_resource: one shared instance per process.
+"""
+
+import functools
+import logging
+import threading
+
+logger = logging.getLogger("transport")
+
+_LEVELS = {"info": logging.INFO, "success": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+_hooks = {
+    "session": lambda: None,
+    "notify": lambda level, message: logger.log(_LEVELS.get(level, logging.INFO), message),
+    "bind_worker": lambda fn: fn,
+}
+
+
+def install(session=None, notify=None, bind_worker=None):
+    for name, hook in (("session", session), ("notify", notify), ("bind_worker", bind_worker)):
+        if hook is not None:
+            _hooks[name] = hook
+
+
+def session():
+    return _hooks["session"]()
+
+
+def notify(level, message):
+    _hooks["notify"](level, message)
+
+
+def bind_worker(fn):
+    return _hooks["bind_worker"](fn)
+
+
+def resource(fn):
+    """Cache fn(*args) for the life of the process (thread-safe, built once)."""
+    instances = {}
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def get(*args):
+        try:
+            return instances[args]
+        except KeyError:
+            pass
+        with lock:
+            if args not in instances:
+                instances[args] = fn(*args)
+            return instances[args]
+
+    get.exists = lambda *args: args in instances
+    get.clear = instances.clear
+    return get
@@ -0,0 +1,866 @@
+"""
+Login, CRUD, seat-map, scheduling, bulk and report helpers used by every
+page of the app and by the transport-admin CLI.
+"""
+
+import contextlib
+import random
+import threading
+from datetime import datetime, time, timedelta
+
+from . import (auth, backends, bulk_ops, config, context, dashboard, passenger_identity, queries, reporting,
+               seat_inventory, stop_geo, table_registry, ticket_lookup, waitlist)
+from .db import (connect_db, get_conn, fetch_all, log_ticket_event,
+                 get_tag_versions, invalidate_queries)
+from .config import (BOOKING_RETRIES, DASHBOARD_REFRESH_SECONDS, REPORT_FULL_EVERY, REPORT_REFRESH_SECONDS,
+                     TICKET_LOOKUP_BURST, TICKET_LOOKUP_CACHE_SECONDS, TICKET_LOOKUP_CACHE_SIZE,
+                     TICKET_LOOKUP_RATE, TICKET_PAGE_SIZE, WAITLIST_SWEEP_SECONDS)
+from .queries import TICKETS_BY_CONTACT_SQL
+from .query_guard import workload
+from .route_topology import RouteTopologyCache, ROUTE_TOPOLOGY_SQL
+from .seat_feed import SeatFeed, SeatMap, TicketLogPoller, BOOKED, RELEASED
+from .stop_geo import StopIndexCache, COORDS_SQL
+from .ticket_log_writer import ACTION_ISSUED, ACTION_UPDATED, ACTION_DELETED
+from .timetable import TimetableCache, TIMETABLE_SQL
+from .trip_scheduler import BLOCKING_STATUSES, TripScheduler, SCHEDULE_SQL
+
+# --------------------------- AUTH HELPERS ---------------------------
+def hash_password(plain):
+    return auth.hash_password(plain)
+
+@context.resource
+def get_credential_cache():
+    """Recently verified logins, shared by all sessions of this process. A user
+    changed outside this process can still log in the old way for up to ttl
+    (300 s)."""
+    return auth.CredentialCache(maxsize=1024, ttl=300)
+
+USER_LOGIN_SQL = "SELECT user_id, username, role, password_hash FROM users WHERE username=%s"
+
+def authenticate(username, password):
+    cache = get_credential_cache()
+    user = cache.get(username, password)
+    if user:
+        return user
+    with get_conn() as (conn, cur):
+        cur.execute(USER_LOGIN_SQL, (username,))
+        row = cur.fetchone()
+        if not row:
+            auth.verify_unknown_user(password)
+            return None
+        ok, needs_rehash = auth.verify_password(password, row["password_hash"])
+        if not ok:
+            return None
+        if needs_rehash:
+            # legacy SHA-256 (or old cost factor): upgrade in place, unless changed meanwhile
+            cur.execute("UPDATE users SET password_hash=%s WHERE user_id=%s AND password_hash=%s",
+                        (auth.hash_password(password), row["user_id"], row["password_hash"]))
+    user = {"user_id": row["user_id"], "username": row["username"], "role": row["role"]}
+    cache.put(username, password, user)
+    return user
+
+def register_user(username, password, role="operator"):
+    # single statement: the UNIQUE(username) key decides, no check-then-insert race.
+    # A plain INSERT, not INSERT IGNORE: that would also hide truncation and bad
+    # role values as "already exists" (and SQLite has no such syntax).
+    password_hash = hash_password(password)
+    with get_conn() as (conn, cur):
+        try:
+            cur.execute("INSERT INTO users (username,password_hash,role) VALUES (%s,%s,%s)",
+                        (username, password_hash, role))
+        except Exception as e:
+            if not backends.get().is_duplicate(e):
+                raise
+            return False, "Username already exists."
+    get_credential_cache().forget_user(username)
+    return True, "User created."
+
+# --------------------------- CRUD HELPERS ---------------------------
+def list_buses(): 
+    return fetch_all(queries.LIST_BUSES_SQL, read_only=True)
+
+def list_drivers(): 
+    return fetch_all(queries.LIST_DRIVERS_SQL, read_only=True)
+
+def list_routes(): 
+    return fetch_all(queries.LIST_ROUTES_SQL, read_only=True)
+
+def list_stops(): 
+    return fetch_all(queries.LIST_STOPS_SQL, read_only=True)
+
+def list_trips(): 
+    return fetch_all(queries.LIST_TRIPS_SQL, read_only=True)
+
+def list_tickets():
+    return fetch_all(queries.LIST_TICKETS_SQL, read_only=True)
+
+def tickets_by_contact_query(contact_no):
+    """(sql, params) for the tickets of a contact number in any format ("+91 98765 43210")"""
+    return TICKETS_BY_CONTACT_SQL, (passenger_identity.normalize_contact(contact_no),)
+
+def list_tickets_by_contact(contact_no):
+    """Every ticket booked under a contact number, newest first (unpaged: "My Tickets" uses lookup_tickets)"""
+    return fetch_all(*tickets_by_contact_query(contact_no), read_only=True)
+
+@context.resource
+def get_ticket_lookup_cache():
+    """Process-wide cache of "My Tickets" pages, invalidated through the query tags"""
+    return ticket_lookup.LookupCache(get_tag_versions(), TICKET_LOOKUP_CACHE_SIZE, TICKET_LOOKUP_CACHE_SECONDS)
+
+@context.resource
+def get_ticket_rate_limiter():
+    """Lookup token buckets of callers without a session (API clients)"""
+    return ticket_lookup.RateLimiter(TICKET_LOOKUP_RATE, TICKET_LOOKUP_BURST)
+
+def check_lookup_rate(client=None):
+    """Spend one ticket lookup of `client` (an API peer address) or, with None,
+    of the current session; RateLimited when none is left. Unlimited outside
+    a session (CLI, scripts)."""
+    if client is not None:
+        get_ticket_rate_limiter().check(client)
+        return
+    state = context.session()
+    if state is not None:
+        if "ticket_lookup_bucket" not in state:
+            state["ticket_lookup_bucket"] = ticket_lookup.TokenBucket(TICKET_LOOKUP_RATE, TICKET_LOOKUP_BURST)
+        state["ticket_lookup_bucket"].check()
+
+def lookup_tickets(contact_no, cursor=None, limit=TICKET_PAGE_SIZE, client=None):
+    """One page of the tickets booked under a contact number, newest first
+    ("My Tickets"): TicketPage(tickets, next_cursor), next_cursor None on the
+    last page. Rate limited per client (check_lookup_rate); pages come from
+    the shared cache until a write touches the contact. Reads the primary,
+    so a cached page is never behind a lagging replica."""
+    check_lookup_rate(client)
+    key = passenger_identity.normalize_contact(contact_no)
+    if key is None:
+        return ticket_lookup.TicketPage([], None)
+    sql, params = ticket_lookup.page_query(key, cursor, limit)
+    return get_ticket_lookup_cache().get(
+        (key, cursor, limit), ticket_lookup.lookup_tags(key),
+        lambda: ticket_lookup.to_page(fetch_all(sql, params, query_class="public"), limit))
+
+def available_trips_query(route_id=None, day=None):
+    """SQL and params for scheduled trips from today on, optionally for one route and/or one day"""
+    where, params = ["t.status = 'scheduled'", "DATE(t.start_time) >= %s"], [datetime.now().date()]
+    if route_id is not None:
+        where.append("t.route_id = %s")
+        params.append(route_id)
+    if day is not None:
+        # a range on start_time rather than DATE(start_time) = day, so an index can serve it
+        where.append("t.start_time >= %s AND t.start_time < %s")
+        start = datetime.combine(day, time.min)
+        params += [start, start + timedelta(days=1)]
+    return f"""
+        SELECT t.*, r.route_name, b.bus_no, b.type, b.ac, 
+               CONCAT(d.first_name,' ',d.last_name) AS driver_name
+        FROM trips t
+        LEFT JOIN routes r ON t.route_id=r.route_id
+        LEFT JOIN buses b ON t.bus_id=b.bus_id
+        LEFT JOIN drivers d ON t.driver_id=d.driver_id
+        WHERE {" AND ".join(where)}
+        ORDER BY t.start_time ASC
+    """, tuple(params)
+
+def list_available_trips(route_id=None, limit=None):
+    """Trips scheduled for today or later (optionally one route's first `limit`),
+    served from the in-memory timetable"""
+    return timetable().trips(route_id, limit=limit)
+
+@context.resource
+def get_timetable_cache():
+    """Process-wide compact timetable of scheduled trips (survives Streamlit reruns)"""
+    return TimetableCache()
+
+def _timetable_rows(since, trip_ids=None):
+    sql, params = TIMETABLE_SQL, [since]
+    if trip_ids:
+        sql += f" AND t.trip_id IN ({','.join(['%s'] * len(trip_ids))})"
+        params += trip_ids
+    # primary, not a replica: an incremental reload must see the write it follows
+    return fetch_all(sql, params)
+
+def timetable():
+    return get_timetable_cache().get(get_tag_versions().snapshot(TRIP_LIST_TAGS), _timetable_rows)
+
+def note_trip_changes(*trip_ids):
+    """Tell the timetable which trips a write touched; call just before invalidate_queries("trips")"""
+    get_timetable_cache().note(trip_ids)
+
+@context.resource
+def get_route_topology_cache():
+    """Process-wide route topology cache (survives Streamlit reruns)."""
+    return RouteTopologyCache()
+
+def route_topology():
+    """Route/stop topology index, loaded with one bulk query until invalidated"""
+    return get_route_topology_cache().get(lambda: fetch_all(ROUTE_TOPOLOGY_SQL))
+
+def invalidate_route_topology():
+    """Call after any write to stops or route_stops (drops the nearest-stop index too)"""
+    get_route_topology_cache().invalidate()
+    get_stop_index_cache().invalidate()
+
+@context.resource
+def get_stop_index_cache():
+    """Process-wide nearest-stop index (survives Streamlit reruns)."""
+    return StopIndexCache()
+
+def stop_index():
+    """k-d tree of the geocoded stops, loaded with one query until invalidated"""
+    return get_stop_index_cache().get(lambda: fetch_all(COORDS_SQL))
+
+def nearest_stops(latitude, longitude, k=5, max_km=None):
+    """The k geocoded stops nearest to a point, nearest first, each with its distance_km.
+    Raises stop_geo.CoordinateError for a point off the map."""
+    latitude, longitude = stop_geo.check_coordinates(latitude, longitude)
+    return stop_index().nearest(latitude, longitude, k, max_km)
+
+def stops_within(latitude, longitude, radius_km, limit=None):
+    """Geocoded stops within radius_km of a point, nearest first"""
+    latitude, longitude = stop_geo.check_coordinates(latitude, longitude)
+    return stop_index().within(latitude, longitude, radius_km, limit)
+
+def import_stop_coordinates(lines, dry_run=False):
+    """Bulk-set stop coordinates from CSV lines (stop_id or stop_name, latitude, longitude)"""
+    with get_conn() as (conn, _):
+        report = stop_geo.import_coordinates(conn, stop_geo.read_csv(lines), dry_run=dry_run)
+    if report.updated and not dry_run:
+        invalidate_route_topology()
+        invalidate_queries("stops")
+    return report
+
+def get_route_stops(route_id):
+    """Get stops for a specific route in order"""
+    return route_topology().stops_for_route(route_id)
+
+def calculate_fare(boarding_stop_id, dropping_stop_id, bus_type, is_ac):
+    """Calculate fare based on stops and bus type"""
+    base_fare = 20.0
+    if bus_type.lower() == "ac" or is_ac:
+        base_fare += 10.0
+    return base_fare + random.randint(5, 15)
+
+# memo() tags for the trip list and a trip's seat map
+TRIP_LIST_TAGS = ("trips", "routes", "buses", "drivers")
+
+def seat_tags(trip_id):
+    return (f"tickets:trip={trip_id}", "trips", "buses")
+
+@context.resource
+def get_seat_feed():
+    """Process-wide seat change feed, plus the ticket_log poller that feeds it
+    changes made outside this process."""
+    feed = SeatFeed()
+    TicketLogPoller(connect_db, feed).start()
+    return feed
+
+def publish_seat_change(trip_id, kind, seat_no=None, ticket_id=None, action=None):
+    """Tell live seat maps about a booking change; `action` is the ticket_log
+    row the change wrote, which the poller then skips. No feed yet means no
+    seat map is following one (and none in CLI runs), so there is nothing to tell."""
+    if get_seat_feed.exists():
+        get_seat_feed().publish(trip_id, kind, seat_no, ticket_id, action)
+
+@context.resource
+def get_report_refresher():
+    """Process-wide background refresher for the report_* tables"""
+    return reporting.ReportRefresher(connect_db, interval=REPORT_REFRESH_SECONDS,
+                                     full_every=REPORT_FULL_EVERY).start()
+
+@context.resource
+def get_dashboard_refresher():
+    """Process-wide dashboard snapshot, recomputed every DASHBOARD_REFRESH_SECONDS"""
+    compute = lambda: dashboard.compute_snapshot(
+        lambda sql, params: fetch_all(sql, params, read_only=True, query_class="report"), available_trips_query())
+    return dashboard.DashboardRefresher(compute, interval=DASHBOARD_REFRESH_SECONDS).start()
+
+def report_refresh_state():
+    rows = fetch_all(reporting.REFRESH_STATE_SQL)
+    return rows[0] if rows else None
+
+def revenue_report(dimension, start, end):
+    return fetch_all(reporting.revenue_report_sql(dimension), (start, end), read_only=True)
+
+def load_seat_map(trip_id):
+    """Fresh seat map for a trip (None if the trip or its bus is gone).
+    Runs in the caller's query class: "booking" for the seat check inside
+    book_ticket(), the session's (public/staff) for seat pickers."""
+    # feed position taken before loading: deltas racing with the load get re-applied
+    seq = get_seat_feed().seq
+    bus = fetch_all(queries.TRIP_CAPACITY_SQL, (trip_id,))
+    if not bus:
+        return None
+    booked_seats = fetch_all(queries.BOOKED_SEATS_SQL, (trip_id,))
+    return SeatMap(trip_id, bus[0]['capacity'] or 0, [seat['seat_no'] for seat in booked_seats], seq)
+
+def live_seat_map(trip_id):
+    """This session's seat map for a trip, brought up to date from the seat feed"""
+    state = context.session()
+    if state is None:
+        return load_seat_map(trip_id)
+    maps = state.setdefault("seat_maps", {})
+    seat_map = maps.get(trip_id)
+    if seat_map is None or not seat_map.apply(get_seat_feed()):
+        seat_map = maps[trip_id] = load_seat_map(trip_id)
+    return seat_map
+
+def get_available_seats(trip_id):
+    """Get available seats for a trip"""
+    seat_map = load_seat_map(trip_id)
+    return seat_map.available() if seat_map else []
+
+# Add/Update/Delete functions
+def add_bus(bus_no, bus_name, type_, capacity, fare_id, route_id, ac, status):
+    with get_conn() as (conn, cur):
+        cur.execute("INSERT INTO buses (bus_no,bus_name,type,capacity,fare_id,route_id,ac,status) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
+                    (bus_no, bus_name, type_, capacity, fare_id, route_id, ac, status))
+    invalidate_queries("buses")
+
+def update_row(table, row_id, **changes):
+    """UPDATE one row by primary key: columns are checked against table_registry
+    and the statement runs as a cached prepared statement on the pooled connection"""
+    sql, params = table_registry.update_statement(table, changes, row_id)
+    with get_conn() as (conn, cur):
+        return table_registry.execute_prepared(conn, sql, params)
+
+def update_bus(bus_id, **kwargs):
+    update_row("buses", bus_id, **kwargs)
+    if "capacity" in kwargs:
+        reset_seat_counters()
+    invalidate_queries("buses")
+
+def delete_bus(bus_id):
+    with get_conn() as (conn, cur):
+        cur.execute("DELETE FROM buses WHERE bus_id=%s", (bus_id,))
+        seat_inventory.reset(cur)
+    invalidate_queries("buses", "trips")
+
+def add_driver(first, last, license_no, phone, salary, address, is_active=True):
+    with get_conn() as (conn, cur):
+        cur.execute("INSERT INTO drivers (first_name,last_name,license_no,phone,salary,address,is_active) VALUES (%s,%s,%s,%s,%s,%s,%s)",
+                    (first, last, license_no, phone, salary, address, is_active))
+    invalidate_queries("drivers")
+
+def update_driver(driver_id, **kwargs):
+    update_row("drivers", driver_id, **kwargs)
+    invalidate_queries("drivers")
+
+def delete_driver(driver_id):
+    with get_conn() as (conn, cur):
+        cur.execute("DELETE FROM drivers WHERE driver_id=%s", (driver_id,))
+    invalidate_queries("drivers", "trips")
+
+def add_route(route_name, source, destination, distance_km=None):
+    with get_conn() as (conn, cur):
+        cur.execute("INSERT INTO routes (route_name,source,destination,distance_km) VALUES (%s,%s,%s,%s)", 
+                   (route_name, source, destination, distance_km))
+    invalidate_queries("routes")
+
+def update_route(route_id, **kwargs):
+    update_row("routes", route_id, **kwargs)
+    invalidate_queries("routes")
+
+def delete_route(route_id):
+    with get_conn() as (conn, cur):
+        cur.execute("DELETE FROM routes WHERE route_id=%s", (route_id,))
+    # route_stops rows go with it (ON DELETE CASCADE)
+    invalidate_route_topology()
+    invalidate_queries("routes", "trips", "buses")
+
+def add_stop(stop_name, location, latitude=None, longitude=None):
+    with get_conn() as (conn, cur):
+        cur.execute("INSERT INTO stops (stop_name,location,latitude,longitude) VALUES (%s,%s,%s,%s)",
+                    (stop_name, location, latitude, longitude))
+    invalidate_route_topology()
+    invalidate_queries("stops")
+
+def update_stop(stop_id, **kwargs):
+    update_row("stops", stop_id, **kwargs)
+    invalidate_route_topology()
+    invalidate_queries("stops")
+
+def delete_stop(stop_id):
+    with get_conn() as (conn, cur):
+        cur.execute("DELETE FROM stops WHERE stop_id=%s", (stop_id,))
+    invalidate_route_topology()
+    invalidate_queries("stops", "tickets")
+
+def add_trip(route_id, bus_id, driver_id, start_time, end_time, frequency, status='scheduled'):
+    with get_conn() as (conn, cur):
+        cur.execute("INSERT INTO trips (route_id,bus_id,driver_id,start_time,end_time,frequency,status) VALUES (%s,%s,%s,%s,%s,%s,%s)",
+                    (route_id, bus_id, driver_id, start_time, end_time, frequency, status))
+        trip_id = cur.lastrowid
+    note_trip_changes(trip_id)
+    invalidate_queries("trips")
+    return trip_id
+
+class TripConflictError(ValueError):
+    """A trip change that would double-book a bus or driver; .conflicts as find_trip_conflicts()."""
+
+    def __init__(self, conflicts):
+        super().__init__("Double booking: " + ", ".join(f"{kind} already on trip {tid}" for kind, tid in conflicts))
+        self.conflicts = conflicts
+
+# the columns update_trip() needs to re-check a trip against the schedule
+TRIP_SCHEDULE_SQL = "SELECT bus_id, driver_id, start_time, end_time, status FROM trips WHERE trip_id = %s"
+
+def update_trip(trip_id, allow_conflict=False, **kwargs):
+    """Update a trip's columns. A change of bus, driver, times or status that
+    leaves it double-booking a bus or driver raises TripConflictError unless
+    allow_conflict (the trip is then flagged like any other clash)."""
+    if not allow_conflict and {"bus_id", "driver_id", "start_time", "end_time", "status"} & kwargs.keys():
+        current = fetch_all(TRIP_SCHEDULE_SQL, (trip_id,))
+        trip = {**current[0], **kwargs} if current else None
+        if trip and trip["status"] in BLOCKING_STATUSES and trip["start_time"] and trip["end_time"]:
+            conflicts = find_trip_conflicts(trip["bus_id"], trip["driver_id"], trip["start_time"], trip["end_time"],
+                                            ignore_trip_id=trip_id)
+            if conflicts:
+                raise TripConflictError(conflicts)
+    update_row("trips", trip_id, **kwargs)
+    if "bus_id" in kwargs:
+        reset_seat_counters([trip_id])
+    note_trip_changes(trip_id)
+    invalidate_queries("trips")
+
+@context.resource
+def get_scheduler_holder():
+    return {}
+
+def trip_scheduler():
+    """Bus/driver interval index over scheduled and ongoing trips; rebuilt
+    with one query after any trip write (shared, read-only)"""
+    holder = get_scheduler_holder()
+    stamp = get_tag_versions().snapshot(("trips",))
+    if holder.get("stamp") != stamp:
+        holder["scheduler"] = TripScheduler.from_rows(fetch_all(SCHEDULE_SQL))
+        holder["stamp"] = stamp
+    return holder["scheduler"]
+
+def find_trip_conflicts(bus_id, driver_id, start_time, end_time, ignore_trip_id=None):
+    """[("bus"|"driver", trip_id), ...] that the proposed trip would double-book"""
+    return trip_scheduler().conflicts(bus_id, driver_id, start_time, end_time, ignore_trip_id)
+
+def list_trips_for_day(day):
+    return fetch_all(queries.TRIPS_FOR_DAY_SQL, (day, day + timedelta(days=1)))
+
+ACTIVE_BUSES_SQL = "SELECT bus_id, route_id FROM buses WHERE status = 'active'"
+ACTIVE_DRIVERS_SQL = "SELECT driver_id FROM drivers WHERE is_active"
+
+def plan_trip_assignments(day, keep_existing=True):
+    """Greedy bus/driver assignment for a day's scheduled trips.
+    Returns (assignments {trip_id: (bus_id, driver_id)}, unassigned trip ids)."""
+    trips = list_trips_for_day(day)
+    if not keep_existing:
+        trips = [dict(t, bus_id=None, driver_id=None) for t in trips]
+    buses = fetch_all(ACTIVE_BUSES_SQL)
+    drivers = fetch_all(ACTIVE_DRIVERS_SQL)
+    # private copy: auto_assign adds the new assignments to the index it works on
+    scheduler = TripScheduler.from_rows(fetch_all(SCHEDULE_SQL))
+    return scheduler.auto_assign(trips, [b['bus_id'] for b in buses], [d['driver_id'] for d in drivers],
+                                 {b['bus_id']: b['route_id'] for b in buses})
+
+def apply_trip_assignments(assignments):
+    with get_conn() as (conn, cur):
+        cur.executemany("UPDATE trips SET bus_id=%s, driver_id=%s WHERE trip_id=%s",
+                        [(bus_id, driver_id, trip_id) for trip_id, (bus_id, driver_id) in assignments.items()])
+        seat_inventory.reset(cur, assignments)
+    note_trip_changes(*assignments)
+    invalidate_queries("trips")
+
+# weekday numbers (Mon=0) each recurring trip frequency runs on
+FREQUENCY_DAYS = {"daily": range(7), "weekdays": range(5), "weekends": (5, 6)}
+# one row per recurring pattern (route, bus, driver, time of day, length)
+RECURRING_PATTERNS_SQL = """
+    SELECT DISTINCT route_id, bus_id, driver_id, frequency, TIME(start_time) AS start_at,
+           TIMESTAMPDIFF(MINUTE, start_time, end_time) AS minutes
+    FROM trips
+    WHERE frequency IN ('daily','weekdays','weekends') AND status <> 'cancelled'
+      AND start_time IS NOT NULL AND end_time IS NOT NULL
+"""
+ROUTE_STARTS_SQL = "SELECT route_id, start_time FROM trips WHERE start_time >= %s AND start_time < %s"
+
+def expand_recurring_trips(first_day, last_day, dry_run=False):
+    """Materialize recurring trips (daily/weekdays/weekends) on every matching
+    day in [first_day, last_day]. Idempotent: a route already having a trip at
+    that start time is left alone; a copy that would double-book its bus or
+    driver is skipped. Returns (created, skipped) lists of (route_id, start, note)."""
+    patterns = fetch_all(RECURRING_PATTERNS_SQL)
+    existing = {(r["route_id"], r["start_time"]) for r in fetch_all(
+        ROUTE_STARTS_SQL, (first_day, last_day + timedelta(days=1)))}
+    scheduler = TripScheduler.from_rows(fetch_all(SCHEDULE_SQL))
+    created, skipped, rows = [], [], []
+    day = first_day
+    while day <= last_day:
+        for p in patterns:
+            if day.weekday() not in FREQUENCY_DAYS[p["frequency"]]:
+                continue
+            start = datetime.combine(day, time.min) + p["start_at"]
+            end = start + timedelta(minutes=p["minutes"])
+            if (p["route_id"], start) in existing:
+                continue
+            clashes = scheduler.conflicts(p["bus_id"], p["driver_id"], start, end)
+            if clashes:
+                skipped.append((p["route_id"], start, ", ".join(
+                    f"{kind} busy (" + ("another new trip" if isinstance(tid, tuple) else f"trip {tid}") + ")"
+                    for kind, tid in clashes)))
+                continue
+            existing.add((p["route_id"], start))
+            scheduler.add(("new", len(rows)), p["bus_id"], p["driver_id"], start, end)
+            rows.append((p["route_id"], p["bus_id"], p["driver_id"], start, end, p["frequency"]))
+            created.append((p["route_id"], start, p["frequency"]))
+        day += timedelta(days=1)
+    if rows and not dry_run:
+        with get_conn() as (conn, cur):
+            cur.executemany("INSERT INTO trips (route_id,bus_id,driver_id,start_time,end_time,frequency,status) "
+                            "VALUES (%s,%s,%s,%s,%s,%s,'scheduled')", rows)
+        invalidate_queries("trips")
+    return created, skipped
+
+def delete_trip(trip_id):
+    with get_conn() as (conn, cur):
+        cur.execute("DELETE FROM trips WHERE trip_id=%s", (trip_id,))
+    note_trip_changes(trip_id)
+    invalidate_queries("trips", "tickets")
+
+def add_passenger(name, address, contact_no, email):
+    """The passenger for this contact number, created if it is new"""
+    with get_conn() as (conn, cur):
+        passenger_id = passenger_identity.upsert(cur, name, address, contact_no, email)
+    invalidate_queries("passengers")
+    return passenger_id
+
+def dedupe_passengers(chunk_size=passenger_identity.CHUNK_SIZE, dry_run=False):
+    """Merge duplicate passengers per contact (chunked, one short transaction per chunk)"""
+    conn = connect_db()
+    try:
+        report = passenger_identity.merge_duplicates(conn, backends.get().live_indexes(conn), chunk_size, dry_run)
+    finally:
+        conn.close()
+    if report.rows_merged and not dry_run:
+        invalidate_queries("passengers", "tickets", ticket_lookup.ALL_CONTACTS_TAG)
+    return report
+
+INSERT_TICKET_SQL = "INSERT INTO tickets (trip_id,passenger_id,boarding_stop_id,dropping_stop_id,seat_no,fare,gender) VALUES (%s,%s,%s,%s,%s,%s,%s)"
+
+@workload("booking")
+def add_ticket(trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, fare, gender):
+    with get_conn() as (conn, cur):
+        cur.execute(INSERT_TICKET_SQL, (trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, fare, gender))
+        ticket_id = cur.lastrowid
+        seat_inventory.adjust(cur, trip_id, -1)
+        contact_key = ticket_lookup.contact_key_of(cur, passenger_id)
+    ticket_issued(ticket_id, trip_id, seat_no, contact_key)
+    return ticket_id
+
+def ticket_issued(ticket_id, trip_id, seat_no, contact_key=None):
+    # logged only after the booking has committed
+    log_ticket_event(ticket_id, trip_id, ACTION_ISSUED)
+    publish_seat_change(trip_id, BOOKED, seat_no, ticket_id, ACTION_ISSUED)
+    invalidate_queries("tickets", f"tickets:trip={trip_id}", *contact_tags(contact_key))
+
+def contact_tags(*contact_keys):
+    """Query tags of the "My Tickets" pages of these contacts (None: no contact)"""
+    return [ticket_lookup.contact_tag(key) for key in contact_keys if key]
+
+def reset_seat_counters(trip_ids=None):
+    """Have trips' remaining-seat counters recounted (all if trip_ids is None)"""
+    with get_conn() as (conn, cur):
+        seat_inventory.reset(cur, trip_ids)
+
+class BookingError(ValueError):
+    """A booking request that cannot be honoured (unknown trip, bad stops, seat taken)."""
+
+GENDERS = ("male", "female", "other")
+# what a booking needs to know of its trip and bus
+BOOKING_TRIP_SQL = """
+    SELECT t.trip_id, t.route_id, t.status, t.start_time, b.type, b.ac
+    FROM trips t JOIN buses b ON t.bus_id = b.bus_id
+    WHERE t.trip_id = %s
+"""
+
+# one lock per trip: bookings in this process cannot both pass the seat check
+_booking_locks = {}
+
+def _check_booking(trip_id, boarding_stop_id, dropping_stop_id, name, contact_no, gender):
+    """(trip, fare) for a booking or waitlist request, or BookingError"""
+    if not name or len(contact_no or "") < 10:
+        raise BookingError("name and a 10-digit contact number are required")
+    if gender not in GENDERS:
+        raise BookingError(f"gender must be one of {', '.join(GENDERS)}")
+    trip = fetch_all(BOOKING_TRIP_SQL, (trip_id,))
+    if not trip or trip[0]["status"] != "scheduled":
+        raise BookingError(f"trip {trip_id} is not open for booking")
+    trip = trip[0]
+    if not route_topology().is_forward(trip["route_id"], boarding_stop_id, dropping_stop_id):
+        raise BookingError("dropping stop must come after boarding stop on this trip's route")
+    return trip, calculate_fare(boarding_stop_id, dropping_stop_id, trip["type"], trip["ac"])
+
+@workload("booking")
+def book_ticket(trip_id, boarding_stop_id, dropping_stop_id, seat_no, name, contact_no, email="", gender="other",
+                fare=None):
+    """Validate and book one seat the way the Book Ticket page does; returns the ticket summary.
+    seat_no None books any free seat; `fare` is the fare already quoted to the rider
+    (None: calculated here). config.BOOKING_MODE picks how concurrent bookings
+    are kept apart (see seat_inventory)."""
+    trip, quoted = _check_booking(trip_id, boarding_stop_id, dropping_stop_id, name, contact_no, gender)
+    fare = quoted if fare is None else fare
+    if config.BOOKING_MODE == "optimistic":
+        passenger_id = add_passenger(name, "", contact_no, email or "")
+        ticket_id, seat_no = _book_optimistic(trip_id, passenger_id, boarding_stop_id, dropping_stop_id,
+                                              seat_no, fare, gender, passenger_identity.normalize_contact(contact_no))
+    else:
+        with _booking_locks.setdefault(trip_id, threading.Lock()):
+            available = get_available_seats(trip_id)
+            if seat_no is None and not available:
+                raise BookingError(f"trip {trip_id} is sold out")
+            seat_no = seat_no or available[0]
+            if seat_no not in available:
+                raise BookingError(f"seat {seat_no} is not available on trip {trip_id}")
+            passenger_id = add_passenger(name, "", contact_no, email or "")
+            ticket_id = add_ticket(trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, fare, gender)
+    return {"ticket_id": ticket_id, "trip_id": trip_id, "passenger_id": passenger_id, "seat_no": seat_no,
+            "fare": fare, "start_time": trip["start_time"]}
+
+def _book_optimistic(trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, fare, gender,
+                     contact_key=None):
+    """Book through the trip's remaining-seat counter, no lock held between
+    attempts (see seat_inventory); returns (ticket_id, seat_no)"""
+    backend = backends.get()
+    insert = lambda cur, seat: cur.execute(INSERT_TICKET_SQL, (
+        trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat, fare, gender))
+    recounted = False
+    for attempt in range(BOOKING_RETRIES):
+        seat_map = load_seat_map(trip_id)
+        free = seat_map.available() if seat_map else []
+        if seat_no is not None and seat_no not in free:
+            raise BookingError(f"seat {seat_no} is not available on trip {trip_id}")
+        if not free:
+            raise BookingError(f"trip {trip_id} is sold out")
+        seats = [seat_no] if seat_no is not None else seat_inventory.candidates(free)
+        with get_conn() as (conn, cur):
+            try:
+                claimed = seat_inventory.claim(cur, trip_id, seats, insert, backend.is_duplicate)
+            except Exception as e:
+                if not backend.is_retryable(e):
+                    raise
+                claimed = None
+            if claimed is None:
+                conn.rollback()
+            ticket_id = cur.lastrowid
+        if claimed == seat_inventory.SOLD_OUT:
+            if recounted:
+                raise BookingError(f"trip {trip_id} is sold out")
+            # the seat map had free seats: recount once in case tickets went
+            # without the counter hearing (SQL console, scripts)
+            reset_seat_counters([trip_id])
+            recounted = True
+            continue
+        if claimed is not None:
+            ticket_issued(ticket_id, trip_id, claimed, contact_key)
+            return ticket_id, claimed
+        seat_inventory.backoff(attempt)
+    raise BookingError(f"trip {trip_id} is busy right now, please try again")
+
+# a ticket's seat and whose "My Tickets" it is on
+TICKET_OWNER_SQL = """
+    SELECT tk.trip_id, tk.seat_no, p.contact_key FROM tickets tk
+    LEFT JOIN passengers p ON tk.passenger_id = p.passenger_id WHERE tk.ticket_id = %s
+"""
+
+@workload("booking")
+def update_ticket(ticket_id, **kwargs):
+    sql, params = table_registry.update_statement("tickets", kwargs, ticket_id)
+    with get_conn() as (conn, cur):
+        cur.execute(TICKET_OWNER_SQL, (ticket_id,))
+        before = cur.fetchone()
+        table_registry.execute_prepared(conn, sql, params)
+        cur.execute(TICKET_OWNER_SQL, (ticket_id,))
+        row = cur.fetchone()
+        if before and row and before["trip_id"] != row["trip_id"]:
+            seat_inventory.adjust(cur, before["trip_id"], 1)
+            seat_inventory.adjust(cur, row["trip_id"], -1)
+    if row:
+        log_ticket_event(ticket_id, row["trip_id"], ACTION_UPDATED)
+        if before and (before["trip_id"], before["seat_no"]) != (row["trip_id"], row["seat_no"]):
+            publish_seat_change(before["trip_id"], RELEASED, before["seat_no"], ticket_id)
+            publish_seat_change(row["trip_id"], BOOKED, row["seat_no"], ticket_id, ACTION_UPDATED)
+            invalidate_queries(f"tickets:trip={before['trip_id']}")
+        invalidate_queries(f"tickets:trip={row['trip_id']}")
+    invalidate_queries("tickets", *contact_tags(before and before["contact_key"], row and row["contact_key"]))
+
+@workload("booking")
+def delete_ticket(ticket_id):
+    with get_conn() as (conn, cur):
+        cur.execute(TICKET_OWNER_SQL, (ticket_id,))
+        row = cur.fetchone()
+        cur.execute("DELETE FROM tickets WHERE ticket_id=%s", (ticket_id,))
+        if row and cur.rowcount:
+            seat_inventory.adjust(cur, row["trip_id"], 1)
+    if row:
+        log_ticket_event(ticket_id, row["trip_id"], ACTION_DELETED)
+        publish_seat_change(row["trip_id"], RELEASED, row["seat_no"], ticket_id, ACTION_DELETED)
+        invalidate_queries(f"tickets:trip={row['trip_id']}", *contact_tags(row["contact_key"]))
+    invalidate_queries("tickets")
+
+# --------------------------- waitlist ---------------------------
+@context.resource
+def get_waitlist_worker():
+    """Process-wide waitlist backfill worker, woken by the seat feed"""
+    worker = waitlist.BackfillWorker(backfill_waitlist, sweep_waitlist, interval=WAITLIST_SWEEP_SECONDS)
+    get_seat_feed().subscribe(worker.on_seat_change)
+    return worker.start()
+
+@workload("booking")
+def join_waitlist(trip_id, boarding_stop_id, dropping_stop_id, name, contact_no, email="", gender="other"):
+    """Queue a rider for a full trip, validated like book_ticket; returns
+    {"waitlist_id", "trip_id", "position"}. A freed seat is booked for them automatically."""
+    trip, fare = _check_booking(trip_id, boarding_stop_id, dropping_stop_id, name, contact_no, gender)
+    passenger_id = add_passenger(name, "", contact_no, email or "")
+    with get_conn() as (conn, cur):
+        waitlist_id, position = waitlist.join(cur, trip_id, passenger_id, boarding_stop_id, dropping_stop_id,
+                                              fare, gender)
+    # a seat may have come free since the rider saw the trip as full
+    if get_waitlist_worker.exists():
+        get_waitlist_worker().wake(trip_id)
+    return {"waitlist_id": waitlist_id, "trip_id": trip_id, "position": position}
+
+@workload("booking")
+def leave_waitlist(waitlist_id):
+    with get_conn() as (conn, cur):
+        return waitlist.leave(cur, waitlist_id)
+
+WAITLIST_ENTRY_SQL = """
+    SELECT waitlist_id, trip_id, status, ticket_id, created_at, resolved_at FROM waitlist WHERE waitlist_id = %s
+"""
+
+def get_waitlist_entry(waitlist_id):
+    """An entry's status, its ticket once assigned and its place while waiting (None if unknown)"""
+    with get_conn() as (conn, cur):
+        cur.execute(WAITLIST_ENTRY_SQL, (waitlist_id,))
+        entry = cur.fetchone()
+        if entry:
+            entry["position"] = waitlist.position(cur, entry["trip_id"], waitlist_id)
+    return entry
+
+def waitlist_by_contact(contact_no):
+    """Waiting entries of the rider with this contact number, with their places"""
+    key = passenger_identity.normalize_contact(contact_no)
+    return fetch_all(waitlist.BY_CONTACT_SQL, (key,)) if key else []
+
+TRIP_STATUS_SQL = "SELECT status, start_time FROM trips WHERE trip_id = %s"
+
+@workload("booking")
+def backfill_waitlist(trip_id):
+    """Book the trip's free seats for its waitlist, oldest entry first, one
+    transaction per seat; returns the Assignments made"""
+    trip = fetch_all(TRIP_STATUS_SQL, (trip_id,))
+    if not trip or trip[0]["status"] != "scheduled" or trip[0]["start_time"] <= datetime.now():
+        return []   # the sweep expires its entries
+    backend = backends.get()
+    locked = config.BOOKING_MODE == "locked"
+    assignments, misses, recounted = [], 0, False
+    with _booking_locks.setdefault(trip_id, threading.Lock()) if locked else contextlib.nullcontext():
+        while misses < BOOKING_RETRIES:
+            seat_map = load_seat_map(trip_id)
+            free = seat_map.available() if seat_map else []
+            if not free:
+                break
+            with get_conn() as (conn, cur):
+                try:
+                    result = waitlist.assign_next(cur, trip_id, seat_inventory.candidates(free),
+                                                  backend.is_duplicate, datetime.now())
+                except Exception as e:
+                    if not backend.is_retryable(e):
+                        raise
+                    result = False
+                if not isinstance(result, waitlist.Assignment):
+                    conn.rollback()
+                else:
+                    contact_key = ticket_lookup.contact_key_of(cur, result.passenger_id)
+            if result is None:
+                break
+            if result == seat_inventory.SOLD_OUT:
+                if recounted:
+                    break
+                # the seat map has free seats: the counter missed a release
+                reset_seat_counters([trip_id])
+                recounted = True
+                continue
+            if result is False:
+                misses += 1
+                seat_inventory.backoff(misses)
+                continue
+            ticket_issued(result.ticket_id, trip_id, result.seat_no, contact_key)
+            assignments.append(result)
+    return assignments
+
+def sweep_waitlist():
+    """Expire entries of departed/cancelled trips; the trips still having waiting entries"""
+    with get_conn() as (conn, cur):
+        waitlist.expire(cur, datetime.now())
+        return waitlist.pending_trips(cur)
+
+# Query tags each bulk-editable table's writes invalidate
+BULK_TAGS = {"buses": ("buses",), "drivers": ("drivers",), "trips": ("trips", "tickets"),
+             "tickets": ("tickets", ticket_lookup.ALL_CONTACTS_TAG)}
+
+def run_bulk(op, table, *args, new_trip_id=None, dry_run=False):
+    """Run a bulk_ops call in one transaction on a pooled connection (admitted and
+    under statement deadlines like any get_conn() work), then log/publish ticket
+    changes and invalidate caches like the single-row helpers"""
+    with get_conn() as (conn, _):
+        result = op(conn, table, *args, dry_run=dry_run)
+    if dry_run:
+        return result
+    if table in ("trips", "buses"):
+        reset_seat_counters()
+    elif table == "tickets" and result.tickets:
+        reset_seat_counters({trip_id for _, trip_id, _ in result.tickets} | {new_trip_id} - {None})
+    for ticket_id, trip_id, seat_no in result.tickets or ():
+        if result.action == "delete":
+            log_ticket_event(ticket_id, trip_id, ACTION_DELETED)
+            publish_seat_change(trip_id, RELEASED, seat_no, ticket_id, ACTION_DELETED)
+        else:
+            log_ticket_event(ticket_id, trip_id, ACTION_UPDATED)
+            new_trip = new_trip_id or trip_id
+            if new_trip != trip_id:
+                publish_seat_change(trip_id, RELEASED, seat_no, ticket_id)
+                publish_seat_change(new_trip, BOOKED, seat_no, ticket_id, ACTION_UPDATED)
+                invalidate_queries(f"tickets:trip={new_trip}")
+        invalidate_queries(f"tickets:trip={trip_id}")
+    invalidate_queries(*BULK_TAGS[table])
+    return result
+
+def bulk_update_rows(table, ids, **changes):
+    return run_bulk(bulk_ops.bulk_update, table, ids, changes, new_trip_id=changes.get("trip_id"))
+
+def bulk_delete_rows(table, ids):
+    return run_bulk(bulk_ops.bulk_delete, table, ids)
+
+def cancel_route_trips(route_id, day):
+    """Cancel every still-scheduled trip of a route on one day in a single UPDATE"""
+    day_start = datetime.combine(day, time.min)
+    return run_bulk(bulk_ops.bulk_update_where, "trips", {"status": "cancelled"},
+                    {"route_id": route_id, "status": "scheduled",
+                     "start_time": (day_start, day_start + timedelta(days=1))})
+
+def list_path_for_trip(trip_id):
+    return fetch_all(queries.PATH_FOR_TRIP_SQL, (trip_id,), read_only=True)
+
+def list_major_stops():
+    return fetch_all(queries.LIST_MAJOR_STOPS_SQL, read_only=True)
+
+def demand_report(forecast_method="seasonal"):
+    """Occupancy, peak loads and per-route/hour demand forecast over all path rows"""
+    from . import demand_analytics   # pandas: only loaded by the pages/commands that need it
+    occ = demand_analytics.running_occupancy(demand_analytics.path_frame(fetch_all(demand_analytics.PATH_SQL, read_only=True)))
+    hourly = demand_analytics.hourly_demand(occ)
+    forecast = demand_analytics.forecast_demand(hourly, method=forecast_method)
+    supply = demand_analytics.supply_frame(fetch_all(demand_analytics.SUPPLY_SQL, (datetime.now().date(),), read_only=True))
+    return {
+        "trip_peaks": demand_analytics.trip_peaks(occ),
+        "stop_peaks": demand_analytics.peak_load_per_stop(occ),
+        "hourly": hourly,
+        "recommendations": demand_analytics.recommend_trip_changes(forecast, supply),
+    }
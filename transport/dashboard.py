@@ -0,0 +1,151 @@
+"""
+Dashboard snapshots with bounded staleness.
+
+The Admin Dashboard, Operator Overview and Public Overview show the same
+handful of counts plus a few recent tickets and upcoming trips. Instead of
+every page view running the queries (the full tickets join among them),
+DashboardRefresher recomputes one DashboardSnapshot every `interval`
+seconds on a background thread with a few aggregate/LIMIT queries and
+swaps it in whole. Pages read `refresher.snapshot` without touching the
+database; the numbers are at most `interval` seconds (plus one compute)
+old, and `computed_at` says exactly how old. Snapshots are immutable
+(namedtuple of tuples of read-only rows), so readers need no lock.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+
+from . import context
+
+DashboardSnapshot = namedtuple("DashboardSnapshot", [
+    "computed_at",       # datetime the queries ran
+    "duration_ms",
+    "buses",             # total buses
+    "bus_status",        # {'active': n, 'maintenance': n, 'inactive': n}
+    "active_drivers",
+    "routes",
+    "stops",
+    "tickets",           # total tickets
+    "upcoming_trips",    # scheduled trips from today on
+    "recent_tickets",    # newest RECENT_TICKETS tickets (passenger_name, route_name, fare, ...)
+    "next_trips",        # first UPCOMING_TRIPS upcoming trips (route_name, bus_no, type, start_time, ...)
+])
+
+RECENT_TICKETS = 10
+UPCOMING_TRIPS = 5
+
+COUNTS_SQL = """
+    SELECT (SELECT COUNT(*) FROM buses) AS buses,
+           (SELECT COUNT(*) FROM drivers WHERE is_active) AS active_drivers,
+           (SELECT COUNT(*) FROM routes) AS routes,
+           (SELECT COUNT(*) FROM stops) AS stops,
+           (SELECT COUNT(*) FROM tickets) AS tickets
+"""
+BUS_STATUS_SQL = "SELECT status, COUNT(*) AS n FROM buses GROUP BY status"
+RECENT_TICKETS_SQL = f"""
+    SELECT tk.ticket_id, tk.fare, tk.seat_no, tk.created_at, p.name AS passenger_name, r.route_name
+    FROM tickets tk
+    JOIN trips t ON tk.trip_id = t.trip_id
+    JOIN routes r ON t.route_id = r.route_id
+    JOIN passengers p ON tk.passenger_id = p.passenger_id
+    ORDER BY tk.created_at DESC, tk.ticket_id DESC
+    LIMIT {RECENT_TICKETS}
+"""
+
+
+def _frozen(rows):
+    return tuple(MappingProxyType(dict(row)) for row in rows)
+
+
+def compute_snapshot(fetch_all, upcoming_query):
+    """One snapshot. `fetch_all(sql, params)` runs a read query; `upcoming_query`
+    is the (sql, params) of the upcoming-trips list."""
+    started = time.perf_counter()
+    computed_at = datetime.now()
+    counts = fetch_all(COUNTS_SQL, ())[0]
+    status = {row["status"]: row["n"] for row in fetch_all(BUS_STATUS_SQL, ())}
+    trips_sql, trips_params = upcoming_query
+    upcoming = fetch_all(f"SELECT COUNT(*) AS n FROM ({trips_sql}) upcoming", trips_params)[0]["n"]
+    next_trips = fetch_all(f"{trips_sql} LIMIT {UPCOMING_TRIPS}", trips_params)
+    recent = fetch_all(RECENT_TICKETS_SQL, ())
+    return DashboardSnapshot(
+        computed_at=computed_at,
+        duration_ms=round((time.perf_counter() - started) * 1000, 1),
+        buses=counts["buses"],
+        bus_status=MappingProxyType({s: status.get(s, 0) for s in ("active", "maintenance", "inactive")}),
+        active_drivers=counts["active_drivers"],
+        routes=counts["routes"],
+        stops=counts["stops"],
+        tickets=counts["tickets"],
+        upcoming_trips=upcoming,
+        recent_tickets=_frozen(recent),
+        next_trips=_frozen(next_trips),
+    )
+
+
+class DashboardRefresher:
+    """Background thread replacing `snapshot` every `interval` seconds.
+
+    start() computes the first snapshot before returning, so readers only
+    see None if that very first compute failed. A failed refresh keeps the
+    previous snapshot (and logs); `last_error` holds the failure until the
+    next success.
+    """
+
+    def __init__(self, compute, interval=15.0):
+        self.compute = compute
+        self.interval = interval
+        self.snapshot = None
+        self.refreshes = 0
+        self.last_error = None
+        self._computing = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._done = threading.Condition()
+
+    def start(self):
+        self._refresh()
+        threading.Thread(target=self._run, name="dashboard-refresher", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def age_seconds(self):
+        return (datetime.now() - self.snapshot.computed_at).total_seconds() if self.snapshot else None
+
+    def request_refresh(self, wait=0.0):
+        """Recompute now instead of at the next tick; with `wait`, block up to
+        that many seconds for the new snapshot. Returns the current snapshot."""
+        with self._done:
+            # a compute already running may have read the tables before this call
+            target = self.refreshes + (2 if self._computing else 1)
+            self._wake.set()
+            if wait:
+                self._done.wait_for(lambda: self.refreshes >= target, timeout=wait)
+        return self.snapshot
+
+    def _refresh(self):
+        with self._done:
+            self._computing = True
+        try:
+            self.snapshot = self.compute()
+            self.last_error = None
+        except Exception as e:
+            context.logger.exception("dashboard snapshot failed")
+            self.last_error = e
+        with self._done:
+            self._computing = False
+            self.refreshes += 1
+            self._done.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stop.is_set():
+                self._refresh()
@@ -0,0 +1,195 @@
+"""
+Connections, pooled query helpers, ticket-log events and the query memo.
+"""
+
+import functools
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from . import backends, config, context
+from .config import (DB_POOL_SIZE, DB_REPLICAS, READ_YOUR_WRITES_SECONDS, TICKET_LOG_MODE,
+                     QUERY_CLASSES, BOOKING_RESERVE, DB_POOL_PING_AFTER_SECONDS)
+from .db_pool import ConnectionPool, gather
+from .db_router import ReplicaSet
+from .query_guard import (Admission, Watchdog, StatementGuard, Overloaded, QueryTimeout, CANCEL_GRACE_SECONDS,
+                          current_class)
+from .query_memo import TagVersions, SessionMemo
+from .ticket_log_writer import TicketLogWriter
+
+
+# --------------------------- DB HELPERS ---------------------------
+def ticket_log_async():
+    """True if the app writes ticket_log itself instead of the triggers"""
+    return TICKET_LOG_MODE == "async" and config.DB_BACKEND == "mysql"
+
+def connect_db():
+    """Open a new connection to the app database (config.DB_BACKEND)"""
+    return backends.get().connect(async_log=ticket_log_async())
+
+def connect_replica(overrides):
+    """Open a read-only session on a replica"""
+    return backends.get().connect(overrides=overrides, read_only=True)
+
+@context.resource
+def get_replica_set():
+    """Process-wide replica pools (empty when DB_REPLICAS is empty or the backend is not MySQL)"""
+    replicas = DB_REPLICAS if config.DB_BACKEND == "mysql" else []
+    return ReplicaSet([ConnectionPool(lambda cfg=cfg: connect_replica(cfg), size=DB_POOL_SIZE,
+                                      ping_after=DB_POOL_PING_AFTER_SECONDS)
+                       for cfg in replicas])
+
+def pin_reads_to_primary():
+    """Called on every write: this session reads from the primary for a while"""
+    state = context.session()
+    if state is not None:
+        state["primary_until"] = datetime.now() + timedelta(seconds=READ_YOUR_WRITES_SECONDS)
+
+def db_connection(read_only=False):
+    """Pooled connection context: a replica for read-only work unless the session wrote recently"""
+    replicas = get_replica_set()
+    if read_only and replicas:
+        state = context.session()
+        if state is None or state.get("primary_until", datetime.min) <= datetime.now():
+            return replicas.connection(fallback=get_db_pool())
+    return get_db_pool().connection()
+
+@context.resource
+def get_db_pool():
+    """Process-wide connection pool; creates the database on first use."""
+    backends.get().create_database()
+    return ConnectionPool(connect_db, size=DB_POOL_SIZE, ping_after=DB_POOL_PING_AFTER_SECONDS)
+
+@context.resource
+def get_admission():
+    """Process-wide per-class concurrency limits (config.QUERY_CLASSES)"""
+    return Admission(QUERY_CLASSES, DB_POOL_SIZE, BOOKING_RESERVE)
+
+@context.resource
+def get_watchdog():
+    """Process-wide thread cancelling queries that overrun their class deadline"""
+    return Watchdog()
+
+@contextmanager
+def get_conn(read_only=False, query_class=None):
+    """Pooled (conn, cur) for one unit of work, committed at the end.
+
+    The work runs under a query class (see query_guard): it waits for or is
+    refused admission (Overloaded), and a statement that outlives the class
+    timeout is cancelled with QueryTimeout. Cursors from conn.cursor() are
+    guarded the same way.
+    """
+    count_query()
+    name = current_class(query_class)
+    timeout = QUERY_CLASSES[name][0]
+    backend = backends.get()
+    guard = None
+    try:
+        with get_admission().admit(name), db_connection(read_only) as conn:
+            # no timeout: clear whatever limit the pooled session carried over (0 = none)
+            backend.set_statement_timeout(conn, timeout or 0)
+            cur = conn.cursor(dictionary=True)
+            if timeout is not None:
+                guard = StatementGuard(get_watchdog(), conn, backend.cancel, timeout + CANCEL_GRACE_SECONDS)
+                conn, cur = guard.connection(), guard.cursor(cur)
+            try:
+                yield conn, cur
+                conn.commit()
+            finally:
+                cur.close()
+    except Overloaded as e:
+        context.notify("warning", str(e))
+        raise
+    except ValueError:
+        # the work's own validation (bulk filters, CSV columns): the caller reports it
+        raise
+    except Exception as e:
+        if (guard is not None and guard.fired) or backend.is_timeout(e):
+            context.notify("error", f"Query cancelled: it ran longer than the {timeout}s {name} limit")
+            raise QueryTimeout(f"{name} query exceeded {timeout}s") from e
+        context.notify("error", f"Database error: {e}")
+        context.logger.debug("database error", exc_info=True)
+        raise
+
+def fetch_all(sql, params=None, read_only=False, query_class=None):
+    with get_conn(read_only, query_class) as (conn, cur):
+        cur.execute(sql, params or ())
+        return cur.fetchall() or []
+
+def fetch_all_concurrent(queries, read_only=False, query_class=None):
+    """fetch_all for several independent queries at once: {name: (sql, params)} -> {name: rows}"""
+    # resolve the class here: workload() is per thread and the pool workers have none
+    name = current_class(query_class)
+    return gather(get_db_pool(), {key: context.bind_worker(functools.partial(fetch_all, sql, params, read_only, name))
+                                  for key, (sql, params) in queries.items()})
+
+def gather_queries(**calls):
+    """Run independent data helpers concurrently, e.g. gather_queries(routes=list_routes, buses=list_buses)"""
+    return gather(get_db_pool(), {name: context.bind_worker(fn) for name, fn in calls.items()})
+
+def run_sql(sql, params=None):
+    with get_conn() as (conn, cur):
+        cur.execute(sql, params or ())
+        return cur.lastrowid
+
+@context.resource
+def get_ticket_log_writer():
+    """One background ticket_log writer per process (survives Streamlit reruns)."""
+    return TicketLogWriter(connect_db).start()
+
+def log_ticket_event(ticket_id, trip_id, action):
+    """Queue a ticket lifecycle event when running in async log mode.
+    In trigger mode the DB triggers already wrote the row."""
+    if ticket_log_async():
+        get_ticket_log_writer().log(ticket_id, trip_id, action)
+
+def json_default(value):
+    """json.dumps default= for row values (DATETIME, DECIMAL, TIME columns)"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, timedelta)):
+        return str(value)
+    raise TypeError(f"cannot serialize {type(value).__name__}")
+
+# --------------------------- QUERY MEMO ---------------------------
+@context.resource
+def get_tag_versions():
+    """Process-wide dependency tag versions; writes bump them via invalidate_queries()."""
+    return TagVersions()
+
+def session_memo():
+    """This session's memoized query results (kept across reruns); None outside a session"""
+    state = context.session()
+    if state is None:
+        return None
+    if "query_memo" not in state:
+        state["query_memo"] = SessionMemo(get_tag_versions())
+    return state["query_memo"]
+
+def memo(tags, loader, *args):
+    """loader(*args), reused across reruns until a write touches one of `tags`.
+
+    Tags name what the result depends on: a table ("routes") or a slice of
+    one ("tickets:trip=7"). Writers invalidate both the table tag and any
+    slice tags they know about.
+    """
+    cache = session_memo()
+    if cache is None:
+        return loader(*args)
+    return cache.get((loader.__name__,) + args, tags, lambda: loader(*args))
+
+def invalidate_queries(*tags):
+    get_tag_versions().bump(*tags)
+    pin_reads_to_primary()
+
+def count_query():
+    """Count DB round trips for the current rerun (shown on the booking pages)"""
+    state = context.session()
+    if state is not None:
+        state["rerun_queries"] = state.get("rerun_queries", 0) + 1
+
+def start_rerun_stats():
+    state = context.session()
+    if state is not None:
+        state["rerun_queries"] = 0
+        session_memo().reset_counters()
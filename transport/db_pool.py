@@ -0,0 +1,145 @@
+"""
+Connection pool and concurrent query fan-out.
+
+`ConnectionPool` keeps up to `size` open connections and blocks (up to
+`timeout` seconds) when they are all checked out, instead of failing like
+mysql.connector's own pool. A connection that sat idle longer than
+`ping_after` seconds is pinged before it is handed out (the server may have
+dropped it meanwhile); one returned after an error that the rollback could
+not clean up is closed. `gather()` / `fetch_many()` run independent
+queries on the pool's worker threads, so a page that needs four lists
+waits for the slowest query rather than the sum of all four.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free within the pool timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=8, timeout=10.0, ping_after=30.0):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()     # (conn, time.monotonic() it was released)
+        self._slots = threading.BoundedSemaphore(size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """An idle or new connection, waiting up to `timeout` (default: the pool's) for a free slot"""
+        timeout = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"all {self.size} connections busy for {timeout}s")
+        try:
+            while True:
+                try:
+                    conn, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    return self.connect()
+                if time.monotonic() - idle_since < self.ping_after or _is_alive(conn):
+                    return conn
+                _close_quietly(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        try:
+            if discard:
+                _close_quietly(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out for the duration of the block.
+
+        The caller commits; anything left uncommitted after an error is
+        rolled back before the connection goes back to the pool.
+        """
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.release(conn, discard)
+
+    @property
+    def executor(self):
+        """Worker threads for gather(), one per pooled connection."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="db-fanout")
+        return self._executor
+
+    def close_all(self):
+        while True:
+            try:
+                _close_quietly(self._idle.get_nowait()[0])
+            except queue.Empty:
+                break
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def gather(pool, calls):
+    """Run independent calls concurrently and return their results by name.
+
+    `calls` maps a name to a zero-argument callable (or a `(func, *args)`
+    tuple). Each call should take its own connection from `pool`; the first
+    exception raised by any call is re-raised here.
+    """
+    futures = {}
+    for name, call in calls.items():
+        if isinstance(call, tuple):
+            futures[name] = pool.executor.submit(*call)
+        else:
+            futures[name] = pool.executor.submit(call)
+    return {name: future.result() for name, future in futures.items()}
+
+
+def fetch_many(pool, queries, dictionary=True):
+    """Concurrent variant of fetch_all: `queries` maps name -> (sql, params)."""
+    def run(sql, params):
+        with pool.connection() as conn:
+            cur = conn.cursor(dictionary=dictionary)
+            try:
+                cur.execute(sql, params or ())
+                rows = cur.fetchall() or []
+            finally:
+                cur.close()
+            conn.commit()
+            return rows
+    return gather(pool, {name: (run, sql, params) for name, (sql, params) in queries.items()})
+
+
+def _is_alive(conn):
+    try:
+        return conn.is_connected()
+    except Exception:
+        return False
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
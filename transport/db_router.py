@@ -0,0 +1,82 @@
+"""
+Read replica routing.
+
+A ReplicaSet holds one ConnectionPool per read replica and hands out
+connections round-robin. A replica that cannot be connected to (connect or
+ping error) is skipped for `cooldown` seconds and the read falls back to
+the next replica, then to the primary, so a dead replica degrades to
+"everything on the primary" rather than to errors. A replica whose pool is
+merely busy (no free connection within `busy_wait` seconds) is passed over
+for this read only: it stays in rotation.
+
+Deciding *whether* a read may go to a replica (read-only helper, no recent
+write in the session) is the caller's job; see get_conn(read_only=...) in
+transport/db.py.
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from .db_pool import PoolTimeout
+
+
+class ReplicaSet:
+    def __init__(self, pools, cooldown=30.0, busy_wait=0.05):
+        self.pools = list(pools)
+        self.cooldown = cooldown
+        self.busy_wait = busy_wait
+        self._down_until = [0.0] * len(self.pools)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"replica_reads": 0, "fallback_reads": 0, "failovers": 0, "busy": 0}
+
+    def __bool__(self):
+        return bool(self.pools)
+
+    def _candidates(self):
+        """Healthy replica indexes, starting from the next one in rotation."""
+        now = time.monotonic()
+        start = next(self._next)
+        order = [(start + i) % len(self.pools) for i in range(len(self.pools))]
+        return [i for i in order if self._down_until[i] <= now]
+
+    def mark_down(self, index):
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.cooldown
+            self.stats["failovers"] += 1
+
+    @contextmanager
+    def connection(self, fallback):
+        """A replica connection, or one from the `fallback` pool if no replica is reachable."""
+        for index in self._candidates():
+            pool = self.pools[index]
+            try:
+                conn = pool.acquire(timeout=self.busy_wait)
+            except PoolTimeout:
+                self.stats["busy"] += 1
+                continue
+            except Exception:
+                self.mark_down(index)
+                continue
+            self.stats["replica_reads"] += 1
+            discard = False
+            try:
+                yield conn
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+                raise
+            finally:
+                pool.release(conn, discard)
+            return
+        self.stats["fallback_reads"] += 1
+        with fallback.connection() as conn:
+            yield conn
+
+    def close_all(self):
+        for pool in self.pools:
+            pool.close_all()
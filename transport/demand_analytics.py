@@ -0,0 +1,163 @@
+"""
+Occupancy and demand analytics over `path` and `major_stops`.
+
+Everything here works on whole pandas DataFrames (groupby/cumsum/pivot),
+never a Python loop per trip, so millions of path rows take seconds.
+
+    df = path_frame(rows)                # rows from PATH_SQL
+    occ = running_occupancy(df)          # + occupancy / load_factor per row
+    peak_load_per_stop(occ)              # per stop
+    hourly = hourly_demand(occ)          # route x hour boardings
+    fc = forecast_demand(hourly)         # route x weekday x hour baseline
+    recommend_trip_changes(fc, supply)   # add / cancel suggestions
+"""
+
+import pandas as pd
+
+PATH_SQL = """
+    SELECT p.path_id, p.trip_id, t.route_id, p.stop_id, p.arrival_time, p.departure_time,
+           p.people_in, p.people_out, b.capacity
+    FROM path p
+    JOIN trips t ON p.trip_id = t.trip_id
+    LEFT JOIN buses b ON t.bus_id = b.bus_id
+"""
+PATH_COLUMNS = ["path_id", "trip_id", "route_id", "stop_id", "arrival_time", "departure_time",
+                "people_in", "people_out", "capacity"]
+
+MAJOR_STOPS_SQL = """
+    SELECT route_id, stop_id, time_taken_minutes, people_getting_in, people_getting_down
+    FROM major_stops
+"""
+MAJOR_STOPS_COLUMNS = ["route_id", "stop_id", "time_taken_minutes", "people_getting_in", "people_getting_down"]
+
+# Seats offered per route and hour, for recommend_trip_changes()
+SUPPLY_SQL = """
+    SELECT t.route_id, t.start_time, COALESCE(b.capacity, 0) AS capacity
+    FROM trips t
+    LEFT JOIN buses b ON t.bus_id = b.bus_id
+    WHERE t.status IN ('scheduled','ongoing') AND t.start_time >= %s
+"""
+
+
+def _frame(rows, columns):
+    """DataFrame from dict or tuple rows, in `columns` order."""
+    if rows and isinstance(rows[0], dict):
+        return pd.DataFrame.from_records(rows, columns=columns)
+    return pd.DataFrame.from_records(list(rows), columns=columns)
+
+
+def path_frame(rows):
+    df = _frame(rows, PATH_COLUMNS)
+    for col in ("people_in", "people_out"):
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int32")
+    df["capacity"] = pd.to_numeric(df["capacity"], errors="coerce")
+    for col in ("arrival_time", "departure_time"):
+        df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def running_occupancy(df):
+    """Add `occupancy` (people on board after each stop) and `load_factor`.
+
+    Rows are ordered within a trip by arrival time (path_id breaks ties),
+    then occupancy is a grouped cumulative sum of people_in - people_out,
+    floored at zero at every stop: with incomplete counts more people can
+    get off than were counted on, and that deficit must not carry into the
+    later stops. Floored at each step the running total is the plain
+    cumulative sum minus its running minimum (when that is below zero).
+    """
+    df = df.sort_values(["trip_id", "arrival_time", "path_id"], kind="mergesort").reset_index(drop=True)
+    total = (df["people_in"] - df["people_out"]).groupby(df["trip_id"]).cumsum()
+    df["occupancy"] = total - total.groupby(df["trip_id"]).cummin().clip(upper=0)
+    df["load_factor"] = df["occupancy"] / df["capacity"].where(df["capacity"] > 0)
+    return df
+
+
+def trip_peaks(occ):
+    """Per trip: peak occupancy, the stop where it happens and peak load factor."""
+    idx = occ.groupby("trip_id")["occupancy"].idxmax()
+    peaks = occ.loc[idx, ["trip_id", "route_id", "stop_id", "occupancy", "load_factor"]]
+    return peaks.rename(columns={"stop_id": "peak_stop_id", "occupancy": "peak_occupancy",
+                                 "load_factor": "peak_load_factor"}).reset_index(drop=True)
+
+
+def peak_load_per_stop(occ):
+    """Per stop: boardings, alightings, peak and mean on-board load leaving the stop."""
+    return occ.groupby("stop_id").agg(
+        boardings=("people_in", "sum"),
+        alightings=("people_out", "sum"),
+        peak_load=("occupancy", "max"),
+        mean_load=("occupancy", "mean"),
+        peak_load_factor=("load_factor", "max"),
+        trips=("trip_id", "nunique"),
+    ).reset_index().sort_values("peak_load", ascending=False)
+
+
+def hourly_demand(occ):
+    """Boardings per route per clock hour (from each stop's departure time)."""
+    hours = occ["departure_time"].fillna(occ["arrival_time"]).dt.floor("h")
+    out = occ.assign(hour=hours).groupby(["route_id", "hour"], as_index=False)["people_in"].sum()
+    return out.rename(columns={"people_in": "boardings"})
+
+
+def forecast_demand(hourly, method="seasonal", weeks=4, window=3):
+    """Expected boardings per route, weekday and hour of day.
+
+    method="seasonal": mean of the same weekday+hour over the last `weeks`
+    weeks of history (missing hours count as zero demand).
+    method="moving_average": mean of the last `window` observations of the
+    same hour of day, regardless of weekday.
+    """
+    if hourly.empty:
+        return pd.DataFrame(columns=["route_id", "weekday", "hour_of_day", "forecast_boardings"])
+    end = hourly["hour"].max()
+    if method == "seasonal":
+        recent = hourly[hourly["hour"] > end - pd.Timedelta(weeks=weeks)]
+        recent = recent.assign(weekday=recent["hour"].dt.weekday, hour_of_day=recent["hour"].dt.hour)
+        totals = recent.groupby(["route_id", "weekday", "hour_of_day"])["boardings"].sum()
+        # divide by the number of weeks observed, so a busy hour seen once is not overstated
+        span_weeks = max(1, min(weeks, int((end - hourly["hour"].min()) / pd.Timedelta(weeks=1)) + 1))
+        fc = (totals / span_weeks).rename("forecast_boardings").reset_index()
+    elif method == "moving_average":
+        h = hourly.sort_values("hour").assign(hour_of_day=hourly["hour"].dt.hour)
+        h["forecast_boardings"] = (h.groupby(["route_id", "hour_of_day"])["boardings"]
+                                   .transform(lambda s: s.rolling(window, min_periods=1).mean()))
+        fc = h.groupby(["route_id", "hour_of_day"], as_index=False).last()[
+            ["route_id", "hour_of_day", "forecast_boardings"]]
+        fc = fc.merge(pd.DataFrame({"weekday": range(7)}), how="cross")
+    else:
+        raise ValueError(f"unknown forecast method: {method}")
+    return fc[["route_id", "weekday", "hour_of_day", "forecast_boardings"]]
+
+
+def supply_frame(rows):
+    """Seats offered per route, weekday and hour of day from SUPPLY_SQL rows."""
+    df = _frame(rows, ["route_id", "start_time", "capacity"])
+    df["start_time"] = pd.to_datetime(df["start_time"])
+    df["capacity"] = pd.to_numeric(df["capacity"], errors="coerce").fillna(0)
+    df = df.assign(weekday=df["start_time"].dt.weekday, hour_of_day=df["start_time"].dt.hour)
+    return df.groupby(["route_id", "weekday", "hour_of_day"], as_index=False).agg(
+        trips=("capacity", "size"), seats=("capacity", "sum"))
+
+
+def recommend_trip_changes(forecast, supply, add_above=0.9, cancel_below=0.3):
+    """Join forecast demand with scheduled seats; suggest 'add trip' where the
+    expected load factor exceeds `add_above` and 'cancel trip' where a route-hour
+    with more than one trip stays under `cancel_below`."""
+    df = forecast.merge(supply, on=["route_id", "weekday", "hour_of_day"], how="outer")
+    df[["forecast_boardings", "trips", "seats"]] = df[["forecast_boardings", "trips", "seats"]].fillna(0)
+    df["expected_load"] = df["forecast_boardings"] / df["seats"].where(df["seats"] > 0)
+    df["action"] = "keep"
+    df.loc[(df["seats"] == 0) & (df["forecast_boardings"] > 0), "action"] = "add trip"
+    df.loc[df["expected_load"] > add_above, "action"] = "add trip"
+    df.loc[(df["expected_load"] < cancel_below) & (df["trips"] > 1), "action"] = "cancel trip"
+    return df.sort_values(["route_id", "weekday", "hour_of_day"]).reset_index(drop=True)
+
+
+def major_stops_load(rows):
+    """Cumulative on-board load along each route's major stops (ordered by
+    time from origin) and the peak-load stop per route."""
+    df = _frame(rows, MAJOR_STOPS_COLUMNS)
+    df = df.sort_values(["route_id", "time_taken_minutes"], kind="mergesort").reset_index(drop=True)
+    df["load"] = (df["people_getting_in"] - df["people_getting_down"]).groupby(df["route_id"]).cumsum().clip(lower=0)
+    return df
@@ -0,0 +1,178 @@
+"""
+Passenger identity: one passengers row per contact number.
+
+Bookings used to insert a passenger for every ticket, so a regular rider
+had as many passengers rows as tickets and "My Tickets" scanned them all by
+raw contact_no. Now:
+
+* contact_key holds the normalized number (digits only, national prefix
+  dropped: "+91 98765-43210", "09876543210" and "9876543210" are the same
+  rider) behind the unique index uq_passengers_contact_key;
+* upsert() returns the existing passenger for a contact (filling in a
+  missing email) and only inserts for a new one;
+* merge_duplicates() folds historical duplicates into the oldest row per
+  contact: walking passengers in primary-key order, CHUNK_SIZE rows per
+  short transaction, it repoints their tickets, deletes the duplicates and
+  backfills contact_key, then creates the unique index. Rows without any
+  digits keep a NULL key and are left alone.
+
+Databases created before contact_key are migrated by the schema bootstrap
+(ensure_schema + merge_duplicates); `transport-admin passengers dedupe`
+runs the job on demand and prints its MergeReport.
+"""
+
+import re
+import time
+from collections import namedtuple
+
+CHUNK_SIZE = 500
+UNIQUE_INDEX = "uq_passengers_contact_key"
+
+# digits in front of a 10-digit number that only say "national/India"
+NATIONAL_PREFIXES = ("0", "91", "091", "0091")
+
+FIND_SQL = "SELECT passenger_id FROM passengers WHERE contact_key = %s ORDER BY passenger_id LIMIT 1"
+UPSERT_SQL = """
+    INSERT INTO passengers (name, address, contact_no, email_id, contact_key) VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE email_id = COALESCE(NULLIF(email_id, ''), VALUES(email_id))
+"""
+FILL_EMAIL_SQL = "UPDATE passengers SET email_id = %s WHERE passenger_id = %s AND (email_id IS NULL OR email_id = '')"
+
+MergeReport = namedtuple("MergeReport", [
+    "passengers_before", "passengers_after",
+    "contacts_merged",    # contacts that had more than one row
+    "rows_merged",        # duplicate rows folded into a survivor (deleted unless dry run)
+    "tickets_repointed",
+    "keys_backfilled",
+    "chunks", "elapsed_ms",
+    "index_created",
+])
+
+
+def normalize_contact(contact_no):
+    """Comparable form of a phone number, or None if it has no digits"""
+    digits = re.sub(r"\D", "", contact_no or "")
+    if len(digits) > 10 and digits[:-10] in NATIONAL_PREFIXES:
+        digits = digits[-10:]
+    return digits or None
+
+
+def upsert(cur, name, address, contact_no, email):
+    """passenger_id for this contact, inserting a passenger only for a new one"""
+    key = normalize_contact(contact_no)
+    if key is not None:
+        cur.execute(FIND_SQL, (key,))
+        row = cur.fetchone()
+        if row:
+            if email:
+                cur.execute(FILL_EMAIL_SQL, (email, row["passenger_id"]))
+            return row["passenger_id"]
+    cur.execute(UPSERT_SQL, (name, address, contact_no, email, key))
+    if key is None:
+        return cur.lastrowid
+    # a concurrent booking may have inserted the contact first (the upsert then
+    # updated its row and lastrowid is meaningless): read the winner back
+    cur.execute(FIND_SQL, (key,))
+    return cur.fetchone()["passenger_id"]
+
+
+# --------------------------- schema ---------------------------
+def ensure_schema(cur, live_columns):
+    """Add contact_key to a passengers table created before it existed; True if added"""
+    if "contact_key" in live_columns.get("passengers", ()):
+        return False
+    cur.execute("ALTER TABLE passengers ADD COLUMN contact_key VARCHAR(20)")
+    return True
+
+
+def has_unique_index(live_indexes):
+    return UNIQUE_INDEX in live_indexes.get("passengers", ())
+
+
+# --------------------------- merge job ---------------------------
+def _count(cur):
+    cur.execute("SELECT COUNT(*) AS n FROM passengers")
+    return cur.fetchone()["n"]
+
+
+def merge_duplicates(conn, live_indexes, chunk_size=CHUNK_SIZE, dry_run=False):
+    """Fold duplicate passengers into the oldest row per contact key.
+
+    Commits after every chunk, so bookings only ever wait for one chunk's
+    row locks; the unique index is created at the end (once no duplicates
+    are left). With dry_run nothing is written and the report says what
+    would change. Survivors keep their name; a blank email or address is
+    taken from a duplicate that has one.
+    """
+    started = time.perf_counter()
+    cur = conn.cursor(dictionary=True)
+    try:
+        before = _count(cur)
+        survivors = {}     # contact key -> oldest passenger_id
+        blanks = {}        # survivor id -> columns still empty on it
+        merged_keys = set()
+        rows_merged = tickets = backfilled = chunks = 0
+        last_id = 0
+        while True:
+            cur.execute("""
+                SELECT passenger_id, contact_no, contact_key, email_id, address FROM passengers
+                WHERE passenger_id > %s ORDER BY passenger_id LIMIT %s
+            """, (last_id, chunk_size))
+            rows = cur.fetchall()
+            conn.commit()
+            if not rows:
+                break
+            last_id = rows[-1]["passenger_id"]
+            chunks += 1
+            moves, keys, fills = [], [], []
+            for row in rows:
+                key = normalize_contact(row["contact_no"])
+                if key is None:
+                    continue
+                survivor = survivors.setdefault(key, row["passenger_id"])
+                if survivor == row["passenger_id"]:
+                    if row["contact_key"] != key:
+                        keys.append((key, survivor))
+                    empty = {c for c in ("email_id", "address") if not row[c]}
+                    if empty:
+                        blanks[survivor] = empty
+                    continue
+                merged_keys.add(key)
+                moves.append((survivor, row["passenger_id"]))
+                for column in tuple(blanks.get(survivor, ())):
+                    if row[column]:
+                        fills.append((column, row[column], survivor))
+                        blanks[survivor].discard(column)
+            rows_merged += len(moves)
+            backfilled += len(keys)
+            if dry_run:
+                if moves:
+                    cur.execute(f"SELECT COUNT(*) AS n FROM tickets WHERE passenger_id IN ({','.join(['%s'] * len(moves))})",
+                                [dup for _, dup in moves])
+                    tickets += cur.fetchone()["n"]
+                    conn.commit()
+                continue
+            if moves:
+                cur.executemany("UPDATE tickets SET passenger_id = %s WHERE passenger_id = %s", moves)
+                tickets += cur.rowcount
+                cur.execute(f"DELETE FROM passengers WHERE passenger_id IN ({','.join(['%s'] * len(moves))})",
+                            [dup for _, dup in moves])
+            for column, value, survivor in fills:
+                cur.execute(f"UPDATE passengers SET {column} = %s WHERE passenger_id = %s", (value, survivor))
+            if keys:
+                cur.executemany("UPDATE passengers SET contact_key = %s WHERE passenger_id = %s", keys)
+            conn.commit()
+        index_created = False
+        if not dry_run and not has_unique_index(live_indexes):
+            cur.execute(f"CREATE UNIQUE INDEX {UNIQUE_INDEX} ON passengers (contact_key)")
+            conn.commit()
+            index_created = True
+        after = before - rows_merged if dry_run else _count(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return MergeReport(before, after, len(merged_keys), rows_merged, tickets, backfilled, chunks,
+                       round((time.perf_counter() - started) * 1000, 1), index_created)
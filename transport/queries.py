@@ -0,0 +1,223 @@
+"""
+Registry of the named read queries the app, API and SQL script run.
+
+Page and list SQL lives here as constants (the list_* helpers in crud and
+the Tickets/Users/Trigger Logs/Search pages of app.py use them); the
+queries other modules own (timetable, reports, waitlist, ...) are
+registered by reference, and the SELECTs of Public_Transport_DBMS_Queries.sql
+are parsed from the script. all_queries() returns them all as
+NamedQuery(name, source, sql, params), `params` being sample values, so a
+tool can run or EXPLAIN every one of them:
+
+    for q in all_queries():
+        cur.execute(q.sql, q.params)
+
+tests/test_query_plans.py captures their plans on a generated dataset and
+compares them with checked-in baselines (see transport.query_plans).
+Statements that lock (FOR UPDATE) or write are not registered.
+"""
+
+import os
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+NamedQuery = namedtuple("NamedQuery", "name source sql params")
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "Public_Transport_DBMS_Queries.sql")
+
+# --------------------------- list helpers (crud) ---------------------------
+LIST_BUSES_SQL = "SELECT * FROM buses ORDER BY bus_id DESC"
+LIST_DRIVERS_SQL = "SELECT * FROM drivers ORDER BY driver_id DESC"
+LIST_ROUTES_SQL = "SELECT * FROM routes ORDER BY route_id DESC"
+LIST_STOPS_SQL = "SELECT * FROM stops ORDER BY stop_id DESC"
+LIST_TRIPS_SQL = """
+        SELECT t.*, r.route_name, b.bus_no, b.type, b.ac, CONCAT(d.first_name,' ',d.last_name) AS driver_name
+        FROM trips t
+        LEFT JOIN routes r ON t.route_id=r.route_id
+        LEFT JOIN buses b ON t.bus_id=b.bus_id
+        LEFT JOIN drivers d ON t.driver_id=d.driver_id
+        ORDER BY t.trip_id DESC
+"""
+LIST_TICKETS_SQL = """
+        SELECT tk.*, r.route_name, s1.stop_name AS boarding_stop, s2.stop_name AS dropping_stop,
+               p.name AS passenger_name, t.start_time, t.end_time
+        FROM tickets tk
+        JOIN trips t ON tk.trip_id = t.trip_id
+        JOIN routes r ON t.route_id = r.route_id
+        JOIN stops s1 ON tk.boarding_stop_id = s1.stop_id
+        JOIN stops s2 ON tk.dropping_stop_id = s2.stop_id
+        JOIN passengers p ON tk.passenger_id = p.passenger_id
+        ORDER BY tk.created_at DESC
+"""
+# every ticket of a contact, unpaged; "My Tickets" pages are transport.ticket_lookup.PAGE_SQL
+TICKETS_BY_CONTACT_SQL = """
+        SELECT tk.*, r.route_name, s1.stop_name AS boarding_stop, s2.stop_name AS dropping_stop,
+               p.name AS passenger_name, t.start_time, t.end_time, b.bus_no
+        FROM tickets tk
+        JOIN trips t ON tk.trip_id = t.trip_id
+        JOIN routes r ON t.route_id = r.route_id
+        JOIN stops s1 ON tk.boarding_stop_id = s1.stop_id
+        JOIN stops s2 ON tk.dropping_stop_id = s2.stop_id
+        JOIN passengers p ON tk.passenger_id = p.passenger_id
+        JOIN buses b ON t.bus_id = b.bus_id
+        WHERE p.contact_key = %s
+        ORDER BY tk.created_at DESC
+"""
+TRIPS_FOR_DAY_SQL = """
+        SELECT trip_id, route_id, bus_id, driver_id, start_time, end_time
+        FROM trips
+        WHERE status = 'scheduled' AND start_time >= %s AND start_time < %s
+        ORDER BY start_time
+"""
+PATH_FOR_TRIP_SQL = "SELECT p.*, s.stop_name FROM path p JOIN stops s ON p.stop_id=s.stop_id WHERE p.trip_id=%s ORDER BY p.path_id"
+LIST_MAJOR_STOPS_SQL = """
+        SELECT m.*, r.route_name, s.stop_name FROM major_stops m
+        LEFT JOIN routes r ON m.route_id=r.route_id LEFT JOIN stops s ON m.stop_id=s.stop_id
+        ORDER BY m.major_stop_id DESC
+"""
+# seat map of one trip (load_seat_map)
+TRIP_CAPACITY_SQL = "SELECT b.capacity FROM trips t JOIN buses b ON t.bus_id = b.bus_id WHERE t.trip_id = %s"
+BOOKED_SEATS_SQL = "SELECT seat_no FROM tickets WHERE trip_id = %s"
+
+# --------------------------- pages (app.py) ---------------------------
+PASSENGERS_SQL = "SELECT * FROM passengers"
+USERS_SQL = "SELECT user_id, username, role, created_at FROM users ORDER BY user_id DESC"
+RECENT_TICKET_LOG_SQL = "SELECT * FROM ticket_log ORDER BY log_time DESC LIMIT 50"
+SEARCH_ROUTES_SQL = "SELECT * FROM routes WHERE route_name LIKE %s OR source LIKE %s OR destination LIKE %s"
+SEARCH_STOPS_SQL = "SELECT * FROM stops WHERE stop_name LIKE %s OR location LIKE %s"
+SEARCH_BUSES_SQL = "SELECT * FROM buses WHERE bus_no LIKE %s OR bus_name LIKE %s"
+
+
+def search_params(text, columns):
+    """LIKE parameters for one of the SEARCH_*_SQL queries ("contains text" on each column)"""
+    return (f"%{text}%",) * columns
+
+
+# --------------------------- SQL script ---------------------------
+_SECTION = re.compile(r"^--\s*\d+\.\s*(.+?)\s*$")
+_PROCEDURE = re.compile(r"CREATE\s+PROCEDURE\s+(\w+)\s*\(([^)]*)\)\s*BEGIN\s+(SELECT\b.*?);\s*END", re.I | re.S)
+_IN_PARAM = re.compile(r"\bIN\s+(\w+)\s+\w+", re.I)
+
+
+def _slug(text):
+    text = re.sub(r"(?<=[a-z])(?=[A-Z])", "_", text)      # GetTripRevenue -> get_trip_revenue
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def script_queries(path=SCRIPT_PATH, sample_id=1):
+    """The SELECTs of the SQL script: one per numbered section ("script_join_query", ...)
+    and the bodies of its stored procedures with their IN parameters as %s
+    (sample_id for each). Nothing when the script is not there (installed package)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    found = []
+    for name, args, body in _PROCEDURE.findall(text):
+        params = _IN_PARAM.findall(args)
+        for p in params:
+            body = re.sub(rf"\b{p}\b", "%s", body)
+        found.append(NamedQuery(f"script_{_slug(name)}", "script", body, (sample_id,) * len(params)))
+    section, statement, in_block = None, [], False
+    for line in text.splitlines():
+        m = _SECTION.match(line)
+        if m:
+            section, statement = _slug(m.group(1)), []
+            continue
+        if line.upper().startswith("DELIMITER"):
+            # trigger/procedure bodies: the procedures were taken above
+            in_block = line.split()[-1] != ";"
+            continue
+        if in_block or line.startswith("--") or not (statement or line.lstrip().upper().startswith("SELECT")):
+            continue
+        statement.append(line)
+        if line.rstrip().endswith(";"):
+            found.append(NamedQuery(f"script_{section}", "script", "\n".join(statement).rstrip().rstrip(";"), ()))
+            statement = []
+    return found
+
+
+# --------------------------- registry ---------------------------
+def all_queries(contact_key="9000000001", trip_id=1, search="Central"):
+    """Every registered query with sample parameters, in a stable order (names are unique)"""
+    # imported here: crud imports this module, and demand_analytics needs pandas
+    from . import crud, dashboard, reporting, seat_inventory, ticket_lookup, waitlist
+    from .route_topology import ROUTE_TOPOLOGY_SQL
+    from .stop_geo import COORDS_SQL
+    from .timetable import TIMETABLE_SQL
+    from .trip_scheduler import SCHEDULE_SQL
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    month = (today.date() - timedelta(days=30), today.date())
+    q = lambda name, sql, params=(), source="crud": NamedQuery(name, source, sql, tuple(params))
+    queries = [
+        q("list_buses", LIST_BUSES_SQL),
+        q("list_drivers", LIST_DRIVERS_SQL),
+        q("list_routes", LIST_ROUTES_SQL),
+        q("list_stops", LIST_STOPS_SQL),
+        q("list_trips", LIST_TRIPS_SQL),
+        q("list_tickets", LIST_TICKETS_SQL),
+        q("tickets_by_contact", TICKETS_BY_CONTACT_SQL, (contact_key,)),
+        q("ticket_lookup_page", *ticket_lookup.page_query(contact_key)),
+        q("ticket_lookup_next_page", *ticket_lookup.page_query(
+            contact_key, ticket_lookup.encode_cursor({"created_at": today, "ticket_id": 10 ** 6}))),
+        q("ticket_owner", crud.TICKET_OWNER_SQL, (trip_id,)),
+        q("user_login", crud.USER_LOGIN_SQL, ("admin",)),
+        q("active_buses", crud.ACTIVE_BUSES_SQL),
+        q("active_drivers", crud.ACTIVE_DRIVERS_SQL),
+        q("recurring_patterns", crud.RECURRING_PATTERNS_SQL),
+        q("route_starts", crud.ROUTE_STARTS_SQL, (today, today + timedelta(days=7))),
+        q("booking_trip", crud.BOOKING_TRIP_SQL, (trip_id,)),
+        q("trip_status", crud.TRIP_STATUS_SQL, (trip_id,)),
+        q("trip_schedule", crud.TRIP_SCHEDULE_SQL, (trip_id,)),
+        q("waitlist_entry", crud.WAITLIST_ENTRY_SQL, (1,)),
+        q("available_trips", *crud.available_trips_query()),
+        q("available_trips_route_day", *crud.available_trips_query(1, today.date() + timedelta(days=1))),
+        q("timetable", TIMETABLE_SQL, (today,)),
+        q("route_topology", ROUTE_TOPOLOGY_SQL),
+        q("stop_coordinates", COORDS_SQL),
+        q("trip_capacity", TRIP_CAPACITY_SQL, (trip_id,)),
+        q("booked_seats", BOOKED_SEATS_SQL, (trip_id,)),
+        q("seat_count", seat_inventory.COUNT_SQL, (trip_id,)),
+        q("trips_for_day", TRIPS_FOR_DAY_SQL, (today, today + timedelta(days=1))),
+        q("schedule", SCHEDULE_SQL),
+        q("path_for_trip", PATH_FOR_TRIP_SQL, (trip_id,)),
+        q("list_major_stops", LIST_MAJOR_STOPS_SQL),
+        q("waitlist_by_contact", waitlist.BY_CONTACT_SQL, (contact_key,)),
+        q("waitlist_position", waitlist.POSITION_SQL, (trip_id, 1)),
+        q("waitlist_stale", waitlist.STALE_SQL, (datetime.now(),)),
+        q("waitlist_waiting_entry", waitlist.WAITING_ENTRY_SQL, (trip_id, 1)),
+        q("waitlist_status", waitlist.STATUS_SQL, (1,)),
+        q("waitlist_trip", waitlist.TRIP_OF_SQL, (1,)),
+        q("dashboard_counts", dashboard.COUNTS_SQL, source="dashboard"),
+        q("dashboard_bus_status", dashboard.BUS_STATUS_SQL, source="dashboard"),
+        q("dashboard_recent_tickets", dashboard.RECENT_TICKETS_SQL, source="dashboard"),
+        *[q(f"revenue_by_{dim}", reporting.revenue_report_sql(dim), month, source="reporting")
+          for dim in reporting.DIMENSIONS],
+        q("gender_report", reporting.GENDER_REPORT_SQL, month, source="reporting"),
+        q("stop_pair_report", reporting.STOP_PAIR_REPORT_SQL, month, source="reporting"),
+        q("report_refresh_state", reporting.REFRESH_STATE_SQL, source="reporting"),
+        q("page_passengers", PASSENGERS_SQL, source="app"),
+        q("page_users", USERS_SQL, source="app"),
+        q("page_trigger_logs", RECENT_TICKET_LOG_SQL, source="app"),
+        q("search_routes", SEARCH_ROUTES_SQL, search_params(search, 3), source="app"),
+        q("search_stops", SEARCH_STOPS_SQL, search_params(search, 2), source="app"),
+        q("search_buses", SEARCH_BUSES_SQL, search_params(search, 2), source="app"),
+    ]
+    try:
+        from . import demand_analytics
+    except ImportError:
+        pass
+    else:
+        queries += [q("demand_path", demand_analytics.PATH_SQL, source="demand_analytics"),
+                    q("demand_supply", demand_analytics.SUPPLY_SQL, (today.date(),), source="demand_analytics")]
+    return queries + script_queries(sample_id=trip_id)
+
+
+def get(name, **samples):
+    for query in all_queries(**samples):
+        if query.name == name:
+            return query
+    raise KeyError(name)
@@ -0,0 +1,268 @@
+"""
+Query classes: statement deadlines, cancellation and admission control.
+
+Every pooled query runs under a class (config.QUERY_CLASSES):
+
+    booking   seat checks and ticket writes; never shed
+    staff     admin/operator pages, CLI
+    report    background refreshers and exports
+    public    public pages and API reads; shed first
+    maintenance  schema bootstrap and migrations; no deadline, never shed
+
+Admission bounds how many statements of each class run at once in this
+process. Classes with a limit together never hold more than
+DB_POOL_SIZE - BOOKING_RESERVE connections, so a burst of public searches
+waits (briefly) or is rejected with Overloaded while bookings still find a
+free connection. Public reads have the shortest queue wait, so under
+overload they are the first to be turned away.
+
+Each statement also gets a deadline (except under "maintenance"). The backend enforces it on the server
+where it can (MySQL MAX_EXECUTION_TIME, SELECTs only); the Watchdog thread
+cancels whatever is still running a moment later (KILL QUERY / sqlite3
+interrupt()), so one slow LIKE search cannot hold a connection forever.
+The caller then gets QueryTimeout. The deadline covers each execute() and
+fetch call on its own, not the checkout: time spent between calls (writing
+an export, a slow HTTP client) is not the database's and is not cancelled.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from . import context
+
+CLASSES = ("booking", "staff", "report", "public", "maintenance")
+
+# client-side cancellation fires this long after the server-side limit,
+# so on MySQL a SELECT normally stops itself first
+CANCEL_GRACE_SECONDS = 1.0
+
+
+class Overloaded(Exception):
+    """Admission refused: too many statements of this class already running."""
+
+
+class QueryTimeout(Exception):
+    """The statement overran its class deadline and was cancelled."""
+
+
+# --------------------------- current class ---------------------------
+_local = threading.local()
+
+
+@contextmanager
+def workload(name):
+    """Run the block's queries under class `name` (this thread only)"""
+    previous = getattr(_local, "name", None)
+    _local.name = name
+    try:
+        yield
+    finally:
+        _local.name = previous
+
+
+def current_class(explicit=None, default="staff"):
+    """explicit argument > workload() block > the session's class > default"""
+    name = explicit or getattr(_local, "name", None)
+    if name is None:
+        state = context.session()
+        name = state.get("query_class") if state is not None else None
+    name = name or default
+    if name not in CLASSES:
+        raise ValueError(f"unknown query class {name!r} (expected one of {', '.join(CLASSES)})")
+    return name
+
+
+# --------------------------- admission ---------------------------
+class Admission:
+    """Per-class concurrency limits with a shared cap that keeps `reserve`
+    connections for the unlimited classes.
+
+    `classes` maps name -> (timeout_s, limit, wait_s); limit None means the
+    class is never queued or shed (it still waits for a pooled connection).
+    """
+
+    def __init__(self, classes, capacity, reserve):
+        self.classes = classes
+        self.shared = max(1, capacity - reserve)
+        self.active = Counter()
+        self.admitted = Counter()
+        self.shed = Counter()
+        self._cond = threading.Condition()
+
+    def _limited_active(self):
+        return sum(n for name, n in self.active.items() if self.classes[name][1] is not None)
+
+    def _has_room(self, name):
+        limit = self.classes[name][1]
+        if limit is None:
+            return True
+        return self.active[name] < limit and self._limited_active() < self.shared
+
+    @contextmanager
+    def admit(self, name):
+        wait = self.classes[name][2]
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._has_room(name), timeout=wait):
+                self.shed[name] += 1
+                raise Overloaded(f"server busy: too many {name} queries running, please retry shortly")
+            self.active[name] += 1
+            self.admitted[name] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active[name] -= 1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {name: {"active": self.active[name], "admitted": self.admitted[name], "shed": self.shed[name]}
+                    for name in self.classes}
+
+
+# --------------------------- deadlines ---------------------------
+class Deadline:
+    """One armed checkout; `fired` is set once the watchdog has cancelled it."""
+
+    def __init__(self, conn, cancel, timeout):
+        self.conn = conn
+        self.cancel = cancel
+        self.timeout = timeout
+        self.fired = False
+        self.done = False
+        self.lock = threading.Lock()
+
+
+class Watchdog:
+    """One thread cancelling statements that outlive their deadline."""
+
+    def __init__(self):
+        self.cancelled = 0
+        self._heap = []
+        self._finished = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @contextmanager
+    def deadline(self, conn, cancel, timeout):
+        """Cancel `conn`'s running statement via cancel(conn) if the block
+        lasts longer than `timeout` seconds; yields the Deadline."""
+        armed = Deadline(conn, cancel, timeout)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-watchdog", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (time.monotonic() + timeout, next(self._seq), armed))
+            self._cond.notify()
+        try:
+            yield armed
+        finally:
+            # a cancel in progress finishes before the connection can be reused
+            with armed.lock:
+                armed.done = True
+                armed.conn = None
+            with self._cond:
+                # per-statement arming leaves many finished entries behind; drop them
+                # once they are most of the heap instead of waiting for their due time
+                self._finished += 1
+                if self._finished > 64 and self._finished * 2 > len(self._heap):
+                    self._heap = [entry for entry in self._heap if not entry[2].done]
+                    heapq.heapify(self._heap)
+                    self._finished = 0
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, armed = heapq.heappop(self._heap)
+            with armed.lock:
+                if armed.done:
+                    with self._cond:
+                        self._finished = max(self._finished - 1, 0)
+                    continue
+                armed.fired = True
+                self.cancelled += 1
+                try:
+                    armed.cancel(armed.conn)
+                except Exception:
+                    context.logger.warning("could not cancel overrunning query", exc_info=True)
+
+
+class StatementGuard:
+    """One checkout's connection and cursors, each statement armed on the
+    watchdog; `fired` is set once any of them was cancelled."""
+
+    def __init__(self, watchdog, conn, cancel, timeout):
+        self.watchdog = watchdog
+        self.conn = conn
+        self.cancel = cancel
+        self.timeout = timeout
+        self.fired = False
+
+    @contextmanager
+    def statement(self):
+        with self.watchdog.deadline(self.conn, self.cancel, self.timeout) as armed:
+            try:
+                yield
+            finally:
+                self.fired = self.fired or armed.fired
+
+    def connection(self):
+        return GuardedConnection(self.conn, self)
+
+    def cursor(self, cursor):
+        return GuardedCursor(cursor, self)
+
+
+class GuardedConnection:
+    """The pooled connection, handing out guarded cursors (bulk helpers take a connection)"""
+
+    def __init__(self, conn, guard):
+        self._conn = conn
+        self._guard = guard
+
+    def cursor(self, *args, **kwargs):
+        return GuardedCursor(self._conn.cursor(*args, **kwargs), self._guard)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class GuardedCursor:
+    """A cursor whose execute and fetch calls each run under the deadline"""
+
+    def __init__(self, cursor, guard):
+        self._cursor = cursor
+        self._guard = guard
+
+    def execute(self, *args, **kwargs):
+        with self._guard.statement():
+            return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        with self._guard.statement():
+            return self._cursor.executemany(*args, **kwargs)
+
+    def fetchone(self):
+        with self._guard.statement():
+            return self._cursor.fetchone()
+
+    def fetchmany(self, *args, **kwargs):
+        with self._guard.statement():
+            return self._cursor.fetchmany(*args, **kwargs)
+
+    def fetchall(self):
+        with self._guard.statement():
+            return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
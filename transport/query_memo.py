@@ -0,0 +1,82 @@
+"""
+Per-session query memoization with dependency tags.
+
+A SessionMemo is kept in st.session_state, so its results survive
+Streamlit reruns of that session. Every entry records the tags it
+depends on ("tickets", "tickets:trip=7", ...) and the version of each tag
+when it was loaded. Writes bump tag versions in a process-wide TagVersions
+registry, which makes every dependent entry in every session stale, while
+entries that do not share a tag keep being served.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TagVersions:
+    """Process-wide tag -> version counter, bumped by writes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._epoch = 0
+
+    def snapshot(self, tags):
+        with self._lock:
+            return (self._epoch,) + tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def bump(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def bump_all(self):
+        """Invalidate everything (reseed, schema reset)."""
+        with self._lock:
+            self._epoch += 1
+
+
+class SessionMemo:
+    """Memoized loader results for one session (LRU, at most `max_entries`).
+
+    `max_age` bounds staleness against writers this process cannot see
+    (other app processes, the SQL console).
+    """
+
+    def __init__(self, versions, max_entries=256, max_age=60.0):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def reset_counters(self):
+        """Called at the start of every rerun so hits/misses are per rerun."""
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, tags, loader):
+        """Return the cached result for `key`, reloading via `loader()` if any tag changed."""
+        tags = tuple(tags)
+        stamp = self.versions.snapshot(tags)
+        entry = self._entries.get(key)
+        if entry is not None:
+            loaded_at, entry_stamp, value = entry
+            if entry_stamp == stamp and time.monotonic() - loaded_at < self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        self.misses += 1
+        value = loader()
+        # stamp taken before loading: a write racing with the load leaves the
+        # entry stale rather than silently fresh
+        self._entries[key] = (time.monotonic(), stamp, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,116 @@
+"""
+Query plan capture and regression checks for the registered queries.
+
+capture(cur, queries) EXPLAINs every NamedQuery (transport.queries) through
+the backend's explain() and keeps a comparable summary per query: each
+table's access type, key and row estimate, plus whether the plan sorts
+(filesort) or builds a temporary table. compare(baseline, current) lists
+what got worse:
+
+* a table's access type moved down ACCESS_RANK (ref -> ALL, eq_ref -> index, ...);
+* a filesort or temporary table appeared;
+* a table's row estimate grew more than ROWS_GROWTH times (and past
+  ROWS_FLOOR rows: small tables move around);
+* a query or a table in its plan is new, or a query is gone, since the
+  baseline.
+
+Improvements are not regressions; re-record the baseline to keep them.
+Baselines are JSON, one file per backend (plans differ between MySQL and
+SQLite), written by save_baselines() with stable key order so a diff shows
+exactly which plan moved.
+"""
+
+import json
+import os
+
+# best first; anything not listed ranks with "ALL"
+ACCESS_RANK = {access: rank for rank, names in enumerate((
+    ("system", "const"),
+    ("eq_ref",),
+    ("ref", "fulltext", "unique_subquery"),
+    ("ref_or_null", "index_subquery", "index_merge"),
+    ("range",),
+    ("index",),
+    ("ALL",),
+)) for access in names}
+ROWS_GROWTH = 10
+ROWS_FLOOR = 1000
+
+
+def _rank(access):
+    return ACCESS_RANK.get(access, ACCESS_RANK["ALL"])
+
+
+def _tables(plan):
+    """{table label: step}; a table seen twice (subqueries) gets "#2", "#3"..."""
+    seen, out = {}, {}
+    for step in plan["tables"]:
+        n = seen[step["table"]] = seen.get(step["table"], 0) + 1
+        out[step["table"] if n == 1 else f"{step['table']}#{n}"] = step
+    return out
+
+
+def capture(cur, queries, explain=None):
+    """{query name: plan summary} for a list of NamedQuery"""
+    if explain is None:
+        from . import backends
+        explain = backends.get().explain
+    return {q.name: explain(cur, q.sql, q.params) for q in queries}
+
+
+def compare(baseline, current):
+    """Regressions of `current` against `baseline` ({name: plan} each), as
+    "name: what changed" strings (empty when nothing got worse)"""
+    problems = []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in current:
+            problems.append(f"{name}: in the baseline but no longer registered")
+            continue
+        if name not in baseline:
+            problems.append(f"{name}: no baseline plan (record one)")
+            continue
+        old, new = baseline[name], current[name]
+        for flag in ("filesort", "temporary"):
+            if new[flag] and not old[flag]:
+                problems.append(f"{name}: now uses a {flag}")
+        old_tables, new_tables = _tables(old), _tables(new)
+        for table, step in new_tables.items():
+            before = old_tables.get(table)
+            if before is None:
+                problems.append(f"{name}: new table {table} ({step['access']})")
+                continue
+            if _rank(step["access"]) > _rank(before["access"]):
+                problems.append(f"{name}: {table} access {before['access']} ({before['key']}) -> "
+                                f"{step['access']} ({step['key']})")
+            if (before["rows"] is not None and step["rows"] is not None and step["rows"] > ROWS_FLOOR
+                    and step["rows"] > before["rows"] * ROWS_GROWTH):
+                problems.append(f"{name}: {table} row estimate {before['rows']} -> {step['rows']}")
+    return problems
+
+
+def describe(plan):
+    """One line per plan for reports: "t:ref(idx) tk:ALL +filesort" """
+    parts = [f"{table}:{step['access']}" + (f"({step['key']})" if step["key"] else "")
+             for table, step in _tables(plan).items()]
+    parts += [f"+{flag}" for flag in ("filesort", "temporary") if plan[flag]]
+    return " ".join(parts)
+
+
+# --------------------------- baselines ---------------------------
+def baseline_path(directory, backend):
+    return os.path.join(directory, f"{backend}.json")
+
+
+def load_baselines(path):
+    """{name: plan} from a baseline file ({} if there is none yet)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(path, plans):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plans, f, indent=2, sort_keys=True)
+        f.write("\n")
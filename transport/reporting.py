@@ -0,0 +1,328 @@
+"""
+Materialized reporting tables for the admin reports.
+
+Revenue and ridership are pre-aggregated per service day (the trip's start
+date) into small report_* tables, so report pages read a few hundred rows
+however large `tickets` grows. ReportRefresher keeps them current in the
+background:
+
+* new tickets are folded in incrementally by ticket_id high-water mark.
+  A booking still uncommitted when the refresh reads tickets leaves a gap
+  below the mark; those ids are kept as pending (for up to
+  PENDING_SECONDS) and folded in by the run that first sees them, so a
+  late commit is neither skipped nor counted twice;
+* days touched by ticket updates/deletes since the last run (found via
+  `ticket_log`, followed by log_id the same way) are recomputed from
+  scratch;
+* a periodic (and on-demand) full rebuild picks up what ticket_log does
+  not capture: trip reassignments, deleted trips, and the old day of a
+  ticket moved to another trip.
+
+A MySQL named lock keeps concurrent app processes from refreshing at once.
+"""
+
+import json
+import threading
+import time
+
+from . import context
+
+REPORT_TABLES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS report_revenue_daily (
+        day DATE NOT NULL,
+        route_id INT NOT NULL,
+        bus_id INT NOT NULL,
+        driver_id INT NOT NULL,
+        tickets INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, route_id, bus_id, driver_id)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS report_gender_daily (
+        day DATE NOT NULL,
+        route_id INT NOT NULL,
+        gender VARCHAR(10) NOT NULL,
+        tickets INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, route_id, gender)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS report_stop_pairs_daily (
+        day DATE NOT NULL,
+        route_id INT NOT NULL,
+        boarding_stop_id INT NOT NULL,
+        dropping_stop_id INT NOT NULL,
+        tickets INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, route_id, boarding_stop_id, dropping_stop_id)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS report_refresh_state (
+        id INT PRIMARY KEY,
+        ticket_high_water DATETIME,
+        ticket_id_high_water INT,
+        log_high_water INT,
+        pending_ids TEXT,
+        refreshed_at DATETIME,
+        last_duration_ms INT
+    ) ENGINE=InnoDB;
+    """,
+]
+
+# table -> (grouping key columns, SELECT expressions for them)
+REPORTS = {
+    "report_revenue_daily": (
+        ("day", "route_id", "bus_id", "driver_id"),
+        "DATE(t.start_time), COALESCE(t.route_id,0), COALESCE(t.bus_id,0), COALESCE(t.driver_id,0)",
+    ),
+    "report_gender_daily": (
+        ("day", "route_id", "gender"),
+        "DATE(t.start_time), COALESCE(t.route_id,0), COALESCE(tk.gender,'other')",
+    ),
+    "report_stop_pairs_daily": (
+        ("day", "route_id", "boarding_stop_id", "dropping_stop_id"),
+        "DATE(t.start_time), COALESCE(t.route_id,0), COALESCE(tk.boarding_stop_id,0), COALESCE(tk.dropping_stop_id,0)",
+    ),
+}
+
+LOCK_NAME = "transport_report_refresh"
+
+# Ids this far below the newest ticket/log row are the only ones that may
+# still be in-flight writes; a gap older than PENDING_SECONDS is a rollback
+# or a deleted row, not a commit still to come (the full rebuild catches
+# anything stranger)
+PENDING_WINDOW = 1000
+PENDING_SECONDS = 600
+
+# report_refresh_state columns added after the table first shipped
+STATE_COLUMNS = {"ticket_id_high_water": "INT", "pending_ids": "TEXT"}
+
+
+def _aggregate_sql(table, where):
+    keys, exprs = REPORTS[table]
+    group = ", ".join(str(i + 1) for i in range(len(keys)))
+    return f"""
+        INSERT INTO {table} ({', '.join(keys)}, tickets, revenue)
+        SELECT {exprs}, COUNT(*), COALESCE(SUM(tk.fare), 0)
+        FROM tickets tk
+        JOIN trips t ON tk.trip_id = t.trip_id
+        WHERE t.start_time IS NOT NULL AND {where}
+        GROUP BY {group}
+        ON DUPLICATE KEY UPDATE tickets = tickets + VALUES(tickets), revenue = revenue + VALUES(revenue)
+    """
+
+
+def _marks(params):
+    return ",".join(["%s"] * len(params))
+
+
+def _advance(cur, table, key, mark, pending, now):
+    """(new high-water mark, ids that became visible below the old one, ids
+    still pending) for an auto-increment `key`. `pending` maps ids missing
+    below the mark to when they were first missed."""
+    cur.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}")
+    top = max(cur.fetchone()[0], mark)
+    floor = max(mark, top - PENDING_WINDOW)
+    cur.execute(f"SELECT {key} FROM {table} WHERE {key} > %s AND {key} <= %s", (floor, top))
+    seen = {row[0] for row in cur.fetchall()}
+    late = []
+    if pending:
+        ids = sorted(pending)
+        cur.execute(f"SELECT {key} FROM {table} WHERE {key} IN ({_marks(ids)})", ids)
+        late = sorted(row[0] for row in cur.fetchall())
+    still = {i: since for i, since in pending.items() if i not in late and now - since < PENDING_SECONDS}
+    still.update((i, now) for i in range(floor + 1, top + 1) if i not in seen)
+    if len(still) > PENDING_WINDOW:
+        still = dict(sorted(still.items())[-PENDING_WINDOW:])
+    return top, late, still
+
+
+def refresh_reports(conn, full=False):
+    """Bring the report tables up to date; returns a stats dict, or None if
+    another process holds the refresh lock."""
+    started = time.perf_counter()
+    cur = conn.cursor()
+    cur.execute("SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))
+    if cur.fetchone()[0] != 1:
+        cur.close()
+        return None
+    try:
+        cur.execute("SELECT ticket_id_high_water, log_high_water, pending_ids FROM report_refresh_state WHERE id = 1")
+        state = cur.fetchone()
+        incremental = not full and state is not None and state[0] is not None
+        ticket_mark, log_mark = (state[0] or 0, state[1] or 0) if state else (0, 0)
+        pending = {name: {i: since for i, since in ids}
+                   for name, ids in json.loads(state[2] if state and state[2] else "{}").items()}
+        now = time.time()
+        ticket_hwm, late_tickets, ticket_pending = _advance(
+            cur, "tickets", "ticket_id", ticket_mark, pending.get("tickets", {}), now)
+        log_hwm, late_log, log_pending = _advance(cur, "ticket_log", "log_id", log_mark, pending.get("log", {}), now)
+        stats = {"mode": "incremental" if incremental else "full", "dirty_days": 0}
+
+        # the tickets the report tables hold once this run commits
+        counted, counted_params = "tk.ticket_id <= %s", [ticket_hwm]
+        if ticket_pending:
+            counted += f" AND tk.ticket_id NOT IN ({_marks(ticket_pending)})"
+            counted_params += sorted(ticket_pending)
+        if not incremental:
+            for table in REPORTS:
+                cur.execute(f"DELETE FROM {table}")
+                cur.execute(_aggregate_sql(table, counted), counted_params)
+        else:
+            # days whose tickets were edited or deleted since the last run: recompute whole days
+            where, params = "(l.log_id > %s AND l.log_id <= %s)", [log_mark, log_hwm]
+            if late_log:
+                where += f" OR l.log_id IN ({_marks(late_log)})"
+                params += late_log
+            cur.execute(f"""
+                SELECT DISTINCT DATE(t.start_time)
+                FROM ticket_log l JOIN trips t ON l.trip_id = t.trip_id
+                WHERE ({where})
+                  AND l.action IN ('Ticket Updated', 'Ticket Deleted') AND t.start_time IS NOT NULL
+            """, params)
+            dirty = [row[0] for row in cur.fetchall()]
+            stats["dirty_days"] = len(dirty)
+            for table in REPORTS:
+                if dirty:
+                    cur.execute(f"DELETE FROM {table} WHERE day IN ({_marks(dirty)})", dirty)
+                    cur.execute(_aggregate_sql(table, f"DATE(t.start_time) IN ({_marks(dirty)}) AND {counted}"),
+                                dirty + counted_params)
+                # tickets above the last mark or committed late below it (dirty days already include them)
+                where, params = "tk.ticket_id > %s", [ticket_mark]
+                if late_tickets:
+                    where += f" OR tk.ticket_id IN ({_marks(late_tickets)})"
+                    params += late_tickets
+                where = f"({where}) AND {counted}"
+                params += counted_params
+                if dirty:
+                    where += f" AND DATE(t.start_time) NOT IN ({_marks(dirty)})"
+                    params += dirty
+                cur.execute(_aggregate_sql(table, where), params)
+
+        stats["duration_ms"] = int((time.perf_counter() - started) * 1000)
+        stats["pending"] = len(ticket_pending)
+        pending_ids = json.dumps({"tickets": sorted(ticket_pending.items()), "log": sorted(log_pending.items())})
+        cur.execute("""
+            INSERT INTO report_refresh_state (id, ticket_high_water, ticket_id_high_water, log_high_water,
+                                              pending_ids, refreshed_at, last_duration_ms)
+            VALUES (1, NOW(), %s, %s, %s, NOW(), %s)
+            ON DUPLICATE KEY UPDATE ticket_high_water = VALUES(ticket_high_water),
+                ticket_id_high_water = VALUES(ticket_id_high_water), log_high_water = VALUES(log_high_water),
+                pending_ids = VALUES(pending_ids), refreshed_at = VALUES(refreshed_at),
+                last_duration_ms = VALUES(last_duration_ms)
+        """, (ticket_hwm, log_hwm, pending_ids, stats["duration_ms"]))
+        conn.commit()
+        return stats
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cur.fetchall()
+        cur.close()
+
+
+def ensure_schema(cur, live_columns):
+    """Add the ticket_id watermark columns to a report_refresh_state created before them; True if added"""
+    added = False
+    for column, sql_type in STATE_COLUMNS.items():
+        if column not in live_columns.get("report_refresh_state", ()):
+            cur.execute(f"ALTER TABLE report_refresh_state ADD COLUMN {column} {sql_type}")
+            added = True
+    return added
+
+
+class ReportRefresher:
+    """Background thread running refresh_reports() every `interval` seconds,
+    with a full rebuild every `full_every` runs."""
+
+    def __init__(self, connect, interval=60.0, full_every=60):
+        self.connect = connect
+        self.interval = interval
+        self.full_every = full_every
+        self.runs = 0
+        self.last_stats = None
+        self._wake = threading.Event()
+        self._full = False
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="report-refresher", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def request_refresh(self, full=False):
+        """Refresh now instead of waiting for the next tick."""
+        self._full = self._full or full
+        self._wake.set()
+
+    def _run(self):
+        conn = None
+        while not self._stop.is_set():
+            full, self._full = self._full, False
+            full = full or (self.full_every and self.runs % self.full_every == self.full_every - 1)
+            self.runs += 1
+            try:
+                if conn is None:
+                    conn = self.connect()
+                stats = refresh_reports(conn, full=full)
+                if stats:
+                    self.last_stats = stats
+            except Exception:
+                context.logger.exception("report refresh failed")
+                conn = None
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+# ---- report queries (group the small daily tables, never touch tickets) ----
+DIMENSIONS = {
+    "route": ("r.route_name", "LEFT JOIN routes r ON r.route_id = x.route_id", "x.route_id"),
+    "bus": ("b.bus_no", "LEFT JOIN buses b ON b.bus_id = x.bus_id", "x.bus_id"),
+    "driver": ("CONCAT(d.first_name,' ',d.last_name)", "LEFT JOIN drivers d ON d.driver_id = x.driver_id", "x.driver_id"),
+    "day": ("x.day", "", "x.day"),
+}
+
+
+def revenue_report_sql(dimension):
+    """Revenue/ridership by route, bus, driver or day between two dates (params: start, end)."""
+    label, join, key = DIMENSIONS[dimension]
+    return f"""
+        SELECT {key} AS id, {label} AS name, SUM(x.tickets) AS tickets, SUM(x.revenue) AS revenue
+        FROM report_revenue_daily x
+        {join}
+        WHERE x.day BETWEEN %s AND %s
+        GROUP BY {key}, {label}
+        ORDER BY revenue DESC
+    """
+
+
+GENDER_REPORT_SQL = """
+    SELECT gender, SUM(tickets) AS tickets, SUM(revenue) AS revenue
+    FROM report_gender_daily
+    WHERE day BETWEEN %s AND %s
+    GROUP BY gender
+    ORDER BY tickets DESC
+"""
+
+STOP_PAIR_REPORT_SQL = """
+    SELECT r.route_name, s1.stop_name AS boarding_stop, s2.stop_name AS dropping_stop,
+           SUM(x.tickets) AS tickets, SUM(x.revenue) AS revenue
+    FROM report_stop_pairs_daily x
+    LEFT JOIN routes r ON r.route_id = x.route_id
+    LEFT JOIN stops s1 ON s1.stop_id = x.boarding_stop_id
+    LEFT JOIN stops s2 ON s2.stop_id = x.dropping_stop_id
+    WHERE x.day BETWEEN %s AND %s
+    GROUP BY x.route_id, x.boarding_stop_id, x.dropping_stop_id, r.route_name, s1.stop_name, s2.stop_name
+    ORDER BY tickets DESC
+    LIMIT 50
+"""
+
+REFRESH_STATE_SQL = "SELECT ticket_high_water, refreshed_at, last_duration_ms FROM report_refresh_state WHERE id = 1"
@@ -0,0 +1,110 @@
+"""
+In-memory route topology index.
+
+Loaded with one bulk query over route_stops/stops and kept until a write to
+either table invalidates it, so the booking pages can resolve a route's
+ordered stops, the routes serving a stop and "is the dropping stop after the
+boarding stop" without touching the database. Writes this process does not
+see (another process, the SQL console) show up after at most `max_age`.
+"""
+
+import threading
+import time
+
+ROUTE_TOPOLOGY_SQL = """
+    SELECT rs.route_id, rs.stop_order, s.stop_id, s.stop_name, s.location, s.latitude, s.longitude
+    FROM route_stops rs
+    JOIN stops s ON rs.stop_id = s.stop_id
+    ORDER BY rs.route_id, rs.stop_order
+"""
+
+
+class RouteTopology:
+    """Immutable index: route -> ordered stops, stop -> routes, (route, stop) -> position."""
+
+    def __init__(self, rows):
+        """Build from rows shaped like ROUTE_TOPOLOGY_SQL's result."""
+        route_stops = {}
+        stop_routes = {}
+        positions = {}
+        for row in rows:
+            stops = route_stops.setdefault(row["route_id"], [])
+            pos = len(stops)
+            stops.append({
+                "stop_order": row["stop_order"],
+                "stop_id": row["stop_id"],
+                "stop_name": row["stop_name"],
+                "location": row["location"],
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+            })
+            stop_routes.setdefault(row["stop_id"], set()).add(row["route_id"])
+            # loop routes can visit a stop twice: keep first and last visit
+            first, _ = positions.get((row["route_id"], row["stop_id"]), (pos, pos))
+            positions[(row["route_id"], row["stop_id"])] = (first, pos)
+        self._route_stops = {rid: tuple(stops) for rid, stops in route_stops.items()}
+        self._stop_routes = {sid: frozenset(rids) for sid, rids in stop_routes.items()}
+        self._positions = positions
+
+    def stops_for_route(self, route_id):
+        """Stops of a route in stop_order, same shape as get_route_stops() rows."""
+        return self._route_stops.get(route_id, ())
+
+    def routes_for_stop(self, stop_id):
+        return self._stop_routes.get(stop_id, frozenset())
+
+    def position(self, route_id, stop_id):
+        """0-based position of the stop's first visit on the route, or None."""
+        pos = self._positions.get((route_id, stop_id))
+        return pos[0] if pos else None
+
+    def segment(self, route_id, boarding_stop_id, dropping_stop_id):
+        """Stops ridden from boarding to dropping stop, both included (() if not forward)."""
+        board = self._positions.get((route_id, boarding_stop_id))
+        drop = self._positions.get((route_id, dropping_stop_id))
+        if board is None or drop is None or board[0] >= drop[1]:
+            return ()
+        return self._route_stops[route_id][board[0]:drop[1] + 1]
+
+    def is_forward(self, route_id, boarding_stop_id, dropping_stop_id):
+        """True if the route reaches dropping_stop after boarding_stop."""
+        board = self._positions.get((route_id, boarding_stop_id))
+        drop = self._positions.get((route_id, dropping_stop_id))
+        if board is None or drop is None:
+            return False
+        return board[0] < drop[1]
+
+
+class RouteTopologyCache:
+    """Holds the current RouteTopology; writers call invalidate().
+
+    Readers get a whole index object, so an invalidation racing with a page
+    render never leaves them with a half-built or missing index. An index
+    older than `max_age` seconds is reloaded like an invalidated one.
+    """
+
+    def __init__(self, max_age=60.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._topology = None
+        self._loaded_at = 0.0
+        self.loads = 0
+
+    def _stale(self, topology, loaded_at):
+        return topology is None or time.monotonic() - loaded_at >= self.max_age
+
+    def get(self, fetch):
+        """Current index, loading it via `fetch()` (returns rows) if needed."""
+        topology = self._topology
+        if self._stale(topology, self._loaded_at):
+            with self._lock:
+                if self._stale(self._topology, self._loaded_at):
+                    self._topology = RouteTopology(fetch())
+                    self._loaded_at = time.monotonic()
+                    self.loads += 1
+                topology = self._topology
+        return topology
+
+    def invalidate(self):
+        with self._lock:
+            self._topology = None
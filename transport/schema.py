@@ -0,0 +1,385 @@
+"""
+Schema bootstrap (tables, triggers, stored procedure, report tables) and
+sample data. Backend-specific DDL lives in transport/backends/.
+"""
+
+from datetime import datetime, timedelta
+
+from . import (auth, backends, bulk_loader, config, context, passenger_identity, reporting, seat_inventory,
+               stop_geo, table_registry, ticket_lookup, waitlist)
+from .config import DEMO_USERS
+from .crud import dedupe_passengers, get_report_refresher, invalidate_route_topology
+from .db import get_conn, get_tag_versions
+
+# --------------------------- SCHEMA & SEED ---------------------------
+# MySQL DDL; other backends translate it (see backends/)
+TABLES_DDL = [
+    # Users table
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(100) UNIQUE,
+        password_hash VARCHAR(256),
+        role ENUM('admin','operator') NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB;
+    """,
+    # Drivers table
+    """
+    CREATE TABLE IF NOT EXISTS drivers (
+        driver_id INT AUTO_INCREMENT PRIMARY KEY,
+        first_name VARCHAR(100),
+        last_name VARCHAR(100),
+        license_no VARCHAR(100) UNIQUE,
+        phone VARCHAR(20),
+        salary DECIMAL(10,2),
+        address TEXT,
+        is_active BOOLEAN DEFAULT TRUE
+    ) ENGINE=InnoDB;
+    """,
+    # Routes table
+    """
+    CREATE TABLE IF NOT EXISTS routes (
+        route_id INT AUTO_INCREMENT PRIMARY KEY,
+        route_name VARCHAR(200),
+        source VARCHAR(200),
+        destination VARCHAR(200),
+        distance_km FLOAT
+    ) ENGINE=InnoDB;
+    """,
+    # Stops table
+    """
+    CREATE TABLE IF NOT EXISTS stops (
+        stop_id INT AUTO_INCREMENT PRIMARY KEY,
+        stop_name VARCHAR(200),
+        location VARCHAR(255),
+        -- WGS84 degrees; NULL until geocoded (stop_geo)
+        latitude DOUBLE,
+        longitude DOUBLE
+    ) ENGINE=InnoDB;
+    """,
+    # Buses table - CORRECTED: Added 'type' column
+    """
+    CREATE TABLE IF NOT EXISTS buses (
+        bus_id INT AUTO_INCREMENT PRIMARY KEY,
+        bus_no VARCHAR(100) UNIQUE,
+        bus_name VARCHAR(200),
+        type VARCHAR(100),
+        capacity INT,
+        fare_id INT,
+        route_id INT,
+        ac BOOLEAN DEFAULT FALSE,
+        status ENUM('active','maintenance','inactive') DEFAULT 'active',
+        FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE SET NULL
+    ) ENGINE=InnoDB;
+    """,
+    # Route stops table
+    """
+    CREATE TABLE IF NOT EXISTS route_stops (
+        route_id INT,
+        stop_order INT,
+        stop_id INT,
+        PRIMARY KEY (route_id, stop_order),
+        FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE CASCADE,
+        FOREIGN KEY (stop_id) REFERENCES stops(stop_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """,
+    # Trips table
+    """
+    CREATE TABLE IF NOT EXISTS trips (
+        trip_id INT AUTO_INCREMENT PRIMARY KEY,
+        route_id INT,
+        bus_id INT,
+        driver_id INT,
+        start_time DATETIME,
+        end_time DATETIME,
+        frequency VARCHAR(100),
+        status ENUM('scheduled','ongoing','completed','cancelled') DEFAULT 'scheduled',
+        FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE SET NULL,
+        FOREIGN KEY (bus_id) REFERENCES buses(bus_id) ON DELETE SET NULL,
+        FOREIGN KEY (driver_id) REFERENCES drivers(driver_id) ON DELETE SET NULL
+    ) ENGINE=InnoDB;
+    """,
+    # Passengers table
+    """
+    CREATE TABLE IF NOT EXISTS passengers (
+        passenger_id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(200),
+        address VARCHAR(300),
+        contact_no VARCHAR(20),
+        email_id VARCHAR(200),
+        -- normalized contact_no (passenger_identity); unique index added by the merge job
+        contact_key VARCHAR(20)
+    ) ENGINE=InnoDB;
+    """,
+    # Tickets table
+    """
+    CREATE TABLE IF NOT EXISTS tickets (
+        ticket_id INT AUTO_INCREMENT PRIMARY KEY,
+        trip_id INT,
+        passenger_id INT,
+        boarding_stop_id INT,
+        dropping_stop_id INT,
+        -- unique per trip_id (uq_tickets_trip_seat, added by the bootstrap: seat_inventory)
+        seat_no VARCHAR(10),
+        fare DECIMAL(10,2),
+        gender ENUM('male','female','other') DEFAULT 'other',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_tickets_passenger_created (passenger_id, created_at),
+        FOREIGN KEY (trip_id) REFERENCES trips(trip_id) ON DELETE SET NULL,
+        FOREIGN KEY (passenger_id) REFERENCES passengers(passenger_id) ON DELETE SET NULL,
+        FOREIGN KEY (boarding_stop_id) REFERENCES stops(stop_id) ON DELETE SET NULL,
+        FOREIGN KEY (dropping_stop_id) REFERENCES stops(stop_id) ON DELETE SET NULL
+    ) ENGINE=InnoDB;
+    """,
+    # Path table
+    """
+    CREATE TABLE IF NOT EXISTS path (
+        path_id INT AUTO_INCREMENT PRIMARY KEY,
+        trip_id INT,
+        stop_id INT,
+        arrival_time DATETIME,
+        departure_time DATETIME,
+        people_in INT DEFAULT 0,
+        people_out INT DEFAULT 0,
+        money_collected DECIMAL(10,2) DEFAULT 0,
+        FOREIGN KEY (trip_id) REFERENCES trips(trip_id) ON DELETE CASCADE,
+        FOREIGN KEY (stop_id) REFERENCES stops(stop_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """,
+    # Major stops table
+    """
+    CREATE TABLE IF NOT EXISTS major_stops (
+        major_stop_id INT AUTO_INCREMENT PRIMARY KEY,
+        route_id INT,
+        stop_id INT,
+        time_taken_minutes INT DEFAULT 0,
+        people_getting_in INT DEFAULT 0,
+        people_getting_down INT DEFAULT 0,
+        FOREIGN KEY (route_id) REFERENCES routes(route_id) ON DELETE CASCADE,
+        FOREIGN KEY (stop_id) REFERENCES stops(stop_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+    """,
+    # Ticket log table - append-only audit table, no FK so that rows
+    # survive ticket deletion and inserts skip the parent lookup
+    """
+    CREATE TABLE IF NOT EXISTS ticket_log (
+        log_id INT AUTO_INCREMENT PRIMARY KEY,
+        ticket_id INT,
+        trip_id INT,
+        log_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+        action VARCHAR(50),
+        INDEX idx_ticket_log_ticket (ticket_id),
+        INDEX idx_ticket_log_trip (trip_id)
+    ) ENGINE=InnoDB;
+    """,
+    # Remaining seats per trip for optimistic booking
+    seat_inventory.INVENTORY_DDL,
+    # Per-trip waitlist and its lifecycle log
+    *waitlist.WAITLIST_DDL,
+]
+
+def initialize_database_and_schema():
+    """Create all tables safely - only if they don't exist"""
+    # no deadline: index builds and ALTERs on a big table must not be killed at boot
+    with get_conn(query_class="maintenance") as (conn, cur):
+        backend = backends.get()
+        backend.create_schema(conn, cur, TABLES_DDL + reporting.REPORT_TABLES_DDL)
+
+        live = backend.live_columns(conn)
+        passenger_identity.ensure_schema(cur, live)
+        stop_geo.ensure_schema(cur, live)
+        reporting.ensure_schema(cur, live)
+        # update_* helpers only accept registry columns: make sure they all exist
+        missing = table_registry.missing_columns(live)
+        if missing:
+            context.notify("warning", f"Schema is missing registered columns: {missing}")
+        indexes = backend.live_indexes(conn)
+        identity_indexed = passenger_identity.has_unique_index(indexes)
+        double_booked = seat_inventory.ensure_unique_index(cur, indexes)
+        ticket_lookup.ensure_index(cur, indexes)
+    if double_booked and config.BOOKING_MODE == "optimistic":
+        # optimistic booking relies on the unique seat index: stay on the lock
+        config.BOOKING_MODE = "locked"
+        context.notify("warning", f"{double_booked} seat(s) are booked more than once: "
+                                  "bookings use the locked mode until they are fixed and the app restarts")
+
+    # one-off migration of databases from before passenger dedup (a no-op on a new one)
+    if not identity_indexed:
+        report = dedupe_passengers()
+        if report.rows_merged:
+            context.notify("info", f"Merged {report.rows_merged} duplicate passenger(s) "
+                                   f"({report.passengers_before} -> {report.passengers_after} rows)")
+
+    # Only seed data if tables are empty
+    seed_sample_data()
+
+@context.resource
+def ensure_database_initialized():
+    """Run the schema/seed bootstrap once per process instead of on every rerun"""
+    initialize_database_and_schema()
+    return True
+# --------------------------- sample data ---------------------------
+# children first; ticket_log after tickets (the delete triggers log into it). users
+# are kept: accounts registered through the app survive a reset
+SAMPLE_TABLES_RESET_ORDER = ("waitlist_log", "waitlist", "trip_inventory", "tickets", "ticket_log", "path",
+                             "major_stops", "route_stops", "trips", "buses", "drivers", "routes", "stops",
+                             "passengers")
+
+
+def sample_batches(now, existing_users=()):
+    """The sample data as bulk_loader batches (parents first), trips today and tomorrow around `now`;
+    demo users named in `existing_users` are left out"""
+    at = lambda day, hour, minute=0: (now + timedelta(days=day)).replace(hour=hour, minute=minute, second=0,
+                                                                          microsecond=0)
+    users = [(uname, auth.hash_password(pwd), role) for uname, pwd, role in DEMO_USERS
+             if uname not in existing_users]
+    stops = [
+        ("Central Station", "City Center", 12.9767, 77.5713),
+        ("North Square", "North Area", 13.0358, 77.5970),
+        ("East Park", "East Side", 12.9784, 77.6408),
+        ("West End", "West District", 12.9719, 77.5128),
+        ("South Gate", "South Zone", 12.9121, 77.5850),
+        ("University", "Campus Road", 12.9507, 77.5848),
+        ("Airport", "Airport Terminal", 13.1986, 77.7066),
+        ("Mall", "Shopping District", 12.9345, 77.6112),
+        ("Tech Park", "IT Hub", 12.9279, 77.6271)
+    ]
+    routes = [
+        ("R1 Central-Airport", "Central Station", "Airport", 15.0),
+        ("R2 Central-University", "Central Station", "University", 8.5),
+        ("R3 North-South Express", "North Square", "South Gate", 12.0),
+        ("R4 Tech Loop", "Tech Park", "Mall", 9.0)
+    ]
+    route_stops = {
+        "R1 Central-Airport": ["Central Station", "East Park", "West End", "Airport"],
+        "R2 Central-University": ["Central Station", "North Square", "University"],
+        "R3 North-South Express": ["North Square", "Central Station", "South Gate"]
+    }
+    drivers = [
+        ("Raj", "Kumar", "LIC1001", "9999990001", 30000, "Central City", True),
+        ("Anita", "Sharma", "LIC1002", "9999990002", 32000, "North Block", True),
+        ("Vikram", "Singh", "LIC1003", "9999990003", 31000, "East Side", False),
+        ("Deepa", "Rao", "LIC1004", "9999990004", 29000, "South Area", True),
+        ("Kiran", "Mehta", "LIC1005", "9999990005", 28000, "Airport Zone", False)
+    ]
+    buses = [
+        ("BUS100", "City Rapid", "AC", 50, None, "R1 Central-Airport", True, "active"),
+        ("BUS101", "Metro Shuttle", "Mini", 30, None, "R2 Central-University", False, "active"),
+        ("BUS102", "Airport Express", "AC", 60, None, "R1 Central-Airport", True, "maintenance"),
+        ("BUS103", "Downtown Loop", "Non-AC", 40, None, "R3 North-South Express", False, "active"),
+        ("BUS104", "City Connect", "AC", 45, None, "R4 Tech Loop", True, "active")
+    ]
+    trips = [
+        # Today's trips
+        ("R1 Central-Airport", "BUS100", "LIC1001", at(0, 8), at(0, 9), "daily", "scheduled"),
+        ("R2 Central-University", "BUS101", "LIC1002", at(0, 10, 30), at(0, 11, 15), "daily", "scheduled"),
+        ("R3 North-South Express", "BUS103", "LIC1004", at(0, 14), at(0, 14, 45), "weekdays", "scheduled"),
+        # Tomorrow's trips
+        ("R1 Central-Airport", "BUS100", "LIC1001", at(1, 9), at(1, 10), "daily", "scheduled"),
+        ("R4 Tech Loop", "BUS104", "LIC1003", at(1, 11), at(1, 11, 40), "daily", "scheduled")
+    ]
+    passengers = [
+        ("Sneha Verma", "College Road", "8888888888", "sneha@example.com"),
+        ("Aman Singh", "North Lane", "7777777777", "aman@example.com"),
+        ("Priya Patel", "South Street", "6666666666", "priya@example.com"),
+        ("Rahul Kumar", "East Avenue", "5555555555", "rahul@example.com"),
+        ("Anjali Sharma", "West Boulevard", "4444444444", "anjali@example.com")
+    ]
+    # Sample tickets on the next trip to leave, to demonstrate availability
+    next_trip = min((t for t in trips if t[3] > now), key=lambda t: t[3])
+    trip_key = (next_trip[1], next_trip[3])
+    tickets = [
+        (trip_key, "8888888888", "Central Station", "East Park", "A1", 45.00, "female"),
+        (trip_key, "7777777777", "North Square", "West End", "A2", 35.00, "male"),
+        (trip_key, "6666666666", "Central Station", "North Square", "B1", 25.00, "female")
+    ]
+    # Path data for analytics: the first trip's first three stops
+    path = [(("BUS100", at(0, 8)), stop[0], at(0, 8) + timedelta(minutes=idx * 15),
+             at(0, 8) + timedelta(minutes=idx * 15 + 2), 5 + idx, 2 + idx, 150.0 * (idx + 1))
+            for idx, stop in enumerate(stops[:3])]
+    # Major stops data
+    major_stops = [(route[0], stop[0], (i + 1) * 5, (j + 1) * 8, (j + 1) * 3)
+                   for i, route in enumerate(routes[:2]) for j, stop in enumerate(stops[:2])]
+
+    col, batch = bulk_loader.col, bulk_loader.batch
+    return [
+        batch("users", [col("username"), col("password_hash"), col("role")], users),
+        batch("stops", [col("stop_name"), col("location"), col("latitude", float), col("longitude", float)],
+              stops, key="stop_name"),
+        batch("routes", [col("route_name"), col("source"), col("destination"), col("distance_km", float)],
+              routes, key="route_name"),
+        batch("route_stops", [col("route_id", ref="routes"), col("stop_order", int), col("stop_id", ref="stops")],
+              [(route, idx, stop) for route, names in route_stops.items() for idx, stop in enumerate(names, 1)]),
+        batch("drivers", [col("first_name"), col("last_name"), col("license_no"), col("phone"), col("salary", int),
+                          col("address"), col("is_active", bool)], drivers, key="license_no"),
+        batch("buses", [col("bus_no"), col("bus_name"), col("type"), col("capacity", int), col("fare_id", int),
+                        col("route_id", ref="routes"), col("ac", bool), col("status")], buses, key="bus_no"),
+        batch("trips", [col("route_id", ref="routes"), col("bus_id", ref="buses"), col("driver_id", ref="drivers"),
+                        col("start_time", datetime), col("end_time", datetime), col("frequency"), col("status")],
+              trips, key=("bus_id", "start_time")),
+        batch("passengers", [col("name"), col("address"), col("contact_no"), col("email_id"), col("contact_key")],
+              [p + (passenger_identity.normalize_contact(p[2]),) for p in passengers], key="contact_key"),
+        batch("tickets", [col("trip_id", ref="trips"), col("passenger_id", ref="passengers"),
+                          col("boarding_stop_id", ref="stops"), col("dropping_stop_id", ref="stops"),
+                          col("seat_no"), col("fare", float), col("gender")], tickets),
+        batch("path", [col("trip_id", ref="trips"), col("stop_id", ref="stops"), col("arrival_time", datetime),
+                       col("departure_time", datetime), col("people_in", int), col("people_out", int),
+                       col("money_collected", float)], path),
+        batch("major_stops", [col("route_id", ref="routes"), col("stop_id", ref="stops"),
+                              col("time_taken_minutes", int), col("people_getting_in", int),
+                              col("people_getting_down", int)], major_stops),
+    ]
+
+
+def _load_sample_data(cur):
+    cur.execute("SELECT username FROM users")
+    existing = {row["username"] for row in cur.fetchall()}
+    loader = bulk_loader.BulkLoader(cur)
+    for batch in sample_batches(datetime.now(), existing):
+        loader.load(batch)
+    return loader.report()
+
+
+def _sample_data_loaded():
+    invalidate_route_topology()
+    get_tag_versions().bump_all()
+    if get_report_refresher.exists():
+        get_report_refresher().request_refresh(full=True)
+        return True
+    return False
+
+
+def seed_sample_data():
+    """Populate with rich sample data only if tables are empty"""
+    with get_conn() as (conn, cur):
+        # Only seed if users table is empty (indicator that all tables are empty)
+        cur.execute("SELECT COUNT(*) as c FROM users")
+        user_count = cur.fetchone()["c"]
+        
+        if user_count > 0:
+            context.notify("info", "Database already has data. Skipping seeding.")
+            return    
+        context.notify("info", "Seeding database with sample data...")
+        report = _load_sample_data(cur)
+        context.notify("success", f"✅ Database seeded successfully with sample data! "
+                                  f"({report.rows} rows in {report.statements} statements)")
+    _sample_data_loaded()
+    return report
+
+
+def reset_sample_data():
+    """Delete every row of the app's tables except users and load the sample data again, in one
+    transaction; missing demo users are added back, other accounts (and their logins) are kept"""
+    with get_conn() as (conn, cur):
+        # every foreign key of the sample batches is a resolved ref=: nothing is left unchecked
+        with backends.get().relaxed_checks(cur):
+            for table in SAMPLE_TABLES_RESET_ORDER:
+                cur.execute(f"DELETE FROM {table}")
+            report = _load_sample_data(cur)
+        context.notify("success", f"✅ Database reset: {report.rows} sample rows in {report.statements} statements")
+    if not _sample_data_loaded():
+        # the report tables still hold the deleted tickets' totals
+        with get_conn() as (conn, cur):
+            reporting.refresh_reports(conn, full=True)
+    return report
@@ -0,0 +1,184 @@
+"""
+Per-trip seat change feed.
+
+Booking writes in this process publish seat deltas ("A7 booked", "A3
+released") to a SeatFeed. Pages keep a SeatMap per trip and apply the
+deltas since the last sequence number they saw, instead of reloading the
+whole seat list. Writes made elsewhere (another app process, the SQL
+console) are picked up by TicketLogPoller, which follows ticket_log by
+log_id high-water mark and tells subscribers to resync the affected trip.
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+from . import context
+
+BOOKED = "booked"
+RELEASED = "released"
+RESYNC = "resync"   # something changed, seat unknown: reload the trip's map
+
+
+class SeatFeed:
+    """In-process pub/sub of seat deltas, with a bounded per-trip history."""
+
+    def __init__(self, history=500):
+        self.history = history
+        self._lock = threading.Condition()
+        self._seq = 0
+        self._events = {}        # trip_id -> deque[(seq, kind, seat_no)]
+        self._evicted = {}       # trip_id -> seq of the newest event dropped from history
+        self._subscribers = []
+        # (ticket_id, ticket_log action) -> ticket_log rows of this process's writes not yet
+        # seen by the poller; the oldest keys are dropped past `local_limit`
+        self._local = OrderedDict()
+        self.local_limit = 5000
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, trip_id, kind, seat_no=None, ticket_id=None, action=None):
+        """Append a delta; `action` is the ticket_log action the write logged
+        ("Ticket Issued", ...), so the poller can skip that row."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            events = self._events.setdefault(trip_id, deque(maxlen=self.history))
+            if len(events) == events.maxlen:
+                self._evicted[trip_id] = events[0][0]
+            events.append((seq, kind, seat_no))
+            if ticket_id is not None and action is not None:
+                key = (ticket_id, action)
+                self._local[key] = self._local.pop(key, 0) + 1
+                if len(self._local) > self.local_limit:
+                    self._local.popitem(last=False)
+            self._lock.notify_all()
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(trip_id, kind, seat_no)
+            except Exception:
+                context.logger.exception("seat feed subscriber failed for trip %s", trip_id)
+        return seq
+
+    def published_here(self, ticket_id, action):
+        """True if a ticket_log row (ticket_id, action) is one this process
+        already published (poller dedup). Each publish answers for one row."""
+        key = (ticket_id, action)
+        with self._lock:
+            left = self._local.get(key)
+            if not left:
+                return False
+            if left == 1:
+                del self._local[key]
+            else:
+                self._local[key] = left - 1
+            return True
+
+    def subscribe(self, callback):
+        """callback(trip_id, kind, seat_no) on every published delta."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def changes_since(self, trip_id, seq):
+        """Deltas for a trip after `seq`, or None if history no longer reaches back that far."""
+        with self._lock:
+            if self._evicted.get(trip_id, 0) > seq:
+                return None
+            events = self._events.get(trip_id)
+            if not events:
+                return []
+            return [(s, kind, seat) for s, kind, seat in events if s > seq]
+
+    def wait(self, seq, timeout):
+        """Block until anything is published after `seq` (long-poll helper)."""
+        with self._lock:
+            return self._lock.wait_for(lambda: self._seq > seq, timeout)
+
+
+class SeatMap:
+    """One trip's seats, kept current by applying SeatFeed deltas."""
+
+    def __init__(self, trip_id, capacity, booked, seq):
+        self.trip_id = trip_id
+        self.seats = [f"A{i+1}" for i in range(capacity)]
+        self.booked = set(booked)
+        self.seq = seq
+
+    def available(self):
+        return [seat for seat in self.seats if seat not in self.booked]
+
+    def apply(self, feed):
+        """Apply new deltas; returns False if the map must be reloaded."""
+        changes = feed.changes_since(self.trip_id, self.seq)
+        if changes is None:
+            return False
+        for seq, kind, seat_no in changes:
+            if kind == RESYNC:
+                return False
+            if kind == BOOKED:
+                self.booked.add(seat_no)
+            elif kind == RELEASED:
+                self.booked.discard(seat_no)
+            self.seq = seq
+        return True
+
+
+class TicketLogPoller:
+    """Fallback change source: follows ticket_log by log_id high-water mark.
+
+    Events this process already published are skipped; anything else
+    becomes a RESYNC for its trip, since ticket_log carries no seat number.
+    """
+
+    def __init__(self, connect, feed, interval=2.0, batch=500):
+        self.connect = connect
+        self.feed = feed
+        self.interval = interval
+        self.batch = batch
+        self.high_water = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ticket-log-poller", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def poll_once(self, conn):
+        cur = conn.cursor()
+        try:
+            if self.high_water is None:
+                cur.execute("SELECT COALESCE(MAX(log_id), 0) FROM ticket_log")
+                self.high_water = cur.fetchone()[0]
+                return 0
+            cur.execute("SELECT log_id, ticket_id, trip_id, action FROM ticket_log "
+                        "WHERE log_id > %s ORDER BY log_id LIMIT %s", (self.high_water, self.batch))
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        conn.commit()   # end the read snapshot so the next poll sees new rows
+        stale = set()
+        for log_id, ticket_id, trip_id, action in rows:
+            self.high_water = log_id
+            if trip_id is not None and not self.feed.published_here(ticket_id, action):
+                stale.add(trip_id)
+        for trip_id in stale:
+            self.feed.publish(trip_id, RESYNC)
+        return len(rows)
+
+    def _run(self):
+        conn = None
+        while not self._stop.is_set():
+            try:
+                if conn is None:
+                    conn = self.connect()
+                self.poll_once(conn)
+            except Exception:
+                context.logger.exception("ticket_log poll failed; reconnecting")
+                conn = None
+            self._stop.wait(self.interval)
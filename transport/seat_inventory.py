@@ -0,0 +1,149 @@
+"""
+Optimistic booking: a per-trip remaining-seat counter instead of a lock.
+
+book_ticket() used to re-check the seat map and insert the ticket under a
+per-trip lock. That lock only covers one process, and within it every
+booking for a busy trip waits for the one before. In BOOKING_MODE
+"optimistic" nothing is held between the seat check and the write:
+
+* trip_inventory keeps each trip's remaining seats. A booking takes one
+  with `UPDATE ... SET remaining = remaining - 1 WHERE trip_id = %s AND
+  remaining > 0` and inserts its ticket in the same transaction, so a
+  sold-out trip refuses in one statement and is never oversold;
+* the seat comes from the free seats read just before, picked at random
+  among the first SEAT_SPREAD so concurrent bookings rarely want the same
+  one. The unique index uq_tickets_trip_seat (trip_id, seat_no) decides
+  between two that do: the loser moves on to its next candidate;
+* a deadlock, lock wait or busy database rolls the attempt back and the
+  caller retries after a short jittered backoff, at most BOOKING_RETRIES
+  times.
+
+A trip's counter row is created from its tickets on first booking and kept
+in step by the single-ticket helpers (adjust()); bulk edits and bus/trip
+changes drop rows (reset()) so they are recounted on next use. Databases
+from before the unique index get it at bootstrap unless they already hold
+double-booked seats, in which case bookings stay in "locked" mode.
+"""
+
+import random
+import time
+
+UNIQUE_INDEX = "uq_tickets_trip_seat"
+SEAT_SPREAD = 8
+BACKOFF_SECONDS = 0.005
+
+# claim() result when the counter is at zero
+SOLD_OUT = "sold out"
+
+INVENTORY_DDL = """
+    CREATE TABLE IF NOT EXISTS trip_inventory (
+        trip_id INT PRIMARY KEY,
+        remaining INT NOT NULL,
+        FOREIGN KEY (trip_id) REFERENCES trips(trip_id) ON DELETE CASCADE
+    ) ENGINE=InnoDB;
+"""
+
+TAKE_SQL = "UPDATE trip_inventory SET remaining = remaining - 1 WHERE trip_id = %s AND remaining > 0"
+ADJUST_SQL = "UPDATE trip_inventory SET remaining = remaining + %s WHERE trip_id = %s"
+COUNT_SQL = """
+    SELECT b.capacity, (SELECT COUNT(*) FROM tickets tk WHERE tk.trip_id = t.trip_id) AS booked
+    FROM trips t JOIN buses b ON t.bus_id = b.bus_id
+    WHERE t.trip_id = %s
+"""
+INIT_SQL = """
+    INSERT INTO trip_inventory (trip_id, remaining) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE trip_id = trip_id
+"""
+DOUBLE_BOOKED_SQL = """
+    SELECT COUNT(*) AS n FROM (
+        SELECT trip_id, seat_no FROM tickets
+        WHERE trip_id IS NOT NULL AND seat_no IS NOT NULL
+        GROUP BY trip_id, seat_no HAVING COUNT(*) > 1
+    ) d
+"""
+
+
+# --------------------------- counter ---------------------------
+def take(cur, trip_id):
+    """Take one seat off the trip's counter (created on first use); False if sold out"""
+    cur.execute(TAKE_SQL, (trip_id,))
+    if cur.rowcount:
+        return True
+    cur.execute("SELECT remaining FROM trip_inventory WHERE trip_id = %s", (trip_id,))
+    if cur.fetchone():
+        return False
+    cur.execute(COUNT_SQL, (trip_id,))
+    row = cur.fetchone()
+    if not row:
+        return False
+    # a concurrent first booking may have created it meanwhile: theirs stands
+    cur.execute(INIT_SQL, (trip_id, max((row["capacity"] or 0) - row["booked"], 0)))
+    cur.execute(TAKE_SQL, (trip_id,))
+    return cur.rowcount > 0
+
+
+def adjust(cur, trip_id, delta):
+    """Keep a counter in step with a ticket written outside claim() (no-op without one)"""
+    if trip_id is not None:
+        cur.execute(ADJUST_SQL, (delta, trip_id))
+
+
+def reset(cur, trip_ids=None):
+    """Drop counters (all of them if trip_ids is None); each is recounted on next booking"""
+    if trip_ids is None:
+        cur.execute("DELETE FROM trip_inventory")
+    elif trip_ids:
+        trip_ids = list(trip_ids)
+        cur.execute(f"DELETE FROM trip_inventory WHERE trip_id IN ({','.join(['%s'] * len(trip_ids))})", trip_ids)
+
+
+# --------------------------- booking ---------------------------
+def candidates(free, rng=random):
+    """Order to try free seats in: a random one of the first SEAT_SPREAD, then
+    the rest front to back (buses still fill from the front)"""
+    if not free:
+        return []
+    first = rng.randrange(min(SEAT_SPREAD, len(free)))
+    return [free[first]] + free[:first] + free[first + 1:]
+
+
+def claim(cur, trip_id, seats, insert, is_duplicate):
+    """Take a seat off the counter and insert the ticket (`insert(cur, seat_no)`)
+    into the first of `seats` nobody else holds, in the caller's transaction.
+
+    Returns the seat, SOLD_OUT, or None when every candidate was taken
+    meanwhile; on None the caller rolls back (returning the counted seat).
+    """
+    if not take(cur, trip_id):
+        return SOLD_OUT
+    for seat_no in seats:
+        try:
+            insert(cur, seat_no)
+        except Exception as e:
+            if not is_duplicate(e):
+                raise
+            continue
+        return seat_no
+    return None
+
+
+def backoff(attempt, rng=random):
+    """Sleep before retry `attempt` (0-based): exponential with full jitter"""
+    time.sleep(rng.uniform(0, BACKOFF_SECONDS * 2 ** min(attempt, 6)))
+
+
+# --------------------------- schema ---------------------------
+def has_unique_index(live_indexes):
+    return UNIQUE_INDEX in live_indexes.get("tickets", ())
+
+
+def ensure_unique_index(cur, live_indexes):
+    """Add uq_tickets_trip_seat to a tickets table created before it.
+    Returns the number of double-booked seats that prevent it (0 when in place)."""
+    if has_unique_index(live_indexes):
+        return 0
+    cur.execute(DOUBLE_BOOKED_SQL)
+    doubles = cur.fetchone()["n"]
+    if not doubles:
+        cur.execute(f"CREATE UNIQUE INDEX {UNIQUE_INDEX} ON tickets (trip_id, seat_no)")
+    return doubles
@@ -0,0 +1,151 @@
+"""
+Table metadata registry and allow-listed UPDATE builder.
+
+The update_* helpers pass arbitrary keyword arguments; update_statement()
+only lets through columns registered here (mirroring the CREATE TABLE
+statements, checked against the live schema by missing_columns()), and
+generates one canonical statement per (table, column set), so
+
+    update_statement("buses", {"capacity": 40, "status": "active"}, 7)
+
+yields the same SQL text however the kwargs were ordered. That fixed text
+is what makes execute_prepared() worthwhile: each pooled connection keeps
+a small LRU of server-side prepared cursors keyed by SQL, so a repeated
+edit skips the parse/prepare step.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+TableMeta = namedtuple("TableMeta", "name pk columns")
+
+
+class UnknownColumnError(ValueError):
+    pass
+
+
+def _meta(name, pk, *columns):
+    return TableMeta(name, pk, frozenset(columns))
+
+
+# Updatable columns per table (primary keys and created_at are not)
+TABLES = {m.name: m for m in (
+    _meta("buses", "bus_id", "bus_no", "bus_name", "type", "capacity", "fare_id", "route_id", "ac", "status"),
+    _meta("drivers", "driver_id", "first_name", "last_name", "license_no", "phone", "salary", "address", "is_active"),
+    _meta("routes", "route_id", "route_name", "source", "destination", "distance_km"),
+    _meta("stops", "stop_id", "stop_name", "location", "latitude", "longitude"),
+    _meta("trips", "trip_id", "route_id", "bus_id", "driver_id", "start_time", "end_time", "frequency", "status"),
+    _meta("passengers", "passenger_id", "name", "address", "contact_no", "email_id"),
+    _meta("tickets", "ticket_id", "trip_id", "passenger_id", "boarding_stop_id", "dropping_stop_id",
+          "seat_no", "fare", "gender"),
+)}
+
+
+def table(name):
+    try:
+        return TABLES[name]
+    except KeyError:
+        raise UnknownColumnError(f"unknown table {name!r}") from None
+
+
+def validate_columns(name, columns):
+    """Raise UnknownColumnError unless every column is updatable on the table."""
+    meta = table(name)
+    bad = sorted(set(columns) - meta.columns)
+    if bad:
+        raise UnknownColumnError(f"{name}: cannot update column(s) {', '.join(bad)}")
+    return meta
+
+
+# Cached so a column set always maps to the *same* string object: the
+# connector's prepared cursor only skips re-preparing when it is handed the
+# identical operation it executed last.
+@lru_cache(maxsize=256)
+def _update_sql(name, columns):
+    meta = TABLES[name]
+    return f"UPDATE {name} SET {', '.join(f'{c}=%s' for c in columns)} WHERE {meta.pk}=%s"
+
+
+def update_statement(name, changes, row_id):
+    """(sql, params) for UPDATE name SET changes WHERE pk = row_id; columns in sorted order."""
+    if not changes:
+        raise UnknownColumnError(f"{name}: nothing to update")
+    validate_columns(name, changes)
+    columns = tuple(sorted(changes))
+    return _update_sql(name, columns), tuple(changes[c] for c in columns) + (row_id,)
+
+
+def missing_columns(live):
+    """Registry columns missing from the live schema ({table: {column, ...}}, see
+    backends' live_columns()): {table: [columns]} (empty if in sync)."""
+    missing = {}
+    for meta in TABLES.values():
+        cols = sorted((meta.columns | {meta.pk}) - live.get(meta.name, set()))
+        if cols:
+            missing[meta.name] = cols
+    return missing
+
+
+# --------------------------- prepared statements ---------------------------
+PREPARED_PER_CONNECTION = 32
+
+_prepared = weakref.WeakKeyDictionary()   # connection -> OrderedDict[sql, cursor]
+_prepared_lock = threading.Lock()
+stats = {"prepared": 0, "reused": 0}
+
+
+def _cursor_for(conn, sql):
+    with _prepared_lock:
+        cursors = _prepared.get(conn)
+        if cursors is None:
+            cursors = _prepared[conn] = OrderedDict()
+        cur = cursors.get(sql)
+        if cur is not None:
+            cursors.move_to_end(sql)
+            stats["reused"] += 1
+            return cur
+        evicted = cursors.popitem(last=False)[1] if len(cursors) >= PREPARED_PER_CONNECTION else None
+        stats["prepared"] += 1
+    if evicted is not None:
+        evicted.close()   # deallocates the server-side statement
+    cur = conn.cursor(prepared=True)
+    with _prepared_lock:
+        cursors[sql] = cur
+    return cur
+
+
+def execute_prepared(conn, sql, params):
+    """Run a write through this connection's cached prepared cursor; returns rowcount.
+
+    Connections without prepared-cursor support fall back to a plain cursor.
+    A connection is used by one thread at a time (the pool guarantees it),
+    so its cursors are never shared concurrently.
+    """
+    try:
+        cur = _cursor_for(conn, sql)
+    except TypeError:
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            return cur.rowcount
+        finally:
+            cur.close()
+    try:
+        cur.execute(sql, params)
+    except Exception:
+        forget_connection(conn)
+        raise
+    return cur.rowcount
+
+
+def forget_connection(conn):
+    """Drop (and close) a connection's prepared cursors, e.g. after an error or reconnect."""
+    with _prepared_lock:
+        cursors = _prepared.pop(conn, None)
+    for cur in (cursors or {}).values():
+        try:
+            cur.close()
+        except Exception:
+            pass
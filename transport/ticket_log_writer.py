@@ -0,0 +1,199 @@
+"""
+Asynchronous ticket_log writer.
+
+Ticket lifecycle events (issued / updated / deleted) are pushed onto an
+in-process queue and written to `ticket_log` in batches by a background
+thread, so the booking transaction no longer pays for the log insert.
+Anything that cannot be written (DB down, process shutting down) is spooled
+to a local file. The spool is replayed when the writer starts and, after a
+transient error, as soon as a later batch is written again. Replay moves
+the spool to `<spool>.replay` first and appends to a leftover one (a crash
+mid-replay), so no rows are lost; lines that do not parse (a torn write)
+are set aside in `<spool>.bad` instead of stopping the writer.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+from . import context
+from .config import TICKET_LOG_SPOOL_PATH
+
+ACTION_ISSUED = "Ticket Issued"
+ACTION_UPDATED = "Ticket Updated"
+ACTION_DELETED = "Ticket Deleted"
+
+INSERT_SQL = "INSERT INTO ticket_log (ticket_id, trip_id, log_time, action) VALUES (%s,%s,%s,%s)"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class TicketLogWriter:
+    """Queue + background batch writer for ticket_log rows.
+
+    `connect` is a zero-argument callable returning a DB-API connection
+    (e.g. `lambda: mysql.connector.connect(**DB_CONFIG)`).
+    """
+
+    def __init__(self, connect, batch_size=200, flush_interval=0.5, spool_path=TICKET_LOG_SPOOL_PATH):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.queue = queue.Queue()
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "spooled": 0, "replayed": 0, "bad_lines": 0}
+        self._stop = threading.Event()
+        self._spool_lock = threading.Lock()
+        self._spool_pending = False
+        self._thread = None
+        self._conn = None
+
+    # ---- producer side ----
+    def log(self, ticket_id, trip_id, action):
+        """Queue one lifecycle event; returns immediately."""
+        self.queue.put((ticket_id, trip_id, datetime.now(), action))
+        self.stats["enqueued"] += 1
+
+    # ---- lifecycle ----
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._replay_spool()
+        self._thread = threading.Thread(target=self._run, name="ticket-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=10.0):
+        """Drain the queue to the DB (or the spool file) and stop the thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # stuck on a slow write: leave its connection alone, spool the rest
+                self._spool(self._drain(block=False, limit=None))
+                return
+            self._thread = None
+        # whatever the thread did not get to goes to disk
+        leftover = self._drain(block=False, limit=None)
+        if leftover:
+            self._spool(leftover)
+        self._close()
+
+    def flush(self):
+        """Synchronously write everything queued so far (used by tests/benchmarks)."""
+        while True:
+            batch = self._drain(block=False, limit=self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    # ---- consumer side ----
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._drain(block=True, limit=self.batch_size)
+            if batch and self._write(batch) and self._spool_pending:
+                # the database is back: retry what an earlier failure spooled
+                self._replay_spool()
+        # final drain on shutdown
+        self.flush()
+
+    def _drain(self, block, limit):
+        batch = []
+        try:
+            if block:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+            while limit is None or len(batch) < limit:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch):
+        try:
+            if self._conn is None:
+                self._conn = self.connect()
+            cur = self._conn.cursor()
+            cur.executemany(INSERT_SQL, batch)
+            self._conn.commit()
+            cur.close()
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            return True
+        except Exception:
+            context.logger.exception("ticket_log write failed; spooling %d row(s)", len(batch))
+            self._close()
+            self._spool(batch)
+            return False
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    # ---- durability ----
+    def _spool(self, batch):
+        if not batch:
+            return
+        with self._spool_lock:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for ticket_id, trip_id, log_time, action in batch:
+                    f.write(json.dumps([ticket_id, trip_id, log_time.strftime(TIME_FORMAT), action]) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._spool_pending = True
+        self.stats["spooled"] += len(batch)
+
+    def _take_spool(self):
+        """Move the spool onto `<spool>.replay` (appending to one a crashed replay left); its path or None"""
+        pending = self.spool_path + ".replay"
+        with self._spool_lock:
+            self._spool_pending = False
+            if os.path.exists(self.spool_path):
+                if os.path.exists(pending):
+                    with open(self.spool_path, "rb") as src, open(pending, "ab") as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.spool_path)
+                else:
+                    os.replace(self.spool_path, pending)
+        return pending if os.path.exists(pending) else None
+
+    def _read_spool(self, path):
+        """Spooled rows of `path`; lines that do not parse are appended to `<spool>.bad`"""
+        batch, bad = [], []
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    ticket_id, trip_id, log_time, action = json.loads(line)
+                    batch.append((ticket_id, trip_id, datetime.strptime(log_time, TIME_FORMAT), action))
+                except (ValueError, TypeError):
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            with open(self.spool_path + ".bad", "a", encoding="utf-8") as f:
+                f.writelines(bad)
+            self.stats["bad_lines"] += len(bad)
+        return batch
+
+    def _replay_spool(self):
+        """Write back spooled rows (from a previous run or an earlier failed write)."""
+        if not self.spool_path:
+            return
+        pending = self._take_spool()
+        if pending is None:
+            return
+        batch = self._read_spool(pending)
+        for i in range(0, len(batch), self.batch_size):
+            # a failed write re-spools the chunk, so removing `pending` below is safe
+            if self._write(batch[i:i + self.batch_size]):
+                self.stats["replayed"] += len(batch[i:i + self.batch_size])
+        os.remove(pending)
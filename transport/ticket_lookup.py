@@ -0,0 +1,214 @@
+"""
+"My Tickets" lookup: one rider's tickets a page at a time, from a
+process-wide cache of recent pages, behind a per-client rate limit.
+
+* Tickets are found by normalized contact (passengers.contact_key, unique)
+  and read newest first along idx_tickets_passenger_created (passenger_id,
+  created_at), so a page is an index range read that stops after `limit`
+  rows, however many tickets the table holds.
+* Pages are keyset-paginated: a cursor is the (created_at, ticket_id) of the
+  last ticket of a page, and the next page starts strictly below it. Deep
+  pages cost what the first does, and a booking made between two pages does
+  not shift later ones.
+* LookupCache keeps recent pages keyed by (contact_key, cursor, limit).
+  Like SessionMemo, each entry records the tag versions it was loaded
+  under. Its tags are the contact's own tag (contact_tag(), bumped when a
+  ticket of that contact is booked, moved or cancelled) and the tables the
+  page joins for names and times. A booking rush on other contacts leaves
+  the entry alone. `max_age` bounds staleness against writes made by other
+  processes.
+* RateLimiter hands each client (API peer address) a token bucket; the UI
+  keeps one TokenBucket per session. A lookup without a token raises
+  RateLimited. That caps how fast one client can walk through contact
+  numbers, and how hard a reload loop can hit the database.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+PAGE_INDEX = "idx_tickets_passenger_created"
+
+PAGE_SQL = """
+        SELECT tk.*, r.route_name, s1.stop_name AS boarding_stop, s2.stop_name AS dropping_stop,
+               p.name AS passenger_name, t.start_time, t.end_time, b.bus_no
+        FROM passengers p
+        JOIN tickets tk ON tk.passenger_id = p.passenger_id
+        JOIN trips t ON tk.trip_id = t.trip_id
+        JOIN routes r ON t.route_id = r.route_id
+        JOIN stops s1 ON tk.boarding_stop_id = s1.stop_id
+        JOIN stops s2 ON tk.dropping_stop_id = s2.stop_id
+        JOIN buses b ON t.bus_id = b.bus_id
+        WHERE p.contact_key = %s{after}
+        ORDER BY tk.created_at DESC, tk.ticket_id DESC
+        LIMIT %s
+"""
+AFTER_SQL = " AND (tk.created_at < %s OR (tk.created_at = %s AND tk.ticket_id < %s))"
+CONTACT_KEY_SQL = "SELECT contact_key FROM passengers WHERE passenger_id = %s"
+
+# bumped by writes that move tickets between contacts or touch many at once
+ALL_CONTACTS_TAG = "tickets:contact=*"
+# tables a page shows columns of (route and stop names, trip times, bus number)
+JOINED_TAGS = ("trips", "routes", "stops", "buses")
+
+TicketPage = namedtuple("TicketPage", "tickets next_cursor")
+
+
+class BadCursor(ValueError):
+    pass
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"too many ticket lookups, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def contact_tag(contact_key):
+    return f"tickets:contact={contact_key}"
+
+
+def lookup_tags(contact_key):
+    return (contact_tag(contact_key), ALL_CONTACTS_TAG) + JOINED_TAGS
+
+
+# --------------------------- pages ---------------------------
+def encode_cursor(ticket):
+    return f"{ticket['created_at']:%Y%m%d%H%M%S}.{ticket['ticket_id']}"
+
+
+def decode_cursor(cursor):
+    """(created_at, ticket_id) of an encode_cursor() string, or BadCursor"""
+    try:
+        stamp, ticket_id = cursor.split(".")
+        return datetime.strptime(stamp, "%Y%m%d%H%M%S"), int(ticket_id)
+    except (AttributeError, ValueError):
+        raise BadCursor(f"bad page cursor: {cursor!r}") from None
+
+
+def page_query(contact_key, cursor=None, limit=20):
+    """(sql, params) for up to limit + 1 tickets (the extra row tells whether a next page exists)"""
+    if cursor is None:
+        return PAGE_SQL.format(after=""), (contact_key, limit + 1)
+    created_at, ticket_id = decode_cursor(cursor)
+    return PAGE_SQL.format(after=AFTER_SQL), (contact_key, created_at, created_at, ticket_id, limit + 1)
+
+
+def to_page(rows, limit):
+    """TicketPage from page_query()'s rows"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return TicketPage(rows, encode_cursor(rows[-1]))
+    return TicketPage(rows, None)
+
+
+def contact_key_of(cur, passenger_id):
+    cur.execute(CONTACT_KEY_SQL, (passenger_id,))
+    row = cur.fetchone()
+    return row["contact_key"] if row else None
+
+
+class LookupCache:
+    """Recent pages (LRU, at most `max_entries`), shared by every session and API request."""
+
+    def __init__(self, versions, max_entries=4096, max_age=30.0):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, tags, loader):
+        """The cached value for `key`, reloaded via `loader()` if any tag changed or it is too old"""
+        stamp = self.versions.snapshot(tags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == stamp and time.monotonic() - entry[0] < self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        # loaded outside the lock; stamp taken before loading (see SessionMemo.get)
+        value = loader()
+        with self._lock:
+            self._entries[key] = (time.monotonic(), stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# --------------------------- rate limit ---------------------------
+class TokenBucket:
+    """`rate` lookups per second on average, up to `burst` at once."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def take(self):
+        """0 if a token was taken, else the seconds until one is available"""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def check(self):
+        """Take a token or raise RateLimited"""
+        wait = self.take()
+        if wait:
+            raise RateLimited(wait)
+
+
+class RateLimiter:
+    """A TokenBucket per client key; the least recently seen of more than
+    `max_clients` are forgotten (a forgotten client starts with a full bucket)."""
+
+    def __init__(self, rate, burst, max_clients=10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def check(self, client):
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, self.clock)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(client)
+            try:
+                bucket.check()
+            except RateLimited:
+                self.limited += 1
+                raise
+
+
+# --------------------------- schema ---------------------------
+def ensure_index(cur, live_indexes):
+    """Add idx_tickets_passenger_created to a tickets table created before it; True if added"""
+    if PAGE_INDEX in live_indexes.get("tickets", ()):
+        return False
+    cur.execute(f"CREATE INDEX {PAGE_INDEX} ON tickets (passenger_id, created_at)")
+    return True
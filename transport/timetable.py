@@ -0,0 +1,249 @@
+"""
+Compact in-memory timetable of scheduled trips.
+
+The public Trips/Routes/Book pages used to fetch every upcoming trip as a
+wide dict (route, bus and driver strings repeated on each) on every render,
+then filter by route in Python. Timetable keeps the same data as parallel
+arrays instead:
+
+* per route, arrays of trip ids, start/end times (seconds since
+  1970-01-01, naive local time like the DATETIME columns), bus ids, driver
+  ids and a frequency code, sorted by start time: a route's trips in a time
+  window are two binary searches away;
+* route names, bus (bus_no, type, ac) and driver names once per entity,
+  interned, instead of once per trip.
+
+That is ~50 bytes per trip rather than a dict of 13 objects. Rows come out
+as list_available_trips()-style dicts, built only for the trips returned.
+
+TimetableCache loads it once and then applies trip writes incrementally:
+writers note() the trip ids they changed before bumping the "trips" query
+tag, and the next reader reloads just those trips. A tag bump nobody noted
+(bulk edits, bus/driver/route changes, another process after `max_age`) or
+a new day falls back to a full reload.
+"""
+
+import bisect
+import heapq
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from itertools import islice
+
+TIMETABLE_SQL = """
+    SELECT t.trip_id, t.route_id, t.bus_id, t.driver_id, t.start_time, t.end_time, t.frequency,
+           r.route_name, b.bus_no, b.type, b.ac, CONCAT(d.first_name,' ',d.last_name) AS driver_name
+    FROM trips t
+    LEFT JOIN routes r ON t.route_id = r.route_id
+    LEFT JOIN buses b ON t.bus_id = b.bus_id
+    LEFT JOIN drivers d ON t.driver_id = d.driver_id
+    WHERE t.status = 'scheduled' AND t.start_time >= %s
+"""
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+NO_TIME = -(2 ** 63)   # NULL end_time
+NO_ID = 0              # NULL bus/driver (AUTO_INCREMENT ids start at 1)
+
+
+def _seconds(dt):
+    return NO_TIME if dt is None else (dt - _EPOCH) // _SECOND
+
+
+def _datetime(seconds):
+    return None if seconds == NO_TIME else _EPOCH + timedelta(seconds=seconds)
+
+
+def _intern(text):
+    return sys.intern(text) if isinstance(text, str) else text
+
+
+class _RouteTrips:
+    """One route's trips, parallel arrays sorted by start time."""
+
+    __slots__ = ("ids", "starts", "ends", "buses", "drivers", "freqs")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.buses = array("l")
+        self.drivers = array("l")
+        self.freqs = array("b")
+
+    def arrays(self):
+        return (self.ids, self.starts, self.ends, self.buses, self.drivers, self.freqs)
+
+    def insert(self, trip_id, start, end, bus_id, driver_id, freq):
+        i = bisect.bisect_right(self.starts, start)
+        for arr, value in zip(self.arrays(), (trip_id, start, end, bus_id, driver_id, freq)):
+            arr.insert(i, value)
+
+    def remove(self, trip_id):
+        try:
+            i = self.ids.index(trip_id)
+        except ValueError:
+            return False
+        for arr in self.arrays():
+            del arr[i]
+        return True
+
+    def window(self, start, end):
+        """Positions of trips starting in [start, end)"""
+        return range(bisect.bisect_left(self.starts, start), bisect.bisect_left(self.starts, end))
+
+    def keyed(self, start, end, *tag):
+        """(start, *tag, position) for trips starting in [start, end), for merging routes"""
+        return ((self.starts[i],) + tag + (i,) for i in self.window(start, end))
+
+
+class Timetable:
+    """Scheduled trips by route with binary-searchable start times."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._routes = {}        # route_id -> _RouteTrips
+        self.route_names = {}
+        self.buses = {}          # bus_id -> (bus_no, type, ac)
+        self.drivers = {}        # driver_id -> name
+        self._freqs = []         # frequency code -> text
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from rows shaped like TIMETABLE_SQL's result."""
+        timetable = cls()
+        # in start order every insert is an append
+        for row in sorted(rows, key=lambda r: r["start_time"]):
+            timetable.add(row)
+        return timetable
+
+    def __len__(self):
+        return sum(len(r.ids) for r in self._routes.values())
+
+    def _freq_code(self, frequency):
+        frequency = _intern(frequency)
+        try:
+            return self._freqs.index(frequency)
+        except ValueError:
+            self._freqs.append(frequency)
+            return len(self._freqs) - 1
+
+    def add(self, row):
+        with self._lock:
+            route_id, bus_id, driver_id = row["route_id"], row["bus_id"], row["driver_id"]
+            self.route_names[route_id] = _intern(row["route_name"])
+            if bus_id is not None:
+                self.buses[bus_id] = (_intern(row["bus_no"]), _intern(row["type"]), row["ac"])
+            if driver_id is not None:
+                self.drivers[driver_id] = _intern(row["driver_name"])
+            self._routes.setdefault(route_id, _RouteTrips()).insert(
+                row["trip_id"], _seconds(row["start_time"]), _seconds(row["end_time"]),
+                bus_id or NO_ID, driver_id or NO_ID, self._freq_code(row["frequency"]))
+
+    def remove(self, trip_id):
+        """Drop a trip if present. Its route is found by scanning the id arrays:
+        a trip_id -> route map would cost a dict entry per trip."""
+        with self._lock:
+            for route in self._routes.values():
+                if route.remove(trip_id):
+                    return True
+            return False
+
+    def trips(self, route_id=None, start=None, end=None, limit=None):
+        """Trips starting in [start, end) (open-ended if None) ordered by start
+        time, one route or all, as list_available_trips()-style dicts"""
+        lo = _seconds(start) if start is not None else NO_TIME
+        hi = _seconds(end) if end is not None else 2 ** 63 - 1
+        with self._lock:
+            if route_id is not None:
+                route = self._routes.get(route_id)
+                hits = ((route_id, i) for i in route.window(lo, hi)) if route else ()
+            else:
+                # (start, n, route_id, i): n breaks ties, so route ids are never compared
+                hits = ((rid, i) for _, _, rid, i in heapq.merge(
+                    *(route.keyed(lo, hi, n, rid) for n, (rid, route) in enumerate(self._routes.items()))))
+            return [self._row(rid, i) for rid, i in islice(hits, limit)]
+
+    def _row(self, route_id, i):
+        route = self._routes[route_id]
+        bus_id, driver_id = route.buses[i] or None, route.drivers[i] or None
+        bus_no, type_, ac = self.buses.get(bus_id, (None, None, None))
+        return {
+            "trip_id": route.ids[i], "route_id": route_id, "bus_id": bus_id, "driver_id": driver_id,
+            "start_time": _datetime(route.starts[i]), "end_time": _datetime(route.ends[i]),
+            "frequency": self._freqs[route.freqs[i]], "status": "scheduled",
+            "route_name": self.route_names.get(route_id), "bus_no": bus_no, "type": type_, "ac": ac,
+            "driver_name": self.drivers.get(driver_id),
+        }
+
+    def nbytes(self):
+        """Approximate memory held: the trip arrays plus the name tables"""
+        with self._lock:
+            total = sys.getsizeof(self._routes)
+            for route in self._routes.values():
+                total += sys.getsizeof(route) + sum(sys.getsizeof(a) for a in route.arrays())
+            for table in (self.route_names, self.buses, self.drivers):
+                total += sys.getsizeof(table)
+                # interned strings are shared; count each distinct one once
+                seen = set()
+                for value in table.values():
+                    for item in value if isinstance(value, tuple) else (value,):
+                        if isinstance(item, str) and id(item) not in seen:
+                            seen.add(id(item))
+                            total += sys.getsizeof(item)
+            return total
+
+
+class TimetableCache:
+    """The current Timetable, refreshed from a query-tag stamp.
+
+    `stamp` is TagVersions.snapshot((TRIPS_TAG, *other tags)): position 1 is
+    the trips tag version. Writers note() changed trip ids before bumping it;
+    if every trips bump since the last load was noted and nothing else moved,
+    only those trips are reloaded.
+    """
+
+    def __init__(self, max_age=60.0):
+        self.max_age = max_age
+        self.full_loads = 0
+        self.incremental_loads = 0
+        self._lock = threading.Lock()
+        self._timetable = None
+        self._stamp = None
+        self._loaded_at = 0.0
+        self._day = None
+        self._journal = []
+
+    def note(self, trip_ids):
+        """Record trips a write changed (call before bumping the trips tag)"""
+        with self._lock:
+            self._journal.append(tuple(trip_ids))
+
+    def get(self, stamp, fetch):
+        """Current Timetable; `fetch(since, trip_ids=None)` returns TIMETABLE_SQL rows"""
+        today = datetime.now().date()
+        with self._lock:
+            fresh = time.monotonic() - self._loaded_at < self.max_age and self._day == today
+            if self._timetable is not None and stamp == self._stamp and fresh:
+                return self._timetable
+            journal, self._journal = self._journal, []
+            since = datetime.combine(today, datetime.min.time())
+            noted = self._stamp is not None and fresh and len(journal) == stamp[1] - self._stamp[1] \
+                and stamp[:1] + stamp[2:] == self._stamp[:1] + self._stamp[2:]
+            if noted:
+                changed = sorted({tid for ids in journal for tid in ids})
+                rows = fetch(since, changed) if changed else []
+                for trip_id in changed:
+                    self._timetable.remove(trip_id)
+                for row in rows:
+                    self._timetable.add(row)
+                self.incremental_loads += 1
+            else:
+                self._timetable = Timetable.from_rows(fetch(since))
+                self._loaded_at = time.monotonic()
+                self._day = today
+                self.full_loads += 1
+            self._stamp = stamp
+            return self._timetable
@@ -0,0 +1,191 @@
+"""
+Bus/driver schedule conflict detection and auto-assignment.
+
+Each bus and each driver gets an IntervalIndex: its trips' [start, end)
+windows sorted by start, with a running maximum of end times. "Does
+[start, end) overlap anything?" is one binary search plus one lookup, so a
+trip (or a whole day of trips) can be checked without per-trip SQL.
+"""
+
+import bisect
+from datetime import timedelta
+
+# Trip statuses that occupy a bus and a driver
+BLOCKING_STATUSES = ("scheduled", "ongoing")
+
+SCHEDULE_SQL = """
+    SELECT trip_id, route_id, bus_id, driver_id, start_time, end_time
+    FROM trips
+    WHERE status IN ('scheduled','ongoing') AND start_time IS NOT NULL AND end_time IS NOT NULL
+"""
+
+
+class IntervalIndex:
+    """Sorted [start, end) intervals with prefix-max of end times."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.max_end = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end, trip_id):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, trip_id)
+        self.max_end.insert(i, end)
+        self._refresh_max(i)
+
+    def remove(self, trip_id):
+        i = self.ids.index(trip_id)
+        for arr in (self.starts, self.ends, self.ids, self.max_end):
+            del arr[i]
+        self._refresh_max(i)
+
+    def _refresh_max(self, i):
+        running = self.max_end[i - 1] if i > 0 else None
+        for j in range(i, len(self.ends)):
+            running = self.ends[j] if running is None or self.ends[j] > running else running
+            self.max_end[j] = running
+
+    def overlaps(self, start, end, ignore=None):
+        """True if any interval overlaps [start, end) - O(log n)."""
+        i = bisect.bisect_left(self.starts, end)
+        if i == 0 or self.max_end[i - 1] <= start:
+            return False
+        if ignore is None:
+            return True
+        return bool(self.overlapping(start, end, ignore))
+
+    def overlapping(self, start, end, ignore=None):
+        """Ids of intervals overlapping [start, end), scanning back only while one can still overlap."""
+        found = []
+        j = bisect.bisect_left(self.starts, end) - 1
+        while j >= 0 and self.max_end[j] > start:
+            if self.ends[j] > start and self.ids[j] != ignore:
+                found.append(self.ids[j])
+            j -= 1
+        return found
+
+    def free_after(self, start):
+        """End of the latest interval starting before `start` (None if none)."""
+        i = bisect.bisect_left(self.starts, start)
+        return self.max_end[i - 1] if i else None
+
+
+class TripScheduler:
+    """Interval indexes for every bus and driver."""
+
+    def __init__(self, turnaround=timedelta(0)):
+        self.turnaround = turnaround
+        self.buses = {}
+        self.drivers = {}
+        self.trips = {}
+
+    @classmethod
+    def from_rows(cls, rows, turnaround=timedelta(0)):
+        """Build from rows shaped like SCHEDULE_SQL's result."""
+        scheduler = cls(turnaround)
+        for row in rows:
+            scheduler.add(row["trip_id"], row["bus_id"], row["driver_id"], row["start_time"], row["end_time"])
+        return scheduler
+
+    def _window(self, start, end):
+        # the bus/driver needs `turnaround` after a trip before the next one
+        return start, end + self.turnaround
+
+    def add(self, trip_id, bus_id, driver_id, start, end):
+        start, end = self._window(start, end)
+        if bus_id is not None:
+            self.buses.setdefault(bus_id, IntervalIndex()).add(start, end, trip_id)
+        if driver_id is not None:
+            self.drivers.setdefault(driver_id, IntervalIndex()).add(start, end, trip_id)
+        self.trips[trip_id] = (bus_id, driver_id, start, end)
+
+    def remove(self, trip_id):
+        bus_id, driver_id, _, _ = self.trips.pop(trip_id)
+        if bus_id is not None:
+            self.buses[bus_id].remove(trip_id)
+        if driver_id is not None:
+            self.drivers[driver_id].remove(trip_id)
+
+    def conflicts(self, bus_id, driver_id, start, end, ignore_trip_id=None):
+        """[("bus"|"driver", trip_id), ...] clashing with the proposed trip."""
+        start, end = self._window(start, end)
+        found = []
+        for kind, index in (("bus", self.buses.get(bus_id)), ("driver", self.drivers.get(driver_id))):
+            if index is not None and index.overlaps(start, end, ignore_trip_id):
+                found.extend((kind, tid) for tid in index.overlapping(start, end, ignore_trip_id))
+        return found
+
+    def all_conflicts(self):
+        """{trip_id: [("bus"|"driver", other_trip_id), ...]} for every double booking."""
+        clashes = {}
+        for kind, indexes in (("bus", self.buses), ("driver", self.drivers)):
+            for index in indexes.values():
+                # sweep: intervals sorted by start, compare with the running max end
+                for j in range(1, len(index)):
+                    if index.max_end[j - 1] > index.starts[j]:
+                        for other in index.overlapping(index.starts[j], index.ends[j], index.ids[j]):
+                            clashes.setdefault(index.ids[j], []).append((kind, other))
+                            clashes.setdefault(other, []).append((kind, index.ids[j]))
+        return {tid: sorted(set(c)) for tid, c in clashes.items()}
+
+    def auto_assign(self, trips, bus_ids, driver_ids, bus_routes=None):
+        """Greedily assign free buses/drivers to `trips` (dicts with trip_id,
+        route_id, start_time, end_time and optional bus_id/driver_id to keep).
+
+        Trips are taken in start order; each gets the free resource that has
+        been idle the shortest time (best fit), preferring buses whose home
+        route matches. A bus or driver given on the trip is kept only while it
+        is still in bus_ids/driver_ids (active) and free at that time; an
+        earlier trip keeps a double-booked resource, the later one gets
+        another. Returns (assignments, unassigned), where assignments is
+        {trip_id: (bus_id, driver_id)} and unassigned lists trip ids for
+        which no bus or no driver was free.
+        """
+        bus_routes = bus_routes or {}
+        active_buses, active_drivers = set(bus_ids), set(driver_ids)
+        # the trips being (re)assigned do not block each other with what they had before
+        for trip in trips:
+            if trip["trip_id"] in self.trips:
+                self.remove(trip["trip_id"])
+        assignments, unassigned = {}, []
+        for trip in sorted(trips, key=lambda t: t["start_time"]):
+            start, end = trip["start_time"], trip["end_time"]
+            bus_id = (self._kept(self.buses, active_buses, trip.get("bus_id"), start, end)
+                      or self._pick(self.buses, bus_ids, start, end,
+                                    prefer=lambda b: bus_routes.get(b) == trip.get("route_id")))
+            driver_id = (self._kept(self.drivers, active_drivers, trip.get("driver_id"), start, end)
+                         or self._pick(self.drivers, driver_ids, start, end))
+            if bus_id is None or driver_id is None:
+                unassigned.append(trip["trip_id"])
+                continue
+            self.add(trip["trip_id"], bus_id, driver_id, start, end)
+            assignments[trip["trip_id"]] = (bus_id, driver_id)
+        return assignments, unassigned
+
+    def _kept(self, indexes, active, rid, start, end):
+        """`rid` if it is active and free for [start, end), else None"""
+        if rid is None or rid not in active:
+            return None
+        index = indexes.get(rid)
+        return None if index is not None and index.overlaps(*self._window(start, end)) else rid
+
+    def _pick(self, indexes, candidates, start, end, prefer=None):
+        w_start, w_end = self._window(start, end)
+        best, best_key = None, None
+        for rid in candidates:
+            index = indexes.get(rid)
+            if index is not None and index.overlaps(w_start, w_end):
+                continue
+            last_end = index.free_after(w_start) if index is not None else None
+            # preferred first, then the one that became free most recently
+            key = (bool(prefer and prefer(rid)), last_end is not None, last_end or start)
+            if best_key is None or key > best_key:
+                best, best_key = rid, key
+        return best
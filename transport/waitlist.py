@@ -0,0 +1,309 @@
+"""
+Per-trip waitlist and the worker that backfills cancelled seats from it.
+
+A full trip used to end at "No seats available". Now a rider can join the
+trip's waitlist, a FIFO queue (waitlist rows in waitlist_id order, status
+'waiting'), with stops, fare and gender fixed at join time. When a seat
+comes free, assign_next() books it for the oldest waiting entry in one
+transaction:
+
+    lock the head of the queue -> take a seat off the trip's counter and
+    insert its ticket (seat_inventory.claim) -> mark the entry assigned ->
+    log it
+
+so a seat is never given to two entries and an entry never gets two seats,
+even with a worker in every app process.
+
+BackfillWorker runs assign_next() from a SeatFeed subscription: a released
+seat (or a resync for a change made by another process) queues the trip.
+Every `interval` it also sweeps: entries of departed or cancelled trips
+expire, and every trip with waiting entries is tried, catching releases
+nobody announced.
+
+Every lifecycle step (joined, assigned, left, expired) is written to
+waitlist_log; the ticket it produces is logged in ticket_log like any
+other. stats() reports assignments and release-to-assignment latency.
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from . import context, seat_inventory
+from .seat_feed import RELEASED, RESYNC
+
+WAITING, ASSIGNED, CANCELLED, EXPIRED = "waiting", "assigned", "cancelled", "expired"
+
+# waitlist_log actions
+ACTION_JOINED = "Waitlist Joined"
+ACTION_ASSIGNED = "Waitlist Seat Assigned"
+ACTION_LEFT = "Waitlist Left"
+ACTION_EXPIRED = "Waitlist Expired"
+
+WAITLIST_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS waitlist (
+        waitlist_id INT AUTO_INCREMENT PRIMARY KEY,
+        trip_id INT NOT NULL,
+        passenger_id INT,
+        boarding_stop_id INT,
+        dropping_stop_id INT,
+        fare DECIMAL(10,2),
+        gender ENUM('male','female','other') DEFAULT 'other',
+        status ENUM('waiting','assigned','cancelled','expired') DEFAULT 'waiting',
+        ticket_id INT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        resolved_at DATETIME,
+        INDEX idx_waitlist_queue (trip_id, status, waitlist_id),
+        INDEX idx_waitlist_passenger (passenger_id),
+        FOREIGN KEY (trip_id) REFERENCES trips(trip_id) ON DELETE CASCADE,
+        FOREIGN KEY (passenger_id) REFERENCES passengers(passenger_id) ON DELETE SET NULL,
+        FOREIGN KEY (boarding_stop_id) REFERENCES stops(stop_id) ON DELETE SET NULL,
+        FOREIGN KEY (dropping_stop_id) REFERENCES stops(stop_id) ON DELETE SET NULL
+    ) ENGINE=InnoDB;
+    """,
+    # append-only like ticket_log: no FKs, rows outlive their entry
+    """
+    CREATE TABLE IF NOT EXISTS waitlist_log (
+        log_id INT AUTO_INCREMENT PRIMARY KEY,
+        waitlist_id INT,
+        trip_id INT,
+        ticket_id INT,
+        log_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+        action VARCHAR(50),
+        INDEX idx_waitlist_log_entry (waitlist_id),
+        INDEX idx_waitlist_log_trip (trip_id)
+    ) ENGINE=InnoDB;
+    """,
+]
+
+LOG_SQL = "INSERT INTO waitlist_log (waitlist_id, trip_id, ticket_id, action) VALUES (%s, %s, %s, %s)"
+HEAD_SQL = """
+    SELECT waitlist_id, passenger_id, created_at FROM waitlist
+    WHERE trip_id = %s AND status = 'waiting'
+    ORDER BY waitlist_id LIMIT 1 FOR UPDATE
+"""
+# the ticket is built from the entry itself
+TICKET_FROM_ENTRY_SQL = """
+    INSERT INTO tickets (trip_id, passenger_id, boarding_stop_id, dropping_stop_id, seat_no, fare, gender)
+    SELECT trip_id, passenger_id, boarding_stop_id, dropping_stop_id, %s, fare, gender
+    FROM waitlist WHERE waitlist_id = %s
+"""
+POSITION_SQL = """
+    SELECT COUNT(*) AS n FROM waitlist
+    WHERE trip_id = %s AND status = 'waiting' AND waitlist_id <= %s
+"""
+BY_CONTACT_SQL = """
+    SELECT w.waitlist_id, w.trip_id, w.status, w.created_at, t.start_time, r.route_name,
+           bs.stop_name AS boarding_stop, ds.stop_name AS dropping_stop,
+           (SELECT COUNT(*) FROM waitlist q
+            WHERE q.trip_id = w.trip_id AND q.status = 'waiting' AND q.waitlist_id <= w.waitlist_id) AS position
+    FROM waitlist w
+    JOIN passengers p ON w.passenger_id = p.passenger_id
+    LEFT JOIN trips t ON w.trip_id = t.trip_id
+    LEFT JOIN routes r ON t.route_id = r.route_id
+    LEFT JOIN stops bs ON w.boarding_stop_id = bs.stop_id
+    LEFT JOIN stops ds ON w.dropping_stop_id = ds.stop_id
+    WHERE p.contact_key = %s AND w.status = 'waiting'
+    ORDER BY t.start_time
+"""
+STALE_SQL = """
+    SELECT w.waitlist_id, w.trip_id FROM waitlist w JOIN trips t ON w.trip_id = t.trip_id
+    WHERE w.status = 'waiting' AND (t.status <> 'scheduled' OR t.start_time <= %s)
+"""
+PENDING_TRIPS_SQL = "SELECT DISTINCT trip_id FROM waitlist WHERE status = 'waiting'"
+WAITING_ENTRY_SQL = "SELECT waitlist_id FROM waitlist WHERE trip_id = %s AND passenger_id = %s AND status = 'waiting'"
+STATUS_SQL = "SELECT status FROM waitlist WHERE waitlist_id = %s"
+TRIP_OF_SQL = "SELECT trip_id FROM waitlist WHERE waitlist_id = %s"
+
+Assignment = namedtuple("Assignment", ["waitlist_id", "trip_id", "passenger_id", "ticket_id", "seat_no",
+                                       "waited_s",       # joined -> assigned
+                                       "assigned_at"])   # time.monotonic()
+
+
+def _log(cur, waitlist_id, trip_id, action, ticket_id=None):
+    cur.execute(LOG_SQL, (waitlist_id, trip_id, ticket_id, action))
+
+
+# --------------------------- queue ---------------------------
+def join(cur, trip_id, passenger_id, boarding_stop_id, dropping_stop_id, fare, gender):
+    """Queue a passenger for a trip; (waitlist_id, position). A passenger
+    already waiting for the trip keeps their entry (and place)."""
+    cur.execute(WAITING_ENTRY_SQL, (trip_id, passenger_id))
+    row = cur.fetchone()
+    if row:
+        waitlist_id = row["waitlist_id"]
+    else:
+        cur.execute("""
+            INSERT INTO waitlist (trip_id, passenger_id, boarding_stop_id, dropping_stop_id, fare, gender)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (trip_id, passenger_id, boarding_stop_id, dropping_stop_id, fare, gender))
+        waitlist_id = cur.lastrowid
+        _log(cur, waitlist_id, trip_id, ACTION_JOINED)
+    return waitlist_id, position(cur, trip_id, waitlist_id)
+
+
+def position(cur, trip_id, waitlist_id):
+    """1-based place in the trip's queue (0 once the entry is no longer waiting)"""
+    cur.execute(STATUS_SQL, (waitlist_id,))
+    row = cur.fetchone()
+    if not row or row["status"] != WAITING:
+        return 0
+    cur.execute(POSITION_SQL, (trip_id, waitlist_id))
+    return cur.fetchone()["n"]
+
+
+def leave(cur, waitlist_id):
+    """Take a waiting entry off its queue; False if it was not waiting"""
+    cur.execute("UPDATE waitlist SET status = 'cancelled', resolved_at = NOW() WHERE waitlist_id = %s AND status = 'waiting'",
+                (waitlist_id,))
+    if not cur.rowcount:
+        return False
+    cur.execute(TRIP_OF_SQL, (waitlist_id,))
+    _log(cur, waitlist_id, cur.fetchone()["trip_id"], ACTION_LEFT)
+    return True
+
+
+def expire(cur, now):
+    """Expire waiting entries of trips that departed or are no longer scheduled; their ids"""
+    cur.execute(STALE_SQL, (now,))
+    stale = cur.fetchall()
+    for row in stale:
+        cur.execute("UPDATE waitlist SET status = 'expired', resolved_at = NOW() WHERE waitlist_id = %s AND status = 'waiting'",
+                    (row["waitlist_id"],))
+        if cur.rowcount:
+            _log(cur, row["waitlist_id"], row["trip_id"], ACTION_EXPIRED)
+    return [row["waitlist_id"] for row in stale]
+
+
+def pending_trips(cur):
+    cur.execute(PENDING_TRIPS_SQL)
+    return [row["trip_id"] for row in cur.fetchall()]
+
+
+def assign_next(cur, trip_id, seats, is_duplicate, now):
+    """Book the first free one of `seats` for the head of the trip's queue,
+    in the caller's transaction.
+
+    Returns an Assignment, None when nobody is waiting, or SOLD_OUT / False
+    when no seat could be taken (the caller rolls back: the counter seat
+    of a missed claim must be returned).
+    """
+    cur.execute(HEAD_SQL, (trip_id,))
+    head = cur.fetchone()
+    if not head:
+        return None
+    waitlist_id = head["waitlist_id"]
+    insert = lambda cur, seat_no: cur.execute(TICKET_FROM_ENTRY_SQL, (seat_no, waitlist_id))
+    seat_no = seat_inventory.claim(cur, trip_id, seats, insert, is_duplicate)
+    if seat_no == seat_inventory.SOLD_OUT:
+        return seat_no
+    if seat_no is None:
+        return False
+    ticket_id = cur.lastrowid
+    cur.execute("UPDATE waitlist SET status = 'assigned', ticket_id = %s, resolved_at = NOW() "
+                "WHERE waitlist_id = %s AND status = 'waiting'", (ticket_id, waitlist_id))
+    if not cur.rowcount:
+        return False    # left the queue meanwhile
+    _log(cur, waitlist_id, trip_id, ACTION_ASSIGNED, ticket_id)
+    waited = (now - head["created_at"]).total_seconds() if head["created_at"] else None
+    return Assignment(waitlist_id, trip_id, head["passenger_id"], ticket_id, seat_no, waited, time.monotonic())
+
+
+# --------------------------- worker ---------------------------
+def _percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None}
+    ordered = sorted(samples)
+    pick = lambda p: round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+    return {"p50": pick(0.5), "p95": pick(0.95)}
+
+
+class BackfillWorker:
+    """Background thread giving freed seats to waitlisted passengers.
+
+    `backfill(trip_id)` assigns what it can for one trip and returns the
+    Assignments; `sweep()` expires stale entries and returns the trips that
+    still have waiting ones. Subscribe on_seat_change() to the SeatFeed.
+    """
+
+    def __init__(self, backfill, sweep, interval=30.0):
+        self.backfill = backfill
+        self.sweep = sweep
+        self.interval = interval
+        self.assigned = 0
+        self.runs = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._pending = {}                      # trip_id -> [monotonic time of each wake]
+        self._latency_ms = deque(maxlen=1000)   # seat released -> assignment committed
+        self._waited_s = deque(maxlen=1000)     # joined -> assigned
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="waitlist-backfill", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def on_seat_change(self, trip_id, kind, seat_no):
+        if kind in (RELEASED, RESYNC):
+            self.wake(trip_id)
+
+    def wake(self, trip_id):
+        """Try the trip's queue now (a seat was freed, or someone joined)"""
+        with self._lock:
+            self._pending.setdefault(trip_id, []).append(time.monotonic())
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            return {"assigned": self.assigned, "runs": self.runs, "errors": self.errors,
+                    "pending_trips": len(self._pending),
+                    "release_to_assign_ms": _percentiles(self._latency_ms),
+                    "waited_s": _percentiles(self._waited_s)}
+
+    def run_once(self, sweep=False):
+        """Backfill the queued trips (and, with sweep, every trip with waiting entries)"""
+        if sweep:
+            trips = self.sweep()
+            with self._lock:
+                for trip_id in trips:
+                    self._pending.setdefault(trip_id, []).append(time.monotonic())
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for trip_id, woken in pending.items():
+            try:
+                assignments = self.backfill(trip_id)
+            except Exception:
+                context.logger.exception("waitlist backfill failed for trip %s", trip_id)
+                with self._lock:
+                    self.errors += 1
+                continue
+            with self._lock:
+                self.runs += 1
+                self.assigned += len(assignments)
+                # n-th seat assigned <- n-th release (later ones: the last wake)
+                for i, a in enumerate(assignments):
+                    self._latency_ms.append((a.assigned_at - woken[min(i, len(woken) - 1)]) * 1000)
+                    if a.waited_s is not None:
+                        self._waited_s.append(a.waited_s)
+        return len(pending)
+
+    def _run(self):
+        next_sweep = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.wait(max(0.0, next_sweep - time.monotonic()))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            sweep = time.monotonic() >= next_sweep
+            if sweep:
+                next_sweep = time.monotonic() + self.interval
+            try:
+                self.run_once(sweep)
+            except Exception:
+                context.logger.exception("waitlist worker pass failed")